@@ -9,6 +9,7 @@ import os
 import sys
 import logging
 import atexit
+import signal
 import argparse
 import subprocess
 import platform
@@ -28,6 +29,7 @@ try:
     from config import Config, config
     from database import DatabaseManager
     from models import Post, PostStatus, ContentTone
+    from services.health_monitor import get_health_monitor
     print("✅ Imports de base réussis")
 except ImportError as e:
     print(f"❌ Erreur imports de base: {e}")
@@ -284,6 +286,9 @@ def setup_logging(app):
 
 def get_active_image_service_name(app) -> str:
     """Retourne le nom du service d'images actif"""
+    if hasattr(getattr(app, 'image_generator', None), 'service_name'):
+        # Routage selon l'état des backends
+        return app.image_generator.service_name
     if hasattr(app, 'sd_generator') and app.sd_generator and getattr(app.sd_generator, 'is_available', False):
         return "Stable Diffusion"
     elif hasattr(app, 'hf_generator') and app.hf_generator:
@@ -350,13 +355,25 @@ def init_services(app, services):
         try:
             from services.stable_diffusion_generator import StableDiffusionGenerator
             
-            print(f"🔄 Initialisation Stable Diffusion sur {Config.STABLE_DIFFUSION_URL}...")
-            app.sd_generator = StableDiffusionGenerator(Config.STABLE_DIFFUSION_URL)
+            sd_pool = None
+            if len(Config.STABLE_DIFFUSION_URLS) > 1:
+                from services.sd_backend_pool import SDBackendPool
+                print(f"🔄 Initialisation Stable Diffusion sur {len(Config.STABLE_DIFFUSION_URLS)} instances...")
+                # Contrôle de santé des instances piloté par le moniteur (voir le générateur)
+                sd_pool = SDBackendPool(Config.STABLE_DIFFUSION_URLS,
+                                        health_interval=Config.SD_HEALTH_CHECK_INTERVAL)
+            else:
+                print(f"🔄 Initialisation Stable Diffusion sur {Config.STABLE_DIFFUSION_URL}...")
+            app.sd_generator = StableDiffusionGenerator(
+                Config.STABLE_DIFFUSION_URLS[0] if Config.STABLE_DIFFUSION_URLS else Config.STABLE_DIFFUSION_URL,
+                pool=sd_pool
+            )
+            
+            # Santé sondée en arrière-plan: attente bornée du premier sondage pour le résumé
+            get_health_monitor().wait_checked([app.sd_generator.health_name], timeout=Config.HEALTH_STARTUP_WAIT)
             
-            # ✅ VÉRIFICATION CRITIQUE - C'est ici que ça coince normalement!
-            if hasattr(app.sd_generator, 'is_available') and app.sd_generator.is_available:
+            if app.sd_generator.is_available:
                 # ✅✅✅ STABLE DIFFUSION FONCTIONNE!
-                app.image_generator = app.sd_generator
                 print("✅✅✅ Stable Diffusion ACTIF et configuré comme générateur principal!")
                 print(f"   🌐 URL: {Config.STABLE_DIFFUSION_URL}")
                 
@@ -371,6 +388,7 @@ def init_services(app, services):
                     print(f"   ⚠️  Impossible de récupérer les modèles: {e}")
             else:
                 print(f"⚠️  Stable Diffusion configuré mais NON ACCESSIBLE sur {Config.STABLE_DIFFUSION_URL}")
+                print("🔄 Il sera utilisé dès qu'il répondra (contrôle de santé en arrière-plan)")
                 print(f"💡 Vérifiez que SD est démarré avec: webui-user.bat --api (Windows)")
                 print(f"💡 Ou: ./webui.sh --api (Linux/Mac)")
                 
@@ -382,12 +400,11 @@ def init_services(app, services):
             import traceback
             traceback.print_exc()
     
-    # B. Hugging Face (priorité 2 - gratuit en ligne)
-    if Config.USE_HUGGINGFACE and not app.image_generator:
+    # B. Hugging Face (priorité 2 - gratuit en ligne, relais si SD tombe)
+    if Config.USE_HUGGINGFACE:
         try:
             from services.stable_diffusion_generator import HuggingFaceGenerator
             app.hf_generator = HuggingFaceGenerator(Config.HUGGINGFACE_API_TOKEN)
-            app.image_generator = app.hf_generator
             print("✅ Hugging Face configuré comme générateur d'images")
         except ImportError as e:
             print(f"❌ Module Hugging Face manquant: {e}")
@@ -395,12 +412,12 @@ def init_services(app, services):
             print(f"❌ Erreur Hugging Face: {e}")
     
     # C. OpenAI DALL-E (priorité 3 - payant mais fiable)
-    if Config.OPENAI_API_KEY and not app.image_generator:
+    openai_generator = None
+    if Config.OPENAI_API_KEY:
         try:
             import openai
             from services.ai_generator import AIImageGenerator
             openai_generator = AIImageGenerator(Config.OPENAI_API_KEY)
-            app.image_generator = openai_generator
             print("✅ OpenAI DALL-E configuré comme générateur d'images")
         except ImportError:
             print("❌ Module OpenAI manquant")
@@ -408,6 +425,17 @@ def init_services(app, services):
         except Exception as e:
             print(f"❌ Erreur OpenAI: {e}")
     
+    # Chaque génération va au premier service sain (état en cache du moniteur de santé)
+    if app.sd_generator or app.hf_generator:
+        from services.image_router import FailoverImageGenerator
+        app.image_generator = FailoverImageGenerator([
+            ("Stable Diffusion", app.sd_generator),
+            ("Hugging Face", app.hf_generator),
+            ("OpenAI DALL-E", openai_generator)
+        ])
+    elif openai_generator:
+        app.image_generator = openai_generator
+    
     # D. GÉNÉRATEUR PLACEHOLDER si aucun service disponible
     if not app.image_generator:
         print("⚠️  Aucun service de génération d'images disponible")
@@ -433,6 +461,8 @@ def init_services(app, services):
     
     # Résumé du service d'images actif
     def get_active_service():
+        if hasattr(app.image_generator, 'service_name'):
+            return app.image_generator.service_name
         if hasattr(app, 'sd_generator') and app.sd_generator and getattr(app.sd_generator, 'is_available', False):
             return "Stable Diffusion"
         elif hasattr(app, 'hf_generator') and app.hf_generator:
@@ -445,6 +475,22 @@ def init_services(app, services):
     service_name = get_active_service()
     print(f"🎨 Service d'images actif: {service_name}")
     
+    # File de génération: les routes soumettent, un pool borné alimente Stable Diffusion
+    app.generation_queue = None
+    app.progress_broadcaster = None
+    if app.sd_generator:
+        from services.generation_queue import GenerationQueue
+        # Un worker (ou SD_QUEUE_WORKERS) par instance Stable Diffusion
+        instances = len(app.sd_generator.pool) if getattr(app.sd_generator, 'pool', None) else 1
+        app.generation_queue = GenerationQueue(app.sd_generator,
+                                               workers=Config.SD_QUEUE_WORKERS * instances).start()
+        print(f"✅ File de génération: {app.generation_queue.workers} worker(s), "
+              f"{app.generation_queue.max_pending} travaux en attente max")
+        
+        # Progression: un relevé par instance partagé par tous les clients
+        from services.progress_broadcaster import ProgressBroadcaster
+        app.progress_broadcaster = ProgressBroadcaster(app.sd_generator, app.generation_queue)
+    
     # Service Instagram
     if services.get('instagram') and Config.INSTAGRAM_ACCESS_TOKEN and Config.INSTAGRAM_ACCOUNT_ID:
         try:
@@ -452,6 +498,11 @@ def init_services(app, services):
                 Config.INSTAGRAM_ACCESS_TOKEN,
                 Config.INSTAGRAM_ACCOUNT_ID
             )
+            # Scheduler embarqué et publications manuelles partagent un seul thread de polling
+            if Config.INSTAGRAM_CONTAINER_TRACKER:
+                app.instagram_publisher.enable_container_tracker(
+                    min_interval=Config.INSTAGRAM_CONTAINER_POLL_INTERVAL
+                )
             print("✅ Service Instagram initialisé")
         except Exception as e:
             print(f"❌ Erreur service Instagram: {e}")
@@ -484,8 +535,17 @@ def init_services(app, services):
                 app.logger.error(f"🚨 Erreur scheduler: {error}")
             
             app.scheduler.set_callbacks(on_post_published, on_post_failed, on_scheduler_error)
-            app.scheduler.start()
-            print("✅ Scheduler démarré")
+            app.scheduler.check_interval = Config.SCHEDULER_CHECK_INTERVAL
+            app.scheduler.publish_spacing = Config.SCHEDULER_PUBLISH_SPACING
+            app.scheduler.drain_timeout = Config.SCHEDULER_DRAIN_TIMEOUT
+            
+            if Config.SCHEDULER_EMBEDDED:
+                app.scheduler.start()
+                print("✅ Scheduler démarré")
+            else:
+                # La publication est assurée par le démon (python -m utils.scheduler);
+                # l'instance reste disponible pour la programmation et les statistiques
+                print("ℹ️  Scheduler embarqué désactivé (SCHEDULER_EMBEDDED=False)")
         except Exception as e:
             print(f"❌ Erreur scheduler: {e}")
             app.scheduler = None
@@ -553,6 +613,8 @@ def init_services(app, services):
         try:
             from services.stable_video_diffusion_generator import StableVideoDiffusionGenerator
             app.svd_generator = StableVideoDiffusionGenerator(Config.SVD_API_URL)
+            get_health_monitor().wait_checked([app.svd_generator.health_name],
+                                              timeout=Config.HEALTH_STARTUP_WAIT)
             
             if app.svd_generator.is_available:
                 print("✅ Stable Video Diffusion configuré et accessible")
@@ -1173,6 +1235,7 @@ def setup_system_routes(app, services, routes_ok):
             'services': services_status,
             'ai_configuration': ai_config,
             'ollama_models': ollama_models,
+            'backends_health': get_health_monitor().stats(),
             'statistics': stats,
             'version': '2.0.0-video',
             'timestamp': datetime.now().isoformat(),
@@ -1282,6 +1345,10 @@ def setup_error_handlers(app):
 
 def test_ollama_connection():
     """Test la connexion à Ollama et retourne les modèles (VERSION AMÉLIORÉE)"""
+    # État en cache si le générateur Ollama est surveillé (aucun appel réseau)
+    health = get_health_monitor().status(f"ollama@{Config.OLLAMA_BASE_URL.rstrip('/')}")
+    if health and health.healthy is not None:
+        return bool(health.healthy), list(health.detail or [])
     try:
         import requests
         response = requests.get(f"{Config.OLLAMA_BASE_URL}/api/tags", timeout=10)
@@ -1358,13 +1425,50 @@ OLLAMA_TIMEOUT=30
 # === SERVICES IA - IMAGES ===
 USE_STABLE_DIFFUSION=True
 STABLE_DIFFUSION_URL=http://localhost:7861
+# Plusieurs instances (répartition de charge et bascule), séparées par des virgules
+# STABLE_DIFFUSION_URLS=http://gpu1:7860,http://gpu2:7860
+SD_HEALTH_CHECK_INTERVAL=15
 SD_DEFAULT_STEPS=20
 SD_DEFAULT_CFG_SCALE=7.0
 SD_DEFAULT_SIZE=1024x1024
+# Images générées ensemble par requête (selon la VRAM)
+SD_MAX_BATCH_SIZE=4
+# Profils de génération (1:1, 4:5, 9:16): surface native et hires-fix maximal
+SD_NATIVE_SIZE=720
+SD_MAX_HR_SCALE=2.0
+# File de génération (workers Flask libérés pendant la génération)
+SD_QUEUE_WORKERS=1
+SD_QUEUE_MAX_PENDING=20
+# Regroupement des travaux par modèle (moins de rechargements de checkpoint)
+SD_AFFINITY_MAX_WAIT=120
+SD_AFFINITY_MAX_SKIPS=5
+# Progression en direct (SSE): relevé partagé par instance
+SD_PROGRESS_INTERVAL=0.5
+SD_PROGRESS_IDLE_TIMEOUT=10
+# Post-traitement des images: jpeg (publication Instagram), webp ou png
+IMAGE_OUTPUT_FORMAT=jpeg
+IMAGE_JPEG_QUALITY=92
+IMAGE_WEBP_QUALITY=85
+IMAGE_ARCHIVE_PNG=False
+IMAGE_PIPELINE_WORKERS=0
+# Variantes d'affichage (miniatures de galerie, aperçus)
+IMAGE_THUMB_WIDTH=320
+IMAGE_MEDIUM_WIDTH=720
+IMAGE_VARIANT_FORMAT=webp
+IMAGE_VARIANT_QUALITY=80
+IMAGE_VARIANTS_AT_SAVE=True
+# Cache des images générées, en Mo (0 pour désactiver)
+GENERATION_CACHE_MAX_MB=2048
 
 USE_HUGGINGFACE=False
 HUGGINGFACE_API_TOKEN=your_hf_token_here
 
+# Surveillance des backends en arrière-plan (secondes)
+HEALTH_CHECK_INTERVAL=15
+HEALTH_CHECK_TIMEOUT=5
+HF_HEALTH_CHECK_INTERVAL=300
+HEALTH_STARTUP_WAIT=3
+
 # === SERVICES IA - VIDÉOS (NOUVEAU) ===
 USE_STABLE_VIDEO_DIFFUSION=True
 SVD_API_URL=http://localhost:7862
@@ -1378,6 +1482,16 @@ SVD_DEFAULT_MOTION=0.7
 # === INSTAGRAM CONFIGURATION ===
 INSTAGRAM_ACCESS_TOKEN=your_instagram_access_token
 INSTAGRAM_ACCOUNT_ID=your_instagram_business_account_id
+# Cache persistant des métadonnées Instagram (vide: en mémoire seulement)
+INSTAGRAM_CACHE_PATH=instagram_cache.db
+# Usage de l'API Graph (%) à partir duquel les publications ralentissent
+GRAPH_USAGE_THROTTLE_PERCENT=80
+# Images à publier: backend local (servi sur /media) ou s3
+MEDIA_UPLOAD_BACKEND=local
+MEDIA_PUBLIC_BASE_URL=https://votre-domaine.example
+# S3_BUCKET=
+# S3_ENDPOINT_URL=
+# S3_PUBLIC_BASE_URL=
 
 # === FLASK CONFIGURATION ===
 SECRET_KEY=your_super_secret_key_change_this_in_production
@@ -1392,6 +1506,18 @@ VIDEO_FOLDER=generated/videos
 
 # === SCHEDULER ===
 SCHEDULER_CHECK_INTERVAL=60
+# False pour publier depuis le démon: python -m utils.scheduler
+SCHEDULER_EMBEDDED=True
+SCHEDULER_DAEMON_PORT=8765
+# Publications simultanées depuis une boucle asyncio (démon, aiohttp requis)
+SCHEDULER_ASYNC_PUBLISHING=False
+SCHEDULER_MAX_CONCURRENT_PUBLICATIONS=5
+# Suivi groupé des containers Instagram (polls partagés, intervalle adaptatif)
+INSTAGRAM_CONTAINER_TRACKER=True
+INSTAGRAM_CONTAINER_POLL_INTERVAL=1.0
+# Synchronisations Instagram du démon, en secondes (0 pour désactiver)
+INSIGHTS_SYNC_INTERVAL=900
+MEDIA_SYNC_INTERVAL=300
 
 # === NOTES D'INSTALLATION ===
 # 1. Ollama:
@@ -1605,9 +1731,15 @@ def main():
         if hasattr(app, 'scheduler') and app.scheduler:
             print("🔄 Arrêt du scheduler...")
             app.scheduler.stop()
+        if getattr(app, 'instagram_publisher', None):
+            app.instagram_publisher.close()
     
     atexit.register(shutdown_scheduler)
     
+    # SIGTERM (systemd, docker stop) doit passer par atexit pour laisser
+    # les publications en cours se terminer
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     # Informations de démarrage
     print("\n" + "=" * 60)
     print("🌟 APPLICATION PRÊTE")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Comparaison de débit des profils de génération (services/generation_profiles.py)
+
+Sans --url, le coût GPU est estimé en pixels × étapes de débruitage: passe
+native plus passe hires-fix (≈ steps × denoising_strength étapes). L'ancien
+rendu (720 de large au ratio demandé, hires-fix ×1.5, puis recadrage au
+carré 1080²) sert de référence.
+
+Avec --url, chaque profil et l'ancien rendu sont mesurés sur une instance
+AUTOMATIC1111 réelle (--images générations de chaque).
+
+Usage:
+    python benchmark_generation_profiles.py
+    python benchmark_generation_profiles.py --native-size 1024 --steps 30
+    python benchmark_generation_profiles.py --url http://localhost:7860 --images 3 --json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import requests
+
+from services.generation_profiles import compare_profiles, list_profiles, _round8
+
+
+def legacy_params(ratio: float) -> Dict[str, Any]:
+    """Résolution de l'ancien rendu fixe pour un ratio"""
+    return {'width': _round8(720), 'height': _round8(720 / ratio), 'enable_hr': True, 'hr_scale': 1.5}
+
+
+def measure(url: str, params: Dict[str, Any], images: int, steps: int) -> float:
+    """Secondes moyennes par image sur l'instance"""
+    payload = dict(params, prompt='a mountain lake at sunrise, professional photography',
+                   steps=steps, seed=1, sampler_name='DPM++ 2M Karras',
+                   hr_upscaler='Latent', denoising_strength=0.7)
+    started = time.perf_counter()
+    for _ in range(images):
+        response = requests.post(f"{url.rstrip('/')}/sdapi/v1/txt2img", json=payload, timeout=900)
+        response.raise_for_status()
+    return (time.perf_counter() - started) / images
+
+
+def run(args) -> List[Dict[str, Any]]:
+    rows = compare_profiles(steps=args.steps, denoising_strength=args.denoising)
+    if not args.url:
+        return rows
+
+    profiles = {p.name: p for p in list_profiles(args.native_size ** 2 if args.native_size else None)}
+    for row in rows:
+        profile = profiles[row['profile']['name']]
+        ratio = profile.output_size[0] / profile.output_size[1]
+        row['measured_s'] = round(measure(args.url, profile.txt2img_params(), args.images, args.steps), 2)
+        row['legacy_measured_s'] = round(measure(args.url, legacy_params(ratio), args.images, args.steps), 2)
+        row['measured_speedup'] = round(row['legacy_measured_s'] / row['measured_s'], 2)
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]]):
+    print(f"\n{'Format':<10} {'Natif':<10} {'Hires':<10} {'Publié':<10} {'Perte':>7} "
+          f"{'Perte avant':>12} {'Débit relatif':>14}")
+    for row in rows:
+        profile = row['profile']
+        hires = 'x'.join(map(str, profile['hires_size'])) if profile['hires_size'] else '-'
+        print(f"{profile['aspect']:<10} {'x'.join(map(str, profile['native_size'])):<10} {hires:<10} "
+              f"{'x'.join(map(str, profile['output_size'])):<10} {profile['wasted_fraction']:>7.1%} "
+              f"{row['legacy_wasted_fraction']:>12.1%} {'x' + str(row['relative_throughput']):>14}")
+        if 'measured_s' in row:
+            print(f"{'':<10} mesuré: {row['measured_s']}s/image contre {row['legacy_measured_s']}s "
+                  f"-> x{row['measured_speedup']}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Comparaison de débit des profils de génération")
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--denoising', type=float, default=0.7, help='denoising_strength du hires-fix')
+    parser.add_argument('--native-size', type=int, default=0, help='Côté natif (SD_NATIVE_SIZE par défaut)')
+    parser.add_argument('--url', help='Instance AUTOMATIC1111 pour une mesure réelle')
+    parser.add_argument('--images', type=int, default=2, help='Générations mesurées par profil (--url)')
+    parser.add_argument('--json', action='store_true', help='Rapport JSON sur la sortie standard')
+    args = parser.parse_args(argv)
+
+    if args.native_size:
+        from config import Config
+        Config.SD_NATIVE_SIZE = args.native_size
+
+    rows = run(args)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"📊 PROFILS DE GÉNÉRATION - {args.steps} étapes, hires-fix denoising {args.denoising}")
+        print_report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark du pipeline de post-traitement des images (services/image_pipeline.py)
+
+Des images synthétiques de la taille d'une sortie Stable Diffusion (PNG
+base64, comme renvoyées par txt2img) traversent le pipeline; le rapport
+donne le débit et les percentiles de chaque étape. --baseline mesure aussi
+l'ancien traitement (décodage, recadrage, LANCZOS puis PNG optimize=True
+dans le thread appelant) sur les mêmes images.
+
+Usage:
+    python benchmark_image_pipeline.py --images 32
+    python benchmark_image_pipeline.py --images 64 --format webp --workers 4 --baseline
+    python benchmark_image_pipeline.py --format jpeg --archive --json
+    python benchmark_image_pipeline.py --no-variants   # sans miniatures ni aperçus
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from PIL import Image
+
+from services.image_pipeline import ImagePipeline
+from utils.metrics import RollingHistogram
+
+
+PERCENTILES = (50, 90, 99)
+
+
+def synthetic_images(count: int, width: int, height: int) -> List[str]:
+    """PNG base64 au contenu varié (un aplat se compresserait trop bien)"""
+    images = []
+    for index in range(count):
+        image = Image.effect_mandelbrot((width, height), (-2.0 + index * 0.01, -1.2, 0.8, 1.2), 60 + index)
+        image = Image.merge('RGB', (image, image.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                                    Image.linear_gradient('L').resize((width, height))))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        images.append(base64.b64encode(buffer.getvalue()).decode('ascii'))
+    return images
+
+
+def run_baseline(images: List[str], workdir: str) -> Dict[str, Any]:
+    """Ancien _save_image: tout dans le thread appelant, PNG optimize=True"""
+    histogram = RollingHistogram(window_seconds=10 ** 9, max_samples=10 ** 6)
+    started = time.perf_counter()
+    for index, image_b64 in enumerate(images):
+        image_started = time.perf_counter()
+        image = Image.open(io.BytesIO(base64.b64decode(image_b64))).convert('RGB')
+        width, height = image.size
+        size = min(width, height)
+        left, top = (width - size) // 2, (height - size) // 2
+        image = image.crop((left, top, left + size, top + size)).resize((1080, 1080), Image.Resampling.LANCZOS)
+        image.save(os.path.join(workdir, f"baseline_{index}.png"), 'PNG', quality=95, optimize=True)
+        histogram.observe(time.perf_counter() - image_started)
+    elapsed = time.perf_counter() - started
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(len(images) / elapsed, 2),
+        'per_image_s': histogram.snapshot(PERCENTILES),
+        'bytes_per_image': sum(os.path.getsize(os.path.join(workdir, f"baseline_{i}.png"))
+                               for i in range(len(images))) // max(1, len(images))
+    }
+
+
+def run_pipeline(images: List[str], workdir: str, args) -> Dict[str, Any]:
+    pipeline = ImagePipeline(workers=args.workers or None, fmt=args.format, archive=args.archive,
+                             use_processes=not args.threads, variants=() if args.no_variants else None)
+    # Démarrage du pool hors mesure (création des processus)
+    pipeline.process(images[0], os.path.join(workdir, 'warmup'), is_base64=True)
+    pipeline.stages.clear()
+    pipeline.total = RollingHistogram(window_seconds=10 ** 9, max_samples=10 ** 6)
+
+    started = time.perf_counter()
+    results = pipeline.process_many([
+        {'source': image_b64, 'output_base': os.path.join(workdir, f"pipeline_{index}"),
+         'metadata': {'prompt': 'benchmark', 'index': index}, 'is_base64': True}
+        for index, image_b64 in enumerate(images)
+    ])
+    elapsed = time.perf_counter() - started
+
+    stats = pipeline.stats()
+    pipeline.shutdown()
+    paths = [r.path for r in results if r.success]
+    variant_paths = {}
+    for result in results:
+        for variant, path in result.variants.items():
+            variant_paths.setdefault(variant, []).append(path)
+    return {
+        'format': stats['format'],
+        'workers': stats['workers'],
+        'processes': stats['processes'],
+        'succeeded': len(paths),
+        'failed': len(results) - len(paths),
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(len(images) / elapsed, 2),
+        'per_image_s': stats['total_s'],
+        'stages_s': stats['stages_s'],
+        'bytes_per_image': sum(os.path.getsize(p) for p in paths) // max(1, len(paths)),
+        'bytes_per_variant': {variant: sum(os.path.getsize(p) for p in variant_list) // len(variant_list)
+                              for variant, variant_list in variant_paths.items()}
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    pipeline = report['pipeline']
+    print(f"\n✅ Pipeline {pipeline['format']} ({pipeline['workers']} "
+          f"{'processus' if pipeline['processes'] else 'threads'}): {pipeline['succeeded']} images "
+          f"en {pipeline['elapsed_s']}s -> {pipeline['images_per_s']} images/s, "
+          f"{pipeline['bytes_per_image'] // 1024} Ko/image")
+    for stage, snapshot in pipeline['stages_s'].items():
+        print(f"   {stage:<14} moyenne={snapshot['mean']}s  p50={snapshot['p50']}s  "
+              f"p99={snapshot['p99']}s  max={snapshot['max']}s")
+    for variant, size in pipeline['bytes_per_variant'].items():
+        print(f"   Variante {variant}: {size // 1024} Ko/image")
+
+    baseline = report.get('baseline')
+    if baseline:
+        print(f"\n🐢 Ancien traitement (PNG optimize, thread appelant): {baseline['images_per_s']} images/s, "
+              f"p50={baseline['per_image_s']['p50']}s/image, {baseline['bytes_per_image'] // 1024} Ko/image")
+        print(f"   Accélération: x{round(pipeline['images_per_s'] / baseline['images_per_s'], 1)}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de post-traitement des images")
+    parser.add_argument('--images', type=int, default=32)
+    parser.add_argument('--size', default='1080x1080', help='Taille des images source (sortie SD)')
+    parser.add_argument('--format', default=None, help='jpeg, webp ou png (IMAGE_OUTPUT_FORMAT par défaut)')
+    parser.add_argument('--archive', action='store_true', help='Copie PNG d\'archivage en plus')
+    parser.add_argument('--workers', type=int, default=0, help='Processus (0: un par CPU)')
+    parser.add_argument('--threads', action='store_true', help='Pool de threads au lieu de processus')
+    parser.add_argument('--no-variants', action='store_true', help='Sans variantes d\'affichage (thumb, medium)')
+    parser.add_argument('--baseline', action='store_true', help='Mesurer aussi l\'ancien traitement')
+    parser.add_argument('--json', action='store_true', help='Rapport JSON sur la sortie standard')
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    images = synthetic_images(args.images, width, height)
+    workdir = tempfile.mkdtemp(prefix='image_pipeline_')
+
+    try:
+        if not args.json:
+            print(f"📊 BENCHMARK POST-TRAITEMENT - {args.images} images {width}x{height} -> 1080x1080")
+        report = {'pipeline': run_pipeline(images, workdir, args)}
+        if args.baseline:
+            report['baseline'] = run_baseline(images, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark des appels Graph API d'InstagramPublisher contre un faux serveur local
+
+Compare une connexion neuve par appel (ancien comportement: requests.get/post
+au niveau module) à la session poolée keep-alive du publisher.
+
+Usage:
+    python benchmark_instagram_api.py
+    python benchmark_instagram_api.py --publishes 50 --status-polls 10 --connection-delay 0.08
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from services.instagram_api import InstagramPublisher
+from utils.mock_graph_server import MockGraphServer
+
+
+class FreshConnectionSession(requests.Session):
+    """Session ouvrant une nouvelle connexion à chaque requête (ancien comportement)"""
+
+    def request(self, method, url, **kwargs):
+        return requests.request(method, url, **kwargs)
+
+
+class BenchmarkPublisher(InstagramPublisher):
+    """Publisher dont l'upload CDN est court-circuité (hors périmètre du benchmark)"""
+
+    def _upload_image_to_cdn(self, image_path):
+        return f"https://cdn.example.com/{image_path}"
+
+
+def run(publisher: InstagramPublisher, publishes: int, status_polls: int) -> list:
+    """Exécute `publishes` publications et retourne la durée de chacune"""
+    durations = []
+
+    for i in range(publishes):
+        start = time.perf_counter()
+
+        result = publisher.publish_post(f"bench_{i}.png", f"Benchmark {i}")
+        if not result.success:
+            raise RuntimeError(f"Publication échouée: {result.error_message}")
+
+        # Polls supplémentaires, comme lorsqu'un container reste IN_PROGRESS
+        for _ in range(status_polls):
+            publisher.get_container_status(result.container_id)
+
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def describe(label: str, durations: list, connections: int) -> dict:
+    ordered = sorted(durations)
+    summary = {
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'connections': connections
+    }
+    print(f"   {label:<22} moyenne={summary['mean_ms']:8.1f}ms  p50={summary['p50_ms']:8.1f}ms  "
+          f"p95={summary['p95_ms']:8.1f}ms  connexions={connections}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la session HTTP InstagramPublisher')
+    parser.add_argument('--publishes', type=int, default=30)
+    parser.add_argument('--status-polls', type=int, default=5,
+                        help='Polls de statut supplémentaires par publication')
+    parser.add_argument('--connection-delay', type=float, default=0.05,
+                        help='Coût simulé d\'un handshake TCP+TLS (s)')
+    parser.add_argument('--request-delay', type=float, default=0.005,
+                        help='Temps de traitement simulé de chaque requête (s)')
+    args = parser.parse_args()
+
+    calls = args.publishes * (3 + args.status_polls)
+    print("=" * 70)
+    print(f"📊 BENCHMARK API GRAPH - {args.publishes} publications, {calls} appels")
+    print(f"   Handshake simulé: {args.connection_delay * 1000:.0f}ms, "
+          f"traitement: {args.request_delay * 1000:.0f}ms")
+    print("=" * 70)
+
+    results = {}
+    for label, session in (('connexion par appel', FreshConnectionSession()),
+                           ('session poolée', None)):
+        with MockGraphServer(connection_delay=args.connection_delay,
+                             request_delay=args.request_delay) as server:
+            publisher = BenchmarkPublisher('token', 'account', base_url=server.base_url,
+                                           session=session)
+            durations = run(publisher, args.publishes, args.status_polls)
+            results[label] = describe(label, durations, server.state.stats()['connections'])
+            publisher.close()
+
+    before = results['connexion par appel']['mean_ms']
+    after = results['session poolée']['mean_ms']
+    print(f"\n🚀 Latence moyenne par publication: {before:.1f}ms -> {after:.1f}ms "
+          f"(-{(1 - after / before) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -32,9 +32,47 @@ class Config:
     # Configuration Stable Diffusion
     USE_STABLE_DIFFUSION = os.getenv('USE_STABLE_DIFFUSION', 'True').lower() == 'true'
     STABLE_DIFFUSION_URL = os.getenv('STABLE_DIFFUSION_URL', 'http://127.0.0.1:7860')
+    # Plusieurs instances (un GPU chacune), séparées par des virgules; remplace STABLE_DIFFUSION_URL
+    STABLE_DIFFUSION_URLS = [url.strip() for url in os.getenv('STABLE_DIFFUSION_URLS', '').split(',')
+                             if url.strip()]
+    # Intervalle du contrôle de santé des instances (s)
+    SD_HEALTH_CHECK_INTERVAL = float(os.getenv('SD_HEALTH_CHECK_INTERVAL', '15'))
     SD_DEFAULT_STEPS = int(os.getenv('SD_DEFAULT_STEPS', '20'))
     SD_DEFAULT_CFG_SCALE = float(os.getenv('SD_DEFAULT_CFG_SCALE', '7.0'))
     SD_DEFAULT_SIZE = os.getenv('SD_DEFAULT_SIZE', '1024x1024')
+    # Images calculées ensemble par le GPU dans une requête groupée (limité par la VRAM)
+    SD_MAX_BATCH_SIZE = int(os.getenv('SD_MAX_BATCH_SIZE', '4'))
+    # Profils de génération: côté de la surface native (≈ résolution d'entraînement du
+    # modèle: 512 SD 1.5, 1024 SDXL) et agrandissement hires-fix maximal
+    SD_NATIVE_SIZE = int(os.getenv('SD_NATIVE_SIZE', '720'))
+    SD_MAX_HR_SCALE = float(os.getenv('SD_MAX_HR_SCALE', '2.0'))
+    # File de génération: générations simultanées (par instance) et travaux en attente acceptés
+    SD_QUEUE_WORKERS = int(os.getenv('SD_QUEUE_WORKERS', '1'))
+    SD_QUEUE_MAX_PENDING = int(os.getenv('SD_QUEUE_MAX_PENDING', '20'))
+    # Regroupement par checkpoint: attente (s) et dépassements maximum d'un travail doublé
+    SD_AFFINITY_MAX_WAIT = float(os.getenv('SD_AFFINITY_MAX_WAIT', '120'))
+    SD_AFFINITY_MAX_SKIPS = int(os.getenv('SD_AFFINITY_MAX_SKIPS', '5'))
+    # Progression diffusée en SSE: un relevé par instance toutes les SD_PROGRESS_INTERVAL s,
+    # arrêté après SD_PROGRESS_IDLE_TIMEOUT s sans client
+    SD_PROGRESS_INTERVAL = float(os.getenv('SD_PROGRESS_INTERVAL', '0.5'))
+    SD_PROGRESS_IDLE_TIMEOUT = float(os.getenv('SD_PROGRESS_IDLE_TIMEOUT', '10'))
+    
+    # Post-traitement des images générées (pool de processus)
+    # Format de publication: jpeg (exigé par Instagram), webp (web) ou png
+    IMAGE_OUTPUT_FORMAT = os.getenv('IMAGE_OUTPUT_FORMAT', 'jpeg').lower()
+    IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '92'))
+    IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', '85'))
+    # Copie PNG sans perte dans generated/archive/
+    IMAGE_ARCHIVE_PNG = os.getenv('IMAGE_ARCHIVE_PNG', 'False').lower() == 'true'
+    # Processus de post-traitement (0: un par CPU)
+    IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', '0'))
+    # Variantes d'affichage (galerie ?variant=thumb, aperçus ?variant=medium): largeur en px,
+    # format (webp, jpeg) et qualité; écrites avec l'image ou au premier affichage
+    IMAGE_THUMB_WIDTH = int(os.getenv('IMAGE_THUMB_WIDTH', '320'))
+    IMAGE_MEDIUM_WIDTH = int(os.getenv('IMAGE_MEDIUM_WIDTH', '720'))
+    IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', 'webp').lower()
+    IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+    IMAGE_VARIANTS_AT_SAVE = os.getenv('IMAGE_VARIANTS_AT_SAVE', 'True').lower() == 'true'
     
     # Configuration Stable Video Diffusion (NOUVEAU)
     USE_STABLE_VIDEO_DIFFUSION = os.getenv('USE_STABLE_VIDEO_DIFFUSION', 'False').lower() == 'true'
@@ -47,19 +85,59 @@ class Config:
     HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
     USE_HUGGINGFACE = os.getenv('USE_HUGGINGFACE', 'False').lower() == 'true'
     
+    # Surveillance des backends (Ollama, ComfyUI; Stable Diffusion: SD_HEALTH_CHECK_INTERVAL)
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '15'))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '5'))
+    # API distante à quota: sondée rarement
+    HF_HEALTH_CHECK_INTERVAL = float(os.getenv('HF_HEALTH_CHECK_INTERVAL', '300'))
+    # Attente max du premier sondage au démarrage (résumé des services), 0 pour ne pas attendre
+    HEALTH_STARTUP_WAIT = float(os.getenv('HEALTH_STARTUP_WAIT', '3'))
+    
     # Configuration Instagram
     INSTAGRAM_ACCESS_TOKEN = os.getenv('INSTAGRAM_ACCESS_TOKEN')
     INSTAGRAM_ACCOUNT_ID = os.getenv('INSTAGRAM_ACCOUNT_ID')
     INSTAGRAM_API_VERSION = "v18.0"
     INSTAGRAM_BASE_URL = f"https://graph.facebook.com/{INSTAGRAM_API_VERSION}"
+    # Fichier SQLite du cache des métadonnées Instagram (vide: cache en mémoire seulement)
+    INSTAGRAM_CACHE_PATH = os.getenv('INSTAGRAM_CACHE_PATH', '')
+    # Suivi groupé des containers (un thread de polling partagé par toutes les publications)
+    INSTAGRAM_CONTAINER_TRACKER = os.getenv('INSTAGRAM_CONTAINER_TRACKER', 'True').lower() == 'true'
+    INSTAGRAM_CONTAINER_POLL_INTERVAL = float(os.getenv('INSTAGRAM_CONTAINER_POLL_INTERVAL', '1.0'))
+    # Usage Graph API (%, en-têtes X-App-Usage) à partir duquel le scheduler ralentit
+    GRAPH_USAGE_THROTTLE_PERCENT = float(os.getenv('GRAPH_USAGE_THROTTLE_PERCENT', '80'))
+    
+    # Stockage des médias à publier (adressé par contenu) et backend d'upload
+    MEDIA_STORE_PATH = os.getenv('MEDIA_STORE_PATH', 'media_store')
+    MEDIA_UPLOAD_BACKEND = os.getenv('MEDIA_UPLOAD_BACKEND', 'local')  # local ou s3
+    # URL publique de l'application pour le backend local (doit être joignable par Instagram)
+    MEDIA_PUBLIC_BASE_URL = os.getenv('MEDIA_PUBLIC_BASE_URL', 'http://localhost:5000' if DEBUG else '')
+    S3_BUCKET = os.getenv('S3_BUCKET', '')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')  # Services compatibles S3 (MinIO...)
+    S3_PUBLIC_BASE_URL = os.getenv('S3_PUBLIC_BASE_URL', '')  # URL du bucket ou du CDN
+    # Cache des images générées (paramètres identiques -> image réutilisée; 0 pour désactiver)
+    GENERATION_CACHE_PATH = os.getenv('GENERATION_CACHE_PATH', os.path.join(MEDIA_STORE_PATH, 'generations'))
+    GENERATION_CACHE_MAX_MB = int(os.getenv('GENERATION_CACHE_MAX_MB', '2048'))
     
     # Configuration des fichiers
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'webm', 'avi', 'mov'}
     
     # Configuration du scheduler
-    SCHEDULER_CHECK_INTERVAL = 60  # secondes
+    SCHEDULER_CHECK_INTERVAL = int(os.getenv('SCHEDULER_CHECK_INTERVAL', '60'))  # secondes
+    SCHEDULER_PUBLISH_SPACING = float(os.getenv('SCHEDULER_PUBLISH_SPACING', '2'))
+    SCHEDULER_DRAIN_TIMEOUT = float(os.getenv('SCHEDULER_DRAIN_TIMEOUT', '120'))
+    # False quand le scheduler tourne en démon séparé (python -m utils.scheduler)
+    SCHEDULER_EMBEDDED = os.getenv('SCHEDULER_EMBEDDED', 'True').lower() == 'true'
+    SCHEDULER_DAEMON_HOST = os.getenv('SCHEDULER_DAEMON_HOST', '127.0.0.1')
+    SCHEDULER_DAEMON_PORT = int(os.getenv('SCHEDULER_DAEMON_PORT', '8765'))
+    # Publication concurrente des posts dus (asyncio, aiohttp requis) par le démon
+    SCHEDULER_ASYNC_PUBLISHING = os.getenv('SCHEDULER_ASYNC_PUBLISHING', 'False').lower() == 'true'
+    SCHEDULER_MAX_CONCURRENT_PUBLICATIONS = int(os.getenv('SCHEDULER_MAX_CONCURRENT_PUBLICATIONS', '5'))
+    # Synchronisation des métriques Instagram par le démon (0 pour désactiver)
+    INSIGHTS_SYNC_INTERVAL = int(os.getenv('INSIGHTS_SYNC_INTERVAL', '900'))  # secondes
+    # Copie locale des médias du compte (0 pour désactiver)
+    MEDIA_SYNC_INTERVAL = int(os.getenv('MEDIA_SYNC_INTERVAL', '300'))  # secondes
     
     # Configuration DALL-E (si utilisé)
     DALLE_IMAGE_SIZE = "1024x1024"
@@ -206,6 +284,25 @@ class Config:
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
     
+    @staticmethod
+    def is_media_path(path):
+        """
+        Vérifie qu'un chemin désigne une image gérée par l'application
+        
+        Le chemin réel (liens symboliques résolus) doit se trouver sous
+        GENERATED_FOLDER ou UPLOAD_FOLDER, avec une extension d'image autorisée:
+        un chemin fourni par un client ne peut ni publier ni supprimer un
+        autre fichier du serveur.
+        """
+        if not path or not isinstance(path, str) or not Config.allowed_file(path):
+            return False
+        real = os.path.realpath(path)
+        for folder in (Config.GENERATED_FOLDER, Config.UPLOAD_FOLDER):
+            root = os.path.realpath(folder)
+            if os.path.commonpath([real, root]) == root and real != root:
+                return True
+        return False
+    
     @staticmethod
     def allowed_video_file(filename):
         """Vérifie si l'extension vidéo est autorisée"""
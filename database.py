@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import threading
 import os
@@ -26,6 +27,9 @@ except ImportError:
 class DatabaseManager:
     """Gestionnaire de base de données pour l'application Instagram - VERSION CORRIGÉE"""
     
+    # Version cible du schéma (voir init_database pour la chaîne de migrations)
+    SCHEMA_VERSION = 6
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._lock = threading.Lock()
@@ -65,15 +69,31 @@ class DatabaseManager:
                     # Première installation
                     self._create_initial_schema(cursor)
                     self._set_schema_version(cursor, 1)
+                    schema_version = 1
                     print("   ✅ Schéma initial créé")
-                elif schema_version < 2:
-                    # Migration nécessaire
+                
+                if schema_version >= self.SCHEMA_VERSION:
+                    print("   ✅ Schéma à jour")
+                else:
+                    # Appliquer les migrations manquantes dans l'ordre
                     print("   🔄 Migration du schéma nécessaire...")
-                    self._migrate_to_v2(cursor)
-                    self._set_schema_version(cursor, 2)
+                    migrations = [
+                        (2, self._migrate_to_v2),
+                        (3, self._migrate_to_v3),
+                        (4, self._migrate_to_v4),
+                        (5, self._migrate_to_v5),
+                        (6, self._migrate_to_v6),
+                    ]
+                    for version, migrate in migrations:
+                        if schema_version < version:
+                            migrate(cursor)
+                            self._set_schema_version(cursor, version)
+                            schema_version = version
                     print("   ✅ Migration terminée")
-                else:
-                    print("   ✅ Schéma à jour")
+                
+                # Les index sont idempotents: les (re)créer permet aux bases
+                # existantes de profiter des nouveaux index sans migration
+                self._create_indexes(cursor)
                 
                 conn.commit()
                 print("✅ Base de données initialisée avec succès")
@@ -241,13 +261,95 @@ class DatabaseManager:
             print(f"   ❌ Erreur lors de la migration: {e}")
             raise
     
+    def _migrate_to_v3(self, cursor):
+        """Migration vers la version 3: suivi des publications en cours"""
+        cursor.execute("PRAGMA table_info(posts)")
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        new_columns = [
+            ('instagram_container_id', 'TEXT'),
+            ('processing_started_at', 'DATETIME'),
+            ('processing_owner', 'TEXT')
+        ]
+        
+        for col_name, col_def in new_columns:
+            if col_name not in columns:
+                print(f"   ➕ Ajout de la colonne {col_name}...")
+                cursor.execute(f"ALTER TABLE posts ADD COLUMN {col_name} {col_def}")
+    
+    def _migrate_to_v4(self, cursor):
+        """Migration vers la version 4: métriques Instagram des posts publiés"""
+        cursor.execute("PRAGMA table_info(posts)")
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        new_columns = [
+            ('views_count', 'INTEGER'),
+            ('likes_count', 'INTEGER'),
+            ('comments_count', 'INTEGER'),
+            ('saved_count', 'INTEGER'),
+            ('reach', 'INTEGER'),
+            ('impressions', 'INTEGER'),
+            ('engagement_rate', 'REAL'),
+            ('published_at', 'DATETIME'),
+            ('insights_updated_at', 'DATETIME')
+        ]
+        
+        for col_name, col_def in new_columns:
+            if col_name not in columns:
+                print(f"   ➕ Ajout de la colonne {col_name}...")
+                cursor.execute(f"ALTER TABLE posts ADD COLUMN {col_name} {col_def}")
+        
+        # Meilleure estimation de la date de publication des posts existants
+        cursor.execute("""
+            UPDATE posts SET published_at = COALESCE(scheduled_time, updated_at)
+            WHERE status = 'published' AND published_at IS NULL
+        """)
+    
+    def _migrate_to_v5(self, cursor):
+        """Migration vers la version 5: copie locale des médias du compte Instagram"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS instagram_media (
+                media_id TEXT PRIMARY KEY,
+                post_id INTEGER,
+                media_type TEXT,
+                caption TEXT,
+                permalink TEXT,
+                media_url TEXT,
+                timestamp TEXT,
+                like_count INTEGER,
+                comments_count INTEGER,
+                synced_at DATETIME NOT NULL,
+                FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE SET NULL
+            )
+        ''')
+    
+    def _migrate_to_v6(self, cursor):
+        """Migration vers la version 6: posts multi-images (carrousels)"""
+        cursor.execute("PRAGMA table_info(posts)")
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        new_columns = [
+            ('media_type', "TEXT DEFAULT 'image'"),
+            ('media_paths', 'TEXT')  # Liste JSON des images, dans l'ordre
+        ]
+        
+        for col_name, col_def in new_columns:
+            if col_name not in columns:
+                print(f"   ➕ Ajout de la colonne {col_name}...")
+                cursor.execute(f"ALTER TABLE posts ADD COLUMN {col_name} {col_def}")
+    
     def _create_indexes(self, cursor):
         """Crée les index pour optimiser les performances"""
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_posts_status ON posts(status)",
             "CREATE INDEX IF NOT EXISTS idx_posts_scheduled_time ON posts(scheduled_time)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_status_scheduled_time ON posts(status, scheduled_time)",
             "CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts(created_at)",
             "CREATE INDEX IF NOT EXISTS idx_posts_topic ON posts(topic)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_status_insights ON posts(status, insights_updated_at)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_instagram_post_id ON posts(instagram_post_id)",
+            "CREATE INDEX IF NOT EXISTS idx_instagram_media_timestamp ON instagram_media(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_instagram_media_post_id ON instagram_media(post_id)",
             "CREATE INDEX IF NOT EXISTS idx_activity_logs_post_id ON activity_logs(post_id)",
             "CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp ON activity_logs(timestamp)"
         ]
@@ -272,6 +374,8 @@ class DatabaseManager:
                 topic = getattr(post, 'topic', 'général')
                 tone = getattr(post, 'tone', 'engageant')
                 image_path = getattr(post, 'image_path', None)
+                media_type = getattr(post, 'media_type', 'image')
+                media_paths = getattr(post, 'media_paths', None)
                 scheduled_time = getattr(post, 'scheduled_time', None)
                 status = getattr(post, 'status', 'draft')
                 created_at = getattr(post, 'created_at', datetime.now())
@@ -280,11 +384,13 @@ class DatabaseManager:
                 cursor.execute('''
                     INSERT INTO posts (
                         title, description, hashtags, image_prompt, topic, tone,
-                        image_path, scheduled_time, status, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        image_path, media_type, media_paths, scheduled_time, status,
+                        created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     title, description, hashtags, image_prompt, topic, tone,
-                    image_path, scheduled_time, status, created_at, updated_at
+                    image_path, media_type, json.dumps(media_paths) if media_paths else None,
+                    scheduled_time, status, created_at, updated_at
                 ))
                 
                 post_id = cursor.lastrowid
@@ -341,8 +447,10 @@ class DatabaseManager:
             
             return [self._row_to_post(row) for row in rows]
     
-    def get_scheduled_posts_ready(self) -> List[Post]:
+    def get_scheduled_posts_ready(self, now: datetime = None) -> List[Post]:
         """Récupère les posts programmés prêts à être publiés"""
+        now = now or datetime.now()
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -351,11 +459,61 @@ class DatabaseManager:
                 AND scheduled_time <= ? 
                 AND (image_path IS NOT NULL OR image_path != '')
                 ORDER BY scheduled_time ASC
-            ''', (datetime.now(),))
+            ''', (now,))
             rows = cursor.fetchall()
             
             return [self._row_to_post(row) for row in rows]
     
+    def get_scheduled_posts_summary(self, now: datetime = None) -> Dict[str, int]:
+        """Agrège les posts programmés par tranche horaire en une seule requête"""
+        now = now or datetime.now()
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT
+                    COUNT(*) AS total_scheduled,
+                    SUM(CASE WHEN scheduled_time <= :now
+                              AND image_path IS NOT NULL AND image_path != ''
+                             THEN 1 ELSE 0 END) AS ready_now,
+                    SUM(CASE WHEN scheduled_time <= :now
+                              AND (image_path IS NULL OR image_path = '')
+                             THEN 1 ELSE 0 END) AS overdue,
+                    SUM(CASE WHEN scheduled_time > :now AND scheduled_time <= :next_hour
+                             THEN 1 ELSE 0 END) AS next_hour,
+                    SUM(CASE WHEN scheduled_time > :next_hour AND scheduled_time <= :next_day
+                             THEN 1 ELSE 0 END) AS next_day,
+                    SUM(CASE WHEN scheduled_time > :next_day AND scheduled_time <= :next_week
+                             THEN 1 ELSE 0 END) AS next_week,
+                    SUM(CASE WHEN scheduled_time > :next_week
+                             THEN 1 ELSE 0 END) AS later
+                FROM posts
+                WHERE status = 'scheduled'
+            ''', {
+                'now': now,
+                'next_hour': now + timedelta(hours=1),
+                'next_day': now + timedelta(days=1),
+                'next_week': now + timedelta(weeks=1)
+            })
+            row = cursor.fetchone()
+            
+            # SUM() retourne NULL quand aucune ligne ne correspond
+            return {key: (row[key] or 0) for key in row.keys()}
+    
+    def get_next_scheduled_time(self) -> Optional[datetime]:
+        """Retourne la date de la prochaine publication programmée (lookup d'index)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MIN(scheduled_time) FROM posts
+                WHERE status = 'scheduled' AND scheduled_time IS NOT NULL
+            ''')
+            result = cursor.fetchone()
+            
+            if result and result[0]:
+                return datetime.fromisoformat(result[0])
+            return None
+    
     def update_post(self, post: Post) -> bool:
         """Met à jour un post existant"""
         if not hasattr(post, 'id') or not post.id:
@@ -371,8 +529,9 @@ class DatabaseManager:
                 cursor.execute('''
                     UPDATE posts SET
                         title = ?, description = ?, hashtags = ?, image_prompt = ?,
-                        topic = ?, tone = ?, image_path = ?, scheduled_time = ?,
-                        status = ?, updated_at = ?, instagram_post_id = ?, error_message = ?
+                        topic = ?, tone = ?, image_path = ?, media_type = ?, media_paths = ?,
+                        scheduled_time = ?, status = ?, updated_at = ?, instagram_post_id = ?,
+                        error_message = ?
                     WHERE id = ?
                 ''', (
                     getattr(post, 'title', ''),
@@ -382,6 +541,8 @@ class DatabaseManager:
                     getattr(post, 'topic', ''),
                     getattr(post, 'tone', 'engageant'),
                     getattr(post, 'image_path', None),
+                    getattr(post, 'media_type', 'image'),
+                    json.dumps(post.media_paths) if getattr(post, 'media_paths', None) else None,
                     getattr(post, 'scheduled_time', None),
                     getattr(post, 'status', 'draft'),
                     post.updated_at,
@@ -411,11 +572,19 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                # Un post qui quitte l'état "processing" n'appartient plus à aucun scheduler
                 cursor.execute('''
                     UPDATE posts SET 
-                        status = ?, updated_at = ?, error_message = ?, instagram_post_id = ?
+                        status = ?, updated_at = ?, error_message = ?, instagram_post_id = ?,
+                        processing_started_at = CASE WHEN ? = 'processing'
+                                                     THEN processing_started_at END,
+                        processing_owner = CASE WHEN ? = 'processing'
+                                                THEN processing_owner END,
+                        published_at = CASE WHEN ? = 'published'
+                                            THEN COALESCE(published_at, ?) END
                     WHERE id = ?
-                ''', (status_value, datetime.now(), error_message, instagram_post_id, post_id))
+                ''', (status_value, datetime.now(), error_message, instagram_post_id,
+                      status_value, status_value, status_value, datetime.now(), post_id))
                 
                 affected_rows = cursor.rowcount
                 conn.commit()
@@ -426,6 +595,307 @@ class DatabaseManager:
                 
                 return affected_rows > 0
     
+    def claim_post_for_publishing(self, post_id: int, owner: str, now: datetime = None,
+                                  from_statuses: tuple = ('scheduled',)) -> bool:
+        """
+        Passe atomiquement un post à "processing" (propriétaire et heure de début notés)
+        
+        Args:
+            from_statuses: Statuts depuis lesquels le post peut être pris
+                           (publication manuelle: brouillon, programmé ou échoué)
+        
+        Returns:
+            True si cet appelant a obtenu le post, False s'il a déjà été pris
+        """
+        now = now or datetime.now()
+        
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE posts SET
+                        status = 'processing', updated_at = ?,
+                        processing_started_at = ?, processing_owner = ?
+                    WHERE id = ? AND status IN ({','.join('?' * len(from_statuses))})
+                ''', (now, now, owner, post_id, *from_statuses))
+                
+                claimed = cursor.rowcount == 1
+                conn.commit()
+                
+                if claimed:
+                    self._log_activity(post_id, "STATUS_CHANGED",
+                                     f"Statut changé vers: processing ({owner})", conn)
+                    conn.commit()
+                
+                return claimed
+    
+    def set_post_container_id(self, post_id: int, container_id: Optional[str]) -> bool:
+        """Enregistre (ou efface) le container Instagram d'un post en cours de publication"""
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'UPDATE posts SET instagram_container_id = ?, updated_at = ? WHERE id = ?',
+                    (container_id, datetime.now(), post_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+    
+    def set_post_image_path(self, post_id: int, image_path: Optional[str]) -> bool:
+        """Enregistre l'image d'un post (génération terminée en arrière-plan)"""
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'UPDATE posts SET image_path = ?, updated_at = ? WHERE id = ?',
+                    (image_path, datetime.now(), post_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+    
+    def mark_post_image_failed(self, post_id: int, error: str) -> bool:
+        """
+        Passe en "failed" un post brouillon ou programmé resté sans image
+        
+        Sans image, un post programmé n'est jamais retenu par le scheduler:
+        le statut et le message rendent l'échec visible dans l'interface.
+        """
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE posts SET status = 'failed', error_message = ?, updated_at = ?
+                    WHERE id = ? AND status IN ('draft', 'scheduled')
+                          AND (image_path IS NULL OR image_path = '')
+                ''', (f"Image non générée: {error}", datetime.now(), post_id))
+                affected_rows = cursor.rowcount
+                conn.commit()
+                
+                if affected_rows > 0:
+                    self._log_activity(post_id, "IMAGE_FAILED", error, conn)
+                
+                return affected_rows > 0
+    
+    def get_processing_posts(self, started_before: datetime = None,
+                             post_ids: List[int] = None) -> List[Post]:
+        """
+        Récupère les posts bloqués en "processing"
+        
+        Args:
+            started_before: Ne retourner que les publications commencées avant cette date
+                            (ou sans date de début)
+            post_ids: Posts à retourner quelle que soit leur ancienneté
+        """
+        conditions = []
+        params = []
+        
+        if started_before is not None:
+            conditions.append('processing_started_at IS NULL OR processing_started_at < ?')
+            params.append(started_before)
+        else:
+            conditions.append('1 = 1')
+        
+        if post_ids:
+            conditions.append(f"id IN ({','.join('?' * len(post_ids))})")
+            params.extend(post_ids)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT * FROM posts
+                WHERE status = 'processing' AND (({') OR ('.join(conditions)}))
+                ORDER BY scheduled_time ASC
+            ''', params)
+            rows = cursor.fetchall()
+            
+            return [self._row_to_post(row) for row in rows]
+    
+    def get_posts_due_for_insights(self, refresh_tiers: List[tuple], now: datetime = None,
+                                   limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Posts publiés dont les métriques doivent être rafraîchies
+        
+        Args:
+            refresh_tiers: [(âge max, intervalle de rafraîchissement), ...] en timedelta,
+                           du plus récent au plus ancien; le dernier s'applique au-delà
+            now: Heure de référence
+            limit: Nombre maximum de posts retournés (jamais synchronisés d'abord)
+        """
+        now = now or datetime.now()
+        
+        # CASE: chaque tranche d'âge a son propre seuil de fraîcheur
+        cases = []
+        params = []
+        for max_age, interval in refresh_tiers[:-1]:
+            cases.append('WHEN published_at >= ? THEN ?')
+            params.extend([now - max_age, now - interval])
+        params.append(now - refresh_tiers[-1][1])
+        params.append(limit)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, instagram_post_id, published_at, insights_updated_at
+                FROM posts
+                WHERE status = 'published'
+                AND instagram_post_id IS NOT NULL AND instagram_post_id != ''
+                AND (insights_updated_at IS NULL OR insights_updated_at <
+                     CASE {' '.join(cases)} ELSE ? END)
+                ORDER BY insights_updated_at IS NOT NULL, insights_updated_at ASC
+                LIMIT ?
+            ''', params)
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def bulk_update_post_metrics(self, metrics_by_post: Dict[int, Any],
+                                 updated_at: datetime = None) -> int:
+        """
+        Met à jour les métriques de plusieurs posts en une transaction
+        
+        Args:
+            metrics_by_post: post_id -> InstagramMediaMetrics
+        """
+        updated_at = updated_at or datetime.now()
+        rows = [
+            (m.views_count, m.like_count, m.comments_count, m.saved_count, m.reach,
+             m.impressions, m.engagement_rate, updated_at, post_id)
+            for post_id, m in metrics_by_post.items()
+        ]
+        
+        if not rows:
+            return 0
+        
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE posts SET
+                        views_count = ?, likes_count = ?, comments_count = ?, saved_count = ?,
+                        reach = ?, impressions = ?, engagement_rate = ?, insights_updated_at = ?
+                    WHERE id = ?
+                ''', rows)
+                conn.commit()
+                return cursor.rowcount
+    
+    def touch_post_insights(self, post_ids: List[int], updated_at: datetime = None):
+        """Marque des posts comme synchronisés sans métriques (média supprimé, insights indisponibles)"""
+        if not post_ids:
+            return
+        
+        with self._lock:
+            with self.get_connection() as conn:
+                conn.executemany(
+                    'UPDATE posts SET insights_updated_at = ? WHERE id = ?',
+                    [(updated_at or datetime.now(), post_id) for post_id in post_ids]
+                )
+                conn.commit()
+    
+    def upsert_instagram_media(self, media_items: List[Dict[str, Any]],
+                               synced_at: datetime = None) -> int:
+        """
+        Enregistre (ou met à jour) des médias Instagram dans la copie locale
+        
+        Args:
+            media_items: Objets média tels que retournés par l'API Graph
+        """
+        synced_at = synced_at or datetime.now()
+        rows = [
+            (str(m['id']), m.get('media_type'), m.get('caption'), m.get('permalink'),
+             m.get('media_url'), m.get('timestamp'), m.get('like_count'),
+             m.get('comments_count'), synced_at)
+            for m in media_items if m.get('id')
+        ]
+        
+        if not rows:
+            return 0
+        
+        with self._lock:
+            with self.get_connection() as conn:
+                # Les compteurs absents de la réponse ne doivent pas effacer les valeurs connues
+                conn.executemany('''
+                    INSERT INTO instagram_media (
+                        media_id, media_type, caption, permalink, media_url,
+                        timestamp, like_count, comments_count, synced_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(media_id) DO UPDATE SET
+                        media_type = excluded.media_type,
+                        caption = excluded.caption,
+                        permalink = excluded.permalink,
+                        media_url = COALESCE(excluded.media_url, media_url),
+                        timestamp = excluded.timestamp,
+                        like_count = COALESCE(excluded.like_count, like_count),
+                        comments_count = COALESCE(excluded.comments_count, comments_count),
+                        synced_at = excluded.synced_at
+                ''', rows)
+                conn.commit()
+                return len(rows)
+    
+    def reconcile_instagram_media(self) -> Dict[str, int]:
+        """
+        Rattache les médias synchronisés aux posts via posts.instagram_post_id
+        
+        Returns:
+            linked: médias rattachés à un post, external: médias publiés hors
+            de l'application, missing: posts publiés absents de la copie locale
+        """
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE instagram_media SET post_id = (
+                        SELECT p.id FROM posts p
+                        WHERE p.instagram_post_id = instagram_media.media_id LIMIT 1
+                    )
+                    WHERE post_id IS NOT (
+                        SELECT p.id FROM posts p
+                        WHERE p.instagram_post_id = instagram_media.media_id LIMIT 1
+                    )
+                ''')
+                conn.commit()
+                
+                cursor.execute('''
+                    SELECT
+                        SUM(CASE WHEN post_id IS NOT NULL THEN 1 ELSE 0 END),
+                        SUM(CASE WHEN post_id IS NULL THEN 1 ELSE 0 END)
+                    FROM instagram_media
+                ''')
+                linked, external = cursor.fetchone()
+                
+                cursor.execute('''
+                    SELECT COUNT(*) FROM posts
+                    WHERE status = 'published'
+                    AND instagram_post_id IS NOT NULL AND instagram_post_id != ''
+                    AND instagram_post_id NOT IN (SELECT media_id FROM instagram_media)
+                ''')
+                missing = cursor.fetchone()[0]
+                
+                return {'linked': linked or 0, 'external': external or 0, 'missing': missing}
+    
+    def get_instagram_media(self, limit: int = 50, offset: int = 0,
+                            external_only: bool = False) -> List[Dict[str, Any]]:
+        """Médias Instagram de la copie locale, du plus récent au plus ancien"""
+        where = 'WHERE m.post_id IS NULL' if external_only else ''
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT m.*, p.title AS post_title, p.status AS post_status
+                FROM instagram_media m
+                LEFT JOIN posts p ON p.id = m.post_id
+                {where}
+                ORDER BY m.timestamp DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_instagram_media_count(self) -> int:
+        """Nombre de médias dans la copie locale"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM instagram_media')
+            return cursor.fetchone()[0]
+    
     def delete_post(self, post_id: int) -> bool:
         """Supprime un post"""
         with self._lock:
@@ -598,19 +1068,32 @@ class DatabaseManager:
                 topic=row['topic'] or 'général',
                 tone=row['tone'] or 'engageant',
                 image_path=row['image_path'],
+                media_type=row['media_type'] or 'image',
+                media_paths=json.loads(row['media_paths']) if row['media_paths'] else None,
                 scheduled_time=datetime.fromisoformat(row['scheduled_time']) if row['scheduled_time'] else None,
                 status=row['status'] or 'draft',
                 created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else datetime.now(),
                 updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else datetime.now(),
                 instagram_post_id=row['instagram_post_id'],
-                error_message=row['error_message']
+                instagram_container_id=row['instagram_container_id'],
+                error_message=row['error_message'],
+                views_count=row['views_count'],
+                likes_count=row['likes_count'],
+                comments_count=row['comments_count'],
+                saved_count=row['saved_count'],
+                reach=row['reach'],
+                impressions=row['impressions'],
+                engagement_rate=row['engagement_rate'],
+                published_at=datetime.fromisoformat(row['published_at']) if row['published_at'] else None,
+                insights_updated_at=datetime.fromisoformat(row['insights_updated_at']) if row['insights_updated_at'] else None
             )
         except ImportError:
             # Fallback si Post n'est pas disponible
             post = Post()
             for key in row.keys():
                 value = row[key]
-                if key in ['scheduled_time', 'created_at', 'updated_at'] and value:
+                if key in ['scheduled_time', 'created_at', 'updated_at',
+                           'published_at', 'insights_updated_at'] and value:
                     try:
                         value = datetime.fromisoformat(value)
                     except:
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Test de charge d'InstagramPublisher et du PostScheduler contre le faux serveur Graph
+
+Les publications passent par le vrai code client (session poolée, retries,
+suivi des containers, scheduler et base SQLite); seul l'upload CDN est
+remplacé par une URL fictive. Le faux serveur applique latences, erreurs et
+quotas configurables (voir utils/mock_graph_server.py).
+
+Usage:
+    python loadtest_instagram_api.py --publishes 500 --concurrency 20
+    python loadtest_instagram_api.py --mode scheduler --publishes 200 --tracker \
+        --latency container_create=lognormal:0.3,0.5 --ready-after-polls 2
+    python loadtest_instagram_api.py --publishes 300 --error-rate 0.02 --publish-limit 100 --json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+from services.instagram_api import InstagramPublisher
+from utils.metrics import RollingHistogram
+from utils.mock_graph_server import MockGraphServer, add_server_arguments, server_options
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def fake_uploader(image_path: str) -> str:
+    """Upload hors périmètre: l'URL publique est simulée"""
+    return f"https://cdn.example.com/{os.path.basename(image_path)}"
+
+
+def histogram() -> RollingHistogram:
+    # Fenêtre assez large pour couvrir tout le test
+    return RollingHistogram(window_seconds=10 ** 9, max_samples=10 ** 6)
+
+
+class LoadTestResult:
+    """Collecte thread-safe des latences et issues des publications"""
+
+    def __init__(self):
+        self.latency = histogram()
+        self.stages: Dict[str, RollingHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.succeeded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration: float, result):
+        self.latency.observe(duration)
+        with self._lock:
+            for stage, value in (result.stage_timings or {}).items():
+                self.stages.setdefault(stage, histogram()).observe(value)
+            if result.success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+                key = (result.error_message or 'inconnue')[:80]
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def run_publisher(server: MockGraphServer, args) -> Dict[str, Any]:
+    """`concurrency` threads partagent un InstagramPublisher"""
+    publisher = InstagramPublisher('token', 'account', base_url=server.base_url,
+                                   pool_size=max(10, args.concurrency), uploader=fake_uploader)
+    if args.tracker:
+        publisher.enable_container_tracker(min_interval=args.poll_interval)
+
+    results = LoadTestResult()
+
+    def publish(index: int):
+        start = time.perf_counter()
+        if args.carousel:
+            paths = [f"load_{index}_{i}.png" for i in range(args.carousel)]
+            result = publisher.publish_carousel(paths, f"Test de charge {index}")
+        else:
+            result = publisher.publish_post(f"load_{index}.png", f"Test de charge {index}")
+        results.record(time.perf_counter() - start, result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(publish, range(args.publishes)))
+    elapsed = time.perf_counter() - started
+
+    publisher.close()
+    return summarize(results, elapsed)
+
+
+def run_scheduler(server: MockGraphServer, args) -> Dict[str, Any]:
+    """Posts dus dans une base temporaire, publiés par un PostScheduler"""
+    from database import DatabaseManager
+    from models import Post, PostStatus
+    from utils.scheduler import PostScheduler
+
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    db_manager = DatabaseManager(os.path.join(workdir, 'loadtest.db'))
+
+    due = datetime.now() - timedelta(minutes=1)
+    for i in range(args.publishes):
+        db_manager.create_post(Post(
+            title=f"Test de charge {i}", description=f"Publication {i}", hashtags='#loadtest',
+            image_prompt='test', topic='test', image_path=f"load_{i}.png",
+            scheduled_time=due, status=PostStatus.SCHEDULED.value
+        ))
+
+    publisher = InstagramPublisher('token', 'account', base_url=server.base_url,
+                                   pool_size=max(10, args.concurrency), uploader=fake_uploader)
+    if args.tracker:
+        publisher.enable_container_tracker(min_interval=args.poll_interval)
+
+    scheduler = PostScheduler(db_manager, publisher)
+    scheduler.publish_spacing = 0
+
+    if args.use_async:
+        from services.instagram_async import AsyncInstagramPublisher
+        scheduler.enable_async_publishing(
+            AsyncInstagramPublisher('token', 'account', base_url=server.base_url,
+                                    uploader=fake_uploader),
+            max_concurrent=args.concurrency
+        )
+
+    started = time.perf_counter()
+    # En mode asyncio le scheduler publie par lots de --concurrency posts:
+    # vérifications successives tant qu'un lot avance
+    while True:
+        check = scheduler.manual_check()
+        if not check.get('posts_published') and not check.get('posts_failed'):
+            break
+    elapsed = time.perf_counter() - started
+
+    # Les durées viennent des métriques du scheduler (claim, publication, base)
+    results = LoadTestResult()
+    results.latency = scheduler.metrics.duration
+    results.stages = scheduler.metrics.stages
+    results.succeeded = scheduler.metrics.totals['published']
+    results.failed = scheduler.metrics.totals['failed'] + scheduler.metrics.totals['error']
+    for post in db_manager.get_posts_by_status(PostStatus.FAILED):
+        key = (post.error_message or 'inconnue')[:80]
+        results.errors[key] = results.errors.get(key, 0) + 1
+
+    scheduler.stop()
+    publisher.close()
+    return summarize(results, elapsed)
+
+
+def summarize(results: LoadTestResult, elapsed: float) -> Dict[str, Any]:
+    return {
+        'publishes': results.succeeded + results.failed,
+        'succeeded': results.succeeded,
+        'failed': results.failed,
+        'elapsed_s': round(elapsed, 3),
+        'publishes_per_s': round(results.succeeded / elapsed, 2) if elapsed else None,
+        'latency_s': results.latency.snapshot(PERCENTILES),
+        'stages_s': {stage: h.snapshot(PERCENTILES) for stage, h in results.stages.items() if h.count()},
+        'errors': results.errors
+    }
+
+
+def print_report(report: Dict[str, Any], server_stats: Dict[str, Any]):
+    latency = report['latency_s']
+    print(f"\n✅ {report['succeeded']}/{report['publishes']} publications en {report['elapsed_s']}s "
+          f"-> {report['publishes_per_s']} publications/s")
+
+    if latency['count']:
+        print(f"   Latence: moyenne={latency['mean']}s  " +
+              "  ".join(f"p{p}={latency[f'p{p}']}s" for p in PERCENTILES) +
+              f"  max={latency['max']}s")
+
+    for stage, snapshot in report['stages_s'].items():
+        print(f"   {stage:<18} p50={snapshot['p50']}s  p99={snapshot['p99']}s  max={snapshot['max']}s")
+
+    if report['errors']:
+        print("\n❌ Erreurs:")
+        for message, count in sorted(report['errors'].items(), key=lambda item: -item[1]):
+            print(f"   {count:>5} × {message}")
+
+    print(f"\n🧪 Serveur: {server_stats['requests']} requêtes, {server_stats['connections']} connexions, "
+          f"{server_stats['injected_errors']} erreurs injectées, "
+          f"{server_stats['quota_rejections']} refus quota d'appels, "
+          f"{server_stats['publish_rejections']} refus quota de publications")
+    print(f"   Par endpoint: {server_stats['requests_by_kind']}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Test de charge InstagramPublisher / PostScheduler')
+    parser.add_argument('--mode', choices=('publisher', 'scheduler'), default='publisher')
+    parser.add_argument('--publishes', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='Threads (mode publisher) ou publications simultanées (--async)')
+    parser.add_argument('--carousel', type=int, default=0, help="Images par carrousel (0: image seule)")
+    parser.add_argument('--tracker', action='store_true', help='Suivi groupé des containers')
+    parser.add_argument('--poll-interval', type=float, default=0.2,
+                        help='Premier intervalle de poll du suivi groupé (s)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Mode scheduler: publication asyncio (aiohttp requis)')
+    parser.add_argument('--json', action='store_true', help='Rapport JSON sur la sortie standard')
+    add_server_arguments(parser)
+    parser.set_defaults(connection_delay=0.02)
+    args = parser.parse_args(argv)
+
+    with MockGraphServer(**server_options(args)) as server:
+        if not args.json:
+            print(f"📊 TEST DE CHARGE ({args.mode}) - {args.publishes} publications, "
+                  f"concurrence {args.concurrency}, serveur {server.base_url}")
+
+        run = run_scheduler if args.mode == 'scheduler' else run_publisher
+        # En mode JSON, les traces du client partent sur stderr
+        output = sys.stderr if args.json else sys.stdout
+        with contextlib.redirect_stdout(output):
+            report = run(server, args)
+        server_stats = server.state.stats()
+
+    if args.json:
+        print(json.dumps({'report': report, 'server': server_stats}, indent=2))
+    else:
+        print_report(report, server_stats)
+
+
+if __name__ == '__main__':
+    main()
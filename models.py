@@ -16,6 +16,11 @@ class PostStatus(Enum):
     PROCESSING = "processing"
 
 
+# Limites de l'API Graph pour un carrousel
+CAROUSEL_MIN_ITEMS = 2
+CAROUSEL_MAX_ITEMS = 10
+
+
 class ContentTone(Enum):
     """Tons possibles pour le contenu généré"""
     ENGAGING = "engageant"
@@ -30,7 +35,7 @@ class MediaType(Enum):
     """Types de médias supportés"""
     IMAGE = "image"
     VIDEO = "video"
-    CAROUSEL = "carousel"  # Pour futures extensions
+    CAROUSEL = "carousel"  # Plusieurs images (media_paths)
 
 
 class GenerationService(Enum):
@@ -55,17 +60,25 @@ class Post:
     id: Optional[int] = None
     image_path: Optional[str] = None
     video_path: Optional[str] = None
+    media_paths: Optional[List[str]] = None  # Images d'un carrousel, dans l'ordre
     scheduled_time: Optional[datetime] = None
     status: str = PostStatus.DRAFT.value
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     instagram_post_id: Optional[str] = None
+    instagram_container_id: Optional[str] = None  # Container Graph API en cours de publication
     error_message: Optional[str] = None
     generation_service: Optional[str] = None  # Service utilisé pour générer le média
     generation_params: Optional[str] = None  # Paramètres JSON de génération
     views_count: Optional[int] = None
     likes_count: Optional[int] = None
     comments_count: Optional[int] = None
+    saved_count: Optional[int] = None
+    reach: Optional[int] = None
+    impressions: Optional[int] = None
+    engagement_rate: Optional[float] = None
+    published_at: Optional[datetime] = None
+    insights_updated_at: Optional[datetime] = None  # Dernière synchronisation des métriques
     
     def __post_init__(self):
         """Initialisation après création de l'objet"""
@@ -84,6 +97,14 @@ class Post:
         # S'assurer que tone est une string
         if hasattr(self.tone, 'value'):
             self.tone = self.tone.value
+        
+        # media_paths peut venir de la base sous forme JSON
+        if isinstance(self.media_paths, str):
+            self.media_paths = json.loads(self.media_paths) if self.media_paths else None
+        
+        # La couverture d'un carrousel sert d'image principale (aperçus, galerie)
+        if self.media_paths and not self.image_path:
+            self.image_path = self.media_paths[0]
     
     def to_dict(self) -> Dict[str, Any]:
         """Convertit le post en dictionnaire"""
@@ -98,19 +119,59 @@ class Post:
             'media_type': self.media_type,
             'image_path': self.image_path,
             'video_path': self.video_path,
+            'media_paths': self.media_paths,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'instagram_post_id': self.instagram_post_id,
+            'instagram_container_id': self.instagram_container_id,
             'error_message': self.error_message,
             'generation_service': self.generation_service,
             'generation_params': self.generation_params,
             'views_count': self.views_count,
             'likes_count': self.likes_count,
-            'comments_count': self.comments_count
+            'comments_count': self.comments_count,
+            'saved_count': self.saved_count,
+            'reach': self.reach,
+            'impressions': self.impressions,
+            'engagement_rate': self.engagement_rate,
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'insights_updated_at': self.insights_updated_at.isoformat() if self.insights_updated_at else None
         }
     
+    def get_full_caption(self) -> str:
+        """Retourne la caption complète (description + hashtags)"""
+        parts = [part.strip() for part in (self.description, self.hashtags) if part and part.strip()]
+        return "\n\n".join(parts)
+    
+    def is_carousel(self) -> bool:
+        """Vrai si le post se publie en carrousel (plusieurs images)"""
+        return self.media_type == MediaType.CAROUSEL.value or len(self.media_paths or []) > 1
+    
+    def get_media_paths(self) -> List[str]:
+        """Images à publier, dans l'ordre (une seule hors carrousel)"""
+        if self.media_paths:
+            return list(self.media_paths)
+        return [self.image_path] if self.image_path else []
+    
+    def can_be_published(self) -> bool:
+        """Vérifie que le post a le contenu et le média nécessaires à la publication"""
+        # Déjà publié, ou publication en cours (scheduler ou publication manuelle)
+        if self.status in (PostStatus.PUBLISHED.value, PostStatus.PROCESSING.value):
+            return False
+        
+        if not (self.description or '').strip():
+            return False
+        
+        if self.media_type == MediaType.VIDEO.value:
+            return bool(self.video_path)
+        
+        if self.is_carousel():
+            return CAROUSEL_MIN_ITEMS <= len(self.media_paths or []) <= CAROUSEL_MAX_ITEMS
+        
+        return bool(self.image_path)
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Post':
         """Crée un post à partir d'un dictionnaire"""
@@ -121,13 +182,18 @@ class Post:
             data['created_at'] = datetime.fromisoformat(data['created_at'])
         if data.get('updated_at') and isinstance(data['updated_at'], str):
             data['updated_at'] = datetime.fromisoformat(data['updated_at'])
+        for key in ('published_at', 'insights_updated_at'):
+            if data.get(key) and isinstance(data[key], str):
+                data[key] = datetime.fromisoformat(data[key])
         
         # Filtrer les champs qui ne sont pas dans le constructeur
         constructor_fields = {
             'id', 'title', 'description', 'hashtags', 'image_prompt', 'topic', 'tone',
-            'media_type', 'image_path', 'video_path', 'scheduled_time', 'status',
-            'created_at', 'updated_at', 'instagram_post_id', 'error_message',
-            'generation_service', 'generation_params', 'views_count', 'likes_count', 'comments_count'
+            'media_type', 'image_path', 'video_path', 'media_paths', 'scheduled_time', 'status',
+            'created_at', 'updated_at', 'instagram_post_id', 'instagram_container_id',
+            'error_message', 'generation_service', 'generation_params', 'views_count', 'likes_count', 'comments_count',
+            'saved_count', 'reach', 'impressions', 'engagement_rate', 'published_at',
+            'insights_updated_at'
         }
         
         clean_data = {k: v for k, v in data.items() if k in constructor_fields}
@@ -340,19 +406,34 @@ class InstagramMediaMetrics:
             except:
                 pass
         
-        return cls(
+        # Les insights arrivent imbriqués (champ insights.metric(...)) ou déjà à plat
+        insights = {}
+        for item in (data.get('insights') or {}).get('data', []):
+            values = item.get('values') or [{}]
+            insights[item.get('name')] = values[0].get('value', 0)
+        
+        def metric(name: str) -> int:
+            return data.get(name, insights.get(name, 0)) or 0
+        
+        metrics = cls(
             media_id=data.get('id', ''),
             media_type=data.get('media_type', 'IMAGE'),
             caption=data.get('caption', ''),
             permalink=data.get('permalink', ''),
             timestamp=timestamp,
-            like_count=data.get('like_count', 0),
-            comments_count=data.get('comments_count', 0),
-            views_count=data.get('video_views', 0),
-            saved_count=data.get('saved', 0),
-            reach=data.get('reach', 0),
-            impressions=data.get('impressions', 0)
+            like_count=metric('like_count'),
+            comments_count=metric('comments_count'),
+            views_count=metric('video_views') or metric('plays'),
+            saved_count=metric('saved'),
+            reach=metric('reach'),
+            impressions=metric('impressions')
         )
+        
+        if metrics.reach:
+            interactions = metrics.like_count + metrics.comments_count + metrics.saved_count
+            metrics.engagement_rate = round(interactions / metrics.reach * 100, 2)
+        
+        return metrics
 
 
 @dataclass
@@ -382,6 +463,8 @@ class PublicationResult:
     error_message: Optional[str] = None
     permalink: Optional[str] = None
     timestamp: Optional[datetime] = None
+    container_id: Optional[str] = None  # Container média créé pour la publication
+    stage_timings: Dict[str, float] = field(default_factory=dict)  # Durée (s) par étape
     
     def to_dict(self) -> Dict[str, Any]:
         """Convertit en dictionnaire"""
@@ -390,26 +473,31 @@ class PublicationResult:
             'instagram_post_id': self.instagram_post_id,
             'error_message': self.error_message,
             'permalink': self.permalink,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'container_id': self.container_id,
+            'stage_timings': self.stage_timings
         }
     
     @classmethod
-    def success_result(cls, instagram_post_id: str, permalink: str = None) -> 'PublicationResult':
+    def success_result(cls, instagram_post_id: str, permalink: str = None,
+                       container_id: str = None) -> 'PublicationResult':
         """Crée un résultat de succès"""
         return cls(
             success=True,
             instagram_post_id=instagram_post_id,
             permalink=permalink,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            container_id=container_id
         )
     
     @classmethod
-    def error_result(cls, error_message: str) -> 'PublicationResult':
+    def error_result(cls, error_message: str, container_id: str = None) -> 'PublicationResult':
         """Crée un résultat d'erreur"""
         return cls(
             success=False,
             error_message=error_message,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            container_id=container_id
         )
 
 
@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from datetime import datetime
+import json
 import os
 
-from models import Post, PostStatus, GenerationRequest, ContentTone
+from models import (Post, PostStatus, GenerationRequest, ContentTone, MediaType,
+                    CAROUSEL_MIN_ITEMS, CAROUSEL_MAX_ITEMS)
+from services.generation_queue import QueueFullError, SUCCEEDED, FINISHED_STATUSES
+from services.generation_profiles import get_profile, compare_profiles
+from services.health_monitor import get_health_monitor
+from config import Config
 
 api_bp = Blueprint('api', __name__)
 
@@ -189,6 +195,18 @@ def create_post_api():
             except ValueError:
                 return jsonify({'error': 'Format de date invalide (ISO format requis)'}), 400
         
+        # Carrousel: images existantes, dans l'ordre
+        media_paths = data.get('media_paths') or None
+        if media_paths:
+            if not isinstance(media_paths, list) or not CAROUSEL_MIN_ITEMS <= len(media_paths) <= CAROUSEL_MAX_ITEMS:
+                return jsonify({'error': f'media_paths: de {CAROUSEL_MIN_ITEMS} à {CAROUSEL_MAX_ITEMS} images'}), 400
+            refused = [path for path in media_paths if not Config.is_media_path(path)]
+            if refused:
+                return jsonify({'error': f'Images hors de {Config.GENERATED_FOLDER}/ ou {Config.UPLOAD_FOLDER}/: {refused}'}), 400
+            missing = [path for path in media_paths if not os.path.isfile(path)]
+            if missing:
+                return jsonify({'error': f'Images introuvables: {missing}'}), 400
+        
         current_app.logger.info(f"API: Création d'un post '{title}'")
         
         # Génération du contenu
@@ -208,9 +226,9 @@ def create_post_api():
         if not hashtags:
             hashtags = f"#{topic.replace(' ', '').lower()} #instagram"
         
-        # Génération de l'image
+        # Génération de l'image (sauf carrousel d'images existantes)
         image_path = None
-        if current_app.ai_generator:
+        if current_app.ai_generator and not media_paths:
             image_result = current_app.ai_generator.generate_image(image_prompt)
             if image_result.success:
                 image_path = image_result.image_path
@@ -224,6 +242,8 @@ def create_post_api():
             topic=topic,
             tone=tone,
             image_path=image_path,
+            media_type=MediaType.CAROUSEL.value if media_paths else MediaType.IMAGE.value,
+            media_paths=media_paths,
             scheduled_time=scheduled_time,
             status=PostStatus.SCHEDULED.value if scheduled_time else PostStatus.DRAFT.value
         )
@@ -254,6 +274,9 @@ def publish_post_api(post_id):
         if not post:
             return jsonify({'error': 'Post non trouvé'}), 404
         
+        if post.status == PostStatus.PROCESSING.value:
+            return jsonify({'error': 'Publication déjà en cours pour ce post'}), 409
+        
         if not post.can_be_published():
             return jsonify({'error': 'Post non prêt pour publication'}), 400
         
@@ -262,32 +285,19 @@ def publish_post_api(post_id):
         
         current_app.logger.info(f"API: Publication du post {post_id}")
         
-        # Marquer comme en cours
-        current_app.db_manager.update_post_status(post_id, PostStatus.PROCESSING)
-        
-        # Publier
-        caption = post.get_full_caption()
-        result = current_app.instagram_publisher.publish_post(post.image_path, caption)
+        # Prise en charge atomique: refusée si le scheduler (ou une autre requête) publie déjà ce post
+        from utils.scheduler import publish_post_now
+        result = publish_post_now(current_app.db_manager, current_app.instagram_publisher, post)
+        if result is None:
+            return jsonify({'error': 'Publication déjà en cours pour ce post'}), 409
         
         if result.success:
-            current_app.db_manager.update_post_status(
-                post_id, 
-                PostStatus.PUBLISHED,
-                instagram_post_id=result.instagram_post_id
-            )
-            
             return jsonify({
                 'success': True,
                 'message': 'Post publié avec succès',
                 'instagram_post_id': result.instagram_post_id
             })
         else:
-            current_app.db_manager.update_post_status(
-                post_id, 
-                PostStatus.FAILED,
-                error_message=result.error_message
-            )
-            
             return jsonify({
                 'success': False,
                 'error': result.error_message
@@ -363,12 +373,9 @@ def delete_post_api(post_id):
         if not post:
             return jsonify({'error': 'Post non trouvé'}), 404
         
-        # Supprimer l'image si elle existe
-        if post.image_path and os.path.exists(post.image_path):
-            try:
-                os.remove(post.image_path)
-            except Exception as e:
-                current_app.logger.warning(f"Impossible de supprimer l'image: {e}")
+        # Supprimer les images (toutes les slides d'un carrousel)
+        from services.image_pipeline import remove_post_media
+        remove_post_media(post.get_media_paths())
         
         # Supprimer de la base de données
         if current_app.db_manager.delete_post(post_id):
@@ -419,6 +426,75 @@ def manual_check_api():
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
 
 
+@api_bp.route('/scheduler/metrics', methods=['GET'])
+def scheduler_metrics_api():
+    """API pour récupérer les métriques de publication (JSON ou format Prometheus)"""
+    try:
+        if not current_app.scheduler:
+            return jsonify({'error': 'Scheduler non disponible'}), 503
+        
+        metrics = current_app.scheduler.metrics
+        
+        if request.args.get('format') == 'prometheus':
+            return current_app.response_class(
+                metrics.to_prometheus(),
+                mimetype='text/plain; version=0.0.4'
+            )
+        
+        return jsonify({
+            'success': True,
+            'metrics': metrics.snapshot(),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur API métriques scheduler: {e}")
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+@api_bp.route('/instagram/media', methods=['GET'])
+def instagram_media_api():
+    """API pour lister les médias Instagram depuis la copie locale (sans appel réseau)"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        offset = request.args.get('offset', 0, type=int)
+        external_only = request.args.get('external') == 'true'
+        
+        media = current_app.db_manager.get_instagram_media(limit, offset, external_only)
+        
+        return jsonify({
+            'success': True,
+            'media': media,
+            'total': current_app.db_manager.get_instagram_media_count(),
+            'limit': limit,
+            'offset': offset
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur API médias Instagram: {e}")
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+@api_bp.route('/instagram/media/sync', methods=['POST'])
+def instagram_media_sync_api():
+    """API pour déclencher une synchronisation des médias Instagram"""
+    try:
+        if not current_app.instagram_publisher:
+            return jsonify({'error': 'Service Instagram non disponible'}), 503
+        
+        from services.media_sync import MediaSync
+        
+        data = request.get_json(silent=True) or {}
+        sync = MediaSync(current_app.db_manager, current_app.instagram_publisher)
+        summary = sync.sync(full=bool(data.get('full')))
+        
+        return jsonify({'success': 'error' not in summary, 'summary': summary})
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur API synchronisation médias: {e}")
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
 @api_bp.route('/search', methods=['GET'])
 def search_posts_api():
     """API pour rechercher des posts"""
@@ -502,7 +578,10 @@ def test_sd_generation():
             prompt=prompt,
             steps=10,  # Rapide pour le test
             width=512,  # Plus petit pour être plus rapide
-            height=512
+            height=512,
+            seed=int(data.get('seed', -1)),
+            use_cache=bool(data.get('use_cache', True)),
+            cache_random=bool(data.get('cache_random', False))
         )
         
         generation_time = time.time() - start_time
@@ -512,7 +591,8 @@ def test_sd_generation():
                 'success': True,
                 'image_path': result.image_path,
                 'generation_time': round(generation_time, 1),
-                'prompt_used': result.prompt_used
+                'prompt_used': result.prompt_used,
+                'cached': result.service_used == 'stable_diffusion_cache'
             })
         else:
             return jsonify({
@@ -569,7 +649,9 @@ def get_sd_status():
             'available': status['available'],
             'current_model': status.get('current_model'),
             'api_url': status.get('api_url'),
-            'model_count': status.get('model_count', 0)
+            'model_count': status.get('model_count', 0),
+            'checkpoint_swaps': status.get('checkpoint_swaps'),
+            'backend_pool': status.get('backend_pool')
         })
         
     except Exception as e:
@@ -577,6 +659,27 @@ def get_sd_status():
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
 
 
+@api_bp.route('/backends-health', methods=['GET'])
+def get_backends_health():
+    """API état en cache des backends (SD, HF, Ollama, ComfyUI); ?refresh=true sonde maintenant"""
+    try:
+        monitor = get_health_monitor()
+        if request.args.get('refresh', 'false').lower() == 'true':
+            for name in list(monitor.backends):
+                monitor.check(name)
+        
+        return jsonify({
+            'success': True,
+            'image_service': current_app.image_generator.service_name
+            if hasattr(getattr(current_app, 'image_generator', None), 'service_name') else None,
+            **monitor.stats()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur API santé des backends: {e}")
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
 @api_bp.route('/change-sd-model', methods=['POST'])
 def change_sd_model():
     """API pour changer le modèle Stable Diffusion"""
@@ -616,6 +719,78 @@ def change_sd_model():
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
 
 
+def _sd_image_params(data: dict) -> dict:
+    """Paramètres validés de StableDiffusionGenerator.generate_image depuis une requête JSON"""
+    negative_prompt = data.get('negative_prompt', '')
+    return {
+        'prompt': (data.get('prompt') or '').strip(),
+        'negative_prompt': negative_prompt if negative_prompt else None,
+        'steps': max(1, min(150, int(data.get('steps', 20)))),  # Entre 1 et 150
+        'cfg_scale': max(1.0, min(20.0, float(data.get('cfg_scale', 7.0)))),  # Entre 1 et 20
+        'width': max(64, min(2048, int(data.get('width', 720)))),  # Entre 64 et 2048
+        'height': max(64, min(2048, int(data.get('height', 720)))),  # Entre 64 et 2048
+        'seed': int(data.get('seed', -1)),
+        'use_cache': bool(data.get('use_cache', True)),
+        'cache_random': bool(data.get('cache_random', False)),
+        'checkpoint': (data.get('checkpoint') or '').strip() or None,
+        'profile': (data.get('profile') or '').strip() or None
+    }
+
+
+def _image_result_to_dict(result) -> dict:
+    """ImageGenerationResult -> JSON (avec l'URL publique de l'image)"""
+    data = {
+        'success': result.success,
+        'image_path': result.image_path,
+        'image_url': f"/static/generated/{os.path.basename(result.image_path)}" if result.image_path else None,
+        'prompt_used': result.prompt_used,
+        'cached': result.service_used == 'stable_diffusion_cache'
+    }
+    if not result.success:
+        data['error'] = result.error_message
+    return data
+
+
+def _job_to_dict(job, include_result: bool = False) -> dict:
+    """Travail de génération -> JSON (rang en file, progression, liens)"""
+    data = job.to_dict()
+    data['status_url'] = f"/api/generation-jobs/{job.id}"
+    data['result_url'] = f"/api/generation-jobs/{job.id}/result"
+    data['events_url'] = f"/api/generation-jobs/{job.id}/events"
+    
+    if job.status == 'queued':
+        data['position'] = current_app.generation_queue.position(job.id)
+    elif job.status == 'running' and getattr(current_app, 'progress_broadcaster', None):
+        # Dernier relevé partagé de l'instance qui exécute le travail (pas d'appel à SD)
+        progress = current_app.progress_broadcaster.job_progress(job) or {}
+        data['progress'] = progress.get('progress', 0)
+        data['eta'] = progress.get('eta', 0)
+    elif job.status == 'running' and current_app.generation_queue.workers == 1:
+        # Un seul worker: la progression de Stable Diffusion est celle de ce travail
+        progress = current_app.sd_generator.get_generation_progress()
+        data['progress'] = progress.get('progress', 0)
+        data['eta'] = progress.get('eta_relative', progress.get('eta', 0))
+    
+    if include_result and job.result is not None:
+        results = job.result if isinstance(job.result, list) else [job.result]
+        data['results'] = [_image_result_to_dict(r) for r in results]
+    return data
+
+
+def _sd_variation_params(data: dict) -> dict:
+    """Paramètres validés de StableDiffusionGenerator.generate_variations depuis une requête JSON"""
+    seed = data.get('seed')
+    return {
+        'prompt': (data.get('prompt') or '').strip(),
+        'count': max(1, min(5, int(data.get('count', 3)))),  # Entre 1 et 5 variations
+        'variation_strength': max(0.0, min(1.0, float(data.get('variation_strength', 0.3)))),  # Entre 0 et 1
+        'seed': int(seed) if seed not in (None, '') else None,  # None: seed aléatoire
+        'use_modifiers': bool(data.get('use_modifiers', False)),
+        'checkpoint': (data.get('checkpoint') or '').strip() or None,
+        'profile': (data.get('profile') or '').strip() or None
+    }
+
+
 @api_bp.route('/generate-image-sd', methods=['POST'])
 def generate_image_sd():
     """API pour générer une image avec Stable Diffusion"""
@@ -630,58 +805,50 @@ def generate_image_sd():
         if not data:
             return jsonify({'error': 'Données JSON requises'}), 400
         
-        prompt = data.get('prompt', '').strip()
-        if not prompt:
+        params = _sd_image_params(data)
+        if not params['prompt']:
             return jsonify({'error': 'Prompt requis'}), 400
+        if params['profile']:
+            try:
+                get_profile(params['profile'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
-        # Paramètres optionnels
-        negative_prompt = data.get('negative_prompt', '')
-        steps = data.get('steps', 20)
-        cfg_scale = data.get('cfg_scale', 7.0)
-        width = data.get('width', 720)
-        height = data.get('height', 720)
-        
-        # Validation des paramètres
-        steps = max(1, min(150, int(steps)))  # Entre 1 et 150
-        cfg_scale = max(1.0, min(20.0, float(cfg_scale)))  # Entre 1 et 20
-        width = max(64, min(2048, int(width)))  # Entre 64 et 2048
-        height = max(64, min(2048, int(height)))  # Entre 64 et 2048
-        
-        current_app.logger.info(f"API: Génération SD - Prompt: {prompt[:50]}...")
+        current_app.logger.info(f"API: Génération SD - Prompt: {params['prompt'][:50]}...")
         
         import time
         start_time = time.time()
         
-        result = current_app.sd_generator.generate_image(
-            prompt=prompt,
-            negative_prompt=negative_prompt if negative_prompt else None,
-            steps=steps,
-            cfg_scale=cfg_scale,
-            width=width,
-            height=height
-        )
+        generation_queue = getattr(current_app, 'generation_queue', None)
+        if generation_queue:
+            # Passage par la file: le nombre de générations simultanées reste borné
+            try:
+                job = generation_queue.submit('image', params)
+            except QueueFullError as e:
+                return jsonify({'success': False, 'error': str(e)}), 429
+            
+            if not data.get('wait'):
+                # Réponse immédiate: le client suit le travail via events_url (SSE) ou status_url
+                return jsonify({'success': True, 'job': _job_to_dict(job)}), 202
+            
+            # "wait": true garde l'ancien comportement bloquant (scripts, tests manuels)
+            if not job.wait(timeout=300):
+                return jsonify({'success': False, 'job': _job_to_dict(job),
+                                'error': 'Génération toujours en cours'}), 202
+            result = job.result
+            if result is None:
+                return jsonify({'success': False, 'error': job.error or 'Génération annulée'}), 500
+        else:
+            result = current_app.sd_generator.generate_image(**params)
         
         generation_time = time.time() - start_time
         
         if result.success:
-            # Convertir le chemin en URL accessible
-            import os
-            image_filename = os.path.basename(result.image_path)
-            image_url = f"/static/generated/{image_filename}"
-            
-            return jsonify({
-                'success': True,
-                'image_path': result.image_path,
-                'image_url': image_url,
-                'prompt_used': result.prompt_used,
-                'generation_time': round(generation_time, 1),
-                'parameters': {
-                    'steps': steps,
-                    'cfg_scale': cfg_scale,
-                    'width': width,
-                    'height': height
-                }
-            })
+            return jsonify(dict(
+                _image_result_to_dict(result),
+                generation_time=round(generation_time, 1),
+                parameters={key: params[key] for key in ('steps', 'cfg_scale', 'width', 'height', 'seed')}
+            ))
         else:
             return jsonify({
                 'success': False,
@@ -693,6 +860,16 @@ def generate_image_sd():
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
 
 
+@api_bp.route('/generation-profiles', methods=['GET'])
+def get_generation_profiles():
+    """API pour lister les profils de génération (formats Instagram) et leur coût GPU"""
+    steps = max(1, min(150, request.args.get('steps', 20, type=int)))
+    return jsonify({
+        'profiles': [row['profile'] for row in compare_profiles(steps)],
+        'comparison': compare_profiles(steps)
+    })
+
+
 @api_bp.route('/sd-progress', methods=['GET'])
 def get_sd_progress():
     """API pour récupérer le progrès de génération SD"""
@@ -703,7 +880,11 @@ def get_sd_progress():
         if not current_app.sd_generator.is_available:
             return jsonify({'progress': 0, 'eta': 0})
         
-        progress = current_app.sd_generator.get_generation_progress()
+        if getattr(current_app, 'progress_broadcaster', None):
+            # Relevé partagé: les clients qui interrogent en boucle ne multiplient pas les appels à SD
+            progress = current_app.progress_broadcaster.latest()
+        else:
+            progress = current_app.sd_generator.get_generation_progress()
         
         return jsonify({
             'success': True,
@@ -717,6 +898,156 @@ def get_sd_progress():
         return jsonify({'progress': 0, 'eta': 0})
 
 
+@api_bp.route('/generation-jobs', methods=['POST'])
+def submit_generation_job():
+    """API pour soumettre une génération SD à la file (réponse immédiate avec l'id du travail)"""
+    try:
+        generation_queue = getattr(current_app, 'generation_queue', None)
+        if not generation_queue:
+            return jsonify({'error': 'File de génération non disponible'}), 503
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Données JSON requises'}), 400
+        
+        kind = data.get('kind', 'image')
+        params = _sd_image_params(data)
+        if not params['prompt']:
+            return jsonify({'error': 'Prompt requis'}), 400
+        if params['profile']:
+            try:
+                get_profile(params['profile'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        if kind == 'variations':
+            params = _sd_variation_params(data)
+        
+        post_id = data.get('post_id')
+        on_complete = None
+        if post_id and kind == 'image':
+            # Image destinée à un post existant: l'y rattacher dès qu'elle est prête
+            db_manager = current_app.db_manager
+            
+            def on_complete(job):
+                if job.status == SUCCEEDED:
+                    db_manager.set_post_image_path(job.post_id, job.result.image_path)
+                else:
+                    db_manager.mark_post_image_failed(job.post_id, job.error or 'génération annulée')
+        
+        try:
+            job = generation_queue.submit(kind, params, post_id=post_id, on_complete=on_complete)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except QueueFullError as e:
+            return jsonify({'success': False, 'error': str(e)}), 429
+        
+        return jsonify({'success': True, 'job': _job_to_dict(job)}), 202
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur API soumission génération: {e}")
+        return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
+
+
+@api_bp.route('/generation-jobs', methods=['GET'])
+def list_generation_jobs():
+    """API pour lister les travaux de génération récents"""
+    generation_queue = getattr(current_app, 'generation_queue', None)
+    if not generation_queue:
+        return jsonify({'error': 'File de génération non disponible'}), 503
+    
+    limit = max(1, min(200, request.args.get('limit', 50, type=int)))
+    return jsonify({
+        'jobs': [_job_to_dict(job) for job in generation_queue.list_jobs(limit)],
+        'stats': generation_queue.stats()
+    })
+
+
+@api_bp.route('/generation-jobs/<job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """API pour suivre un travail de génération (statut, rang en file, progression)"""
+    generation_queue = getattr(current_app, 'generation_queue', None)
+    if not generation_queue:
+        return jsonify({'error': 'File de génération non disponible'}), 503
+    
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    
+    return jsonify({'job': _job_to_dict(job, include_result=job.finished)})
+
+
+@api_bp.route('/generation-jobs/<job_id>/result', methods=['GET'])
+def get_generation_job_result(job_id):
+    """API pour récupérer les images d'un travail (202 tant qu'il n'est pas terminé)"""
+    generation_queue = getattr(current_app, 'generation_queue', None)
+    if not generation_queue:
+        return jsonify({'error': 'File de génération non disponible'}), 503
+    
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    
+    # Attente courte optionnelle pour éviter un poll trop serré
+    wait = max(0.0, min(30.0, request.args.get('wait', 0, type=float)))
+    if wait and not job.finished:
+        job.wait(wait)
+    
+    if job.status not in FINISHED_STATUSES:
+        return jsonify({'success': False, 'job': _job_to_dict(job)}), 202
+    
+    data = _job_to_dict(job, include_result=True)
+    if job.status != SUCCEEDED:
+        return jsonify({'success': False, 'job': data, 'error': job.error or 'Génération annulée'}), 409
+    
+    return jsonify({'success': True, 'job': data, 'results': data.get('results', [])})
+
+
+@api_bp.route('/generation-jobs/<job_id>/events', methods=['GET'])
+def stream_generation_job(job_id):
+    """
+    API flux SSE d'un travail: rang en file, progression, ETA, aperçus, puis statut final
+    
+    ?preview=false pour ne pas recevoir les aperçus (current_image, base64)
+    """
+    generation_queue = getattr(current_app, 'generation_queue', None)
+    broadcaster = getattr(current_app, 'progress_broadcaster', None)
+    if not generation_queue or not broadcaster:
+        return jsonify({'error': 'File de génération non disponible'}), 503
+    
+    job = generation_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    
+    preview = request.args.get('preview', 'true').lower() != 'false'
+    
+    def events():
+        for event, data in broadcaster.stream(job_id, preview=preview):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            if event in FINISHED_STATUSES:
+                data = _job_to_dict(job, include_result=True)
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api_bp.route('/generation-jobs/<job_id>', methods=['DELETE'])
+def cancel_generation_job(job_id):
+    """API pour annuler un travail de génération"""
+    generation_queue = getattr(current_app, 'generation_queue', None)
+    if not generation_queue:
+        return jsonify({'error': 'File de génération non disponible'}), 503
+    
+    job = generation_queue.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Travail non trouvé'}), 404
+    
+    return jsonify({'success': job.cancel_requested, 'job': _job_to_dict(job)})
+
+
 @api_bp.route('/generate-variations-sd', methods=['POST'])
 def generate_variations_sd():
     """API pour générer des variations d'image avec SD"""
@@ -731,19 +1062,35 @@ def generate_variations_sd():
         if not data:
             return jsonify({'error': 'Données JSON requises'}), 400
         
-        prompt = data.get('prompt', '').strip()
-        if not prompt:
+        params = _sd_variation_params(data)
+        if not params['prompt']:
             return jsonify({'error': 'Prompt requis'}), 400
-        
-        count = data.get('count', 3)
-        count = max(1, min(5, int(count)))  # Entre 1 et 5 variations
+        count = params['count']
         
         current_app.logger.info(f"API: Génération de {count} variations SD")
         
         import time
         start_time = time.time()
         
-        variations = current_app.sd_generator.generate_variations(prompt, count)
+        generation_queue = getattr(current_app, 'generation_queue', None)
+        if generation_queue:
+            # Même file que les images seules: un lot de variations occupe un worker
+            try:
+                job = generation_queue.submit('variations', params)
+            except QueueFullError as e:
+                return jsonify({'success': False, 'error': str(e)}), 429
+            
+            if not data.get('wait'):
+                return jsonify({'success': True, 'job': _job_to_dict(job)}), 202
+            
+            if not job.wait(timeout=300):
+                return jsonify({'success': False, 'job': _job_to_dict(job),
+                                'error': 'Génération toujours en cours'}), 202
+            if job.result is None:
+                return jsonify({'success': False, 'error': job.error or 'Génération annulée'}), 500
+            variations = job.result
+        else:
+            variations = current_app.sd_generator.generate_variations(**params)
         
         generation_time = time.time() - start_time
         
@@ -795,6 +1142,8 @@ def delete_image():
         if not filename:
             return jsonify({'error': 'Nom de fichier requis'}), 400
         
+        from services.image_pipeline import remove_variants
+        
         # Construire le chemin de l'image
         image_path = os.path.join('generated', filename)
         
@@ -802,6 +1151,7 @@ def delete_image():
         if os.path.exists(image_path):
             try:
                 os.remove(image_path)
+                remove_variants(image_path)
                 current_app.logger.info(f"Image supprimée: {filename}")
                 return jsonify({
                     'success': True,
@@ -823,9 +1173,10 @@ def clear_gallery():
     """API pour vider la galerie d'images"""
     try:
         import glob
+        from services.image_pipeline import remove_variants
         
         # Patterns de fichiers d'images
-        image_patterns = ['*.png', '*.jpg', '*.jpeg', '*.gif']
+        image_patterns = ['*.png', '*.jpg', '*.jpeg', '*.webp', '*.gif']
         deleted_count = 0
         
         for pattern in image_patterns:
@@ -833,6 +1184,7 @@ def clear_gallery():
             for file_path in files:
                 try:
                     os.remove(file_path)
+                    remove_variants(file_path)
                     deleted_count += 1
                 except Exception as e:
                     current_app.logger.warning(f"Impossible de supprimer {file_path}: {e}")
@@ -1292,7 +1644,9 @@ def test_svd_connection():
                 'error': 'SVD non configuré'
             })
         
-        # Test de base
+        # Test réel (l'état en cache est mis à jour au passage)
+        if hasattr(current_app.svd_generator, '_test_connection'):
+            current_app.svd_generator._test_connection()
         status = current_app.svd_generator.get_status()
         queue_status = current_app.svd_generator.get_queue_status()
         
@@ -1334,7 +1688,7 @@ def quick_video_test():
         
         # Chercher des images dans le dossier generated
         if os.path.exists('generated'):
-            patterns = ['*.png', '*.jpg', '*.jpeg']
+            patterns = ['*.png', '*.jpg', '*.jpeg', '*.webp']
             for pattern in patterns:
                 files = glob.glob(os.path.join('generated', pattern))
                 test_images.extend(files)
@@ -116,16 +116,24 @@ def create_post():
             
             # ÉTAPE 2: GÉNÉRATION DE L'IMAGE avec IA
             image_path = None
+            optimized_prompt = f"{image_prompt}, professional photography, instagram style, high quality, vibrant colors, detailed, masterpiece"
             
-            flash('🎨 Génération de l\'image en cours... (peut prendre 10-30 secondes)', 'info')
+            # Avec la file de génération, l'image est produite en arrière-plan
+            # une fois le post créé (ÉTAPE 6): la requête ne bloque pas un worker web.
+            # La file ne sert que Stable Diffusion: s'il est injoignable, le
+            # générateur principal (bascule Hugging Face / DALL-E) reste synchrone
+            generation_queue = getattr(current_app, 'generation_queue', None)
+            sd_generator = getattr(current_app, 'sd_generator', None)
+            if generation_queue and not (sd_generator and sd_generator.is_available):
+                generation_queue = None
             
-            if hasattr(current_app, 'image_generator') and current_app.image_generator:
+            if generation_queue:
+                current_app.logger.info("Image confiée à la file de génération")
+            elif hasattr(current_app, 'image_generator') and current_app.image_generator:
+                flash('🎨 Génération de l\'image en cours... (peut prendre 10-30 secondes)', 'info')
                 current_app.logger.info("Génération de l'image avec IA...")
                 
                 try:
-                    # Optimiser le prompt pour Instagram
-                    optimized_prompt = f"{image_prompt}, professional photography, instagram style, high quality, vibrant colors, detailed, masterpiece"
-                    
                     # Générer l'image selon le type de générateur
                     if hasattr(current_app.image_generator, 'is_available'):
                         # C'est Stable Diffusion
@@ -201,6 +209,10 @@ def create_post():
                     flash(success_msg, 'success')
                     current_app.logger.info(f"✅ Post créé avec ID: {post_id}")
                     
+                    # ÉTAPE 6: IMAGE EN ARRIÈRE-PLAN (file de génération)
+                    if generation_queue:
+                        _queue_post_image(generation_queue, post_id, optimized_prompt)
+                    
                     # Rediriger vers la page d'aperçu du post créé
                     return redirect(url_for('main.preview_post', post_id=post_id))
                 else:
@@ -217,6 +229,30 @@ def create_post():
     return render_template('create_post.html')
 
 
+def _queue_post_image(generation_queue, post_id: int, prompt: str):
+    """Soumet l'image d'un post à la file; elle y est rattachée dès qu'elle est prête"""
+    from services.generation_queue import QueueFullError, SUCCEEDED
+    
+    db_manager = current_app.db_manager
+    
+    def on_complete(job):
+        if job.status == SUCCEEDED:
+            db_manager.set_post_image_path(job.post_id, job.result.image_path)
+        else:
+            db_manager.mark_post_image_failed(job.post_id, job.error or 'génération annulée')
+    
+    try:
+        job = generation_queue.submit('image', {
+            'prompt': prompt, 'width': 720, 'height': 720, 'steps': 20, 'cfg_scale': 7.0
+        }, post_id=post_id, on_complete=on_complete)
+        current_app.logger.info(f"📥 Image du post {post_id} en file (travail {job.id[:8]})")
+        flash('🎨 Image en cours de génération en arrière-plan: rechargez l\'aperçu dans quelques instants', 'info')
+    except QueueFullError as e:
+        current_app.logger.warning(f"File de génération pleine pour le post {post_id}: {e}")
+        db_manager.mark_post_image_failed(post_id, str(e))
+        flash(f'⚠️ Image non générée ({e}) - réessayez depuis l\'aperçu', 'warning')
+
+
 @main_bp.route('/post/<int:post_id>/preview')
 def preview_post(post_id):
     """Aperçu d'un post avant publication"""
@@ -260,40 +296,17 @@ def publish_now(post_id):
         
         current_app.logger.info(f"Publication immédiate du post: {post.title}")
         
-        # Marquer comme en cours si possible
-        try:
-            current_app.db_manager.update_post_status(post_id, PostStatus.PROCESSING if hasattr(PostStatus, 'PROCESSING') else "processing")
-        except:
-            pass
-        
-        # Publier sur Instagram
-        caption = f"{post.description}\n\n{post.hashtags}" if hasattr(post, 'get_full_caption') else f"{post.description}\n\n{post.hashtags}"
-        result = current_app.instagram_publisher.publish_post(post.image_path, caption)
+        # Prise en charge atomique (comme le scheduler): refusée si la publication est déjà en cours
+        from utils.scheduler import publish_post_now
+        result = publish_post_now(current_app.db_manager, current_app.instagram_publisher, post)
+        if result is None:
+            flash('Publication déjà en cours pour ce post', 'warning')
+            return render_template('preview_post.html', post=post), 409
         
         if result.success:
-            # Mettre à jour le statut
-            try:
-                current_app.db_manager.update_post_status(
-                    post_id, 
-                    PostStatus.PUBLISHED if hasattr(PostStatus, 'PUBLISHED') else "published",
-                    instagram_post_id=result.instagram_post_id
-                )
-            except:
-                pass
-            
             flash(f'Post "{post.title}" publié avec succès sur Instagram!', 'success')
             current_app.logger.info(f"✅ Post {post_id} publié avec succès")
         else:
-            # Marquer comme échoué
-            try:
-                current_app.db_manager.update_post_status(
-                    post_id, 
-                    PostStatus.FAILED if hasattr(PostStatus, 'FAILED') else "failed",
-                    error_message=result.error_message
-                )
-            except:
-                pass
-            
             flash(f'Erreur lors de la publication: {result.error_message}', 'error')
             current_app.logger.error(f"❌ Échec publication post {post_id}: {result.error_message}")
             
@@ -399,12 +412,9 @@ def delete_post(post_id):
             flash('Post non trouvé', 'error')
             return redirect(url_for('main.index'))
         
-        # Supprimer le fichier image si il existe
-        if hasattr(post, 'image_path') and post.image_path and os.path.exists(post.image_path):
-            try:
-                os.remove(post.image_path)
-            except Exception as e:
-                current_app.logger.warning(f"Impossible de supprimer l'image: {e}")
+        # Supprimer les fichiers image (toutes les slides d'un carrousel)
+        from services.image_pipeline import remove_post_media
+        remove_post_media(post.get_media_paths())
         
         # Supprimer de la base de données
         if current_app.db_manager.delete_post(post_id):
@@ -494,7 +504,10 @@ def settings():
         # Test de connexion Instagram
         if services_status['instagram_publisher']:
             try:
-                instagram_test = current_app.instagram_publisher.test_connection()
+                # Résultat mis en cache; ?refresh=1 force un test en direct
+                instagram_test = current_app.instagram_publisher.test_connection(
+                    force_refresh=request.args.get('refresh') == '1'
+                )
                 services_status['instagram_test'] = instagram_test
             except:
                 services_status['instagram_test'] = {'errors': ['Impossible de tester la connexion']}
@@ -508,12 +521,56 @@ def settings():
 
 
 # Routes pour les images et galeries
+@main_bp.route('/media/<path:key>')
+def serve_media(key):
+    """Sert un média du store adressé par contenu (le contenu d'une clé ne change jamais)"""
+    try:
+        from flask import send_file
+        from services.media_store import MediaStore, IMMUTABLE_CACHE_CONTROL
+        
+        store = getattr(current_app, 'media_store', None)
+        if store is None:
+            store = current_app.media_store = MediaStore()
+        
+        path = store.path_for(key)
+        if not path:
+            return "Média non trouvé", 404
+        
+        # L'empreinte SHA-256 contenue dans la clé sert d'ETag
+        digest = os.path.splitext(os.path.basename(key))[0]
+        response = send_file(path, conditional=True, etag=digest, max_age=31536000)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+        
+    except Exception as e:
+        current_app.logger.error(f"Erreur servir média: {e}")
+        return "Média non trouvé", 404
+
+
 @main_bp.route('/static/generated/<filename>')
 def serve_generated_image(filename):
-    """Sert les images générées depuis le dossier generated"""
+    """
+    Sert les images générées depuis le dossier generated
+
+    ?variant=thumb (galerie) ou ?variant=medium (aperçus) sert une version
+    réduite en WebP, créée au premier appel puis servie depuis le disque.
+    """
     try:
-        from flask import send_from_directory
-        return send_from_directory('generated', filename)
+        from flask import send_from_directory, send_file
+        from werkzeug.utils import safe_join
+        
+        variant = request.args.get('variant')
+        if not variant or variant == 'full':
+            return send_from_directory('generated', filename)
+        
+        from services.image_pipeline import VARIANT_WIDTHS, ensure_variant
+        if variant not in VARIANT_WIDTHS:
+            return f"Variante inconnue: {variant} ({', '.join(VARIANT_WIDTHS)}, full)", 400
+        
+        source = safe_join('generated', filename)
+        if not source or not os.path.isfile(source):
+            return "Image non trouvée", 404
+        return send_file(os.path.abspath(ensure_variant(source, variant)), conditional=True, max_age=86400)
     except Exception as e:
         current_app.logger.error(f"Erreur servir image: {e}")
         return "Image non trouvée", 404
@@ -531,7 +588,7 @@ def image_gallery():
             os.makedirs(generated_folder)
         
         # Patterns de fichiers d'images
-        image_patterns = ['*.png', '*.jpg', '*.jpeg', '*.gif']
+        image_patterns = ['*.png', '*.jpg', '*.jpeg', '*.webp', '*.gif']
         images = []
         
         for pattern in image_patterns:
@@ -546,11 +603,13 @@ def image_gallery():
                     
                     # Essayer d'extraire le prompt du nom de fichier
                     prompt_hint = filename.split('_')[2:] if '_' in filename else []
-                    prompt_hint = ' '.join(prompt_hint).replace('.png', '').replace('.jpg', '').replace('_', ' ')
+                    prompt_hint = ' '.join(prompt_hint).replace('.png', '').replace('.jpg', '').replace('.webp', '').replace('_', ' ')
                     
                     images.append({
                         'filename': filename,
                         'url': f'/static/generated/{filename}',
+                        'thumb_url': f'/static/generated/{filename}?variant=thumb',
+                        'medium_url': f'/static/generated/{filename}?variant=medium',
                         'created_time': created_time,
                         'file_size': file_size,
                         'prompt_hint': prompt_hint[:50] if prompt_hint else 'Image générée'
@@ -2,11 +2,11 @@ import os
 import requests
 import openai
 from datetime import datetime
-from PIL import Image
 from typing import Optional, Tuple, List
 
 from config import Config
 from models import ImageGenerationResult
+from services.image_pipeline import get_image_pipeline
 
 
 class AIImageGenerator:
@@ -117,17 +117,17 @@ class AIImageGenerator:
             
             # Générer un nom de fichier unique
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"ai_generated_{timestamp}.png"
-            filepath = os.path.join(Config.GENERATED_FOLDER, filename)
+            output_base = os.path.join(Config.GENERATED_FOLDER, f"ai_generated_{timestamp}")
             
-            # Sauvegarder l'image
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            # Optimiser pour Instagram (format carré, 1080x1080) depuis les octets téléchargés:
+            # pas d'écriture brute suivie d'une relecture du fichier
+            result = get_image_pipeline().process(response.content, output_base,
+                                                  metadata={"generator": "DALL-E", "source_url": image_url})
+            if not result.success:
+                print(f"❌ Erreur lors de la sauvegarde: {result.error}")
+                return None
             
-            # Optimiser l'image pour Instagram (optionnel)
-            self._optimize_image_for_instagram(filepath)
-            
-            return filepath
+            return result.path
             
         except requests.RequestException as e:
             print(f"❌ Erreur lors du téléchargement: {e}")
@@ -136,39 +136,6 @@ class AIImageGenerator:
             print(f"❌ Erreur lors de la sauvegarde: {e}")
             return None
     
-    def _optimize_image_for_instagram(self, image_path: str):
-        """Optimise une image pour Instagram (format carré, qualité, taille)"""
-        try:
-            with Image.open(image_path) as img:
-                # Convertir en RGB si nécessaire
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Instagram préfère les images carrées (1080x1080) ou rectangulaires (1080x1350)
-                original_size = img.size
-                
-                # Si l'image n'est pas au bon format, on peut la recadrer ou la redimensionner
-                if original_size[0] != original_size[1]:  # Si pas carrée
-                    # Créer une version carrée en prenant le minimum des deux dimensions
-                    min_size = min(original_size)
-                    left = (original_size[0] - min_size) // 2
-                    top = (original_size[1] - min_size) // 2
-                    right = left + min_size
-                    bottom = top + min_size
-                    
-                    img = img.crop((left, top, right, bottom))
-                
-                # Redimensionner pour Instagram (1080x1080 optimal)
-                if img.size[0] > 1080:
-                    img = img.resize((1080, 1080), Image.Resampling.LANCZOS)
-                
-                # Sauvegarder avec une qualité optimisée
-                img.save(image_path, 'PNG', optimize=True, quality=95)
-                
-        except Exception as e:
-            print(f"⚠️  Erreur lors de l'optimisation de l'image: {e}")
-            # Ne pas lever d'exception, l'image originale reste utilisable
-    
     def generate_variations(self, base_prompt: str, num_variations: int = 3) -> List[ImageGenerationResult]:
         """Génère plusieurs variations d'une image"""
         variations = []
@@ -0,0 +1,191 @@
+# services/container_tracker.py - Suivi groupé de la préparation des containers Instagram
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+# Statuts après lesquels un container n'évoluera plus
+TERMINAL_STATUSES = {'FINISHED', 'ERROR', 'EXPIRED', 'PUBLISHED'}
+
+
+@dataclass
+class _TrackedContainer:
+    """Container en attente et planification de son prochain poll"""
+    container_id: str
+    future: Future
+    deadline: float
+    next_poll: float
+    interval: float
+    polls: int = 0
+    last_status: Optional[str] = None
+    waiters: List[Future] = field(default_factory=list)
+
+
+class ContainerTracker:
+    """
+    Surveille la préparation de nombreux containers depuis un seul thread
+
+    Les containers dus sont interrogés ensemble (GET /?ids=a,b,c) puis
+    re-planifiés avec un intervalle croissant: un container lent coûte de
+    moins en moins de requêtes. Chaque appel à track() retourne un Future
+    résolu avec le statut final (FINISHED, ERROR, EXPIRED, PUBLISHED ou
+    TIMEOUT).
+    """
+
+    def __init__(self, publisher, min_interval: float = 1.0, max_interval: float = 15.0,
+                 backoff: float = 1.5, batch_size: int = 50, default_timeout: float = 300,
+                 clock=time.monotonic):
+        """
+        Args:
+            publisher: InstagramPublisher (get_container_statuses)
+            min_interval: Délai avant le premier poll d'un container
+            max_interval: Intervalle maximal entre deux polls
+            backoff: Facteur d'augmentation de l'intervalle après chaque poll
+            batch_size: Nombre maximum d'IDs par requête groupée
+            default_timeout: Délai maximal d'attente d'un container
+            clock: Horloge monotone (injectable)
+        """
+        self.publisher = publisher
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.default_timeout = default_timeout
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self._pending: Dict[str, _TrackedContainer] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        self.requests_made = 0
+        self.polls_made = 0
+
+    def start(self) -> 'ContainerTracker':
+        """Démarre le thread de suivi"""
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+
+        self._thread = threading.Thread(target=self._run, name='container-tracker', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Arrête le suivi; les containers encore en attente sont résolus en TIMEOUT"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+        with self._cond:
+            pending = list(self._pending.values())
+            self._pending.clear()
+
+        for tracked in pending:
+            self._resolve(tracked, 'TIMEOUT')
+
+    def track(self, container_id: str, timeout: float = None) -> Future:
+        """
+        Ajoute un container au suivi
+
+        Returns:
+            Future résolu avec le statut final du container
+        """
+        container_id = str(container_id)
+        now = self.clock()
+
+        with self._cond:
+            tracked = self._pending.get(container_id)
+            if tracked:
+                # Même container suivi deux fois: partager le résultat
+                waiter = Future()
+                tracked.waiters.append(waiter)
+                return waiter
+
+            tracked = _TrackedContainer(
+                container_id=container_id,
+                future=Future(),
+                deadline=now + (timeout if timeout is not None else self.default_timeout),
+                next_poll=now + self.min_interval,
+                interval=self.min_interval
+            )
+            self._pending[container_id] = tracked
+            self._cond.notify_all()
+
+        if not self._running:
+            self.start()
+
+        return tracked.future
+
+    def wait(self, container_id: str, timeout: float = None) -> str:
+        """Attend de façon bloquante le statut final d'un container"""
+        return self.track(container_id, timeout).result()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        """Boucle de suivi: interroge les containers dus par lots"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+
+                now = self.clock()
+                due = [t for t in self._pending.values() if t.next_poll <= now or t.deadline <= now]
+
+                if not due:
+                    next_wake = min(
+                        (min(t.next_poll, t.deadline) for t in self._pending.values()),
+                        default=None
+                    )
+                    self._cond.wait(None if next_wake is None else max(next_wake - now, 0))
+                    continue
+
+            for start in range(0, len(due), self.batch_size):
+                self._poll_batch(due[start:start + self.batch_size])
+
+    def _poll_batch(self, batch: List[_TrackedContainer]):
+        """Interroge un lot de containers et résout ceux qui sont terminés"""
+        try:
+            statuses = self.publisher.get_container_statuses([t.container_id for t in batch])
+        except Exception as e:
+            self.logger.warning(f"Erreur suivi containers: {e}")
+            statuses = {}
+
+        self.requests_made += 1
+        self.polls_made += len(batch)
+        now = self.clock()
+
+        for tracked in batch:
+            status = statuses.get(tracked.container_id)
+            tracked.polls += 1
+            tracked.last_status = status
+
+            if status in TERMINAL_STATUSES:
+                self._resolve(tracked, status)
+            elif now >= tracked.deadline:
+                self._resolve(tracked, 'TIMEOUT')
+            else:
+                # IN_PROGRESS ou statut inconnu (erreur réseau): espacer les polls
+                tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+                tracked.next_poll = min(now + tracked.interval, tracked.deadline)
+
+    def _resolve(self, tracked: _TrackedContainer, status: str):
+        """Retire un container du suivi et notifie ses waiters"""
+        with self._cond:
+            if self._pending.get(tracked.container_id) is tracked:
+                del self._pending[tracked.container_id]
+
+        for future in [tracked.future] + tracked.waiters:
+            if not future.done():
+                future.set_result(status)
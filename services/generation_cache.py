@@ -0,0 +1,190 @@
+# services/generation_cache.py - Cache des images générées, indexé par les paramètres de génération
+"""
+Une génération Stable Diffusion est déterministe pour un jeu de paramètres
+donné (prompt optimisé, prompt négatif, taille, étapes, CFG, sampler, seed,
+checkpoint...). Le cache associe l'empreinte canonique de ces paramètres à
+l'image produite: une demande identique est servie en quelques millisecondes
+au lieu de plusieurs secondes de GPU.
+
+Les images sont rangées dans un MediaStore dédié (adressé par contenu, une
+image identique n'est stockée qu'une fois); l'index SQLite garde la date de
+dernière utilisation et la taille de chaque entrée pour l'éviction LRU
+bornée en octets.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from services.media_store import MediaStore
+
+
+class GenerationCache:
+    """Cache LRU borné en taille des images générées"""
+
+    # À incrémenter si le post-traitement des images change (invalide le cache)
+    VERSION = 2
+
+    def __init__(self, root: str = None, max_bytes: int = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            root: Dossier du cache (Config.GENERATION_CACHE_PATH par défaut)
+            max_bytes: Taille maximale des images en cache
+                       (Config.GENERATION_CACHE_MAX_MB par défaut)
+            clock: Horloge (injectable pour les tests)
+        """
+        # Copies plutôt que liens: les images générées peuvent être retouchées sur place
+        self.store = MediaStore(root or Config.GENERATION_CACHE_PATH, link=False)
+        self.max_bytes = (Config.GENERATION_CACHE_MAX_MB * 1024 * 1024
+                          if max_bytes is None else max_bytes)
+        self.index_path = os.path.join(self.store.root, 'index.db')
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._execute('''
+            CREATE TABLE IF NOT EXISTS generations (
+                cache_key TEXT PRIMARY KEY,
+                media_key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                prompt_used TEXT,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        self._execute('CREATE INDEX IF NOT EXISTS idx_generations_last_used ON generations(last_used_at)')
+
+    @classmethod
+    def key_for(cls, params: Dict[str, Any]) -> str:
+        """Empreinte canonique des paramètres (ordre des clés et formatage indifférents)"""
+        canonical = json.dumps(dict(params, _version=cls.VERSION), sort_keys=True,
+                               separators=(',', ':'), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, params: Dict[str, Any], dest_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Copie l'image en cache vers `dest_path`
+
+        Returns:
+            {'image_path', 'prompt_used'} ou None si absente du cache
+        """
+        cache_key = self.key_for(params)
+        rows = self._execute('SELECT media_key, prompt_used FROM generations WHERE cache_key = ?',
+                             (cache_key,))
+        source = self.store.path_for(rows[0][0]) if rows else None
+
+        if not source:
+            if rows:
+                # Fichier supprimé hors du cache: oublier l'entrée
+                self._execute('DELETE FROM generations WHERE cache_key = ?', (cache_key,))
+            self.misses += 1
+            return None
+
+        try:
+            os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+            shutil.copyfile(source, dest_path)
+        except OSError:
+            # Évincée entre la lecture de l'index et la copie
+            self.misses += 1
+            return None
+        self._execute('UPDATE generations SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?',
+                      (self.clock(), cache_key))
+        self.hits += 1
+        return {'image_path': dest_path, 'prompt_used': rows[0][1]}
+
+    def put(self, params: Dict[str, Any], image_path: str, prompt_used: str = None):
+        """Enregistre l'image produite pour ces paramètres puis applique la limite de taille"""
+        try:
+            media = self.store.put(image_path)
+        except OSError as e:
+            self.logger.warning(f"Image non mise en cache ({image_path}): {e}")
+            return
+
+        now = self.clock()
+        self._execute('''
+            INSERT OR REPLACE INTO generations
+                (cache_key, media_key, size, prompt_used, created_at, last_used_at, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        ''', (self.key_for(params), media.key, media.size, prompt_used, now, now))
+        self.evict()
+
+    def evict(self) -> int:
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes; retourne les octets libérés"""
+        with self._lock:
+            # Une image partagée par plusieurs entrées n'occupe le disque qu'une fois
+            rows = self._execute('''
+                SELECT media_key, MAX(size), MAX(last_used_at) AS last_used
+                FROM generations GROUP BY media_key ORDER BY last_used ASC
+            ''')
+            total = sum(size for _, size, _ in rows)
+            freed = 0
+
+            for media_key, size, _ in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                self._execute('DELETE FROM generations WHERE media_key = ?', (media_key,))
+                self._remove_media(media_key)
+                freed += size
+
+        if freed:
+            self.logger.info(f"🧹 Cache de génération: {freed // 1024} Ko libérés")
+        return freed
+
+    def clear(self):
+        with self._lock:
+            for (media_key,) in self._execute('SELECT DISTINCT media_key FROM generations'):
+                self._remove_media(media_key)
+            self._execute('DELETE FROM generations')
+
+    def _remove_media(self, media_key: str):
+        """Supprime une image du cache (déjà supprimée par un autre processus: rien à faire)"""
+        path = self.store.path_for(media_key)
+        if path:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.debug(f"Image du cache déjà supprimée ({path}): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._execute('''
+            SELECT COUNT(*), COUNT(DISTINCT media_key), COALESCE(SUM(hits), 0) FROM generations
+        ''')
+        size = self._execute('''
+            SELECT COALESCE(SUM(size), 0) FROM
+                (SELECT MAX(size) AS size FROM generations GROUP BY media_key)
+        ''')
+        entries, images, total_hits = rows[0] if rows else (0, 0, 0)
+        return {
+            'entries': entries,
+            'images': images,
+            'size_bytes': size[0][0] if size else 0,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'total_hits': total_hits
+        }
+
+    def _execute(self, sql: str, params: tuple = ()):
+        try:
+            conn = sqlite3.connect(self.index_path, timeout=5)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Le cache est une optimisation: ne jamais faire échouer la génération
+            self.logger.warning(f"Erreur index du cache de génération: {e}")
+            return []
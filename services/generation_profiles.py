@@ -0,0 +1,206 @@
+# services/generation_profiles.py - Résolutions de génération par format Instagram
+"""
+Stable Diffusion génère à une résolution native (proche de celle
+d'entraînement du modèle), puis hires-fix agrandit l'image latente et la
+raffine. Tout pixel produit au-delà du format publié est du temps GPU
+perdu: rendu plus grand puis réduit, ou rendu dans un autre ratio puis
+recadré.
+
+Un profil calcule, pour un format Instagram (1:1, 4:5, 9:16):
+    - la résolution native au ratio exact du format, d'une surface proche
+      de SD_NATIVE_SIZE² (multiples de 8, contrainte du VAE)
+    - la cible hires-fix (hr_resize_x/y) égale au format publié, arrondie
+      au multiple de 8 supérieur (quelques pixels recadrés au plus)
+    - pas de hires-fix du tout si la résolution native couvre déjà le format
+
+Exemple:
+    profile = get_profile('4:5')
+    profile.txt2img_params()   # {'width': 648, 'height': 808, 'enable_hr': True,
+                               #  'hr_resize_x': 1080, 'hr_resize_y': 1352, ...}
+    profile.output_size        # (1080, 1350) -> taille du pipeline d'images
+"""
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+
+# Formats Instagram: nom -> (ratio, taille publiée)
+INSTAGRAM_FORMATS = {
+    'square': ('1:1', (1080, 1080)),
+    'portrait': ('4:5', (1080, 1350)),
+    'story': ('9:16', (1080, 1920))
+}
+
+# En deçà de ce gain de surface, hires-fix coûte plus qu'un rendu natif direct
+MIN_HIRES_GAIN = 1.2
+
+
+def _round8(value: float) -> int:
+    return max(64, int(round(value / 8)) * 8)
+
+
+def _ceil8(value: float) -> int:
+    return max(64, int(math.ceil(value / 8)) * 8)
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Résolutions native et hires-fix pour un format publié"""
+    name: str
+    aspect: str
+    output_size: Tuple[int, int]
+    native_size: Tuple[int, int]
+    hires_size: Optional[Tuple[int, int]]
+
+    @property
+    def enable_hr(self) -> bool:
+        return self.hires_size is not None
+
+    @property
+    def hr_scale(self) -> float:
+        return round(self.hires_size[0] / self.native_size[0], 3) if self.hires_size else 1.0
+
+    @property
+    def rendered_size(self) -> Tuple[int, int]:
+        """Taille de l'image renvoyée par Stable Diffusion"""
+        return self.hires_size or self.native_size
+
+    def txt2img_params(self) -> Dict[str, Any]:
+        """Paramètres txt2img de résolution"""
+        params = {
+            'width': self.native_size[0],
+            'height': self.native_size[1],
+            'enable_hr': self.enable_hr
+        }
+        if self.enable_hr:
+            # Taille cible explicite: pas d'arrondi de width * hr_scale
+            params.update({'hr_scale': self.hr_scale,
+                           'hr_resize_x': self.hires_size[0], 'hr_resize_y': self.hires_size[1]})
+        return params
+
+    def pixel_steps(self, steps: int, denoising_strength: float = 0.7) -> float:
+        """
+        Coût GPU relatif d'une image (pixels × étapes de débruitage)
+
+        Passe native: `steps` étapes; passe hires-fix (img2img): environ
+        steps × denoising_strength étapes à la résolution agrandie.
+        """
+        native = self.native_size[0] * self.native_size[1] * steps
+        if not self.enable_hr:
+            return native
+        return native + self.hires_size[0] * self.hires_size[1] * steps * denoising_strength
+
+    def wasted_fraction(self) -> float:
+        """Part des pixels rendus qui n'atteignent pas l'image publiée (recadrés ou réduits)"""
+        rendered = self.rendered_size[0] * self.rendered_size[1]
+        output = self.output_size[0] * self.output_size[1]
+        return max(0.0, 1 - output / rendered)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'aspect': self.aspect,
+            'output_size': list(self.output_size),
+            'native_size': list(self.native_size),
+            'hires_size': list(self.hires_size) if self.hires_size else None,
+            'hr_scale': self.hr_scale,
+            'wasted_fraction': round(self.wasted_fraction(), 4)
+        }
+
+
+def build_profile(name: str, output_size: Tuple[int, int], native_pixels: int = None,
+                  max_hr_scale: float = None, aspect: str = None) -> GenerationProfile:
+    """
+    Calcule la génération minimale pour une taille publiée
+
+    Args:
+        output_size: Taille publiée (après le pipeline d'images)
+        native_pixels: Surface native (SD_NATIVE_SIZE² par défaut)
+        max_hr_scale: Agrandissement hires-fix maximal; au-delà, la résolution
+                      native est augmentée (Config.SD_MAX_HR_SCALE par défaut)
+    """
+    native_pixels = native_pixels or Config.SD_NATIVE_SIZE ** 2
+    max_hr_scale = max_hr_scale or Config.SD_MAX_HR_SCALE
+    out_w, out_h = output_size
+    ratio = out_w / out_h
+
+    # Cible au multiple de 8 supérieur: jamais d'agrandissement par le pipeline
+    target = (_ceil8(out_w), _ceil8(out_h))
+
+    native_w = _round8(math.sqrt(native_pixels * ratio))
+    native = (native_w, _round8(native_w / ratio))
+
+    if native[0] * native[1] * MIN_HIRES_GAIN >= target[0] * target[1]:
+        # Le modèle couvre le format en natif: rendu direct à la taille cible
+        return GenerationProfile(name, aspect or f"{out_w}x{out_h}", tuple(output_size), target, None)
+
+    if target[0] / native[0] > max_hr_scale:
+        native = (_ceil8(target[0] / max_hr_scale), _ceil8(target[1] / max_hr_scale))
+
+    return GenerationProfile(name, aspect or f"{out_w}x{out_h}", tuple(output_size), native, target)
+
+
+def list_profiles(native_pixels: int = None) -> List[GenerationProfile]:
+    return [build_profile(name, size, native_pixels, aspect=aspect)
+            for name, (aspect, size) in INSTAGRAM_FORMATS.items()]
+
+
+def get_profile(name: str, native_pixels: int = None) -> GenerationProfile:
+    """
+    Profil d'un format Instagram, par nom (square, portrait, story) ou ratio (1:1, 4:5, 9:16)
+
+    Raises:
+        ValueError: Format inconnu
+    """
+    key = (name or '').strip().lower()
+    for profile_name, (aspect, size) in INSTAGRAM_FORMATS.items():
+        if key in (profile_name, aspect):
+            return build_profile(profile_name, size, native_pixels, aspect=aspect)
+    raise ValueError(f"Format inconnu: {name} ({', '.join(INSTAGRAM_FORMATS)}, 1:1, 4:5, 9:16)")
+
+
+def profile_for_size(width: int, height: int) -> GenerationProfile:
+    """
+    Profil du format Instagram le plus proche d'une taille demandée
+
+    width × height donne la surface native souhaitée (720×720 -> native
+    720², hires-fix jusqu'à 1080²) et le ratio choisit le format publié.
+    """
+    ratio = width / height
+    name, (aspect, size) = min(INSTAGRAM_FORMATS.items(),
+                               key=lambda item: abs(math.log(ratio * item[1][1][1] / item[1][1][0])))
+    return build_profile(name, size, width * height, aspect=aspect)
+
+
+def compare_profiles(steps: int = 20, denoising_strength: float = 0.7,
+                     legacy_native: int = 720, legacy_hr_scale: float = 1.5) -> List[Dict[str, Any]]:
+    """
+    Coût GPU par image publiée: profils contre l'ancien rendu fixe
+
+    L'ancien rendu générait `legacy_native` de large au ratio demandé, agrandi
+    de `legacy_hr_scale`, puis recadrait au carré 1080² (seule sortie possible).
+    Le débit relatif est l'inverse du coût en pixels × étapes.
+    """
+    rows = []
+    for profile in list_profiles():
+        ratio = profile.output_size[0] / profile.output_size[1]
+        legacy = GenerationProfile(
+            'legacy', profile.aspect, (1080, 1080),
+            (_round8(legacy_native), _round8(legacy_native / ratio)),
+            (_round8(legacy_native * legacy_hr_scale), _round8(legacy_native / ratio * legacy_hr_scale))
+        )
+        legacy_cost = legacy.pixel_steps(steps, denoising_strength)
+        cost = profile.pixel_steps(steps, denoising_strength)
+        rows.append({
+            'profile': profile.to_dict(),
+            'pixel_steps': int(cost),
+            'legacy_pixel_steps': int(legacy_cost),
+            'legacy_wasted_fraction': round(legacy.wasted_fraction(), 4),
+            # Pixels publiés par unité de coût, rapportés à l'ancien rendu
+            'relative_throughput': round(
+                (profile.output_size[0] * profile.output_size[1] / cost) /
+                (legacy.output_size[0] * legacy.output_size[1] / legacy_cost), 2)
+        })
+    return rows
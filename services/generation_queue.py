@@ -0,0 +1,399 @@
+# services/generation_queue.py - File de travaux de génération d'images
+"""
+Une génération txt2img occupe le GPU de plusieurs secondes à plusieurs
+minutes. Plutôt que de bloquer un worker Flask pendant tout ce temps, les
+routes soumettent un travail et retournent immédiatement son identifiant;
+un pool borné de threads alimente le générateur, et le client suit le
+travail via l'API (statut, résultat, annulation).
+
+Changer de checkpoint recharge plusieurs Go en VRAM: un worker libre sert
+en priorité le plus ancien travail dont le modèle est déjà chargé (ou en
+cours d'utilisation), quitte à doubler des travaux plus anciens, dans la
+limite d'une attente maximale et d'un nombre de dépassements par travail.
+
+Exemple:
+    queue = GenerationQueue(sd_generator, workers=1).start()
+    job = queue.submit('image', {'prompt': 'a cat', 'seed': 42})
+    queue.get(job.id).status   # queued -> running -> succeeded
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from services.sd_backend_pool import same_checkpoint
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Type de travail -> méthode du générateur
+JOB_KINDS = {
+    'image': 'generate_image',
+    'variations': 'generate_variations'
+}
+
+
+class QueueFullError(Exception):
+    """Trop de travaux en attente: la soumission est refusée"""
+    pass
+
+
+@dataclass
+class GenerationJob:
+    """Travail de génération et son état"""
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    post_id: Optional[int] = None
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    # Checkpoint requis (None: celui qui est chargé) et dépassements subis en file
+    checkpoint: Optional[str] = None
+    skipped: int = 0
+    # Thread du worker qui l'exécute (instance du pool qui le traite, voir progression)
+    worker_thread: Optional[int] = field(default=None, repr=False)
+    on_complete: Optional[Callable[['GenerationJob'], None]] = field(default=None, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Attend la fin du travail; False si le délai expire"""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'post_id': self.post_id,
+            'prompt': self.params.get('prompt'),
+            'checkpoint': self.checkpoint,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': round((self.started_at or now) - self.created_at, 2),
+            'run_seconds': round((self.finished_at or now) - self.started_at, 2) if self.started_at else None,
+            'error': self.error
+        }
+
+
+class GenerationQueue:
+    """File de travaux de génération servie par un pool borné de workers"""
+
+    def __init__(self, generator, workers: int = None, max_pending: int = None,
+                 retention_seconds: float = 3600, max_finished: int = 500,
+                 affinity_max_wait: float = None, affinity_max_skips: int = None):
+        """
+        Args:
+            generator: Générateur d'images (generate_image, generate_variations)
+            workers: Générations simultanées (Config.SD_QUEUE_WORKERS par défaut);
+                     un serveur AUTOMATIC1111 traite de toute façon une image à la fois
+            max_pending: Travaux en attente au-delà desquels submit() refuse
+                         (Config.SD_QUEUE_MAX_PENDING par défaut)
+            retention_seconds: Durée de conservation des travaux terminés
+            max_finished: Nombre maximum de travaux terminés conservés
+            affinity_max_wait: Attente (s) au-delà de laquelle le plus ancien travail
+                               passe en premier, même s'il impose un changement de
+                               modèle (Config.SD_AFFINITY_MAX_WAIT par défaut)
+            affinity_max_skips: Dépassements tolérés par travail
+                                (Config.SD_AFFINITY_MAX_SKIPS par défaut)
+        """
+        self.generator = generator
+        self.workers = workers or Config.SD_QUEUE_WORKERS
+        self.max_pending = max_pending or Config.SD_QUEUE_MAX_PENDING
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self.affinity_max_wait = (Config.SD_AFFINITY_MAX_WAIT
+                                  if affinity_max_wait is None else affinity_max_wait)
+        self.affinity_max_skips = (Config.SD_AFFINITY_MAX_SKIPS
+                                   if affinity_max_skips is None else affinity_max_skips)
+        self.logger = logging.getLogger(__name__)
+
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._order: List[str] = []
+        # Travaux en attente, dans l'ordre de soumission
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        # Travaux servis avant un plus ancien pour éviter un changement de modèle
+        self.affinity_reorders = 0
+        # Travaux servis en premier malgré un changement de modèle (limite d'équité atteinte)
+        self.fairness_overrides = 0
+
+    def start(self) -> 'GenerationQueue':
+        if self._running:
+            return self
+        self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'generation-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"🎨 File de génération démarrée ({self.workers} worker(s))")
+        return self
+
+    def stop(self, timeout: float = 5):
+        """Arrête les workers (les travaux en cours se terminent, ceux en attente restent en file)"""
+        with self._available:
+            self._running = False
+            self._available.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- Soumission et suivi ---
+
+    def submit(self, kind: str, params: Dict[str, Any], post_id: int = None,
+               on_complete: Callable[[GenerationJob], None] = None) -> GenerationJob:
+        """
+        Ajoute un travail à la file
+
+        Args:
+            kind: Type de travail (voir JOB_KINDS)
+            params: Arguments de la méthode du générateur (prompt, width, seed...)
+            post_id: Post auquel l'image est destinée (informatif)
+            on_complete: Appelé par le worker à la fin du travail (succès ou non)
+
+        Raises:
+            ValueError: Type de travail inconnu
+            QueueFullError: Trop de travaux en attente
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Type de travail inconnu: {kind}")
+
+        with self._lock:
+            if self._pending_count() >= self.max_pending:
+                raise QueueFullError(f"{self.max_pending} génération(s) déjà en attente")
+
+            job = GenerationJob(id=uuid.uuid4().hex, kind=kind, params=dict(params),
+                                post_id=post_id, checkpoint=params.get('checkpoint'),
+                                on_complete=on_complete)
+            self._jobs[job.id] = job
+            self._order.append(job.id)
+            self._pending.append(job.id)
+            self._prune()
+            self._available.notify()
+
+        self.logger.info(f"📥 Travail de génération {job.id[:8]} en file ({kind})")
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Rang dans la file d'attente (0: prochain servi; None si pas en attente)"""
+        with self._lock:
+            pending = list(self._pending)
+        return pending.index(job_id) if job_id in pending else None
+
+    def list_jobs(self, limit: int = 50) -> List[GenerationJob]:
+        """Travaux les plus récents d'abord"""
+        with self._lock:
+            return [self._jobs[jid] for jid in reversed(self._order[-limit:])]
+
+    def cancel(self, job_id: str) -> Optional[GenerationJob]:
+        """
+        Annule un travail
+
+        En attente: il ne sera jamais exécuté. En cours: la génération est
+        interrompue côté Stable Diffusion si ce worker est le seul à l'utiliser,
+        et son résultat est écarté dans tous les cas.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return job
+            job.cancel_requested = True
+            was_queued = job.status == QUEUED
+            if was_queued:
+                self._pending.remove(job_id)
+                self._finish(job, CANCELLED)
+
+        if was_queued:
+            self._notify(job)
+        elif self.workers == 1 and hasattr(self.generator, 'interrupt'):
+            # Un seul worker: la génération en cours sur le GPU est forcément celle-ci
+            self.generator.interrupt()
+
+        self.logger.info(f"🛑 Travail de génération {job_id[:8]} annulé")
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'running': self._running,
+            'jobs': counts,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'affinity_reorders': self.affinity_reorders,
+            'fairness_overrides': self.fairness_overrides,
+            'checkpoint_swaps': self.generator.swap_stats() if hasattr(self.generator, 'swap_stats') else None
+        }
+
+    # --- Exécution ---
+
+    def _worker(self):
+        while True:
+            with self._available:
+                while self._running and not self._pending:
+                    self._available.wait()
+                if not self._running:
+                    break
+
+            loaded = self._loaded_checkpoints()
+            with self._available:
+                if not self._running:
+                    break
+                if not self._pending:
+                    # Pris par un autre worker pendant la lecture des modèles chargés
+                    continue
+                job = self._next_job(loaded)
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.worker_thread = threading.get_ident()
+
+            self._run(job)
+
+    def _loaded_checkpoints(self) -> List[str]:
+        """Modèles chargés côté Stable Diffusion (hors verrou: peut interroger l'API)"""
+        try:
+            return list(self.generator.loaded_checkpoints()) if hasattr(self.generator, 'loaded_checkpoints') else []
+        except Exception:
+            return []
+
+    def _next_job(self, loaded: List[str]) -> GenerationJob:
+        """
+        Retire de la file le prochain travail à exécuter (verrou tenu)
+
+        Le plus ancien, sauf si un travail plus récent utilise un modèle déjà
+        chargé ou en cours d'utilisation et que le plus ancien n'a atteint ni
+        l'attente maximale ni le nombre maximal de dépassements.
+        """
+        oldest = self._jobs[self._pending[0]]
+        warm = loaded + [job.checkpoint for job in self._jobs.values()
+                         if job.status == RUNNING and job.checkpoint]
+
+        def is_warm(job: GenerationJob) -> bool:
+            return not job.checkpoint or any(same_checkpoint(job.checkpoint, c) for c in warm)
+
+        chosen = oldest
+        if not is_warm(oldest):
+            starved = (time.time() - oldest.created_at >= self.affinity_max_wait or
+                       oldest.skipped >= self.affinity_max_skips)
+            candidate = next((self._jobs[jid] for jid in self._pending[1:]
+                              if is_warm(self._jobs[jid])), None)
+            if candidate and not starved:
+                chosen = candidate
+                self.affinity_reorders += 1
+                for jid in self._pending[:self._pending.index(candidate.id)]:
+                    self._jobs[jid].skipped += 1
+            elif candidate:
+                self.fairness_overrides += 1
+
+        self._pending.remove(chosen.id)
+        return chosen
+
+    def _run(self, job: GenerationJob):
+        status, result, error = SUCCEEDED, None, None
+        try:
+            method = getattr(self.generator, JOB_KINDS[job.kind])
+            result = method(**job.params)
+
+            results = result if isinstance(result, list) else [result]
+            if not any(getattr(r, 'success', False) for r in results):
+                status = FAILED
+                error = next((r.error_message for r in results if getattr(r, 'error_message', None)),
+                             'Génération échouée')
+
+        except Exception as e:
+            self.logger.error(f"Erreur travail de génération {job.id[:8]}: {e}")
+            status, error = FAILED, str(e)
+
+        with self._lock:
+            if job.cancel_requested:
+                status = CANCELLED
+                self._discard_images(result)
+                result = None
+            job.result = result
+            job.error = error if status == FAILED else None
+            self._finish(job, status)
+
+        self._notify(job)
+
+    def _finish(self, job: GenerationJob, status: str):
+        """Passe le travail dans un état final (verrou tenu)"""
+        job.status = status
+        job.finished_at = time.time()
+        if status == SUCCEEDED:
+            self.completed += 1
+        elif status == FAILED:
+            self.failed += 1
+        else:
+            self.cancelled += 1
+        job._done.set()
+
+    def _notify(self, job: GenerationJob):
+        if job.on_complete:
+            try:
+                job.on_complete(job)
+            except Exception as e:
+                self.logger.error(f"Erreur callback du travail {job.id[:8]}: {e}")
+
+    @staticmethod
+    def _discard_images(result: Any):
+        """Supprime les images produites par un travail annulé"""
+        for item in (result if isinstance(result, list) else [result]):
+            path = getattr(item, 'image_path', None)
+            if path and os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _pending_count(self) -> int:
+        return len(self._pending)
+
+    def _prune(self):
+        """Oublie les travaux terminés anciens ou en surnombre (verrou tenu)"""
+        cutoff = time.time() - self.retention_seconds
+        finished = [jid for jid in self._order if self._jobs[jid].finished]
+        excess = len(finished) - self.max_finished
+
+        for jid in finished:
+            job = self._jobs[jid]
+            if excess > 0 or (job.finished_at or 0) < cutoff:
+                del self._jobs[jid]
+                excess -= 1
+
+        self._order = [jid for jid in self._order if jid in self._jobs]
@@ -0,0 +1,249 @@
+# services/graph_quota.py - Suivi des quotas de l'API Graph (en-têtes d'usage, limite de publication)
+"""
+L'API Graph renvoie l'état des quotas dans chaque réponse:
+    X-App-Usage                 -> {"call_count": 12, "total_cputime": 4, "total_time": 6}
+    X-Business-Use-Case-Usage   -> {"<id>": [{"type": "instagram", "call_count": 12, ...,
+                                              "estimated_time_to_regain_access": 0}]}
+(pourcentages du quota consommé sur une fenêtre glissante d'une heure), et
+/{ig-user-id}/content_publishing_limit donne les publications consommées sur
+les dernières 24h. Le tracker agrège ces informations pour que le scheduler
+ralentisse avant d'atteindre les 429 plutôt que de gaspiller des retries.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from config import Config
+
+
+# Erreur Graph renvoyée par media_publish quand la limite de publication est atteinte
+PUBLISHING_LIMIT_ERROR = (9, 2207042)
+
+
+class GraphQuotaTracker:
+    """
+    État des quotas Graph API, partagé entre publishers synchrone et asynchrone
+
+    Thread-safe. Le délai retourné par throttle_delay() combine:
+    - l'usage applicatif (X-App-Usage, X-Business-Use-Case-Usage): au-delà de
+      `throttle_percent`, un délai croissant jusqu'à `max_throttle_delay`;
+      à 100%, attente du temps de récupération annoncé (ou `blocked_delay`)
+    - la limite de publication du compte: plus de publication restante,
+      attente jusqu'à la prochaine vérification de la limite
+    """
+
+    # Fenêtre glissante des pourcentages d'usage Graph API
+    USAGE_WINDOW = 3600
+
+    def __init__(self, throttle_percent: float = None, max_throttle_delay: float = 60,
+                 blocked_delay: float = 300, publishing_limit_max_age: float = 300,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            throttle_percent: Usage (%) à partir duquel les publications ralentissent
+                              (Config.GRAPH_USAGE_THROTTLE_PERCENT par défaut)
+            max_throttle_delay: Délai entre publications juste avant 100% d'usage
+            blocked_delay: Attente à 100% d'usage sans temps de récupération annoncé
+            publishing_limit_max_age: Durée de validité de content_publishing_limit
+            clock: Horloge (injectable pour les tests)
+        """
+        self.throttle_percent = (Config.GRAPH_USAGE_THROTTLE_PERCENT
+                                 if throttle_percent is None else throttle_percent)
+        self.max_throttle_delay = max_throttle_delay
+        self.blocked_delay = blocked_delay
+        self.publishing_limit_max_age = publishing_limit_max_age
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        # Dernier relevé X-App-Usage: (pourcentage max, heure)
+        self._app_usage: Optional[tuple] = None
+        # Relevés X-Business-Use-Case-Usage par identifiant: (pourcentage max, récupération en s, heure)
+        self._business_usage: Dict[str, tuple] = {}
+        # Limite de publication par compte (dernier content_publishing_limit)
+        self._publishing: Dict[str, Dict[str, Any]] = {}
+        # Publications faites par ce processus, par compte (heures)
+        self._publishes: Dict[str, deque] = {}
+        # Dernière tentative de lecture de la limite, réussie ou non, par compte
+        self._limit_checked_at: Dict[str, float] = {}
+
+    # --- En-têtes d'usage ---
+
+    @staticmethod
+    def _max_percent(usage: Mapping[str, Any]) -> float:
+        values = [usage.get(key) for key in ('call_count', 'total_cputime', 'total_time')]
+        return max((float(v) for v in values if isinstance(v, (int, float))), default=0.0)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Met à jour l'usage depuis les en-têtes d'une réponse Graph (requests ou aiohttp)"""
+        app_usage = headers.get('X-App-Usage')
+        business_usage = headers.get('X-Business-Use-Case-Usage')
+        if not app_usage and not business_usage:
+            return
+
+        now = self.clock()
+        try:
+            with self._lock:
+                if app_usage:
+                    self._app_usage = (self._max_percent(json.loads(app_usage)), now)
+
+                if business_usage:
+                    for business_id, entries in json.loads(business_usage).items():
+                        percent = max((self._max_percent(e) for e in entries), default=0.0)
+                        # Exprimé en minutes par l'API
+                        regain = max((float(e.get('estimated_time_to_regain_access') or 0)
+                                      for e in entries), default=0.0) * 60
+                        self._business_usage[str(business_id)] = (percent, regain, now)
+
+        except (ValueError, TypeError, AttributeError) as e:
+            self.logger.debug(f"En-tête d'usage Graph illisible: {e}")
+
+    def usage_percent(self) -> float:
+        """Usage le plus élevé relevé sur la fenêtre glissante (0 si inconnu)"""
+        with self._lock:
+            return self._usage_percent(self.clock())
+
+    def _usage_percent(self, now: float) -> float:
+        readings = list(self._business_usage.values())
+        if self._app_usage:
+            percent, observed_at = self._app_usage
+            readings.append((percent, 0, observed_at))
+        # Un relevé plus vieux que la fenêtre ne reflète plus rien
+        return max((percent for percent, _, observed_at in readings
+                    if now - observed_at < self.USAGE_WINDOW), default=0.0)
+
+    # --- Limite de publication ---
+
+    def update_publishing_limit(self, account_id: str, quota_usage: int, quota_total: int,
+                                quota_duration: int = 86400):
+        """Enregistre la réponse de /{account}/content_publishing_limit"""
+        with self._lock:
+            self._publishing[account_id] = {
+                'quota_usage': int(quota_usage or 0),
+                'quota_total': int(quota_total or 0),
+                'quota_duration': int(quota_duration or 86400),
+                'fetched_at': self.clock()
+            }
+
+    def record_publish(self, account_id: str):
+        """Compte une publication réussie (décompte local jusqu'à la prochaine vérification)"""
+        now = self.clock()
+        with self._lock:
+            limit = self._publishing.get(account_id)
+            cutoff = now - (limit['quota_duration'] if limit else 86400)
+            publishes = self._publishes.setdefault(account_id, deque())
+            while publishes and publishes[0] < cutoff:
+                publishes.popleft()
+            publishes.append(now)
+
+    def mark_publishing_limit_reached(self, account_id: str):
+        """L'API a refusé une publication pour limite atteinte (erreur 9/2207042)"""
+        with self._lock:
+            limit = self._publishing.get(account_id)
+            # Limite inconnue: la considérer épuisée jusqu'à la prochaine vérification
+            total = max(1, limit['quota_total'] if limit else 0)
+            duration = limit['quota_duration'] if limit else 86400
+            self._publishing[account_id] = {
+                'quota_usage': total, 'quota_total': total,
+                'quota_duration': duration, 'fetched_at': self.clock(),
+                'estimated': not limit
+            }
+
+    def needs_publishing_limit(self, account_id: str) -> bool:
+        """
+        Vrai si la limite de publication du compte est à relire
+
+        Une lecture échouée (permission manquante...) n'est pas retentée avant
+        `publishing_limit_max_age`: l'appelant réserve la tentative ici.
+        """
+        now = self.clock()
+        with self._lock:
+            limit = self._publishing.get(account_id)
+            checked_at = max(limit['fetched_at'] if limit else 0,
+                             self._limit_checked_at.get(account_id, 0))
+            if now - checked_at < self.publishing_limit_max_age:
+                return False
+            self._limit_checked_at[account_id] = now
+            return True
+
+    def remaining_publishes(self, account_id: str) -> Optional[int]:
+        """Publications restantes sur la fenêtre du compte (None si limite inconnue)"""
+        with self._lock:
+            return self._remaining_publishes(account_id)
+
+    def _remaining_publishes(self, account_id: str) -> Optional[int]:
+        limit = self._publishing.get(account_id)
+        if not limit or not limit['quota_total']:
+            return None
+
+        publishes = self._publishes.get(account_id, ())
+        # Seules les publications postérieures au relevé ne sont pas encore comptées par l'API
+        since_fetch = sum(1 for t in publishes if t >= limit['fetched_at'])
+        return max(0, limit['quota_total'] - limit['quota_usage'] - since_fetch)
+
+    # --- Décision ---
+
+    def throttle_delay(self, account_id: str) -> float:
+        """Secondes à attendre avant la prochaine publication du compte (0: publier)"""
+        with self._lock:
+            now = self.clock()
+            delays = [0.0]
+
+            # Accès bloqué: temps de récupération annoncé par l'API
+            for _, regain, observed_at in self._business_usage.values():
+                if regain:
+                    delays.append(observed_at + regain - now)
+
+            usage = self._usage_percent(now)
+            if usage >= 100:
+                observed_at = max([r[2] for r in self._business_usage.values()] +
+                                  ([self._app_usage[1]] if self._app_usage else []))
+                delays.append(observed_at + self.blocked_delay - now)
+            elif usage >= self.throttle_percent:
+                ratio = (usage - self.throttle_percent) / max(1.0, 100 - self.throttle_percent)
+                delays.append(self.max_throttle_delay * ratio)
+
+            if self._remaining_publishes(account_id) == 0:
+                limit = self._publishing[account_id]
+                delays.append(self._publishing_retry_at(account_id, limit) - now)
+
+            return max(delays)
+
+    def _publishing_retry_at(self, account_id: str, limit: Dict[str, Any]) -> float:
+        """Heure à laquelle une publication devrait redevenir possible (verrou tenu)"""
+        recheck_at = limit['fetched_at'] + self.publishing_limit_max_age
+
+        # Si ce processus a fait toutes les publications de la fenêtre, la
+        # plus ancienne en sortira à une heure connue
+        publishes = self._publishes.get(account_id)
+        if publishes and not limit.get('estimated'):
+            cutoff = self.clock() - limit['quota_duration']
+            while publishes and publishes[0] < cutoff:
+                publishes.popleft()
+            if len(publishes) >= limit['quota_total']:
+                return max(recheck_at, publishes[0] + limit['quota_duration'])
+        return recheck_at
+
+    def snapshot(self, account_id: str = None) -> Dict[str, Any]:
+        """État des quotas (API de statut)"""
+        with self._lock:
+            now = self.clock()
+            snapshot = {
+                'usage_percent': round(self._usage_percent(now), 1),
+                'throttle_percent': self.throttle_percent,
+                'business_usage': {
+                    business_id: {'percent': percent, 'regain_seconds': regain}
+                    for business_id, (percent, regain, _) in self._business_usage.items()
+                }
+            }
+            if account_id:
+                limit = self._publishing.get(account_id)
+                snapshot['publishing_limit'] = dict(limit) if limit else None
+                snapshot['remaining_publishes'] = self._remaining_publishes(account_id)
+
+        if account_id:
+            snapshot['throttle_delay'] = round(self.throttle_delay(account_id), 1)
+        return snapshot
@@ -0,0 +1,322 @@
+# services/health_monitor.py - Surveillance en arrière-plan des backends de génération
+"""
+Les générateurs (Stable Diffusion, Hugging Face, Ollama, ComfyUI) ne
+testent plus leur backend dans le constructeur: ils s'enregistrent auprès
+du moniteur, qui sonde chaque backend dans un thread de fond et garde en
+cache:
+    - l'état (None tant que le premier sondage n'a pas répondu)
+    - la latence des sondages (histogramme glissant)
+    - les échecs consécutifs et la dernière erreur
+    - les changements d'état (événements, abonnés notifiés)
+
+`is_available` des générateurs lit ce cache: un backend démarré après
+l'application est utilisé dès le sondage suivant, un backend tombé est
+écarté dès qu'une requête échoue (report_failure) sans attendre le
+sondage. Un backend indisponible est sondé de moins en moins souvent
+(jusqu'à BACKOFF_MAX × l'intervalle).
+
+Exemple:
+    monitor = get_health_monitor()
+    monitor.register('stable_diffusion@' + url, url, http_probe(url + '/sdapi/v1/options'),
+                     on_change=lambda health, previous: print(health.name, health.healthy))
+    monitor.is_healthy('stable_diffusion@' + url)   # False tant que non confirmé
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from config import Config
+from utils.metrics import RollingHistogram
+
+
+class ProbeError(Exception):
+    """Réponse du backend jugée non saine par une sonde"""
+    pass
+
+
+# Sonde: reçoit le timeout, retourne un détail (modèles, file...) ou lève une exception
+Probe = Callable[[float], Any]
+
+
+def http_probe(url: str, ok_statuses=(200,), headers: Dict[str, str] = None,
+               parse: Callable[[requests.Response], Any] = None) -> Probe:
+    """Sonde GET: saine si le statut est dans ok_statuses (détail: parse(response))"""
+    def probe(timeout: float) -> Any:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code not in ok_statuses:
+            raise ProbeError(f"HTTP {response.status_code}")
+        return parse(response) if parse else None
+    return probe
+
+
+@dataclass
+class BackendHealth:
+    """État en cache d'un backend"""
+    name: str
+    url: str
+    probe: Probe = field(repr=False)
+    interval: float
+    # None: pas encore sondé
+    healthy: Optional[bool] = None
+    detail: Any = None
+    last_check: float = 0.0
+    last_change: float = 0.0
+    next_check: float = 0.0
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    checks: int = 0
+    failures: int = 0
+    probing: bool = False
+    listeners: List[Callable[['BackendHealth', Optional[bool]], None]] = field(default_factory=list, repr=False)
+    latency: RollingHistogram = field(default_factory=lambda: RollingHistogram(window_seconds=3600,
+                                                                              max_samples=1000))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'url': self.url,
+            'healthy': self.healthy,
+            'last_check': round(self.last_check, 3),
+            'last_change': round(self.last_change, 3),
+            'last_error': self.last_error,
+            'consecutive_failures': self.consecutive_failures,
+            'checks': self.checks,
+            'failures': self.failures,
+            'interval_s': self.interval,
+            'latency_s': self.latency.snapshot((50, 90, 99))
+        }
+
+
+class HealthMonitor:
+    """Sondage périodique des backends, état en cache et événements de changement d'état"""
+
+    # Un backend indisponible est sondé au plus tous les BACKOFF_MAX × interval
+    BACKOFF_MAX = 4
+    MAX_EVENTS = 200
+
+    def __init__(self, interval: float = None, timeout: float = None, workers: int = 4,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            interval: Intervalle de sondage par défaut (Config.HEALTH_CHECK_INTERVAL)
+            timeout: Timeout d'une sonde (Config.HEALTH_CHECK_TIMEOUT)
+            workers: Sondes simultanées (une sonde lente ne retarde pas les autres)
+            clock: Horloge (injectable pour les simulations)
+        """
+        self.interval = interval or Config.HEALTH_CHECK_INTERVAL
+        self.timeout = timeout or Config.HEALTH_CHECK_TIMEOUT
+        self.workers = workers
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self.backends: Dict[str, BackendHealth] = {}
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self._subscribers: List[Callable[[BackendHealth, Optional[bool]], None]] = []
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    # --- Enregistrement ---
+
+    def register(self, name: str, url: str, probe: Probe, interval: float = None,
+                 on_change: Callable[[BackendHealth, Optional[bool]], None] = None) -> BackendHealth:
+        """
+        Enregistre un backend; premier sondage immédiat en arrière-plan
+
+        Un backend déjà enregistré sous le même nom et la même URL est
+        partagé (un seul sondage pour plusieurs générateurs): sa sonde et
+        ses abonnés d'origine sont conservés.
+
+        Args:
+            probe: Sonde (voir http_probe)
+            interval: Intervalle de sondage (self.interval par défaut)
+            on_change: callback(health, previous) aux changements d'état de ce backend
+        """
+        with self._condition:
+            health = self.backends.get(name)
+            if health is None or health.url != url:
+                health = BackendHealth(name=name, url=url, probe=probe, interval=interval or self.interval)
+                if on_change:
+                    health.listeners.append(on_change)
+                self.backends[name] = health
+                self._condition.notify_all()
+        self.start()
+        return health
+
+    def unregister(self, name: str):
+        with self._condition:
+            self.backends.pop(name, None)
+
+    def subscribe(self, callback: Callable[[BackendHealth, Optional[bool]], None]):
+        """callback(health, previous) à chaque changement d'état de tout backend (premier sondage compris)"""
+        self._subscribers.append(callback)
+
+    # --- Lecture du cache ---
+
+    def is_healthy(self, name: str) -> bool:
+        health = self.backends.get(name)
+        return bool(health and health.healthy)
+
+    def status(self, name: str) -> Optional[BackendHealth]:
+        return self.backends.get(name)
+
+    def wait_checked(self, names: List[str] = None, timeout: float = None) -> bool:
+        """Attend le premier sondage des backends (démarrage); False si le délai expire"""
+        deadline = self.clock() + (self.timeout if timeout is None else timeout)
+        with self._condition:
+            while True:
+                pending = [h for n, h in self.backends.items()
+                           if (names is None or n in names) and h.healthy is None]
+                remaining = deadline - self.clock()
+                if not pending:
+                    return True
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            backends = list(self.backends.values())
+            events = list(self.events)
+        return {
+            'interval_s': self.interval,
+            'timeout_s': self.timeout,
+            'backends': {health.name: health.to_dict() for health in backends},
+            'recent_events': events[-20:]
+        }
+
+    # --- Mise à jour de l'état ---
+
+    def check(self, name: str) -> bool:
+        """Sonde un backend maintenant (dans le thread appelant)"""
+        health = self.backends.get(name)
+        if not health:
+            return False
+        self._probe(health)
+        return bool(health.healthy)
+
+    def report_success(self, name: str):
+        """Requête réelle réussie: le backend est sain sans attendre le sondage"""
+        health = self.backends.get(name)
+        if health and not health.healthy:
+            self._update(health, True)
+
+    def report_failure(self, name: str, error: Any):
+        """Requête réelle en échec de connexion: écarte le backend jusqu'au prochain sondage réussi"""
+        health = self.backends.get(name)
+        if health:
+            self._update(health, False, error=str(error))
+
+    def _probe(self, health: BackendHealth):
+        started = self.clock()
+        try:
+            detail = health.probe(self.timeout)
+        except Exception as e:
+            self._update(health, False, error=str(e) or type(e).__name__, probed=True)
+        else:
+            self._update(health, True, latency=self.clock() - started, detail=detail, probed=True)
+        finally:
+            with self._condition:
+                health.probing = False
+
+    def _update(self, health: BackendHealth, healthy: bool, latency: float = None,
+                error: str = None, detail: Any = None, probed: bool = False):
+        now = self.clock()
+        with self._condition:
+            previous = health.healthy
+            if probed:
+                health.checks += 1
+                health.last_check = now
+            if latency is not None:
+                health.latency.observe(latency)
+            if healthy:
+                health.consecutive_failures = 0
+                health.last_error = None
+                if detail is not None:
+                    health.detail = detail
+                health.next_check = now + health.interval
+            else:
+                health.failures += 1
+                health.consecutive_failures += 1
+                health.last_error = error
+                backoff = min(2 ** (health.consecutive_failures - 1), self.BACKOFF_MAX)
+                health.next_check = now + health.interval * backoff
+            health.healthy = healthy
+            changed = previous != healthy
+            if changed:
+                health.last_change = now
+                self.events.append({'name': health.name, 'healthy': healthy, 'previous': previous,
+                                    'at': round(now, 3), 'error': error})
+            self._condition.notify_all()
+
+        if not changed:
+            return
+        if healthy:
+            self.logger.info(f"✅ Backend {health.name} accessible ({health.url})")
+        else:
+            self.logger.warning(f"⚠️ Backend {health.name} indisponible ({health.url}): {error}")
+        for callback in health.listeners + self._subscribers:
+            try:
+                callback(health, previous)
+            except Exception as e:
+                self.logger.error(f"Erreur abonné santé {health.name}: {e}")
+
+    # --- Thread de fond ---
+
+    def start(self) -> 'HealthMonitor':
+        with self._condition:
+            if self._thread is None:
+                self._stopping = False
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='health-probe')
+                self._thread = threading.Thread(target=self._loop, name='health-monitor', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        if thread:
+            thread.join(self.timeout + 1)
+        if executor:
+            executor.shutdown(wait=False)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                now = self.clock()
+                due = [h for h in self.backends.values() if not h.probing and h.next_check <= now]
+                for health in due:
+                    health.probing = True
+                if not due:
+                    upcoming = [h.next_check for h in self.backends.values() if not h.probing]
+                    wait = min(upcoming) - now if upcoming else self.interval
+                    self._condition.wait(max(0.05, min(wait, self.interval)))
+                    continue
+                executor = self._executor
+            for health in due:
+                executor.submit(self._probe, health)
+
+
+_shared_monitor: Optional[HealthMonitor] = None
+_shared_lock = threading.Lock()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Moniteur partagé par tous les générateurs du processus"""
+    global _shared_monitor
+    with _shared_lock:
+        if _shared_monitor is None:
+            _shared_monitor = HealthMonitor()
+        return _shared_monitor
@@ -0,0 +1,454 @@
+# services/image_pipeline.py - Post-traitement et encodage des images générées
+"""
+Pipeline commun aux générateurs: décodage -> RGB -> recadrage centré ->
+redimensionnement -> encodage, exécuté dans un pool de processus pour ne
+pas occuper le thread de la requête (ni le GIL) pendant les centaines de
+millisecondes de calcul par image.
+
+L'image n'est décodée qu'une fois: chaque étape travaille sur l'image en
+mémoire et tous les formats de sortie sont encodés depuis le même résultat
+(aucune relecture du fichier écrit). Format de publication JPEG par défaut
+(seul format image accepté par l'API Instagram), WebP possible pour le
+web; PNG réservé à l'archivage (copie optionnelle dans archive/).
+
+Les variantes réduites pour l'affichage (galerie, aperçus) sont produites
+depuis la même image en mémoire: 'thumb' (IMAGE_THUMB_WIDTH px de large)
+et 'medium' (IMAGE_MEDIUM_WIDTH px), en WebP sans métadonnées, dans
+variants/. Une image sans variantes (antérieure, ou IMAGE_VARIANTS_AT_SAVE
+désactivé) les obtient au premier affichage (ensure_variant), puis depuis
+le disque.
+
+Chaque étape est chronométrée dans le processus de travail; les durées
+alimentent des histogrammes par étape (stats(), benchmark_image_pipeline.py).
+
+Exemple:
+    pipeline = ImagePipeline()
+    result = pipeline.process(png_bytes, 'generated/sd_20240101_cat', metadata={'prompt': 'a cat'})
+    result.path          # generated/sd_20240101_cat.jpg
+    result.variants      # {'thumb': 'generated/variants/sd_20240101_cat_thumb.webp', ...}
+    result.timings       # {'decode': 0.01, 'resize': 0.05, 'encode_jpeg': 0.02, ...}
+"""
+import base64
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from config import Config
+from utils.metrics import RollingHistogram
+
+
+# Format -> (format PIL, extension)
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+    'png': ('PNG', '.png')
+}
+
+# Balise EXIF ImageDescription: métadonnées de génération (JSON) des JPEG/WebP
+EXIF_IMAGE_DESCRIPTION = 0x010E
+
+ARCHIVE_FOLDER = 'archive'
+
+# Variantes d'affichage: nom -> largeur maximale (jamais agrandies)
+VARIANT_FOLDER = 'variants'
+VARIANT_WIDTHS = {
+    'thumb': Config.IMAGE_THUMB_WIDTH,
+    'medium': Config.IMAGE_MEDIUM_WIDTH
+}
+
+# Verrous par chemin de variante (répartis): une variante absente n'est calculée
+# qu'une fois quand la galerie la demande depuis plusieurs requêtes simultanées
+_VARIANT_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+@dataclass
+class PipelineResult:
+    """Images produites par le pipeline et durée de chaque étape"""
+    success: bool
+    path: Optional[str] = None
+    archive_path: Optional[str] = None
+    size: Optional[Tuple[int, int]] = None
+    variants: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def _encode(image: Image.Image, fmt: str, metadata: Dict[str, Any], quality: int = None) -> bytes:
+    """Encode l'image (métadonnées en texte PNG ou en EXIF)"""
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        from PIL.PngImagePlugin import PngInfo
+        png_info = PngInfo()
+        for key, value in metadata.items():
+            png_info.add_text(key, str(value))
+        # compress_level 6: optimize=True coûte plusieurs fois plus cher pour quelques %
+        image.save(buffer, 'PNG', pnginfo=png_info, compress_level=6)
+    else:
+        exif = Image.Exif()
+        if metadata:
+            # ImageDescription est une chaîne ASCII: JSON échappé (\u00e9...)
+            exif[EXIF_IMAGE_DESCRIPTION] = json.dumps(metadata, ensure_ascii=True, default=str)
+        options = {'quality': quality or Config.IMAGE_WEBP_QUALITY, 'method': 4} if fmt == 'webp' else \
+                  {'quality': quality or Config.IMAGE_JPEG_QUALITY, 'optimize': False, 'progressive': True,
+                   'subsampling': '4:2:0'}
+        image.save(buffer, FORMATS[fmt][0], exif=exif.tobytes(), **options)
+    return buffer.getvalue()
+
+
+def _write(path: str, data: bytes):
+    """Écriture atomique (jamais de fichier partiel servi par la galerie)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Nom propre à chaque écrivain: plusieurs threads Flask peuvent écrire la même variante
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def variant_format() -> str:
+    """Format des variantes (JPEG si Pillow est compilé sans WebP)"""
+    fmt = Config.IMAGE_VARIANT_FORMAT
+    if fmt == 'webp':
+        from PIL import features
+        if not features.check('webp'):
+            return 'jpeg'
+    return fmt if fmt in FORMATS else 'webp'
+
+
+def variant_path(image_path: str, variant: str) -> str:
+    """Chemin de la variante d'une image: <dossier>/variants/<nom>_<variante>.<ext>"""
+    directory, name = os.path.split(image_path)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, VARIANT_FOLDER, f"{stem}_{variant}{FORMATS[variant_format()][1]}")
+
+
+def _write_variant(image: Image.Image, path: str, width: int) -> Image.Image:
+    """Réduit l'image à `width` de large (ratio conservé), l'écrit sans métadonnées et la retourne"""
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    _write(path, _encode(image, variant_format(), {}, quality=Config.IMAGE_VARIANT_QUALITY))
+    return image
+
+
+def ensure_variant(image_path: str, variant: str) -> str:
+    """
+    Chemin de la variante, créée au premier appel puis lue depuis le disque
+
+    Recréée si l'image source est plus récente (image régénérée sous le même nom).
+
+    Raises:
+        ValueError: Variante inconnue
+        FileNotFoundError: Image source absente
+    """
+    if variant not in VARIANT_WIDTHS:
+        raise ValueError(f"Variante inconnue: {variant} ({', '.join(VARIANT_WIDTHS)})")
+    source_mtime = os.path.getmtime(image_path)
+    path = variant_path(image_path, variant)
+
+    def is_fresh() -> bool:
+        return os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+
+    if is_fresh():
+        return path
+
+    with _VARIANT_LOCKS[hash(path) % len(_VARIANT_LOCKS)]:
+        # Calculée par une autre requête pendant l'attente du verrou
+        if is_fresh():
+            return path
+        with Image.open(image_path) as image:
+            # Décodage JPEG directement à l'échelle utile
+            image.draft('RGB', (VARIANT_WIDTHS[variant], VARIANT_WIDTHS[variant]))
+            image.load()
+            _write_variant(image, path, VARIANT_WIDTHS[variant])
+    return path
+
+
+def remove_variants(image_path: str) -> int:
+    """Supprime les variantes d'une image (suppression de l'image); retourne leur nombre"""
+    removed = 0
+    for variant in VARIANT_WIDTHS:
+        path = variant_path(image_path, variant)
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def _process_context():
+    """
+    Contexte multiprocessing du pool de post-traitement
+
+    Le pool est créé à la première image, depuis un worker de génération:
+    l'application a déjà ses threads (moniteur de santé, scheduler, boucle
+    asyncio, pool SD). Un fork copierait leurs verrous tenus et pourrait
+    bloquer l'enfant; forkserver (sinon spawn) part d'un processus neuf.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Module chargé une fois par le serveur, hérité par chaque worker
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def remove_post_media(paths: List[str]) -> int:
+    """
+    Supprime les images d'un post (toutes les slides) et leurs variantes
+
+    Seuls les fichiers gérés par l'application sont touchés (Config.is_media_path):
+    un chemin enregistré hors de generated/ ou uploads/ est ignoré.
+    Retourne le nombre d'images supprimées.
+    """
+    removed = 0
+    for path in paths:
+        if not Config.is_media_path(path) or not os.path.exists(path):
+            continue
+        try:
+            os.remove(path)
+            remove_variants(path)
+            removed += 1
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Impossible de supprimer l'image {path}: {e}")
+    return removed
+
+
+def process_image(source: Union[bytes, str], output_base: str, size: Tuple[int, int] = (1080, 1080),
+                  fmt: str = 'jpeg', archive: bool = False, metadata: Dict[str, Any] = None,
+                  is_base64: bool = False, variants: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """
+    Exécute le pipeline complet sur une image (dans un processus de travail)
+
+    Args:
+        source: Octets de l'image, base64 (is_base64) ou chemin d'un fichier
+        output_base: Chemin de sortie sans extension
+        size: Taille finale; l'image est recadrée au centre au même ratio
+        fmt: Format de publication (jpeg, webp, png)
+        archive: Écrire aussi une copie PNG dans archive/
+        metadata: Métadonnées de génération (prompt, seed...)
+        variants: Variantes d'affichage à écrire (voir VARIANT_WIDTHS)
+
+    Returns:
+        Dictionnaire sérialisable (voir PipelineResult)
+    """
+    timings: Dict[str, float] = {}
+    metadata = metadata or {}
+
+    def stage(name: str, started: float) -> float:
+        now = time.perf_counter()
+        timings[name] = now - started
+        return now
+
+    started = time.perf_counter()
+    if is_base64:
+        source = base64.b64decode(source)
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    # Décodage JPEG réduit directement à la taille utile (DCT partielle)
+    image.draft('RGB', (size[0], size[1]))
+    image.load()
+    started = stage('decode', started)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    started = stage('convert', started)
+
+    # Recadrage centré au ratio cible
+    width, height = image.size
+    target_ratio = size[0] / size[1]
+    if abs(width / height - target_ratio) > 0.001:
+        if width / height > target_ratio:
+            new_width = round(height * target_ratio)
+            box = ((width - new_width) // 2, 0, (width - new_width) // 2 + new_width, height)
+        else:
+            new_height = round(width / target_ratio)
+            box = (0, (height - new_height) // 2, width, (height - new_height) // 2 + new_height)
+    else:
+        box = (0, 0, width, height)
+    started = stage('crop', started)
+
+    # Recadrage fusionné au redimensionnement (box): une seule passe sur les pixels;
+    # reducing_gap réduit d'abord par un facteur entier quand l'image est bien plus grande
+    if image.size != tuple(size) or box != (0, 0, width, height):
+        image = image.resize(tuple(size), Image.Resampling.LANCZOS, box=box, reducing_gap=3.0)
+    started = stage('resize', started)
+
+    outputs = {fmt: output_base + FORMATS[fmt][1]}
+    if archive and fmt != 'png':
+        directory, name = os.path.split(output_base)
+        outputs['png'] = os.path.join(directory, ARCHIVE_FOLDER, name + '.png')
+
+    for output_fmt, path in outputs.items():
+        data = _encode(image, output_fmt, metadata)
+        started = stage(f'encode_{output_fmt}', started)
+        _write(path, data)
+        started = stage(f'write_{output_fmt}', started)
+
+    variant_paths = {}
+    # De la plus grande à la plus petite: chaque variante réduit la précédente
+    reduced = image
+    for variant in sorted(variants, key=VARIANT_WIDTHS.get, reverse=True):
+        variant_paths[variant] = variant_path(outputs[fmt], variant)
+        reduced = _write_variant(reduced, variant_paths[variant], VARIANT_WIDTHS[variant])
+        started = stage(f'variant_{variant}', started)
+
+    return {
+        'path': outputs[fmt],
+        'archive_path': outputs.get('png') if fmt != 'png' else None,
+        'size': image.size,
+        'variants': variant_paths,
+        'timings': timings
+    }
+
+
+class ImagePipeline:
+    """Pool de processus partagé pour le post-traitement des images"""
+
+    def __init__(self, workers: int = None, fmt: str = None, archive: bool = None,
+                 use_processes: bool = True, variants: Tuple[str, ...] = None):
+        """
+        Args:
+            workers: Processus de travail (Config.IMAGE_PIPELINE_WORKERS, 0: nombre de CPU)
+            fmt: Format de publication (Config.IMAGE_OUTPUT_FORMAT par défaut)
+            archive: Copie PNG d'archivage (Config.IMAGE_ARCHIVE_PNG par défaut)
+            use_processes: False pour travailler en threads (débogage, tests)
+            variants: Variantes écrites avec chaque image (toutes si
+                      Config.IMAGE_VARIANTS_AT_SAVE, sinon à la demande)
+        """
+        self.workers = workers or Config.IMAGE_PIPELINE_WORKERS or os.cpu_count() or 1
+        self.fmt = (fmt or Config.IMAGE_OUTPUT_FORMAT).lower()
+        if self.fmt == 'jpg':
+            self.fmt = 'jpeg'
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Format d'image non supporté: {self.fmt} (jpeg, webp, png)")
+        self.archive = Config.IMAGE_ARCHIVE_PNG if archive is None else archive
+        if variants is None:
+            variants = tuple(VARIANT_WIDTHS) if Config.IMAGE_VARIANTS_AT_SAVE else ()
+        self.variants = tuple(variants)
+        self.use_processes = use_processes
+        self.logger = logging.getLogger(__name__)
+
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.stages: Dict[str, RollingHistogram] = {}
+        self.total = RollingHistogram()
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.fmt][1]
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    try:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                             mp_context=_process_context())
+                    except (OSError, NotImplementedError) as e:
+                        # Environnements sans multiprocessing (sandbox, certains hébergeurs)
+                        self.logger.warning(f"Pool de processus indisponible ({e}), repli sur des threads")
+                        self.use_processes = False
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='image-pipeline')
+            return self._executor
+
+    def submit(self, source: Union[bytes, str], output_base: str, size: Tuple[int, int] = (1080, 1080),
+               metadata: Dict[str, Any] = None, is_base64: bool = False, fmt: str = None) -> Future:
+        """Soumet une image au pool; le Future donne le dictionnaire de process_image"""
+        future = self._get_executor().submit(
+            process_image, source, output_base, tuple(size), fmt or self.fmt,
+            self.archive, metadata or {}, is_base64, self.variants
+        )
+        future.submitted_at = time.perf_counter()
+        return future
+
+    def process(self, source: Union[bytes, str], output_base: str,
+                size: Tuple[int, int] = (1080, 1080), metadata: Dict[str, Any] = None,
+                is_base64: bool = False, fmt: str = None) -> PipelineResult:
+        """Traite une image et attend le résultat"""
+        return self.collect(self.submit(source, output_base, size, metadata, is_base64, fmt))
+
+    def process_many(self, jobs: List[Dict[str, Any]]) -> List[PipelineResult]:
+        """Traite plusieurs images en parallèle (arguments de process() par image)"""
+        futures = [self.submit(**job) for job in jobs]
+        return [self.collect(future) for future in futures]
+
+    def collect(self, future: Future) -> PipelineResult:
+        """Attend un Future de submit() et enregistre les durées par étape"""
+        try:
+            output = future.result()
+        except BrokenProcessPool as e:
+            # Processus tué (mémoire...): recréer le pool pour les images suivantes
+            with self._lock:
+                self._executor = None
+            self.failed += 1
+            return PipelineResult(success=False, error=f"Pool de post-traitement interrompu: {e}")
+        except Exception as e:
+            self.failed += 1
+            return PipelineResult(success=False, error=f"Erreur post-traitement image: {e}")
+
+        with self._lock:
+            self.processed += 1
+            for name, value in output['timings'].items():
+                self.stages.setdefault(name, RollingHistogram()).observe(value)
+        # Durée vue par l'appelant: attente du pool et transfert entre processus inclus
+        self.total.observe(time.perf_counter() - getattr(future, 'submitted_at', time.perf_counter()))
+
+        return PipelineResult(success=True, path=output['path'], archive_path=output['archive_path'],
+                              size=tuple(output['size']), variants=output['variants'],
+                              timings=output['timings'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: histogram.snapshot() for name, histogram in self.stages.items()}
+        return {
+            'format': self.fmt,
+            'archive': self.archive,
+            'variants': list(self.variants),
+            'workers': self.workers,
+            'processes': self.use_processes,
+            'processed': self.processed,
+            'failed': self.failed,
+            'total_s': self.total.snapshot(),
+            'stages_s': stages
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_shared_pipeline: Optional[ImagePipeline] = None
+_shared_lock = threading.Lock()
+
+
+def get_image_pipeline() -> ImagePipeline:
+    """Pipeline partagé par tous les générateurs du processus"""
+    global _shared_pipeline
+    with _shared_lock:
+        if _shared_pipeline is None:
+            _shared_pipeline = ImagePipeline()
+        return _shared_pipeline
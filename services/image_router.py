@@ -0,0 +1,93 @@
+# services/image_router.py - Choix du générateur d'images selon l'état des backends
+"""
+Les générateurs configurés sont rangés par priorité (Stable Diffusion,
+Hugging Face, DALL-E). À chaque génération, le premier dont l'état en
+cache (is_available, tenu à jour par le moniteur de santé) est sain est
+utilisé: Stable Diffusion démarré après l'application reprend la main
+dès son premier sondage réussi, et une panne bascule sur le suivant.
+
+Un générateur sans `is_available` (DALL-E) est considéré disponible.
+"""
+import inspect
+from typing import Any, List, Optional, Tuple
+
+from models import ImageGenerationResult
+
+
+class FailoverImageGenerator:
+    """Générateur d'images qui délègue au premier backend disponible"""
+
+    def __init__(self, generators: List[Tuple[str, Any]]):
+        """
+        Args:
+            generators: (nom du service, générateur) par ordre de priorité
+        """
+        self.generators = [(name, generator) for name, generator in generators if generator]
+
+    @staticmethod
+    def _generator_available(generator: Any) -> bool:
+        return getattr(generator, 'is_available', True)
+
+    def available(self) -> List[Tuple[str, Any]]:
+        return [(name, g) for name, g in self.generators if self._generator_available(g)]
+
+    @property
+    def is_available(self) -> bool:
+        return bool(self.available())
+
+    @property
+    def active(self) -> Optional[Any]:
+        """Générateur utilisé par la prochaine génération (le premier sinon)"""
+        available = self.available()
+        if available:
+            return available[0][1]
+        return self.generators[0][1] if self.generators else None
+
+    @property
+    def service_name(self) -> str:
+        available = self.available()
+        return available[0][0] if available else "Non disponible"
+
+    @staticmethod
+    def _supported_kwargs(generator: Any, kwargs: dict) -> dict:
+        """Options de génération acceptées par ce générateur (taille, steps... propres à SD)"""
+        try:
+            parameters = inspect.signature(generator.generate_image).parameters
+        except (TypeError, ValueError):
+            return kwargs
+        if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+            return kwargs
+        return {key: value for key, value in kwargs.items() if key in parameters}
+
+    def generate_image(self, prompt: str, **kwargs) -> ImageGenerationResult:
+        """
+        Génère avec le premier backend disponible; si celui-ci tombe pendant
+        la génération (marqué indisponible par l'échec), essaie le suivant
+        """
+        result = None
+        for name, generator in self.available():
+            result = generator.generate_image(prompt, **self._supported_kwargs(generator, kwargs))
+            if result.success or self._generator_available(generator):
+                return result
+            print(f"🔄 {name} indisponible, bascule sur le service suivant")
+        if result is not None:
+            return result
+        return ImageGenerationResult.error_result(
+            "Aucun service de génération d'images accessible", service_used="none"
+        )
+
+    def get_status(self) -> dict:
+        return {
+            'available': self.is_available,
+            'service': self.service_name,
+            'services': {name: self._generator_available(g) for name, g in self.generators}
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        # Autres méthodes (validate_prompt, get_available_models...): générateur actif
+        if name == 'generators':
+            raise AttributeError(name)
+        active = self.active
+        if active is None:
+            raise AttributeError(name)
+        return getattr(active, name)
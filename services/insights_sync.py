@@ -0,0 +1,150 @@
+# services/insights_sync.py - Synchronisation groupée des métriques Instagram
+"""
+Récupère les métriques (likes, commentaires, portée, enregistrements...)
+des posts publiés par requêtes batch de l'API Graph (50 médias par aller-
+retour) et les enregistre en masse dans la table posts.
+
+Les posts récents sont rafraîchis souvent, les anciens rarement
+(voir DEFAULT_REFRESH_TIERS).
+
+Usage:
+    python -m services.insights_sync --limit 1000
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+
+from models import InstagramMediaMetrics
+
+
+# (âge maximum du post, intervalle de rafraîchissement), du plus récent au plus ancien
+DEFAULT_REFRESH_TIERS = [
+    (timedelta(days=2), timedelta(hours=1)),
+    (timedelta(days=14), timedelta(hours=12)),
+    (timedelta(days=90), timedelta(days=7)),
+    (None, timedelta(days=30)),
+]
+
+
+class InsightsSync:
+    """Synchronise les métriques des posts publiés par lots"""
+
+    MEDIA_FIELDS = 'id,media_type,caption,permalink,timestamp,like_count,comments_count'
+    INSIGHT_METRICS = 'reach,impressions,saved'
+
+    def __init__(self, db_manager, instagram_publisher, refresh_tiers: List[tuple] = None,
+                 batch_size: int = 50):
+        """
+        Args:
+            db_manager: Gestionnaire de base de données
+            instagram_publisher: InstagramPublisher (batch_request)
+            refresh_tiers: Paliers (âge max, intervalle) de rafraîchissement
+            batch_size: Médias par requête batch (50 au maximum côté Graph API)
+        """
+        self.db_manager = db_manager
+        self.instagram_publisher = instagram_publisher
+        self.refresh_tiers = refresh_tiers or DEFAULT_REFRESH_TIERS
+        self.batch_size = min(batch_size, 50)
+        self.logger = logging.getLogger(__name__)
+
+    def fetch_metrics(self, media_ids: List[str]) -> Dict[str, Optional[InstagramMediaMetrics]]:
+        """
+        Récupère les métriques de plusieurs médias
+
+        Returns:
+            media_id -> InstagramMediaMetrics, None si le média n'existe plus;
+            les médias absents du résultat n'ont pas pu être interrogés
+        """
+        results = {}
+        with_insights = f"fields={self.MEDIA_FIELDS},insights.metric({self.INSIGHT_METRICS})"
+        without_insights = f"fields={self.MEDIA_FIELDS}"
+
+        responses = self.instagram_publisher.batch_request([
+            {'method': 'GET', 'relative_url': f"{media_id}?{with_insights}"} for media_id in media_ids
+        ])
+
+        # Les insights peuvent être refusés pour certains médias (anciens, stories...):
+        # on se rabat alors sur les compteurs simples
+        retry_ids = []
+        for media_id, response in zip(media_ids, responses):
+            if response is None:
+                continue
+            if response['code'] == 200:
+                results[media_id] = InstagramMediaMetrics.from_api_response(response['body'])
+            else:
+                retry_ids.append(media_id)
+
+        if retry_ids:
+            responses = self.instagram_publisher.batch_request([
+                {'method': 'GET', 'relative_url': f"{media_id}?{without_insights}"} for media_id in retry_ids
+            ])
+            for media_id, response in zip(retry_ids, responses):
+                if response is None:
+                    continue
+                if response['code'] == 200:
+                    results[media_id] = InstagramMediaMetrics.from_api_response(response['body'])
+                elif response['code'] in (400, 404):
+                    results[media_id] = None
+
+        return results
+
+    def sync(self, limit: int = 500, now: datetime = None) -> Dict[str, Any]:
+        """
+        Rafraîchit les métriques des posts dus selon les paliers
+
+        Returns:
+            Résumé: posts dus, mis à jour, médias introuvables, non joignables, durée
+        """
+        now = now or datetime.now()
+        started = time.time()
+        summary = {'due': 0, 'updated': 0, 'missing': 0, 'unreachable': 0, 'batches': 0}
+
+        due = self.db_manager.get_posts_due_for_insights(self.refresh_tiers, now, limit)
+        summary['due'] = len(due)
+
+        for start in range(0, len(due), self.batch_size):
+            chunk = due[start:start + self.batch_size]
+            post_by_media = {row['instagram_post_id']: row['id'] for row in chunk}
+
+            fetched = self.fetch_metrics(list(post_by_media))
+            summary['batches'] += 1
+
+            updates = {post_by_media[mid]: m for mid, m in fetched.items() if m is not None}
+            missing = [post_by_media[mid] for mid, m in fetched.items() if m is None]
+            # Non joignables (erreur du lot, refus): marqués aussi, sinon ils resteraient
+            # en tête des posts dus et affameraient chaque synchronisation; nouvel essai
+            # à l'intervalle de leur palier
+            unreachable = [pid for mid, pid in post_by_media.items() if mid not in fetched]
+
+            summary['updated'] += self.db_manager.bulk_update_post_metrics(updates, now)
+            self.db_manager.touch_post_insights(missing + unreachable, now)
+            summary['missing'] += len(missing)
+            summary['unreachable'] += len(unreachable)
+
+        summary['duration'] = round(time.time() - started, 3)
+
+        if summary['due']:
+            self.logger.info(f"📈 Synchronisation des métriques: {summary}")
+
+        return summary
+
+
+def main(argv=None):
+    from config import Config
+    from database import DatabaseManager
+    from services.instagram_api import InstagramPublisher
+
+    parser = argparse.ArgumentParser(description='Synchronisation des métriques Instagram')
+    parser.add_argument('--db', default=Config.DATABASE_PATH)
+    parser.add_argument('--limit', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sync = InsightsSync(DatabaseManager(args.db), InstagramPublisher())
+    print(sync.sync(limit=args.limit))
+
+
+if __name__ == '__main__':
+    main()
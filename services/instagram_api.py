@@ -1,33 +1,187 @@
+import hashlib
+import json
 import requests
 import time
 import os
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
 from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import Config
-from models import PublicationResult
+from models import PublicationResult, CAROUSEL_MIN_ITEMS, CAROUSEL_MAX_ITEMS
+from services.container_tracker import ContainerTracker, TERMINAL_STATUSES
+from services.graph_quota import GraphQuotaTracker, PUBLISHING_LIMIT_ERROR
+from utils.cache import TTLCache
 
 
 class InstagramPublisher:
     """Gestionnaire de publication sur Instagram via l'API Graph"""
     
-    def __init__(self, access_token: str = None, account_id: str = None):
+    # Timeouts (connexion, lecture) par type d'appel, en secondes
+    TIMEOUTS = {
+        'container_create': (5, 30),
+        'container_status': (3, 10),
+        'publish': (5, 30),
+        'batch': (5, 60),
+        'default': (5, 10)
+    }
+    
+    # Codes HTTP justifiant une nouvelle tentative (limites de taux, erreurs serveur)
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    # Attente maximale acceptée pour un en-tête Retry-After sur un POST
+    MAX_RETRY_AFTER = 60
+    
+    # Durées de cache (fraîcheur, service périmé pendant le rechargement), en secondes
+    CACHE_TTLS = {
+        'hashtag_id': (30 * 86400, 0),          # Les IDs de hashtags ne changent pas
+        'hashtag_info': (3600, 86400),
+        'account_info': (600, 86400),
+        'token_valid': (600, 3600)
+    }
+    
+    def __init__(self, access_token: str = None, account_id: str = None,
+                 base_url: str = None, session: requests.Session = None,
+                 pool_size: int = 10, max_retries: int = 3, cache: TTLCache = None,
+                 uploader: Callable[[str], Optional[str]] = None,
+                 quota: GraphQuotaTracker = None):
         """
         Initialise le publisher Instagram
         
         Args:
             access_token: Token d'accès Instagram
             account_id: ID du compte Instagram Business
+            base_url: URL de l'API Graph (Config.INSTAGRAM_BASE_URL par défaut)
+            session: Session HTTP à utiliser (une session poolée est créée sinon)
+            pool_size: Nombre de connexions keep-alive conservées par hôte
+            max_retries: Nouvelles tentatives sur 429/5xx
+            cache: Cache des métadonnées (hashtags, compte, validité du token)
+            uploader: Fonction retournant l'URL publique d'une image
+                      (MediaUploader configuré par create_media_uploader par défaut)
+            quota: Suivi des quotas Graph API (partageable avec le publisher asynchrone)
         """
         self.access_token = access_token or Config.INSTAGRAM_ACCESS_TOKEN
         self.account_id = account_id or Config.INSTAGRAM_ACCOUNT_ID
-        self.base_url = Config.INSTAGRAM_BASE_URL
+        self.base_url = (base_url or Config.INSTAGRAM_BASE_URL).rstrip('/')
+        self.max_retries = max_retries
         
         if not self.access_token or not self.account_id:
             raise ValueError("Token d'accès et ID de compte Instagram requis")
+        
+        # Session partagée: réutilise les connexions TCP/TLS entre les appels
+        self.session = session or self._create_session(pool_size, max_retries)
+        
+        # Suivi groupé des containers (voir enable_container_tracker)
+        self.container_tracker = None
+        
+        self.uploader = uploader
+        
+        # Quotas relevés dans les en-têtes de chaque réponse (voir publish_throttle_delay)
+        self.quota = quota or GraphQuotaTracker()
+        
+        self.cache = cache or TTLCache(
+            max_entries=512,
+            persist_path=Config.INSTAGRAM_CACHE_PATH or None,
+            namespace='instagram'
+        )
+    
+    def _cached(self, kind: str, key: str, loader: Callable[[], Any],
+                cacheable: Callable[[Any], bool] = None, force_refresh: bool = False) -> Any:
+        """Appel mis en cache, isolé par compte (voir CACHE_TTLS)"""
+        ttl, stale_ttl = self.CACHE_TTLS[kind]
+        return self.cache.get_or_load(
+            f"{self.account_id}:{kind}:{key}", loader,
+            ttl=ttl, stale_ttl=stale_ttl, cacheable=cacheable, force_refresh=force_refresh
+        )
+    
+    @classmethod
+    def _create_session(cls, pool_size: int, max_retries: int) -> requests.Session:
+        """Crée une session avec pool de connexions et politique de retry"""
+        # Les GET/DELETE sont idempotents: urllib3 les retente avec backoff
+        # exponentiel et respecte Retry-After. Les POST (création de container,
+        # publication) ne sont jamais rejoués automatiquement: voir _request.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=cls.RETRY_STATUSES,
+            allowed_methods=frozenset({'GET', 'DELETE'}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _request(self, method: str, url: str, endpoint: str = 'default',
+                 **kwargs) -> requests.Response:
+        """
+        Effectue un appel Graph API via la session partagée
+        
+        Un POST n'est rejoué que sur 429 (requête refusée avant traitement,
+        donc sans risque de double publication), après le délai Retry-After.
+        """
+        kwargs.setdefault('timeout', self.TIMEOUTS.get(endpoint, self.TIMEOUTS['default']))
+        
+        attempt = 0
+        while True:
+            response = self.session.request(method, url, **kwargs)
+            self.quota.update_from_headers(response.headers)
+            
+            if method != 'POST' or response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            
+            delay = self._retry_after_delay(response, attempt)
+            if delay is None:
+                return response
+            
+            attempt += 1
+            print(f"⏳ Limite de taux Instagram, nouvelle tentative dans {delay:.1f}s")
+            time.sleep(delay)
+    
+    def _retry_after_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """Délai avant nouvelle tentative (Retry-After ou backoff exponentiel)"""
+        retry_after = response.headers.get('Retry-After')
+        
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                return None
+        else:
+            delay = 0.5 * (2 ** attempt)
+        
+        return delay if delay <= self.MAX_RETRY_AFTER else None
+    
+    def enable_container_tracker(self, **options) -> ContainerTracker:
+        """
+        Active le suivi groupé des containers
+        
+        Toutes les publications en cours partagent alors un seul thread de
+        polling (requêtes groupées, intervalle adaptatif) au lieu de bloquer
+        chacune sur ses propres polls.
+        """
+        if not self.container_tracker:
+            self.container_tracker = ContainerTracker(self, **options).start()
+        return self.container_tracker
+    
+    def close(self):
+        """Ferme les connexions du pool"""
+        if self.container_tracker:
+            self.container_tracker.stop()
+        self.session.close()
     
     def publish_post(self, image_path: str, caption: str, 
-                    location_id: str = None) -> PublicationResult:
+                    location_id: str = None, container_id: str = None,
+                    on_container_created: Callable[[str], None] = None) -> PublicationResult:
         """
         Publie un post sur Instagram
         
@@ -35,54 +189,195 @@ class InstagramPublisher:
             image_path: Chemin vers l'image à publier
             caption: Caption du post
             location_id: ID de localisation (optionnel)
+            container_id: Container déjà créé à reprendre (publication interrompue)
+            on_container_created: Appelé avec l'ID du container dès sa création,
+                                  pour pouvoir le retrouver après un crash
         
         Returns:
             PublicationResult avec le résultat de la publication
         """
+        # Durée de chaque étape (upload, création container, attente, publication)
+        stage_timings = {}
+        
         try:
             print(f"📸 Publication sur Instagram...")
             print(f"   🖼️  Image: {os.path.basename(image_path)}")
             print(f"   📝 Caption: {caption[:100]}...")
             
-            # Étape 1: Upload de l'image et création du container média
-            container_result = self._create_media_container(image_path, caption, location_id)
-            
-            if not container_result['success']:
-                return PublicationResult.error_result(container_result['error'])
-            
-            container_id = container_result['container_id']
-            
-            # Étape 2: Vérifier le statut du container
-            if not self._wait_for_container_ready(container_id):
-                return PublicationResult.error_result("Container média non prêt pour publication")
+            if container_id:
+                print(f"   ♻️  Reprise du container {container_id}")
+            else:
+                # Étape 1: Upload de l'image et création du container média
+                container_result = self._create_media_container(
+                    image_path, caption, location_id, stage_timings=stage_timings
+                )
+                
+                if not container_result['success']:
+                    result = PublicationResult.error_result(container_result['error'])
+                    result.stage_timings = stage_timings
+                    return result
+                
+                container_id = container_result['container_id']
+                
+                if on_container_created:
+                    on_container_created(str(container_id))
             
-            # Étape 3: Publier le container
-            publish_result = self._publish_media_container(container_id)
+            # Étapes 2 et 3: attendre le container puis le publier
+            return self._wait_and_publish(container_id, stage_timings)
+                
+        except Exception as e:
+            error_msg = f"Erreur lors de la publication: {str(e)}"
+            print(f"❌ {error_msg}")
+            result = PublicationResult.error_result(error_msg, container_id=container_id)
+            result.stage_timings = stage_timings
+            return result
+    
+    # Créations de containers enfants simultanées pour un carrousel
+    CAROUSEL_WORKERS = 10
+    
+    def publish_carousel(self, image_paths: List[str], caption: str,
+                         location_id: str = None, container_id: str = None,
+                         on_container_created: Callable[[str], None] = None,
+                         max_wait: int = 120) -> PublicationResult:
+        """
+        Publie un carrousel (2 à 10 images)
+        
+        Les containers enfants sont créés (upload compris) en parallèle puis
+        attendus ensemble, avant la création et la publication du container
+        parent. Seul le container parent est notifié via on_container_created
+        et peut être repris (container_id).
+        
+        Args:
+            image_paths: Images du carrousel, dans l'ordre
+            caption: Caption du post
+            location_id: ID de localisation (optionnel)
+            container_id: Container parent déjà créé à reprendre
+            on_container_created: Appelé avec l'ID du container parent dès sa création
+            max_wait: Attente maximale des containers enfants
+        
+        Returns:
+            PublicationResult avec le résultat de la publication
+        """
+        stage_timings = {}
+        
+        try:
+            print(f"📸 Publication d'un carrousel sur Instagram ({len(image_paths)} images)...")
             
-            if publish_result['success']:
-                print(f"✅ Post publié avec succès! ID: {publish_result['post_id']}")
-                return PublicationResult.success_result(
-                    post_id=str(container_id),
-                    instagram_post_id=publish_result['post_id']
-                )
+            if container_id:
+                print(f"   ♻️  Reprise du container {container_id}")
             else:
-                return PublicationResult.error_result(publish_result['error'])
+                if not CAROUSEL_MIN_ITEMS <= len(image_paths) <= CAROUSEL_MAX_ITEMS:
+                    return PublicationResult.error_result(
+                        f"Un carrousel contient de {CAROUSEL_MIN_ITEMS} à {CAROUSEL_MAX_ITEMS} images"
+                    )
                 
+                # Étape 1: containers enfants (upload + création) en parallèle
+                stage_start = time.time()
+                workers = min(len(image_paths), self.CAROUSEL_WORKERS)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='carousel') as pool:
+                    children = list(pool.map(
+                        lambda path: self._create_media_container(path, None, is_carousel_item=True),
+                        image_paths
+                    ))
+                stage_timings['children_create'] = time.time() - stage_start
+                
+                failed = [(path, child) for path, child in zip(image_paths, children) if not child['success']]
+                if failed:
+                    path, child = failed[0]
+                    result = PublicationResult.error_result(
+                        f"Image {os.path.basename(path)}: {child['error']}"
+                    )
+                    result.stage_timings = stage_timings
+                    return result
+                
+                child_ids = [str(child['container_id']) for child in children]
+                
+                # Étape 2: attente groupée des containers enfants
+                stage_start = time.time()
+                statuses = self._wait_for_containers_ready(child_ids, max_wait)
+                stage_timings['children_wait'] = time.time() - stage_start
+                
+                not_ready = {cid: status for cid, status in statuses.items() if status != 'FINISHED'}
+                if not_ready:
+                    result = PublicationResult.error_result(
+                        f"Containers du carrousel non prêts: {not_ready}"
+                    )
+                    result.stage_timings = stage_timings
+                    return result
+                
+                # Étape 3: container parent
+                stage_start = time.time()
+                parent = self._create_carousel_container(child_ids, caption, location_id)
+                stage_timings['container_create'] = time.time() - stage_start
+                
+                if not parent['success']:
+                    result = PublicationResult.error_result(parent['error'])
+                    result.stage_timings = stage_timings
+                    return result
+                
+                container_id = parent['container_id']
+                
+                if on_container_created:
+                    on_container_created(str(container_id))
+            
+            # Étapes 4 et 5: attendre le container parent puis le publier
+            return self._wait_and_publish(container_id, stage_timings)
+            
         except Exception as e:
-            error_msg = f"Erreur lors de la publication: {str(e)}"
+            error_msg = f"Erreur lors de la publication du carrousel: {str(e)}"
             print(f"❌ {error_msg}")
-            return PublicationResult.error_result(error_msg)
+            result = PublicationResult.error_result(error_msg, container_id=container_id)
+            result.stage_timings = stage_timings
+            return result
     
-    def _create_media_container(self, image_path: str, caption: str, 
-                              location_id: str = None) -> Dict[str, Any]:
-        """Crée un container média sur Instagram"""
+    def _wait_and_publish(self, container_id: str, stage_timings: Dict[str, float]) -> PublicationResult:
+        """Attend qu'un container soit prêt puis le publie"""
+        stage_start = time.time()
+        container_ready = self._wait_for_container_ready(container_id)
+        stage_timings['container_wait'] = time.time() - stage_start
+        
+        if not container_ready:
+            result = PublicationResult.error_result(
+                "Container média non prêt pour publication", container_id=container_id
+            )
+            result.stage_timings = stage_timings
+            return result
+        
+        stage_start = time.time()
+        publish_result = self._publish_media_container(container_id)
+        stage_timings['publish'] = time.time() - stage_start
+        
+        if publish_result['success']:
+            print(f"✅ Post publié avec succès! ID: {publish_result['post_id']}")
+            result = PublicationResult.success_result(
+                instagram_post_id=publish_result['post_id'],
+                container_id=str(container_id)
+            )
+        else:
+            result = PublicationResult.error_result(
+                publish_result['error'], container_id=container_id
+            )
+        
+        result.stage_timings = stage_timings
+        return result
+    
+    def _create_media_container(self, image_path: str, caption: Optional[str], 
+                              location_id: str = None,
+                              stage_timings: Dict[str, float] = None,
+                              is_carousel_item: bool = False) -> Dict[str, Any]:
+        """Crée un container média sur Instagram (élément de carrousel: sans caption)"""
+        if stage_timings is None:
+            stage_timings = {}
+        
         try:
             # URL de l'endpoint pour créer un container
             url = f"{self.base_url}/{self.account_id}/media"
             
             # Dans un environnement de production, vous devez uploader l'image
             # sur un serveur accessible publiquement (AWS S3, Cloudinary, etc.)
+            stage_start = time.time()
             image_url = self._upload_image_to_cdn(image_path)
+            stage_timings['upload'] = time.time() - stage_start
             
             if not image_url:
                 return {'success': False, 'error': 'Impossible d\'uploader l\'image'}
@@ -90,57 +385,155 @@ class InstagramPublisher:
             # Paramètres pour créer le container
             params = {
                 'image_url': image_url,
-                'caption': caption,
                 'access_token': self.access_token
             }
             
+            if is_carousel_item:
+                params['is_carousel_item'] = 'true'
+            else:
+                params['caption'] = caption
+            
             # Ajouter la localisation si fournie
             if location_id:
                 params['location_id'] = location_id
             
-            response = requests.post(url, data=params, timeout=30)
-            data = response.json()
-            
-            if response.status_code == 200 and 'id' in data:
-                return {
-                    'success': True,
-                    'container_id': data['id']
-                }
-            else:
-                error_msg = data.get('error', {}).get('message', 'Erreur inconnue lors de la création du container')
-                return {'success': False, 'error': error_msg}
+            stage_start = time.time()
+            response = self._request('POST', url, 'container_create', data=params)
+            stage_timings['container_create'] = time.time() - stage_start
+            return self._container_response(response)
                 
         except requests.RequestException as e:
             return {'success': False, 'error': f'Erreur réseau: {str(e)}'}
         except Exception as e:
             return {'success': False, 'error': f'Erreur: {str(e)}'}
     
+    def _create_carousel_container(self, child_ids: List[str], caption: str,
+                                   location_id: str = None) -> Dict[str, Any]:
+        """Crée le container parent d'un carrousel à partir des containers enfants"""
+        try:
+            params = {
+                'media_type': 'CAROUSEL',
+                'children': ','.join(child_ids),
+                'caption': caption,
+                'access_token': self.access_token
+            }
+            
+            if location_id:
+                params['location_id'] = location_id
+            
+            response = self._request('POST', f"{self.base_url}/{self.account_id}/media",
+                                     'container_create', data=params)
+            return self._container_response(response)
+            
+        except requests.RequestException as e:
+            return {'success': False, 'error': f'Erreur réseau: {str(e)}'}
+        except Exception as e:
+            return {'success': False, 'error': f'Erreur: {str(e)}'}
+    
+    @staticmethod
+    def _container_response(response: requests.Response) -> Dict[str, Any]:
+        data = response.json()
+        
+        if response.status_code == 200 and 'id' in data:
+            return {
+                'success': True,
+                'container_id': data['id']
+            }
+        
+        error_msg = data.get('error', {}).get('message', 'Erreur inconnue lors de la création du container')
+        return {'success': False, 'error': error_msg}
+    
     def _wait_for_container_ready(self, container_id: str, max_wait: int = 60) -> bool:
         """Attend que le container soit prêt pour publication"""
         print(f"⏳ Attente de la préparation du container...")
         
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
-            status = self._get_container_status(container_id)
-            
-            if status == 'FINISHED':
-                print(f"✅ Container prêt pour publication")
-                return True
-            elif status == 'ERROR':
-                print(f"❌ Erreur dans le container")
-                return False
-            elif status in ['IN_PROGRESS', 'PUBLISHED']:
-                time.sleep(2)  # Attendre 2 secondes avant de revérifier
-                continue
-            else:
-                print(f"⚠️  Statut inconnu: {status}")
-                time.sleep(2)
+        if self.container_tracker:
+            status = self.container_tracker.wait(container_id, timeout=max_wait)
+        else:
+            status = self._poll_container_until_done(container_id, max_wait)
         
-        print(f"⏰ Timeout: container non prêt après {max_wait}s")
+        if status == 'FINISHED':
+            print(f"✅ Container prêt pour publication")
+            return True
+        elif status == 'TIMEOUT':
+            print(f"⏰ Timeout: container non prêt après {max_wait}s")
+        else:
+            print(f"❌ Container non publiable (statut: {status})")
         return False
     
+    def _wait_for_containers_ready(self, container_ids: List[str], max_wait: int = 60) -> Dict[str, str]:
+        """
+        Attend plusieurs containers ensemble
+        
+        Returns:
+            container_id -> statut final (FINISHED, ERROR, EXPIRED... ou TIMEOUT)
+        """
+        print(f"⏳ Attente de la préparation de {len(container_ids)} containers...")
+        
+        if self.container_tracker:
+            futures = {cid: self.container_tracker.track(cid, timeout=max_wait) for cid in container_ids}
+            return {cid: future.result() for cid, future in futures.items()}
+        
+        return self._poll_containers_until_done(container_ids, max_wait)
+    
+    def _poll_containers_until_done(self, container_ids: List[str], max_wait: int,
+                                    min_interval: float = 1.0, max_interval: float = 5.0) -> Dict[str, str]:
+        """Poll groupé (GET /?ids=...) avec intervalle croissant jusqu'aux statuts finaux"""
+        deadline = time.time() + max_wait
+        interval = min_interval
+        pending = list(container_ids)
+        results = {}
+        
+        while True:
+            statuses = self.get_container_statuses(pending)
+            for cid in list(pending):
+                if statuses.get(cid) in TERMINAL_STATUSES:
+                    results[cid] = statuses[cid]
+                    pending.remove(cid)
+            
+            if not pending:
+                return results
+            
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                results.update({cid: 'TIMEOUT' for cid in pending})
+                return results
+            
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, max_interval)
+    
+    def _poll_container_until_done(self, container_id: str, max_wait: int,
+                                   min_interval: float = 1.0, max_interval: float = 5.0) -> str:
+        """Poll d'un seul container avec intervalle croissant (1s, 1.5s, 2.25s... max 5s)"""
+        deadline = time.time() + max_wait
+        interval = min_interval
+        
+        while True:
+            status = self.get_container_status(container_id)
+            
+            if status in TERMINAL_STATUSES:
+                return status
+            
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return 'TIMEOUT'
+            
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, max_interval)
+    
     def _get_container_status(self, container_id: str) -> str:
         """Récupère le statut d'un container média"""
+        status = self.get_container_status(container_id)
+        return status if status else 'ERROR'
+    
+    def get_container_status(self, container_id: str) -> Optional[str]:
+        """
+        Récupère le statut d'un container média
+        
+        Returns:
+            FINISHED, IN_PROGRESS, PUBLISHED, ERROR, EXPIRED... ou None si l'API
+            n'a pas pu être interrogée (statut inconnu)
+        """
         try:
             url = f"{self.base_url}/{container_id}"
             params = {
@@ -148,17 +541,106 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._request('GET', url, 'container_status', params=params)
             data = response.json()
             
             if response.status_code == 200:
                 return data.get('status_code', 'UNKNOWN')
-            else:
+            elif response.status_code in (400, 404):
+                # Container inexistant ou expiré côté Instagram
                 return 'ERROR'
+            else:
+                return None
                 
         except Exception as e:
             print(f"❌ Erreur vérification statut: {e}")
-            return 'ERROR'
+            return None
+    
+    def get_container_statuses(self, container_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Récupère le statut de plusieurs containers en une requête (GET /?ids=...)
+        
+        Returns:
+            container_id -> statut (None si inconnu)
+        """
+        if not container_ids:
+            return {}
+        
+        if len(container_ids) == 1:
+            return {container_ids[0]: self.get_container_status(container_ids[0])}
+        
+        try:
+            params = {
+                'ids': ','.join(container_ids),
+                'fields': 'status_code',
+                'access_token': self.access_token
+            }
+            response = self._request('GET', f"{self.base_url}/", 'container_status', params=params)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    cid: (data[cid].get('status_code', 'UNKNOWN') if cid in data else 'ERROR')
+                    for cid in container_ids
+                }
+        except Exception as e:
+            print(f"⚠️  Lookup groupé des containers impossible: {e}")
+        
+        # Repli: un appel par container (la session garde la connexion ouverte)
+        return {cid: self.get_container_status(cid) for cid in container_ids}
+    
+    # Nombre maximum de requêtes par appel batch de l'API Graph
+    BATCH_LIMIT = 50
+    
+    def batch_request(self, batch: List[Dict[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Exécute plusieurs requêtes Graph en un aller-retour (POST / batch=[...])
+        
+        Args:
+            batch: Requêtes {'method': 'GET', 'relative_url': '...'}; découpées par 50
+        
+        Returns:
+            Une réponse par requête: {'code': int, 'body': dict} ou None si
+            l'API n'a pas traité la requête (délai dépassé, erreur réseau)
+        """
+        responses = []
+        
+        for start in range(0, len(batch), self.BATCH_LIMIT):
+            chunk = batch[start:start + self.BATCH_LIMIT]
+            try:
+                response = self._request('POST', f"{self.base_url}/", 'batch', data={
+                    'batch': json.dumps(chunk),
+                    'include_headers': 'false',
+                    'access_token': self.access_token
+                })
+                
+                if response.status_code != 200:
+                    print(f"⚠️  Requête batch refusée: HTTP {response.status_code}")
+                    responses.extend([None] * len(chunk))
+                    continue
+                
+                for item in response.json():
+                    if not item:
+                        responses.append(None)
+                        continue
+                    try:
+                        body = json.loads(item.get('body') or '{}')
+                    except ValueError:
+                        body = {}
+                    responses.append({'code': item.get('code'), 'body': body})
+                    
+            except Exception as e:
+                print(f"❌ Erreur requête batch: {e}")
+                responses.extend([None] * len(chunk))
+        
+        return responses
+    
+    def find_published_media(self, caption: str, limit: int = 25) -> Optional[Dict[str, Any]]:
+        """Retrouve parmi les médias récents celui publié avec cette caption"""
+        for media in self.get_recent_media(limit=limit):
+            if (media.get('caption') or '').strip() == (caption or '').strip():
+                return media
+        return None
     
     def _publish_media_container(self, container_id: str) -> Dict[str, Any]:
         """Publie un container média"""
@@ -170,16 +652,20 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            response = requests.post(url, data=params, timeout=30)
+            response = self._request('POST', url, 'publish', data=params)
             data = response.json()
             
             if response.status_code == 200 and 'id' in data:
+                self.quota.record_publish(self.account_id)
                 return {
                     'success': True,
                     'post_id': data['id']
                 }
             else:
-                error_msg = data.get('error', {}).get('message', 'Erreur lors de la publication')
+                error = data.get('error', {})
+                if (error.get('code'), error.get('error_subcode')) == PUBLISHING_LIMIT_ERROR:
+                    self.quota.mark_publishing_limit_reached(self.account_id)
+                error_msg = error.get('message', 'Erreur lors de la publication')
                 return {'success': False, 'error': error_msg}
                 
         except requests.RequestException as e:
@@ -189,59 +675,29 @@ class InstagramPublisher:
     
     def _upload_image_to_cdn(self, image_path: str) -> Optional[str]:
         """
-        Upload une image vers un CDN accessible publiquement
+        Rend une image accessible publiquement et retourne son URL
         
-        NOTE: Cette fonction doit être implémentée selon votre infrastructure.
-        Vous pouvez utiliser AWS S3, Cloudinary, ou tout autre service de stockage.
+        Le fichier est rangé dans le store adressé par contenu puis confié au
+        backend configuré (MEDIA_UPLOAD_BACKEND): une image déjà publiée n'est
+        ni recopiée ni réuploadée.
         """
-        # EXEMPLE avec un service fictif - À REMPLACER
-        try:
-            # Pour les tests, on peut utiliser un service comme imgur ou un serveur local
-            # Voici un exemple avec un serveur local (pour développement uniquement)
-            
-            # Option 1: Serveur local (développement seulement)
-            if Config.DEBUG:
-                # Copier l'image vers un dossier static accessible
-                import shutil
-                filename = os.path.basename(image_path)
-                static_path = os.path.join('static', 'temp', filename)
-                os.makedirs(os.path.dirname(static_path), exist_ok=True)
-                shutil.copy2(image_path, static_path)
-                
-                # Retourner l'URL locale (ne fonctionne que pour les tests)
-                return f"http://localhost:5000/static/temp/{filename}"
-            
-            # Option 2: Upload vers un vrai CDN (PRODUCTION)
-            # Exemple avec AWS S3 (à décommenter et configurer)
-            """
-            import boto3
-            
-            s3_client = boto3.client('s3')
-            bucket_name = 'your-bucket-name'
-            key = f"instagram-images/{os.path.basename(image_path)}"
-            
-            s3_client.upload_file(image_path, bucket_name, key)
-            return f"https://{bucket_name}.s3.amazonaws.com/{key}"
-            """
-            
-            # Option 3: Exemple avec Cloudinary
-            """
-            import cloudinary.uploader
-            
-            result = cloudinary.uploader.upload(image_path)
-            return result['secure_url']
-            """
-            
-            # Pour le moment, retourner None pour forcer l'implémentation
-            print("⚠️  Fonction _upload_image_to_cdn doit être implémentée avec votre CDN")
-            return None
-            
-        except Exception as e:
-            print(f"❌ Erreur upload image: {e}")
+        if self.uploader is None:
+            from services.media_store import create_media_uploader
+            self.uploader = create_media_uploader()
+        
+        if self.uploader is None:
+            print("⚠️  Aucun backend d'upload configuré (MEDIA_UPLOAD_BACKEND)")
             return None
+        
+        return self.uploader(image_path)
     
-    def get_account_info(self) -> Dict[str, Any]:
-        """Récupère les informations du compte Instagram"""
+    def get_account_info(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Récupère les informations du compte Instagram (mises en cache)"""
+        return self._cached('account_info', 'me', self._fetch_account_info,
+                            cacheable=lambda info: 'error' not in info,
+                            force_refresh=force_refresh)
+    
+    def _fetch_account_info(self) -> Dict[str, Any]:
         try:
             url = f"{self.base_url}/{self.account_id}"
             params = {
@@ -249,7 +705,7 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._request('GET', url, 'default', params=params)
             
             if response.status_code == 200:
                 return response.json()
@@ -269,7 +725,7 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._request('GET', url, 'default', params=params)
             
             if response.status_code == 200:
                 return response.json().get('data', [])
@@ -280,13 +736,105 @@ class InstagramPublisher:
             print(f"❌ Erreur récupération médias: {e}")
             return []
     
-    def validate_access_token(self) -> bool:
-        """Valide le token d'accès"""
+    MEDIA_PAGE_FIELDS = 'id,media_type,media_url,permalink,caption,timestamp,like_count,comments_count'
+    
+    def get_media_page(self, after: str = None, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Récupère une page des médias du compte (du plus récent au plus ancien)
+        
+        Args:
+            after: Curseur de la page précédente (None pour la première page)
+            limit: Taille de page (100 au maximum côté Graph API)
+        
+        Returns:
+            {'data': [...], 'after': curseur suivant ou None en fin de liste},
+            None en cas d'erreur
+        """
+        try:
+            url = f"{self.base_url}/{self.account_id}/media"
+            params = {
+                'fields': self.MEDIA_PAGE_FIELDS,
+                'limit': min(limit, 100),
+                'access_token': self.access_token
+            }
+            if after:
+                params['after'] = after
+            
+            response = self._request('GET', url, 'default', params=params)
+            
+            if response.status_code != 200:
+                print(f"❌ Erreur page de médias: {response.status_code}")
+                return None
+            
+            payload = response.json()
+            paging = payload.get('paging', {})
+            # Sans lien 'next', le curseur 'after' pointe sur la dernière page
+            next_after = paging.get('cursors', {}).get('after') if paging.get('next') else None
+            
+            return {'data': payload.get('data', []), 'after': next_after}
+            
+        except Exception as e:
+            print(f"❌ Erreur page de médias: {e}")
+            return None
+    
+    def get_publishing_limit(self, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Limite de publication du compte (content_publishing_limit)
+        
+        Relue au plus toutes les `publishing_limit_max_age` secondes; entre
+        deux lectures, les publications de ce processus sont décomptées localement.
+        
+        Returns:
+            État des quotas du compte, None si la limite n'a pas pu être lue
+        """
+        if force_refresh or self.quota.needs_publishing_limit(self.account_id):
+            try:
+                url = f"{self.base_url}/{self.account_id}/content_publishing_limit"
+                params = {
+                    'fields': 'quota_usage,config',
+                    'access_token': self.access_token
+                }
+                response = self._request('GET', url, 'default', params=params)
+                if response.status_code != 200:
+                    return None
+                
+                limit = (response.json().get('data') or [{}])[0]
+                config = limit.get('config') or {}
+                self.quota.update_publishing_limit(
+                    self.account_id, limit.get('quota_usage'),
+                    config.get('quota_total'), config.get('quota_duration')
+                )
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️  Limite de publication indisponible: {e}")
+                return None
+        
+        return self.quota.snapshot(self.account_id)
+    
+    def publish_throttle_delay(self) -> float:
+        """
+        Secondes à attendre avant la prochaine publication (0: publier)
+        
+        Tient compte de l'usage Graph API relevé dans les en-têtes et des
+        publications restantes du compte (limite relue si nécessaire).
+        """
+        self.get_publishing_limit()
+        return self.quota.throttle_delay(self.account_id)
+    
+    def validate_access_token(self, force_refresh: bool = False) -> bool:
+        """Valide le token d'accès (un token valide est mis en cache)"""
+        # Un échec n'est jamais mis en cache: il peut venir d'une erreur réseau,
+        # et un token corrigé doit être reconnu immédiatement
+        token_key = hashlib.sha256(self.access_token.encode('utf-8')).hexdigest()[:16]
+        return self._cached('token_valid', token_key, self._check_access_token,
+                            cacheable=lambda valid: valid is True,
+                            force_refresh=force_refresh)
+    
+    def _check_access_token(self) -> bool:
         try:
             url = f"{self.base_url}/me"
             params = {'access_token': self.access_token}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._request('GET', url, 'default', params=params)
             return response.status_code == 200
             
         except Exception:
@@ -301,7 +849,7 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._request('GET', url, 'default', params=params)
             
             if response.status_code == 200:
                 return response.json()
@@ -343,13 +891,13 @@ class InstagramPublisher:
             if location_id:
                 params['location_id'] = location_id
             
-            response = requests.post(url, data=params, timeout=30)
+            response = self._request('POST', url, 'container_create', data=params)
             data = response.json()
             
             if response.status_code == 200 and 'id' in data:
                 return PublicationResult.success_result(
-                    post_id=str(data['id']),
-                    instagram_post_id=data['id']
+                    instagram_post_id=data['id'],
+                    container_id=str(data['id'])
                 )
             else:
                 error_msg = data.get('error', {}).get('message', 'Erreur programmation')
@@ -364,49 +912,67 @@ class InstagramPublisher:
             url = f"{self.base_url}/{media_id}"
             params = {'access_token': self.access_token}
             
-            response = requests.delete(url, params=params, timeout=10)
+            response = self._request('DELETE', url, 'default', params=params)
             return response.status_code == 200
             
         except Exception as e:
             print(f"❌ Erreur suppression média: {e}")
             return False
     
-    def get_hashtag_info(self, hashtag: str) -> Dict[str, Any]:
-        """Récupère des informations sur un hashtag"""
+    def get_hashtag_info(self, hashtag: str, force_refresh: bool = False) -> Dict[str, Any]:
+        """Récupère des informations sur un hashtag (ID et compteurs mis en cache)"""
         try:
-            # Rechercher l'ID du hashtag
-            search_url = f"{self.base_url}/ig_hashtag_search"
-            search_params = {
-                'user_id': self.account_id,
-                'q': hashtag.replace('#', ''),
-                'access_token': self.access_token
-            }
+            name = hashtag.replace('#', '').strip().lower()
             
-            response = requests.get(search_url, params=search_params, timeout=10)
+            hashtag_id = self._cached('hashtag_id', name, lambda: self._search_hashtag_id(name),
+                                      cacheable=lambda hashtag_id: hashtag_id is not None)
+            if not hashtag_id:
+                return {'error': 'Hashtag non trouvé'}
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('data'):
-                    hashtag_id = data['data'][0]['id']
-                    
-                    # Récupérer les infos du hashtag
-                    info_url = f"{self.base_url}/{hashtag_id}"
-                    info_params = {
-                        'fields': 'id,name,media_count',
-                        'access_token': self.access_token
-                    }
-                    
-                    info_response = requests.get(info_url, params=info_params, timeout=10)
-                    if info_response.status_code == 200:
-                        return info_response.json()
-            
-            return {'error': 'Hashtag non trouvé'}
+            return self._cached('hashtag_info', hashtag_id, lambda: self._fetch_hashtag_info(hashtag_id),
+                                cacheable=lambda info: 'error' not in info,
+                                force_refresh=force_refresh)
             
         except Exception as e:
             return {'error': f'Erreur: {str(e)}'}
     
-    def test_connection(self) -> Dict[str, Any]:
-        """Test la connexion à l'API Instagram"""
+    def _search_hashtag_id(self, name: str) -> Optional[str]:
+        """Recherche l'ID d'un hashtag (limité à 30 hashtags uniques par semaine côté Graph API)"""
+        search_url = f"{self.base_url}/ig_hashtag_search"
+        search_params = {
+            'user_id': self.account_id,
+            'q': name,
+            'access_token': self.access_token
+        }
+        
+        response = self._request('GET', search_url, 'default', params=search_params)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('data'):
+                return data['data'][0]['id']
+        return None
+    
+    def _fetch_hashtag_info(self, hashtag_id: str) -> Dict[str, Any]:
+        """Récupère les infos d'un hashtag par son ID"""
+        info_url = f"{self.base_url}/{hashtag_id}"
+        info_params = {
+            'fields': 'id,name,media_count',
+            'access_token': self.access_token
+        }
+        
+        info_response = self._request('GET', info_url, 'default', params=info_params)
+        if info_response.status_code == 200:
+            return info_response.json()
+        return {'error': 'Hashtag non trouvé'}
+    
+    def test_connection(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Test la connexion à l'API Instagram
+        
+        Les résultats positifs viennent du cache (voir CACHE_TTLS);
+        force_refresh impose un test en direct.
+        """
         results = {
             'token_valid': False,
             'account_accessible': False,
@@ -417,13 +983,13 @@ class InstagramPublisher:
         
         try:
             # Test 1: Valider le token
-            results['token_valid'] = self.validate_access_token()
+            results['token_valid'] = self.validate_access_token(force_refresh)
             if not results['token_valid']:
                 results['errors'].append('Token d\'accès invalide')
                 return results
             
             # Test 2: Accéder aux infos du compte
-            account_info = self.get_account_info()
+            account_info = self.get_account_info(force_refresh)
             if 'error' not in account_info:
                 results['account_accessible'] = True
                 results['account_info'] = account_info
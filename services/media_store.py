@@ -0,0 +1,312 @@
+# services/media_store.py - Stockage des médias adressé par contenu et backends d'upload
+"""
+Les images à publier doivent être accessibles par une URL publique (l'API
+Graph les télécharge elle-même). Chaque fichier est rangé dans le store sous
+son empreinte SHA-256: un même visuel publié plusieurs fois n'est stocké et
+uploadé qu'une seule fois, et son URL ne change jamais (cache immuable).
+
+Backends d'upload:
+    local  -> fichiers servis par Flask sur /media/<clé> (MEDIA_PUBLIC_BASE_URL)
+    s3     -> bucket S3 ou compatible (MinIO...), via boto3
+    LocalS3Client: bucket simulé dans un dossier, pour les tests sans réseau
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:
+    import boto3
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+from config import Config
+
+
+# Cache HTTP des médias: le contenu d'une clé ne change jamais
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# <2 premiers caractères>/<sha256><extension>
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,5})?$')
+
+
+@dataclass
+class StoredMedia:
+    """Média présent dans le store"""
+    digest: str
+    key: str
+    path: str
+    size: int
+    content_type: str
+
+
+class MediaStore:
+    """Stockage local adressé par contenu (SHA-256), dédupliqué"""
+
+    def __init__(self, root: str = None, link: bool = True):
+        """
+        Args:
+            root: Dossier du store (Config.MEDIA_STORE_PATH par défaut)
+            link: Créer des liens physiques plutôt que des copies quand c'est
+                  possible (même système de fichiers); le fichier source ne
+                  doit alors plus être réécrit sur place
+        """
+        self.root = os.path.abspath(root or Config.MEDIA_STORE_PATH)
+        self.link = link
+        os.makedirs(self.root, exist_ok=True)
+
+        # (chemin, taille, mtime) -> empreinte: évite de rehacher un fichier inchangé
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(digest: str, filename: str) -> str:
+        ext = os.path.splitext(filename)[1].lower()
+        return f"{digest[:2]}/{digest}{ext}"
+
+    def digest_file(self, path: str) -> str:
+        """Empreinte SHA-256 d'un fichier (mémorisée tant qu'il n'est pas modifié)"""
+        stat = os.stat(path)
+        memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digest = self._digests.get(memo_key)
+        if digest:
+            return digest
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._digests[memo_key] = digest
+        return digest
+
+    def put(self, source_path: str) -> StoredMedia:
+        """Range un fichier dans le store (sans rien écrire s'il y est déjà)"""
+        digest = self.digest_file(source_path)
+        key = self.key_for(digest, source_path)
+        dest = os.path.join(self.root, key)
+
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            # Écriture dans un fichier temporaire puis renommage atomique:
+            # un lecteur concurrent ne voit jamais de fichier partiel
+            tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if self.link:
+                    try:
+                        os.link(source_path, tmp)
+                    except OSError:
+                        # Autre système de fichiers, liens non supportés...
+                        shutil.copyfile(source_path, tmp)
+                else:
+                    shutil.copyfile(source_path, tmp)
+                os.replace(tmp, dest)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        return StoredMedia(
+            digest=digest,
+            key=key,
+            path=dest,
+            size=os.path.getsize(dest),
+            content_type=mimetypes.guess_type(dest)[0] or 'application/octet-stream'
+        )
+
+    def path_for(self, key: str) -> Optional[str]:
+        """Chemin d'un média à partir de sa clé (None si clé invalide ou absente)"""
+        if not _KEY_PATTERN.match(key or ''):
+            return None
+        path = os.path.join(self.root, key)
+        return path if os.path.isfile(path) else None
+
+
+class UploadBackend:
+    """Interface des backends rendant un média du store accessible publiquement"""
+
+    name = 'base'
+
+    def exists(self, media: StoredMedia) -> bool:
+        """Vrai si le média est déjà disponible à son URL publique"""
+        raise NotImplementedError
+
+    def upload(self, media: StoredMedia):
+        raise NotImplementedError
+
+    def public_url(self, media: StoredMedia) -> str:
+        raise NotImplementedError
+
+
+class LocalBackend(UploadBackend):
+    """Médias servis directement depuis le store par l'application (route /media/<clé>)"""
+
+    name = 'local'
+
+    def __init__(self, public_base_url: str):
+        self.public_base_url = public_base_url.rstrip('/')
+
+    def exists(self, media: StoredMedia) -> bool:
+        return os.path.isfile(media.path)
+
+    def upload(self, media: StoredMedia):
+        # Le store est déjà la source servie: rien à transférer
+        pass
+
+    def public_url(self, media: StoredMedia) -> str:
+        return f"{self.public_base_url}/media/{media.key}"
+
+
+class S3Backend(UploadBackend):
+    """Bucket S3 ou compatible; `client` suit l'interface boto3 (head_object, upload_file)"""
+
+    name = 's3'
+
+    def __init__(self, bucket: str, public_base_url: str = None, client=None,
+                 prefix: str = 'media/', endpoint_url: str = None):
+        """
+        Args:
+            bucket: Nom du bucket
+            public_base_url: URL publique du bucket ou du CDN placé devant
+            client: Client S3 (boto3 créé à partir de la configuration sinon)
+            prefix: Préfixe des clés dans le bucket
+            endpoint_url: Endpoint d'un service compatible S3 (MinIO...)
+        """
+        if client is None:
+            if not BOTO3_AVAILABLE:
+                raise ImportError("boto3 requis pour le backend S3 (pip install boto3)")
+            client = boto3.client('s3', endpoint_url=endpoint_url or None)
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_base_url = (public_base_url or f"https://{bucket}.s3.amazonaws.com").rstrip('/')
+
+    def _object_key(self, media: StoredMedia) -> str:
+        return f"{self.prefix}{media.key}"
+
+    def exists(self, media: StoredMedia) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(media))
+            return True
+        except Exception:
+            # botocore ClientError 404 (ou erreur d'accès): considérer absent
+            return False
+
+    def upload(self, media: StoredMedia):
+        self.client.upload_file(
+            media.path, self.bucket, self._object_key(media),
+            ExtraArgs={'ContentType': media.content_type, 'CacheControl': IMMUTABLE_CACHE_CONTROL}
+        )
+
+    def public_url(self, media: StoredMedia) -> str:
+        return f"{self.public_base_url}/{self._object_key(media)}"
+
+
+class LocalS3Client:
+    """Bucket S3 simulé dans un dossier (sous-ensemble de l'API boto3), pour les tests"""
+
+    class NoSuchKey(KeyError):
+        pass
+
+    def __init__(self, root: str):
+        self.root = root
+        self.uploads = 0
+        self.head_requests = 0
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def head_object(self, Bucket: str, Key: str) -> Dict[str, int]:
+        self.head_requests += 1
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise self.NoSuchKey(Key)
+        return {'ContentLength': os.path.getsize(path)}
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, ExtraArgs: Dict = None):
+        self.uploads += 1
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+
+
+class MediaUploader:
+    """
+    Rend une image publiquement accessible: store adressé par contenu + backend
+
+    Appelable (chemin -> URL publique ou None), utilisable comme `uploader`
+    d'InstagramPublisher et d'AsyncInstagramPublisher. Un média déjà uploadé
+    n'est ni recopié ni renvoyé, même après redémarrage (vérification exists).
+    """
+
+    def __init__(self, store: MediaStore, backend: UploadBackend):
+        self.store = store
+        self.backend = backend
+        self._uploaded = set()
+        self._lock = threading.Lock()
+
+        self.uploads = 0
+        self.reused = 0
+
+    def __call__(self, image_path: str) -> Optional[str]:
+        try:
+            media = self.store.put(image_path)
+
+            with self._lock:
+                known = media.digest in self._uploaded
+
+            if known or self.backend.exists(media):
+                self.reused += 1
+            else:
+                self.backend.upload(media)
+                self.uploads += 1
+
+            with self._lock:
+                self._uploaded.add(media.digest)
+
+            return self.backend.public_url(media)
+
+        except Exception as e:
+            print(f"❌ Erreur upload image ({self.backend.name}): {e}")
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        return {'uploads': self.uploads, 'reused': self.reused, 'known': len(self._uploaded)}
+
+
+def create_media_uploader(store: MediaStore = None) -> Optional[MediaUploader]:
+    """
+    Construit l'uploader décrit par la configuration (MEDIA_UPLOAD_BACKEND)
+
+    Returns:
+        None si aucun backend utilisable n'est configuré
+    """
+    backend_name = Config.MEDIA_UPLOAD_BACKEND.lower()
+
+    if backend_name == 's3':
+        if not Config.S3_BUCKET:
+            print("⚠️  S3_BUCKET non configuré: upload des images impossible")
+            return None
+        backend = S3Backend(Config.S3_BUCKET, Config.S3_PUBLIC_BASE_URL,
+                            endpoint_url=Config.S3_ENDPOINT_URL)
+
+    elif backend_name == 'local':
+        if not Config.MEDIA_PUBLIC_BASE_URL:
+            print("⚠️  MEDIA_PUBLIC_BASE_URL non configuré: images non accessibles par Instagram")
+            return None
+        backend = LocalBackend(Config.MEDIA_PUBLIC_BASE_URL)
+
+    else:
+        print(f"⚠️  Backend d'upload inconnu: {Config.MEDIA_UPLOAD_BACKEND}")
+        return None
+
+    return MediaUploader(store or MediaStore(), backend)
@@ -0,0 +1,187 @@
+# services/media_sync.py - Synchronisation incrémentale des médias du compte Instagram
+"""
+Parcourt les pages de /{account}/media (curseurs Graph API) du plus récent
+au plus ancien et enregistre les médias dans la table instagram_media.
+Le parcours s'arrête au dernier média déjà synchronisé (high-water mark
+stocké dans user_settings): une synchronisation courante coûte une seule
+requête. Les médias sont ensuite rattachés aux posts par
+posts.instagram_post_id, et les tableaux de bord lisent la copie locale.
+
+Un parcours qui n'atteint pas le repère en max_pages pages (premier
+parcours d'un gros compte) fixe quand même le repère au média le plus
+récent lu, et garde le curseur où il s'est arrêté (backfill, dans
+user_settings). Les synchronisations suivantes lisent d'abord les
+nouveaux médias, puis reprennent le backfill depuis ce curseur avec les
+pages restantes, jusqu'à l'ancien repère ou la fin de l'historique.
+
+Usage:
+    python -m services.media_sync
+    python -m services.media_sync --full
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class MediaSync:
+    """Copie locale incrémentale des médias Instagram"""
+
+    HIGH_WATER_SETTING_KEY = 'media_sync_high_water'
+    BACKFILL_SETTING_KEY = 'media_sync_backfill'
+
+    def __init__(self, db_manager, instagram_publisher, page_size: int = 100, max_pages: int = 50):
+        """
+        Args:
+            db_manager: Gestionnaire de base de données
+            instagram_publisher: InstagramPublisher (get_media_page)
+            page_size: Médias par page (100 au maximum côté Graph API)
+            max_pages: Nombre maximum de pages parcourues par synchronisation
+        """
+        self.db_manager = db_manager
+        self.instagram_publisher = instagram_publisher
+        self.page_size = min(page_size, 100)
+        self.max_pages = max_pages
+        self.logger = logging.getLogger(__name__)
+
+    def get_high_water_mark(self) -> Optional[Dict[str, str]]:
+        """Média le plus récent déjà synchronisé ({'media_id', 'timestamp'})"""
+        raw = self.db_manager.get_user_setting(self.HIGH_WATER_SETTING_KEY)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _is_known(self, media: Dict[str, Any], mark: Optional[Dict[str, str]]) -> bool:
+        """Vrai si le média est au niveau du high-water mark ou plus ancien"""
+        if not mark:
+            return False
+        if media.get('id') == mark.get('media_id'):
+            return True
+        # Le média repère a pu être supprimé: se fier alors à la date
+        timestamp = media.get('timestamp')
+        return bool(timestamp and mark.get('timestamp') and timestamp < mark['timestamp'])
+
+    def get_backfill(self) -> List[Dict[str, Any]]:
+        """Parcours inachevés: [{'after': curseur de reprise, 'until': repère où s'arrêter}]"""
+        raw = self.db_manager.get_user_setting(self.BACKFILL_SETTING_KEY)
+        if not raw:
+            return []
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return []
+
+    def _walk(self, after: Optional[str], mark: Optional[Dict[str, str]], budget: int,
+              now: datetime, summary: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+        """
+        Lit au plus `budget` pages depuis le curseur `after` jusqu'au repère `mark`
+
+        Returns:
+            (premier média lu, curseur où reprendre, parcours terminé)
+        """
+        newest = None
+        pages = 0
+        while pages < budget:
+            page = self.instagram_publisher.get_media_page(after=after, limit=self.page_size)
+            if page is None:
+                summary['error'] = 'Page de médias indisponible'
+                break
+            pages += 1
+            summary['pages'] += 1
+
+            new_items = []
+            reached_mark = False
+            for media in page['data']:
+                if self._is_known(media, mark):
+                    reached_mark = True
+                    break
+                new_items.append(media)
+
+            if newest is None and page['data']:
+                newest = page['data'][0]
+
+            summary['stored'] += self.db_manager.upsert_instagram_media(new_items, now)
+
+            if reached_mark or not page['after']:
+                return newest, None, True
+            after = page['after']
+        return newest, after, False
+
+    def sync(self, full: bool = False, now: datetime = None) -> Dict[str, Any]:
+        """
+        Synchronise les nouveaux médias, reprend le backfill, puis rattache aux posts
+
+        Args:
+            full: Ignorer le high-water mark et reparcourir tout l'historique
+                  (rafraîchit aussi les compteurs des anciens médias)
+
+        Returns:
+            Résumé: pages lues, médias enregistrés, parcours complet ou non,
+            backfill restant, résultat du rapprochement, durée
+        """
+        now = now or datetime.now()
+        started = time.time()
+        mark = None if full else self.get_high_water_mark()
+        # Un parcours complet remplace les backfills en cours
+        backfill = [] if full else self.get_backfill()
+        summary = {'pages': 0, 'stored': 0, 'complete': False, 'full': full}
+
+        # 1. Nouveaux médias, du plus récent au repère
+        newest, after, head_complete = self._walk(None, mark, self.max_pages, now, summary)
+        if 'error' not in summary:
+            if not head_complete:
+                # Trou entre la dernière page lue et l'ancien repère: à reprendre
+                backfill.append({'after': after, 'until': mark})
+            if newest:
+                # Les médias plus anciens que ce repère sont lus ou couverts par le backfill
+                self.db_manager.set_user_setting(self.HIGH_WATER_SETTING_KEY, json.dumps({
+                    'media_id': newest.get('id'),
+                    'timestamp': newest.get('timestamp')
+                }))
+
+        # 2. Backfill avec les pages restantes (curseur persisté entre deux synchronisations)
+        while backfill and 'error' not in summary and summary['pages'] < self.max_pages:
+            gap = backfill[-1]
+            _, after, gap_complete = self._walk(gap['after'], gap['until'],
+                                                self.max_pages - summary['pages'], now, summary)
+            if gap_complete:
+                backfill.pop()
+            else:
+                gap['after'] = after
+
+        self.db_manager.set_user_setting(self.BACKFILL_SETTING_KEY, json.dumps(backfill))
+        summary['complete'] = head_complete and not backfill and 'error' not in summary
+        summary['backfill_pending'] = len(backfill)
+
+        summary['reconciliation'] = self.db_manager.reconcile_instagram_media()
+        summary['duration'] = round(time.time() - started, 3)
+
+        if summary['stored']:
+            self.logger.info(f"🖼️  Synchronisation des médias: {summary}")
+
+        return summary
+
+
+def main(argv=None):
+    from config import Config
+    from database import DatabaseManager
+    from services.instagram_api import InstagramPublisher
+
+    parser = argparse.ArgumentParser(description='Synchronisation des médias Instagram')
+    parser.add_argument('--db', default=Config.DATABASE_PATH)
+    parser.add_argument('--full', action='store_true', help="Reparcourir tout l'historique")
+    parser.add_argument('--max-pages', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sync = MediaSync(DatabaseManager(args.db), InstagramPublisher(), max_pages=args.max_pages)
+    print(sync.sync(full=args.full))
+
+
+if __name__ == '__main__':
+    main()
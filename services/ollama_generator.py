@@ -5,6 +5,8 @@ import re
 from typing import Optional, Tuple, List
 from datetime import datetime
 
+from services.health_monitor import BackendHealth, HealthMonitor, get_health_monitor
+
 # Import conditionnel des modèles
 try:
     from models import ContentGenerationResult, GenerationRequest, ContentTone, ImageGenerationResult
@@ -43,29 +45,41 @@ except ImportError:
 class OllamaContentGenerator:
     """Générateur de contenu utilisant Ollama avec Mistral en local"""
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "mistral:latest"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "mistral:latest",
+                 monitor: HealthMonitor = None):
         """
         Initialise le générateur avec Ollama
         
         Args:
             base_url: URL de base d'Ollama (par défaut localhost:11434)
             model: Nom du modèle à utiliser (ex: mistral:latest, llama2, codellama)
+            monitor: Surveillance de santé en arrière-plan (moniteur partagé par défaut)
         """
         self.base_url = base_url.rstrip('/')
         self.model = model
         self.api_url = f"{self.base_url}/api/generate"
         
-        # Vérifier que Ollama est accessible
-        try:
-            self._test_connection()
+        # Accessibilité vérifiée en arrière-plan (liste des modèles en cache)
+        self.monitor = monitor or get_health_monitor()
+        self.health_name = f"ollama@{self.base_url}"
+        self.monitor.register(self.health_name, self.base_url, self._test_connection,
+                              on_change=self._on_health_change)
+    
+    @property
+    def is_available(self) -> bool:
+        """État en cache d'Ollama"""
+        return self.monitor.is_healthy(self.health_name)
+    
+    def _on_health_change(self, health: BackendHealth, previous):
+        if health.healthy:
             print(f"✅ Connexion Ollama réussie - Modèle: {self.model}")
-        except Exception as e:
-            print(f"⚠️  Attention: Ollama non accessible - {e}")
+        else:
+            print(f"⚠️  Attention: Ollama non accessible - {health.last_error}")
     
-    def _test_connection(self):
-        """Teste la connexion à Ollama"""
+    def _test_connection(self, timeout: float = 5) -> List[str]:
+        """Teste la connexion à Ollama (sonde du moniteur); retourne les modèles installés"""
         test_url = f"{self.base_url}/api/tags"
-        response = requests.get(test_url, timeout=5)
+        response = requests.get(test_url, timeout=timeout)
         response.raise_for_status()
         
         # Vérifier que le modèle existe
@@ -77,6 +91,7 @@ class OllamaContentGenerator:
             if model_names:
                 self.model = model_names[0]
                 print(f"🔄 Utilisation du modèle: {self.model}")
+        return model_names
     
     def generate_description_and_hashtags(self, topic: str, tone: str = "engageant", 
                                         additional_context: str = None) -> ContentGenerationResult:
@@ -136,6 +151,8 @@ class OllamaContentGenerator:
                 return ContentGenerationResult.error_result("Impossible de parser le contenu généré")
                 
         except requests.RequestException as e:
+            if isinstance(e, requests.ConnectionError):
+                self.monitor.report_failure(self.health_name, e)
             error_msg = f"Erreur de connexion Ollama: {str(e)}"
             print(f"❌ {error_msg}")
             return ContentGenerationResult.error_result(error_msg)
@@ -289,6 +306,10 @@ Maintenant, génère le contenu:"""
     
     def get_available_models(self) -> List[str]:
         """Retourne la liste des modèles disponibles dans Ollama"""
+        health = self.monitor.status(self.health_name)
+        if health and health.healthy and health.detail is not None:
+            # Relevée par le dernier sondage
+            return list(health.detail)
         try:
             response = requests.get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
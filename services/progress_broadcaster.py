@@ -0,0 +1,285 @@
+# services/progress_broadcaster.py - Progression des générations diffusée aux clients (SSE)
+"""
+Chaque onglet qui suit une génération interrogeait /api/sd-progress, et
+chaque interrogation faisait un appel bloquant à /sdapi/v1/progress. Ici,
+un seul thread par instance AUTOMATIC1111 relève la progression à
+intervalle fixe et publie le relevé à tous les abonnés: 50 onglets
+ouverts coûtent un appel par intervalle à l'instance, pas 50.
+
+Le relevé publié est numéroté (version): un abonné attend simplement une
+version plus récente que la dernière envoyée. Un client lent ne reçoit
+que le dernier relevé (la progression est un état, pas une suite
+d'événements à rejouer). L'aperçu en cours (current_image) n'est demandé
+à l'instance que si un abonné le veut, et n'est renvoyé au client que
+lorsqu'il change.
+
+Le thread d'une instance s'arrête après SD_PROGRESS_IDLE_TIMEOUT sans
+abonné ni lecture, et redémarre à la demande.
+
+Exemple:
+    broadcaster = ProgressBroadcaster(sd_generator, generation_queue)
+    for event, data in broadcaster.stream(job_id):
+        ...   # ('queued', {...}), ('progress', {...}), ..., ('succeeded', {...})
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from config import Config
+from services.generation_queue import QUEUED
+
+
+class ProgressPoller:
+    """Relevé périodique de /sdapi/v1/progress d'une instance, partagé par tous ses abonnés"""
+
+    PROGRESS_PATH = '/sdapi/v1/progress'
+
+    def __init__(self, url: str, interval: float, idle_timeout: float, timeout: float = 5,
+                 session: requests.Session = None, clock: Callable[[], float] = time.time):
+        self.url = url.rstrip('/')
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._subscribers = 0
+        self._preview_subscribers = 0
+        self._last_demand = 0.0
+
+        # Dernier relevé publié et son numéro
+        self.version = 0
+        self.data: Dict[str, Any] = {}
+        self.preview: Optional[str] = None
+        self.preview_version = 0
+        self.polls = 0
+        self.errors = 0
+
+    # --- Abonnements ---
+
+    def acquire(self, preview: bool = False):
+        """Abonne un client (démarre le relevé si besoin)"""
+        with self._condition:
+            self._subscribers += 1
+            if preview:
+                self._preview_subscribers += 1
+            self._ensure_running()
+
+    def release(self, preview: bool = False):
+        with self._condition:
+            self._subscribers -= 1
+            if preview:
+                self._preview_subscribers -= 1
+            self._last_demand = self.clock()
+
+    def latest(self, wait: float = None) -> Dict[str, Any]:
+        """Dernier relevé sans abonnement (garde le relevé actif SD_PROGRESS_IDLE_TIMEOUT)"""
+        with self._condition:
+            self._last_demand = self.clock()
+            if self._ensure_running():
+                # Relevé arrêté ou jamais lancé: les données en cache sont périmées
+                version = self.version
+                self._condition.wait_for(lambda: self.version > version,
+                                         self.timeout if wait is None else wait)
+            return dict(self.data)
+
+    def wait_update(self, after_version: int, timeout: float) -> Optional[Tuple[int, Dict[str, Any], int, Optional[str]]]:
+        """
+        Attend un relevé plus récent que `after_version`
+
+        Returns:
+            (version, relevé, version de l'aperçu, aperçu), ou None si le délai expire
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.version > after_version, timeout):
+                return None
+            return self.version, dict(self.data), self.preview_version, self.preview
+
+    def _ensure_running(self) -> bool:
+        """Démarre le thread de relevé (verrou tenu); True s'il vient d'être démarré"""
+        if self._thread is not None:
+            return False
+        self._thread = threading.Thread(target=self._loop, name=f'sd-progress-{self.url}', daemon=True)
+        self._thread.start()
+        return True
+
+    # --- Relevé ---
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if not self._subscribers and self.clock() - self._last_demand > self.idle_timeout:
+                    self._thread = None
+                    return
+                want_preview = self._preview_subscribers > 0
+
+            data, preview = self._poll(want_preview)
+
+            with self._condition:
+                self.polls += 1
+                if preview and preview != self.preview:
+                    self.preview = preview
+                    self.preview_version += 1
+                self.data = data
+                self.version += 1
+                self._condition.notify_all()
+
+            time.sleep(self.interval)
+
+    def _poll(self, preview: bool) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Un appel à /sdapi/v1/progress -> (relevé normalisé, aperçu base64)"""
+        try:
+            response = self.session.get(self.url + self.PROGRESS_PATH, timeout=self.timeout,
+                                        params={'skip_current_image': 'false' if preview else 'true'})
+            response.raise_for_status()
+            raw = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.errors += 1
+            return {'backend': self.url, 'progress': 0, 'eta': 0, 'active': False, 'error': str(e),
+                    'at': self.clock()}, None
+
+        state = raw.get('state') or {}
+        progress = float(raw.get('progress') or 0)
+        return {
+            'backend': self.url,
+            'progress': round(progress, 4),
+            'eta': round(float(raw.get('eta_relative') or 0), 1),
+            'step': state.get('sampling_step'),
+            'steps': state.get('sampling_steps'),
+            'job_no': state.get('job_no'),
+            'job_count': state.get('job_count'),
+            'active': progress > 0 or (state.get('job_count') or 0) > 0,
+            'textinfo': raw.get('textinfo'),
+            'at': self.clock()
+        }, raw.get('current_image')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'url': self.url,
+                'running': self._thread is not None,
+                'subscribers': self._subscribers,
+                'preview_subscribers': self._preview_subscribers,
+                'polls': self.polls,
+                'errors': self.errors
+            }
+
+
+class ProgressBroadcaster:
+    """Progression par travail de génération, servie depuis un relevé partagé par instance"""
+
+    # Commentaire SSE envoyé sans nouvelle donnée (proxys, détection des clients partis)
+    KEEPALIVE_SECONDS = 15
+
+    def __init__(self, generator, queue=None, interval: float = None, idle_timeout: float = None,
+                 timeout: float = 5, session: requests.Session = None):
+        """
+        Args:
+            generator: Générateur Stable Diffusion (backend_urls, backend_for_thread)
+            queue: File de génération (travaux suivis par stream())
+            interval: Intervalle des relevés (Config.SD_PROGRESS_INTERVAL)
+            idle_timeout: Arrêt du relevé d'une instance sans abonné (Config.SD_PROGRESS_IDLE_TIMEOUT)
+            timeout: Délai de réponse de /sdapi/v1/progress
+        """
+        self.generator = generator
+        self.queue = queue
+        self.interval = interval or Config.SD_PROGRESS_INTERVAL
+        self.idle_timeout = Config.SD_PROGRESS_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._pollers: Dict[str, ProgressPoller] = {}
+        self._lock = threading.Lock()
+
+    def poller(self, url: str) -> ProgressPoller:
+        url = url.rstrip('/')
+        with self._lock:
+            if url not in self._pollers:
+                self._pollers[url] = ProgressPoller(url, self.interval, self.idle_timeout,
+                                                    self.timeout, self.session)
+            return self._pollers[url]
+
+    def latest(self) -> Dict[str, Any]:
+        """Relevé de l'instance la plus avancée (remplace l'appel direct de /api/sd-progress)"""
+        snapshots = [self.poller(url).latest() for url in self.generator.backend_urls()]
+        snapshots = [s for s in snapshots if s and not s.get('error')] or snapshots
+        return max(snapshots, key=lambda s: s.get('progress', 0), default={'progress': 0, 'eta': 0})
+
+    def job_progress(self, job) -> Optional[Dict[str, Any]]:
+        """Dernier relevé de l'instance qui exécute le travail (None: pas encore attribué)"""
+        url = self.generator.backend_for_thread(job.worker_thread) if job.worker_thread else None
+        return self.poller(url).latest() if url else None
+
+    def stream(self, job_id: str, preview: bool = True) -> Iterator[Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+        """
+        Événements d'un travail jusqu'à sa fin: (nom, données)
+
+        'queued' à chaque changement de rang, 'progress' à chaque relevé de
+        l'instance qui l'exécute, puis le statut final ('succeeded',
+        'failed', 'cancelled'). (None, None): rien de neuf depuis
+        KEEPALIVE_SECONDS. 'error' si le travail est inconnu.
+        """
+        job = self.queue.get(job_id) if self.queue else None
+        if job is None:
+            yield 'error', {'job_id': job_id, 'error': 'Travail non trouvé'}
+            return
+
+        poller: Optional[ProgressPoller] = None
+        version = preview_version = 0
+        position = None
+        last_event = time.time()
+        try:
+            while not job.finished:
+                if job.status == QUEUED:
+                    current = self.queue.position(job_id)
+                    if current != position:
+                        position = current
+                        last_event = time.time()
+                        yield 'queued', {'job_id': job_id, 'status': QUEUED, 'position': position}
+                    elif time.time() - last_event >= self.KEEPALIVE_SECONDS:
+                        last_event = time.time()
+                        yield None, None
+                    job.wait(self.interval)
+                    continue
+
+                url = self.generator.backend_for_thread(job.worker_thread)
+                if url is None:
+                    # Instance pas encore choisie (changement de modèle, bascule)
+                    job.wait(self.interval)
+                    continue
+                if poller is None or poller.url != url.rstrip('/'):
+                    if poller:
+                        poller.release(preview)
+                    poller = self.poller(url)
+                    poller.acquire(preview)
+                    version = 0
+
+                update = poller.wait_update(version, self.KEEPALIVE_SECONDS)
+                if job.finished:
+                    break
+                if update is None:
+                    yield None, None
+                    continue
+
+                version, data, image_version, image = update
+                event = dict(data, job_id=job_id, status=job.status)
+                if preview and image and image_version != preview_version:
+                    preview_version = image_version
+                    event['current_image'] = image
+                yield 'progress', event
+        finally:
+            if poller:
+                poller.release(preview)
+
+        yield job.status, {'job_id': job_id, 'status': job.status, 'error': job.error}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pollers = list(self._pollers.values())
+        return {
+            'interval_s': self.interval,
+            'idle_timeout_s': self.idle_timeout,
+            'pollers': [poller.stats() for poller in pollers]
+        }
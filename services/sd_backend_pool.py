@@ -0,0 +1,386 @@
+# services/sd_backend_pool.py - Répartition des générations entre plusieurs instances AUTOMATIC1111
+"""
+Chaque instance AUTOMATIC1111 (un GPU, une machine) traite une requête
+txt2img à la fois; les suivantes attendent derrière elle. Le pool garde
+l'état de chaque instance:
+    - santé et charge externe via /sdapi/v1/progress (progress, eta_relative)
+    - requêtes envoyées par ce processus et pas encore terminées (profondeur de file)
+    - durée moyenne d'une requête (pour estimer l'attente derrière la file)
+
+et envoie chaque requête à l'instance dont l'attente estimée est la plus
+courte. Une instance qui ne répond plus est écartée et la requête repart
+sur la suivante; le contrôle de santé périodique la réintègre quand elle
+revient.
+
+Exemple:
+    pool = SDBackendPool(['http://gpu1:7860', 'http://gpu2:7860']).start()
+    response = pool.request('POST', '/sdapi/v1/txt2img', json=payload, timeout=300)
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+
+class NoBackendAvailable(requests.ConnectionError):
+    """Aucune instance Stable Diffusion ne répond"""
+    pass
+
+
+def same_checkpoint(a: Optional[str], b: Optional[str]) -> bool:
+    """Compare deux checkpoints avec ou sans empreinte ("model.safetensors [6ce0161689]")"""
+    if not a or not b:
+        return False
+    return a == b or a.split(' [')[0].strip() == b.split(' [')[0].strip()
+
+
+@dataclass
+class SDBackend:
+    """État d'une instance AUTOMATIC1111"""
+    url: str
+    healthy: bool = True
+    # Requêtes de ce processus en cours sur l'instance
+    in_flight: int = 0
+    # Dernier relevé /sdapi/v1/progress
+    busy: bool = False
+    eta_relative: float = 0.0
+    # Durée moyenne d'une requête (moyenne mobile exponentielle)
+    avg_duration: float = 30.0
+    last_check: float = 0.0
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    served: int = 0
+    failed: int = 0
+    # Checkpoint chargé (None: inconnu) et changements de modèle imposés par les requêtes
+    checkpoint: Optional[str] = None
+    swaps: int = 0
+    swap_seconds: float = 0.0
+
+    def estimated_wait(self) -> float:
+        """Secondes avant qu'une nouvelle requête ne commence sur cette instance"""
+        # Un travail en cours (le nôtre ou celui d'un autre client) se termine dans eta_relative
+        depth = max(self.in_flight, 1 if self.busy else 0)
+        current = self.eta_relative if self.busy else (self.avg_duration if depth else 0.0)
+        return current + max(0, depth - 1) * self.avg_duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'busy': self.busy,
+            'eta_relative': round(self.eta_relative, 1),
+            'avg_duration': round(self.avg_duration, 1),
+            'estimated_wait': round(self.estimated_wait(), 1),
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+            'served': self.served,
+            'failed': self.failed,
+            'checkpoint': self.checkpoint,
+            'swaps': self.swaps,
+            'swap_seconds': round(self.swap_seconds, 1)
+        }
+
+
+class SDBackendPool:
+    """Pool d'instances Stable Diffusion avec répartition de charge et bascule"""
+
+    PROGRESS_PATH = '/sdapi/v1/progress?skip_current_image=true'
+    OPTIONS_PATH = '/sdapi/v1/options'
+    # Estimation du coût d'un changement de modèle tant qu'aucun n'a été mesuré
+    DEFAULT_SWAP_SECONDS = 30.0
+
+    def __init__(self, urls: List[str], health_interval: float = 15, health_timeout: float = 5,
+                 session: requests.Session = None, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            urls: URLs des instances AUTOMATIC1111 (lancées avec --api)
+            health_interval: Intervalle du contrôle de santé en arrière-plan (s)
+            health_timeout: Délai de réponse de /sdapi/v1/progress (s)
+            session: Session HTTP (une par défaut, connexions réutilisées)
+            clock: Horloge (injectable pour les tests)
+        """
+        if not urls:
+            raise ValueError("Au moins une URL Stable Diffusion est requise")
+
+        self.backends = [SDBackend(url=url.rstrip('/')) for url in urls]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.session = session or requests.Session()
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Départage des instances à charge égale (tourniquet)
+        self._turn = 0
+        # Thread -> instance qui traite sa requête en cours (suivi de progression par travail)
+        self._thread_backends: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    # --- Santé ---
+
+    def check_health(self) -> int:
+        """Relève /sdapi/v1/progress sur chaque instance; retourne le nombre d'instances saines"""
+        threads = [threading.Thread(target=self._check_backend, args=(backend,), daemon=True)
+                   for backend in self.backends]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.health_timeout + 1)
+        return sum(1 for backend in self.backends if backend.healthy)
+
+    def _check_backend(self, backend: SDBackend):
+        try:
+            response = self.session.get(backend.url + self.PROGRESS_PATH, timeout=self.health_timeout)
+            response.raise_for_status()
+            progress = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self._mark_down(backend, str(e))
+            return
+
+        state = progress.get('state') or {}
+        checkpoint = backend.checkpoint or self._fetch_checkpoint(backend)
+        with self._lock:
+            if not backend.healthy:
+                self.logger.info(f"✅ Instance Stable Diffusion de retour: {backend.url}")
+            backend.healthy = True
+            backend.consecutive_failures = 0
+            backend.last_error = None
+            backend.last_check = self.clock()
+            backend.busy = bool(progress.get('progress') or state.get('job_count', 0) > 0)
+            backend.eta_relative = float(progress.get('eta_relative') or 0)
+            if backend.checkpoint is None:
+                backend.checkpoint = checkpoint
+
+    def _fetch_checkpoint(self, backend: SDBackend) -> Optional[str]:
+        """Checkpoint chargé par l'instance (ensuite suivi localement à chaque changement)"""
+        try:
+            response = self.session.get(backend.url + self.OPTIONS_PATH, timeout=self.health_timeout)
+            if response.status_code == 200:
+                return response.json().get('sd_model_checkpoint')
+        except (requests.RequestException, ValueError):
+            pass
+        return None
+
+    def _mark_down(self, backend: SDBackend, error: str):
+        with self._lock:
+            if backend.healthy:
+                self.logger.warning(f"⚠️ Instance Stable Diffusion indisponible: {backend.url} ({error})")
+            backend.healthy = False
+            backend.busy = False
+            # Une instance redémarrée peut avoir chargé un autre modèle
+            backend.checkpoint = None
+            backend.consecutive_failures += 1
+            backend.last_error = error
+            backend.last_check = self.clock()
+
+    def start(self) -> 'SDBackendPool':
+        """Contrôle de santé initial puis périodique en arrière-plan"""
+        self.check_health()
+        if self._thread is None and self.health_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._health_loop, name='sd-backend-health', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.health_timeout + 1)
+            self._thread = None
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                self.logger.error(f"Erreur contrôle de santé Stable Diffusion: {e}")
+
+    @property
+    def is_available(self) -> bool:
+        return any(backend.healthy for backend in self.backends)
+
+    def loaded_checkpoints(self) -> List[str]:
+        """Checkpoints chargés sur les instances saines"""
+        with self._lock:
+            return [b.checkpoint for b in self.backends if b.healthy and b.checkpoint]
+
+    def swap_seconds_estimate(self) -> float:
+        """Durée moyenne mesurée d'un changement de modèle"""
+        swaps = sum(b.swaps for b in self.backends)
+        return sum(b.swap_seconds for b in self.backends) / swaps if swaps else self.DEFAULT_SWAP_SECONDS
+
+    # --- Répartition ---
+
+    def _select(self, exclude: List[SDBackend], checkpoint: str = None) -> Optional[SDBackend]:
+        """
+        Instance saine à l'attente estimée la plus courte; la réserve (in_flight) (verrou tenu)
+
+        Avec `checkpoint`, une instance qui devrait d'abord changer de modèle
+        voit son attente augmentée de la durée moyenne d'un changement.
+        """
+        candidates = [b for b in self.backends if b.healthy and b not in exclude]
+        if not candidates:
+            return None
+
+        swap_cost = self.swap_seconds_estimate() if checkpoint else 0.0
+
+        def wait(backend: SDBackend) -> float:
+            if checkpoint and not same_checkpoint(backend.checkpoint, checkpoint):
+                return backend.estimated_wait() + swap_cost
+            return backend.estimated_wait()
+
+        self._turn += 1
+        count = len(self.backends)
+        backend = min(candidates, key=lambda b: (wait(b), b.in_flight,
+                                                 (self.backends.index(b) - self._turn) % count))
+        backend.in_flight += 1
+        return backend
+
+    def _switch_checkpoint(self, backend: SDBackend, checkpoint: str, timeout: float) -> requests.Response:
+        """Charge `checkpoint` sur l'instance (mesure le temps perdu)"""
+        started = self.clock()
+        response = self.session.post(backend.url + self.OPTIONS_PATH,
+                                     json={'sd_model_checkpoint': checkpoint}, timeout=timeout)
+        elapsed = self.clock() - started
+        with self._lock:
+            backend.swaps += 1
+            backend.swap_seconds += elapsed
+            if response.status_code == 200:
+                backend.checkpoint = checkpoint
+        self.logger.info(f"🔄 {backend.url}: modèle {checkpoint} chargé en {elapsed:.1f}s")
+        return response
+
+    def backend_for_thread(self, thread_id: int) -> Optional[str]:
+        """URL de l'instance qui traite la requête en cours du thread (None: aucune)"""
+        return self._thread_backends.get(thread_id)
+
+    def request(self, method: str, path: str, timeout: float = 300, checkpoint: str = None,
+                **kwargs) -> requests.Response:
+        """
+        Envoie la requête à l'instance la moins chargée, avec bascule
+
+        Une instance injoignable (connexion refusée ou non établie dans
+        `timeout`) est marquée hors service et la requête repart sur
+        l'instance suivante. Une réponse qui tarde (ReadTimeout) est un échec
+        du travail, pas de l'instance: elle calcule sans doute encore, et
+        relancer ailleurs doublerait le travail GPU. Les réponses HTTP (même
+        500) sont retournées telles quelles: une erreur de génération se
+        reproduirait sur une autre instance.
+
+        Args:
+            checkpoint: Modèle requis; de préférence une instance qui l'a
+                        déjà chargé, sinon il est chargé avant la requête
+
+        Raises:
+            NoBackendAvailable: Plus aucune instance saine à essayer
+        """
+        tried: List[SDBackend] = []
+        last_error = None
+
+        while True:
+            with self._lock:
+                backend = self._select(tried, checkpoint)
+            if backend is None and not tried and self.check_health():
+                # Toutes marquées hors service: un relevé frais peut en réintégrer
+                with self._lock:
+                    backend = self._select(tried, checkpoint)
+            if backend is None:
+                raise NoBackendAvailable(
+                    f"Aucune instance Stable Diffusion disponible ({len(self.backends)} configurée(s))"
+                    + (f": {last_error}" if last_error else "")
+                )
+
+            tried.append(backend)
+            thread_id = threading.get_ident()
+            self._thread_backends[thread_id] = backend.url
+            try:
+                if checkpoint and not same_checkpoint(backend.checkpoint, checkpoint):
+                    swap = self._switch_checkpoint(backend, checkpoint, timeout)
+                    if swap.status_code != 200:
+                        return swap
+                started = self.clock()
+                response = self.session.request(method, backend.url + path, timeout=timeout, **kwargs)
+            except requests.ReadTimeout:
+                self.logger.warning(f"⏱️  {method} {path}: pas de réponse de {backend.url} en {timeout}s")
+                raise
+            except requests.ConnectionError as e:
+                # Seules les erreurs de connexion font basculer (ConnectTimeout compris)
+                last_error = str(e)
+                with self._lock:
+                    backend.failed += 1
+                self._mark_down(backend, last_error)
+                self.failovers += 1
+                self.logger.warning(f"🔁 Bascule de {method} {path}: {backend.url} ne répond plus")
+                continue
+            finally:
+                # Toute issue (réponse, bascule, autre exception) libère l'instance
+                with self._lock:
+                    backend.in_flight -= 1
+                self._thread_backends.pop(thread_id, None)
+
+            with self._lock:
+                backend.served += 1
+                if path.startswith('/sdapi/v1/txt2img'):
+                    backend.avg_duration = 0.8 * backend.avg_duration + 0.2 * (self.clock() - started)
+            return response
+
+    def broadcast(self, method: str, path: str, timeout: float = 30,
+                  **kwargs) -> Dict[str, Optional[requests.Response]]:
+        """Envoie la requête à toutes les instances saines (changement de modèle, interruption)"""
+        responses: Dict[str, Optional[requests.Response]] = {}
+        for backend in self.backends:
+            if not backend.healthy:
+                continue
+            try:
+                responses[backend.url] = self.session.request(method, backend.url + path,
+                                                              timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._mark_down(backend, str(e))
+                responses[backend.url] = None
+                continue
+
+            # Changement de modèle explicite: suivre le checkpoint chargé
+            checkpoint = (kwargs.get('json') or {}).get('sd_model_checkpoint')
+            if path == self.OPTIONS_PATH and checkpoint:
+                with self._lock:
+                    backend.checkpoint = checkpoint if responses[backend.url].status_code == 200 else None
+        return responses
+
+    def progress(self) -> Dict[str, Any]:
+        """Progression de la génération la plus avancée parmi les instances occupées par ce processus"""
+        busy = [b for b in self.backends if b.healthy and b.in_flight] or \
+               [b for b in self.backends if b.healthy]
+        best: Dict[str, Any] = {"progress": 0, "eta_relative": 0, "current_image": None}
+        for backend in busy:
+            try:
+                response = self.session.get(backend.url + self.PROGRESS_PATH, timeout=self.health_timeout)
+                data = response.json() if response.status_code == 200 else {}
+            except (requests.RequestException, ValueError):
+                continue
+            if data.get('progress', 0) >= best.get('progress', 0):
+                best = dict(data, backend=backend.url)
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backends': [backend.to_dict() for backend in self.backends],
+                'healthy': sum(1 for backend in self.backends if backend.healthy),
+                'in_flight': sum(backend.in_flight for backend in self.backends),
+                'failovers': self.failovers,
+                'checkpoint_swaps': sum(backend.swaps for backend in self.backends),
+                'swap_seconds': round(sum(backend.swap_seconds for backend in self.backends), 1)
+            }
+
+    def close(self):
+        self.stop()
+        self.session.close()
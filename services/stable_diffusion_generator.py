@@ -5,51 +5,177 @@ import json
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from PIL import Image
-import io
-import base64
+import math
+import random
+import threading
 import time
+import uuid
 
+from config import Config
 from models import ImageGenerationResult
+from services.generation_cache import GenerationCache
+from services.image_pipeline import ImagePipeline, get_image_pipeline
+from services.generation_profiles import GenerationProfile, get_profile, profile_for_size
+from services.health_monitor import BackendHealth, HealthMonitor, ProbeError, get_health_monitor, http_probe
+from services.sd_backend_pool import NoBackendAvailable, SDBackendPool, same_checkpoint
+from utils.cache import TTLCache
 
 
 class StableDiffusionGenerator:
     """Générateur d'images avec Stable Diffusion (gratuit et local)"""
     
-    def __init__(self, api_url: str = "http://localhost:7860"):
+    # Modificateurs de prompt pour les variations à prompts distincts
+    VARIATION_MODIFIERS = [
+        "different angle",
+        "different lighting",
+        "different composition",
+        "different style",
+        "different mood",
+        "different colors"
+    ]
+    
+    # Paramètres payload txt2img déterminant l'image (clé du cache de génération)
+    CACHE_KEY_FIELDS = (
+        "prompt", "negative_prompt", "width", "height", "steps", "cfg_scale",
+        "sampler_name", "seed", "restore_faces", "tiling", "enable_hr",
+        "hr_scale", "hr_upscaler", "denoising_strength", "hr_resize_x", "hr_resize_y"
+    )
+    
+    def __init__(self, api_url: str = "http://localhost:7860",
+                 cache: GenerationCache = None, pool: SDBackendPool = None,
+                 pipeline: ImagePipeline = None, monitor: HealthMonitor = None):
         """
         Initialise le générateur Stable Diffusion
         
         Args:
             api_url: URL de l'API Stable Diffusion (AUTOMATIC1111 WebUI)
+            cache: Cache des images générées (créé selon GENERATION_CACHE_MAX_MB sinon)
+            pool: Instances multiples; les requêtes vont à la moins chargée
+                  (api_url est alors ignorée)
+            pipeline: Post-traitement des images (pipeline partagé par défaut)
+            monitor: Surveillance de santé en arrière-plan (moniteur partagé par défaut)
         """
+        self.pool = pool
+        if pool:
+            api_url = pool.backends[0].url
         self.api_url = api_url.rstrip('/')
         self.txt2img_url = f"{self.api_url}/sdapi/v1/txt2img"
         self.models_url = f"{self.api_url}/sdapi/v1/sd-models"
         self.options_url = f"{self.api_url}/sdapi/v1/options"
         self.progress_url = f"{self.api_url}/sdapi/v1/progress"
         
+        if cache is None and Config.GENERATION_CACHE_MAX_MB > 0:
+            cache = GenerationCache()
+        self.cache = cache
+        self.pipeline = pipeline or get_image_pipeline()
+        # Checkpoint chargé (partie de la clé du cache), relu au plus toutes les minutes
+        self._model_memo = TTLCache(max_entries=1, default_ttl=60)
+        # Changements de modèle imposés par les requêtes (instance unique; voir pool sinon)
+        self._swap_lock = threading.Lock()
+        self.checkpoint_swaps = 0
+        self.checkpoint_swap_seconds = 0.0
+        
         print(f"🎨 Générateur Stable Diffusion initialisé")
-        print(f"   🌐 URL: {self.api_url}")
+        if pool:
+            print(f"   🌐 {len(pool)} instances: {', '.join(b.url for b in pool.backends)}")
+        else:
+            print(f"   🌐 URL: {self.api_url}")
         
-        # Test de connexion
-        self.is_available = self._test_connection()
-        if self.is_available:
+        # Connexion testée en arrière-plan: is_available suit l'état en cache du moniteur
+        self.monitor = monitor or get_health_monitor()
+        self.health_name = f"stable_diffusion@{'pool' if pool else self.api_url}"
+        self.monitor.register(self.health_name, self.api_url, self._probe,
+                              interval=Config.SD_HEALTH_CHECK_INTERVAL, on_change=self._on_health_change)
+    
+    @property
+    def is_available(self) -> bool:
+        """État en cache (dernier sondage ou dernière requête), sans appel réseau"""
+        if not self.monitor.is_healthy(self.health_name):
+            return False
+        return self.pool.is_available if self.pool else True
+    
+    def _test_connection(self) -> bool:
+        """Teste la connexion à Stable Diffusion maintenant (met à jour l'état en cache)"""
+        return self.monitor.check(self.health_name)
+    
+    def _probe(self, timeout: float) -> Dict[str, Any]:
+        """Sonde du moniteur: options de l'API, ou contrôle de santé de chaque instance du pool"""
+        if self.pool:
+            healthy = self.pool.check_health()
+            if not healthy:
+                raise NoBackendAvailable("Aucune instance Stable Diffusion ne répond")
+            return {"instances": healthy, "checkpoints": self.pool.loaded_checkpoints()}
+        response = requests.get(self.options_url, timeout=timeout)
+        if response.status_code != 200:
+            raise ProbeError(f"HTTP {response.status_code}")
+        checkpoint = response.json().get('sd_model_checkpoint')
+        if checkpoint:
+            # Le sondage rafraîchit au passage le checkpoint de la clé du cache
+            self._model_memo.set('checkpoint', checkpoint)
+        return {"checkpoint": checkpoint}
+    
+    def _on_health_change(self, health: BackendHealth, previous: Optional[bool]):
+        self._model_memo.invalidate('checkpoint')
+        if health.healthy:
             print("✅ Stable Diffusion accessible")
             self._print_status()
         else:
-            print("⚠️  Stable Diffusion non accessible")
-            print("💡 Pour démarrer Stable Diffusion :")
-            print("   1. Téléchargez: https://github.com/AUTOMATIC1111/stable-diffusion-webui")
-            print("   2. Démarrez avec: ./webui.sh --api")
-            print("   3. Ou: python launch.py --api")
+            print(f"⚠️  Stable Diffusion non accessible ({health.last_error})")
+            if previous is None:
+                print("💡 Pour démarrer Stable Diffusion :")
+                print("   1. Téléchargez: https://github.com/AUTOMATIC1111/stable-diffusion-webui")
+                print("   2. Démarrez avec: ./webui.sh --api")
+                print("   3. Ou: python launch.py --api")
     
-    def _test_connection(self) -> bool:
-        """Teste la connexion à Stable Diffusion"""
+    def _sd_request(self, method: str, path: str, timeout: float, checkpoint: str = None,
+                    **kwargs) -> requests.Response:
+        """
+        Requête à l'API: instance unique, ou la moins chargée du pool (avec bascule)
+        
+        Avec `checkpoint`, le modèle est chargé avant la requête s'il ne l'est
+        pas déjà (le pool choisit de préférence une instance qui l'a chargé).
+        """
         try:
-            response = requests.get(self.options_url, timeout=60)
-            return response.status_code == 200
-        except Exception as e:
-            return False
+            if self.pool:
+                return self.pool.request(method, path, timeout=timeout, checkpoint=checkpoint, **kwargs)
+            if checkpoint:
+                swap = self._switch_checkpoint(checkpoint)
+                if swap is not None and swap.status_code != 200:
+                    return swap
+            return requests.request(method, f"{self.api_url}{path}", timeout=timeout, **kwargs)
+        except requests.ConnectionError as e:
+            # Backend tombé: plus de routage vers lui jusqu'au prochain sondage réussi
+            self.monitor.report_failure(self.health_name, e)
+            raise
+    
+    def _switch_checkpoint(self, checkpoint: str) -> Optional[requests.Response]:
+        """Charge `checkpoint` si nécessaire (temps mesuré); None si déjà chargé"""
+        with self._swap_lock:
+            if same_checkpoint(self._current_checkpoint(), checkpoint):
+                return None
+            
+            start_time = time.time()
+            response = requests.post(self.options_url, json={"sd_model_checkpoint": checkpoint}, timeout=600)
+            elapsed = time.time() - start_time
+            self.checkpoint_swaps += 1
+            self.checkpoint_swap_seconds += elapsed
+            self._model_memo.invalidate('checkpoint')
+            print(f"🔄 Modèle {checkpoint} chargé en {elapsed:.1f}s")
+            return response
+    
+    def loaded_checkpoints(self) -> List[str]:
+        """Checkpoints actuellement chargés (un par instance)"""
+        if self.pool:
+            return self.pool.loaded_checkpoints()
+        model = self._current_checkpoint()
+        return [model] if model not in ("Erreur", "Non disponible") else []
+    
+    def swap_stats(self) -> Dict[str, Any]:
+        """Changements de modèle imposés par les requêtes et temps perdu"""
+        if self.pool:
+            stats = self.pool.stats()
+            return {"swaps": stats["checkpoint_swaps"], "seconds": stats["swap_seconds"]}
+        return {"swaps": self.checkpoint_swaps, "seconds": round(self.checkpoint_swap_seconds, 1)}
     
     def _print_status(self):
         """Affiche le statut de Stable Diffusion"""
@@ -65,17 +191,27 @@ class StableDiffusionGenerator:
     
     def generate_image(self, prompt: str, negative_prompt: str = None, 
                       width: int = 720, height: int = 720, 
-                      steps: int = 20, cfg_scale: float = 7.0) -> ImageGenerationResult:
+                      steps: int = 20, cfg_scale: float = 7.0,
+                      seed: int = -1, use_cache: bool = True,
+                      cache_random: bool = False, checkpoint: str = None,
+                      profile: str = None) -> ImageGenerationResult:
         """
         Génère une image avec Stable Diffusion
         
         Args:
             prompt: Description de l'image
             negative_prompt: Ce qu'on ne veut PAS dans l'image
-            width: Largeur de l'image
-            height: Hauteur de l'image
+            width: Largeur native (sans profil: avec height, surface native et format le plus proche)
+            height: Hauteur native
             steps: Nombre d'étapes de génération (plus = meilleur mais plus lent)
             cfg_scale: Respect du prompt (1-20, 7 recommandé)
+            seed: Seed de génération (-1 = aléatoire)
+            use_cache: Servir depuis le cache de génération si possible
+            cache_random: Avec une seed aléatoire, accepter une image déjà
+                          générée pour les mêmes paramètres
+            checkpoint: Modèle à utiliser (modèle chargé si None)
+            profile: Format Instagram (square/1:1, portrait/4:5, story/9:16);
+                     fixe résolution native et hires-fix au format publié
         
         Returns:
             ImageGenerationResult
@@ -96,34 +232,36 @@ class StableDiffusionGenerator:
             
             print(f"🎨 Génération d'image avec Stable Diffusion...")
             print(f"   📝 Prompt: {optimized_prompt[:100]}...")
-            print(f"   📐 Taille: {width}x{height}")
+            generation_profile = self._resolve_profile(profile, width, height)
+            print(f"   📐 Taille: {self._describe_profile(generation_profile)}")
             print(f"   ⚙️  Étapes: {steps}, CFG: {cfg_scale}")
             
             # Paramètres pour Stable Diffusion
-            payload = {
-                "prompt": optimized_prompt,
-                "negative_prompt": negative_prompt,
-                "width": width,
-                "height": height,
-                "steps": steps,
-                "cfg_scale": cfg_scale,
-                "sampler_name": "DPM++ 2M Karras",  # Excellent sampler
-                "seed": -1,  # -1 = aléatoire
-                "restore_faces": True,  # Améliorer les visages
-                "tiling": False,
-                "n_iter": 1,  # Nombre d'images
-                "batch_size": 1,
-                "enable_hr": True,  # Haute résolution
-                "hr_scale": 1.5,    # Facteur d'agrandissement
-                "hr_upscaler": "Latent",
-                "denoising_strength": 0.7
-            }
+            payload = self._txt2img_payload(optimized_prompt, negative_prompt,
+                                            generation_profile, steps, cfg_scale)
+            payload["seed"] = seed
             
-            # Démarrer la génération
             start_time = time.time()
-            response = requests.post(
-                self.txt2img_url,
+            
+            # Seed fixe: image reproductible; seed aléatoire: cache sur demande
+            cache_params = None
+            if use_cache and self.cache and (seed >= 0 or cache_random):
+                cache_params = self._cache_params(payload, checkpoint)
+                cached = self.cache.get(cache_params, self._output_path(prompt))
+                if cached:
+                    generation_time = time.time() - start_time
+                    print(f"⚡ Image servie depuis le cache en {generation_time * 1000:.0f}ms: {cached['image_path']}")
+                    return ImageGenerationResult.success_result(
+                        cached['image_path'], "stable_diffusion_cache",
+                        prompt_used=cached['prompt_used'] or optimized_prompt,
+                        generation_time=generation_time
+                    )
+            
+            # Démarrer la génération
+            response = self._sd_request(
+                "POST", "/sdapi/v1/txt2img",
                 json=payload,
+                checkpoint=checkpoint,
                 timeout=300  # 5 minutes max
             )
             
@@ -143,19 +281,20 @@ class StableDiffusionGenerator:
                     "Aucune image générée", optimized_prompt
                 )
             
-            # Décoder l'image (base64 → PIL Image)
-            image_b64 = result['images'][0]
-            image_data = base64.b64decode(image_b64)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Sauvegarder l'image
-            image_path = self._save_image(image, prompt)
+            # Décodage, recadrage et encodage dans le pool de post-traitement
+            image_path = self._save_image(result['images'][0], prompt,
+                                          output_size=generation_profile.output_size)
             
             generation_time = time.time() - start_time
             
             if image_path:
                 print(f"✅ Image générée avec succès en {generation_time:.1f}s: {image_path}")
-                return ImageGenerationResult.success_result(image_path, optimized_prompt)
+                if use_cache and self.cache:
+                    self._cache_result(payload, result, image_path, cache_params, checkpoint)
+                return ImageGenerationResult.success_result(
+                    image_path, "stable_diffusion", prompt_used=optimized_prompt,
+                    generation_time=generation_time
+                )
             else:
                 return ImageGenerationResult.error_result(
                     "Erreur lors de la sauvegarde", optimized_prompt
@@ -171,6 +310,194 @@ class StableDiffusionGenerator:
             print(f"❌ {error_msg}")
             return ImageGenerationResult.error_result(error_msg, prompt)
     
+    @staticmethod
+    def _resolve_profile(profile: Optional[str], width: int, height: int) -> GenerationProfile:
+        """Profil nommé, sinon déduit de la taille native demandée"""
+        return get_profile(profile) if profile else profile_for_size(width, height)
+    
+    @staticmethod
+    def _describe_profile(profile: GenerationProfile) -> str:
+        native = "x".join(map(str, profile.native_size))
+        output = "x".join(map(str, profile.output_size))
+        if profile.enable_hr:
+            return f"{native} -> hires {'x'.join(map(str, profile.hires_size))} -> {output} ({profile.aspect})"
+        return f"{native} -> {output} ({profile.aspect})"
+    
+    def _txt2img_payload(self, prompt: str, negative_prompt: str, profile: GenerationProfile,
+                         steps: int, cfg_scale: float) -> Dict[str, Any]:
+        """Paramètres txt2img communs (une image, seed aléatoire)"""
+        payload = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "steps": steps,
+            "cfg_scale": cfg_scale,
+            "sampler_name": "DPM++ 2M Karras",  # Excellent sampler
+            "seed": -1,  # -1 = aléatoire
+            "restore_faces": True,  # Améliorer les visages
+            "tiling": False,
+            "n_iter": 1,  # Nombre d'images
+            "batch_size": 1,
+            "hr_upscaler": "Latent",
+            "denoising_strength": 0.7
+        }
+        # Résolution native et hires-fix calculées pour le format publié
+        payload.update(profile.txt2img_params())
+        return payload
+    
+    def generate_batch(self, prompt: str, count: int = 4, negative_prompt: str = None,
+                       width: int = 720, height: int = 720, steps: int = 20,
+                       cfg_scale: float = 7.0, seed: int = None,
+                       variation_strength: float = 0.3, modifiers: List[str] = None,
+                       checkpoint: str = None, profile: str = None) -> List[ImageGenerationResult]:
+        """
+        Génère plusieurs images en une seule requête txt2img
+        
+        Sans `modifiers`, les images partagent le prompt et la seed principale
+        et varient par leur subseed (`variation_strength` = subseed_strength):
+        le GPU les calcule ensemble (batch_size), hires-fix compris. Avec
+        `modifiers`, chaque image reçoit son propre complément de prompt via
+        le script "prompts from file or textbox" (une requête, un job par ligne).
+        
+        Args:
+            prompt: Description commune des images
+            count: Nombre d'images
+            seed: Seed principale (aléatoire si None); image i = subseed seed + i
+            variation_strength: Écart des variations (0: identiques, 1: indépendantes)
+            modifiers: Compléments de prompt, un par image
+            checkpoint: Modèle à utiliser (modèle chargé si None)
+            profile: Format Instagram (voir generate_image)
+        
+        Returns:
+            Un ImageGenerationResult par image demandée
+        """
+        if not self.is_available:
+            return self._batch_error(
+                "Stable Diffusion non disponible. Vérifiez que l'interface web est démarrée avec --api",
+                count
+            )
+        
+        optimized_prompt = self._optimize_prompt_for_instagram(prompt)
+        negative_prompt = negative_prompt or self._get_default_negative_prompt()
+        seed = random.randint(0, 2 ** 32 - 1) if seed is None or seed < 0 else seed
+        try:
+            generation_profile = self._resolve_profile(profile, width, height)
+        except ValueError as e:
+            return self._batch_error(str(e), count)
+        
+        payload = self._txt2img_payload(optimized_prompt, negative_prompt,
+                                        generation_profile, steps, cfg_scale)
+        payload.update({
+            "seed": seed,
+            "subseed": seed,
+            "subseed_strength": variation_strength,
+            # La grille de prévisualisation serait renvoyée avec les images
+            "override_settings": {"return_grid": False},
+            "override_settings_restore_afterwards": True
+        })
+        
+        if modifiers:
+            prompts = [f"{optimized_prompt}, {modifiers[i % len(modifiers)]}" for i in range(count)]
+            payload.update({
+                "script_name": "prompts from file or textbox",
+                # checkbox_iterate, checkbox_iterate_batch, position, prompts
+                "script_args": [False, False, "start", "\n".join(prompts)]
+            })
+        else:
+            prompts = [optimized_prompt] * count
+            # Au-delà de SD_MAX_BATCH_SIZE (VRAM), plusieurs lots dans la même requête
+            batch_size = max(1, min(count, Config.SD_MAX_BATCH_SIZE))
+            payload.update({"batch_size": batch_size, "n_iter": math.ceil(count / batch_size)})
+        
+        print(f"🎨 Génération groupée de {count} image(s) avec Stable Diffusion...")
+        print(f"   📝 Prompt: {optimized_prompt[:100]}...")
+        print(f"   📐 Taille: {self._describe_profile(generation_profile)}")
+        print(f"   🎲 Seed: {seed}, variation: {variation_strength}, "
+              f"lots: {payload['n_iter']}x{payload['batch_size']}")
+        
+        start_time = time.time()
+        try:
+            response = self._sd_request("POST", "/sdapi/v1/txt2img", json=payload,
+                                        checkpoint=checkpoint, timeout=300 + 120 * count)
+            if response.status_code != 200:
+                return self._batch_error(f"Erreur Stable Diffusion: {response.status_code}", count)
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            error = f"Erreur connexion Stable Diffusion: {str(e)}"
+            print(f"❌ {error}")
+            return self._batch_error(error, count)
+        
+        images = result.get('images') or []
+        expected = count if modifiers else payload['batch_size'] * payload['n_iter']
+        # Versions ignorant override_settings: la grille arrive en tête
+        if len(images) > expected:
+            images = images[len(images) - expected:]
+        images = images[:count]
+        
+        try:
+            info = json.loads(result.get('info') or '{}')
+        except ValueError:
+            info = {}
+        subseeds = info.get('all_subseeds') or [seed + i for i in range(count)]
+        
+        # Décodage, recadrage et encodage en parallèle dans le pool de post-traitement
+        paths = self._save_images(images, prompt, [
+            (f"_{index + 1}", {"seed": seed, "subseed": subseeds[index],
+                               "subseed_strength": variation_strength,
+                               "prompt_used": prompts[index]})
+            for index in range(len(images))
+        ], output_size=generation_profile.output_size)
+        
+        generation_time = time.time() - start_time
+        print(f"✅ {sum(1 for p in paths if p)}/{count} image(s) générée(s) en {generation_time:.1f}s")
+        
+        results = []
+        for index in range(count):
+            path = paths[index] if index < len(paths) else None
+            if path:
+                results.append(ImageGenerationResult.success_result(
+                    path, "stable_diffusion", prompt_used=prompts[index],
+                    generation_time=generation_time
+                ))
+            else:
+                error = "Erreur lors de la sauvegarde" if index < len(paths) else "Aucune image générée"
+                results.append(ImageGenerationResult.error_result(error, "stable_diffusion"))
+        return results
+    
+    def _cache_params(self, payload: Dict[str, Any], checkpoint: str = None) -> Dict[str, Any]:
+        """Paramètres déterminant l'image produite, checkpoint compris"""
+        params = {field: payload.get(field) for field in self.CACHE_KEY_FIELDS}
+        # Sans l'empreinte: "model.safetensors" et son titre complet désignent le même modèle
+        params["model"] = (checkpoint or self._current_checkpoint()).split(' [')[0].strip()
+        # Le fichier en cache est copié tel quel: un .jpg ne doit pas servir une sortie .webp
+        params["format"] = self.pipeline.fmt
+        return params
+    
+    def _current_checkpoint(self) -> str:
+        return self._model_memo.get_or_load(
+            'checkpoint', self.get_current_model,
+            cacheable=lambda model: model not in ("Erreur", "Non disponible")
+        )
+    
+    def _cache_result(self, payload: Dict[str, Any], result: Dict[str, Any],
+                      image_path: str, requested_params: Optional[Dict[str, Any]],
+                      checkpoint: str = None):
+        """Met l'image en cache sous sa seed réelle (et sous la demande, si seed aléatoire cachable)"""
+        try:
+            actual_seed = json.loads(result.get('info') or '{}').get('seed')
+        except ValueError:
+            actual_seed = None
+        
+        seed = payload["seed"] if payload["seed"] >= 0 else actual_seed
+        if seed is not None:
+            self.cache.put(self._cache_params(dict(payload, seed=seed), checkpoint),
+                           image_path, payload["prompt"])
+        if requested_params and requested_params["seed"] < 0:
+            self.cache.put(requested_params, image_path, payload["prompt"])
+    
+    @staticmethod
+    def _batch_error(error: str, count: int) -> List[ImageGenerationResult]:
+        return [ImageGenerationResult.error_result(error, "stable_diffusion") for _ in range(count)]
+    
     def _optimize_prompt_for_instagram(self, prompt: str) -> str:
         """Optimise le prompt pour des images Instagram de qualité"""
         
@@ -206,68 +533,63 @@ class StableDiffusionGenerator:
             "too many fingers, long neck"
         )
     
-    def _save_image(self, image: Image.Image, original_prompt: str) -> Optional[str]:
-        """Sauvegarde l'image générée"""
-        try:
-            # Créer le nom de fichier
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            # Nettoyer le prompt pour le nom de fichier
-            clean_prompt = "".join(c for c in original_prompt[:30] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            clean_prompt = clean_prompt.replace(' ', '_')
-            filename = f"sd_{timestamp}_{clean_prompt}.png"
-            filepath = os.path.join("generated", filename)
-            
-            # Créer le dossier si nécessaire
-            os.makedirs("generated", exist_ok=True)
-            
-            # Optimiser pour Instagram (format carré)
-            image = self._optimize_for_instagram(image)
-            
-            # Sauvegarder avec métadonnées
+    def _output_path(self, original_prompt: str, suffix: str = "") -> str:
+        """Chemin de sortie d'une image (dossier generated/, extension du format de publication)"""
+        # Créer le nom de fichier
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Nettoyer le prompt pour le nom de fichier
+        clean_prompt = "".join(c for c in original_prompt[:30] if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        clean_prompt = clean_prompt.replace(' ', '_')
+        # Plusieurs workers peuvent traiter le même prompt dans la même seconde:
+        # le suffixe aléatoire évite qu'un travail écrase (ou qu'une annulation
+        # supprime) l'image d'un autre
+        unique = uuid.uuid4().hex[:8]
+        filename = f"sd_{timestamp}_{clean_prompt}_{unique}{suffix}{self.pipeline.extension}"
+        return os.path.join("generated", filename)
+    
+    def _save_image(self, image_b64: str, original_prompt: str, suffix: str = "",
+                    extra_metadata: Dict[str, Any] = None,
+                    output_size: tuple = (1080, 1080)) -> Optional[str]:
+        """Sauvegarde l'image générée (suffix: distingue les images d'un même lot)"""
+        return self._save_images([image_b64], original_prompt, [(suffix, extra_metadata)],
+                                 output_size)[0]
+    
+    def _save_images(self, images_b64: List[str], original_prompt: str,
+                     variants: List[tuple], output_size: tuple = (1080, 1080)) -> List[Optional[str]]:
+        """
+        Post-traite et sauvegarde des images base64 en parallèle
+        
+        Args:
+            images_b64: Images renvoyées par txt2img
+            original_prompt: Prompt d'origine (nom de fichier et métadonnées)
+            variants: (suffixe, métadonnées supplémentaires) par image
+            output_size: Taille publiée (format du profil de génération)
+        
+        Returns:
+            Chemin de chaque image (None si échec)
+        """
+        jobs = []
+        for image_b64, (suffix, extra_metadata) in zip(images_b64, variants):
             metadata = {
                 "prompt": original_prompt,
                 "generator": "Stable Diffusion",
                 "timestamp": datetime.now().isoformat()
             }
-            
-            # Ajouter les métadonnées à l'image
-            from PIL.PngImagePlugin import PngInfo
-            png_info = PngInfo()
-            for key, value in metadata.items():
-                png_info.add_text(key, str(value))
-            
-            # Sauvegarder
-            image.save(filepath, "PNG", pnginfo=png_info, quality=95, optimize=True)
-            
-            return filepath
-            
-        except Exception as e:
-            print(f"❌ Erreur sauvegarde image: {e}")
-            return None
-    
-    def _optimize_for_instagram(self, image: Image.Image) -> Image.Image:
-        """Optimise l'image pour Instagram"""
-        # Convertir en RGB si nécessaire
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+            metadata.update(extra_metadata or {})
+            jobs.append({
+                "source": image_b64,
+                "output_base": os.path.splitext(self._output_path(original_prompt, suffix))[0],
+                "size": output_size,
+                "metadata": metadata,
+                "is_base64": True
+            })
         
-        # Format carré pour Instagram (1080x1080)
-        width, height = image.size
-        
-        # Si l'image n'est pas carrée, la recadrer au centre
-        if width != height:
-            size = min(width, height)
-            left = (width - size) // 2
-            top = (height - size) // 2
-            right = left + size
-            bottom = top + size
-            image = image.crop((left, top, right, bottom))
-        
-        # Redimensionner à 1080x1080 (optimal Instagram)
-        if image.size != (1080, 1080):
-            image = image.resize((1080, 1080), Image.Resampling.LANCZOS)
-        
-        return image
+        paths = []
+        for result in self.pipeline.process_many(jobs):
+            if not result.success:
+                print(f"❌ Erreur sauvegarde image: {result.error}")
+            paths.append(result.path if result.success else None)
+        return paths
     
     def get_available_models(self) -> List[str]:
         """Récupère la liste des modèles disponibles"""
@@ -275,7 +597,7 @@ class StableDiffusionGenerator:
             return []
         
         try:
-            response = requests.get(self.models_url, timeout=10)
+            response = self._sd_request("GET", "/sdapi/v1/sd-models", timeout=10)
             if response.status_code == 200:
                 models = response.json()
                 return [model['title'] for model in models]
@@ -290,7 +612,7 @@ class StableDiffusionGenerator:
             return "Non disponible"
         
         try:
-            response = requests.get(self.options_url, timeout=10)
+            response = self._sd_request("GET", "/sdapi/v1/options", timeout=10)
             if response.status_code == 200:
                 options = response.json()
                 return options.get('sd_model_checkpoint', 'Inconnu')
@@ -305,14 +627,25 @@ class StableDiffusionGenerator:
         
         try:
             payload = {"sd_model_checkpoint": model_name}
-            response = requests.post(
-                self.options_url,
-                json=payload,
-                timeout=30
-            )
+            if self.pool:
+                # Toutes les instances doivent servir le même modèle
+                responses = self.pool.broadcast("POST", "/sdapi/v1/options", json=payload, timeout=120)
+                failed = [url for url, r in responses.items() if r is None or r.status_code != 200]
+                if failed or not responses:
+                    print(f"❌ Erreur changement de modèle sur: {', '.join(failed) or 'aucune instance'}")
+                    self._model_memo.invalidate('checkpoint')
+                    return False
+                response = next(iter(responses.values()))
+            else:
+                response = requests.post(
+                    self.options_url,
+                    json=payload,
+                    timeout=30
+                )
             
             if response.status_code == 200:
                 print(f"✅ Modèle changé pour: {model_name}")
+                self._model_memo.invalidate('checkpoint')
                 return True
             else:
                 print(f"❌ Erreur changement de modèle: {response.status_code}")
@@ -326,6 +659,9 @@ class StableDiffusionGenerator:
         if not self.is_available:
             return {"progress": 0, "eta": 0, "current_image": None}
         
+        if self.pool:
+            return self.pool.progress()
+        
         try:
             response = requests.get(self.progress_url, timeout=60)
             if response.status_code == 200:
@@ -334,36 +670,39 @@ class StableDiffusionGenerator:
         except:
             return {"progress": 0, "eta": 0, "current_image": None}
     
+    def backend_urls(self) -> List[str]:
+        """URLs des instances (une seule sans pool)"""
+        return [backend.url for backend in self.pool.backends] if self.pool else [self.api_url]
+    
+    def backend_for_thread(self, thread_id: int) -> Optional[str]:
+        """Instance qui exécute la génération en cours du thread (None: pas encore attribuée)"""
+        return self.pool.backend_for_thread(thread_id) if self.pool else self.api_url
+    
+    def interrupt(self) -> bool:
+        """Interrompt la génération en cours (l'image partielle est retournée à l'appelant)"""
+        if self.pool:
+            responses = self.pool.broadcast("POST", "/sdapi/v1/interrupt", timeout=10)
+            return any(r is not None and r.status_code == 200 for r in responses.values())
+        try:
+            response = requests.post(f"{self.api_url}/sdapi/v1/interrupt", timeout=10)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+    
     def generate_variations(self, prompt: str, count: int = 3, 
-                          variation_strength: float = 0.3) -> List[ImageGenerationResult]:
-        """Génère plusieurs variations d'une image"""
-        variations = []
-        
-        # Modificateurs pour créer des variations
-        variation_modifiers = [
-            "different angle",
-            "different lighting", 
-            "different composition",
-            "different style",
-            "different mood",
-            "different colors"
-        ]
-        
-        for i in range(count):
-            print(f"🎨 Génération variation {i+1}/{count}")
-            
-            # Ajouter un modificateur différent à chaque variation
-            modifier = variation_modifiers[i % len(variation_modifiers)]
-            varied_prompt = f"{prompt}, {modifier}, variation {i+1}"
-            
-            result = self.generate_image(varied_prompt)
-            variations.append(result)
-            
-            # Petite pause entre les générations
-            if i < count - 1:
-                time.sleep(1)
+                          variation_strength: float = 0.3, seed: int = None,
+                          use_modifiers: bool = False, checkpoint: str = None,
+                          profile: str = None) -> List[ImageGenerationResult]:
+        """
+        Génère plusieurs variations d'une image en une seule requête
         
-        return variations
+        Par défaut, variations de seed autour d'une même image (subseed);
+        use_modifiers ajoute à chaque variation un modificateur de prompt
+        (angle, lumière, composition...).
+        """
+        modifiers = self.VARIATION_MODIFIERS if use_modifiers else None
+        return self.generate_batch(prompt, count, seed=seed, variation_strength=variation_strength,
+                                   modifiers=modifiers, checkpoint=checkpoint, profile=profile)
     
     def upscale_image(self, image_path: str, scale_factor: int = 2) -> Optional[str]:
         """Agrandit une image (si l'upscaler est disponible dans SD)"""
@@ -393,7 +732,11 @@ class StableDiffusionGenerator:
             "api_url": self.api_url,
             "current_model": self.get_current_model() if self.is_available else None,
             "available_models": self.get_available_models() if self.is_available else [],
-            "model_count": len(self.get_available_models()) if self.is_available else 0
+            "model_count": len(self.get_available_models()) if self.is_available else 0,
+            "generation_cache": self.cache.stats() if self.cache else None,
+            "backend_pool": self.pool.stats() if self.pool else None,
+            "checkpoint_swaps": self.swap_stats(),
+            "image_pipeline": self.pipeline.stats()
         }
     
     def test_generation(self) -> ImageGenerationResult:
@@ -406,12 +749,13 @@ class StableDiffusionGenerator:
 class HuggingFaceGenerator:
     """Alternative avec Hugging Face (gratuit, en ligne)"""
     
-    def __init__(self, api_token: str = None):
+    def __init__(self, api_token: str = None, monitor: HealthMonitor = None):
         """
         Générateur d'images avec Hugging Face
         
         Args:
             api_token: Token Hugging Face (gratuit sur huggingface.co)
+            monitor: Surveillance de santé en arrière-plan (moniteur partagé par défaut)
         """
         self.api_token = api_token
         self.api_url = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-2-1"
@@ -424,6 +768,18 @@ class HuggingFaceGenerator:
         if not api_token:
             print("⚠️  Pas de token API - limites de taux plus strictes")
             print("💡 Obtenez un token gratuit sur: https://huggingface.co/settings/tokens")
+        
+        # 503: modèle en cours de chargement, l'API répond (la génération attendra)
+        self.monitor = monitor or get_health_monitor()
+        self.health_name = f"huggingface@{self.api_url}"
+        self.monitor.register(self.health_name, self.api_url,
+                              http_probe(self.api_url, ok_statuses=(200, 503), headers=self.headers),
+                              interval=Config.HF_HEALTH_CHECK_INTERVAL)
+    
+    @property
+    def is_available(self) -> bool:
+        """État en cache de l'API d'inférence"""
+        return self.monitor.is_healthy(self.health_name)
     
     def generate_image(self, prompt: str) -> ImageGenerationResult:
         """Génère une image avec Hugging Face"""
@@ -443,25 +799,31 @@ class HuggingFaceGenerator:
                 }
             }
             
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=60
-            )
+            try:
+                response = requests.post(
+                    self.api_url,
+                    headers=self.headers,
+                    json=payload,
+                    timeout=60
+                )
+            except requests.ConnectionError as e:
+                self.monitor.report_failure(self.health_name, e)
+                raise
             
             if response.status_code == 200:
                 # Sauvegarder l'image
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 clean_prompt = "".join(c for c in prompt[:20] if c.isalnum() or c in (' ', '-', '_')).rstrip()
                 clean_prompt = clean_prompt.replace(' ', '_')
-                filename = f"hf_{timestamp}_{clean_prompt}.png"
-                filepath = os.path.join("generated", filename)
+                output_base = os.path.join("generated", f"hf_{timestamp}_{clean_prompt}")
                 
-                os.makedirs("generated", exist_ok=True)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
+                processed = get_image_pipeline().process(
+                    response.content, output_base,
+                    metadata={"prompt": prompt, "generator": "Hugging Face"}
+                )
+                if not processed.success:
+                    return ImageGenerationResult.error_result(processed.error, optimized_prompt)
+                filepath = processed.path
                 
                 print(f"✅ Image Hugging Face générée: {filepath}")
                 return ImageGenerationResult.success_result(filepath, optimized_prompt)
@@ -488,7 +850,7 @@ class HuggingFaceGenerator:
     def get_status(self) -> Dict[str, Any]:
         """Retourne le statut du générateur Hugging Face"""
         return {
-            "available": True,
+            "available": self.is_available,
             "service": "Hugging Face",
             "model": "stable-diffusion-2-1",
             "has_token": bool(self.api_token)
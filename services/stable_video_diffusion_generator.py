@@ -10,17 +10,19 @@ import base64
 import io
 
 from models import VideoGenerationResult
+from services.health_monitor import BackendHealth, HealthMonitor, get_health_monitor, http_probe
 
 
 class StableVideoDiffusionGenerator:
     """Générateur de vidéos avec Stable Video Diffusion (local)"""
     
-    def __init__(self, api_url: str = "http://localhost:7862"):
+    def __init__(self, api_url: str = "http://localhost:7862", monitor: HealthMonitor = None):
         """
         Initialise le générateur SVD
         
         Args:
             api_url: URL de l'API ComfyUI avec SVD
+            monitor: Surveillance de santé en arrière-plan (moniteur partagé par défaut)
         """
         self.api_url = api_url.rstrip('/')
         self.queue_url = f"{self.api_url}/prompt"
@@ -30,24 +32,40 @@ class StableVideoDiffusionGenerator:
         print(f"🎬 Générateur Stable Video Diffusion initialisé")
         print(f"   🌐 URL: {self.api_url}")
         
-        # Test de connexion
-        self.is_available = self._test_connection()
-        if self.is_available:
+        # Connexion testée en arrière-plan (statistiques système de ComfyUI en cache)
+        self.monitor = monitor or get_health_monitor()
+        self.health_name = f"comfyui@{self.api_url}"
+        self.monitor.register(self.health_name, self.api_url,
+                              http_probe(f"{self.api_url}/system_stats", parse=lambda r: r.json()),
+                              on_change=self._on_health_change)
+    
+    @property
+    def is_available(self) -> bool:
+        """État en cache de ComfyUI"""
+        return self.monitor.is_healthy(self.health_name)
+    
+    @is_available.setter
+    def is_available(self, available: bool):
+        # Résultat d'un test externe: remplace l'état en cache jusqu'au prochain sondage
+        if available:
+            self.monitor.report_success(self.health_name)
+        else:
+            self.monitor.report_failure(self.health_name, "marqué indisponible")
+    
+    def _on_health_change(self, health: BackendHealth, previous):
+        if health.healthy:
             print("✅ SVD accessible")
         else:
-            print("⚠️  SVD non accessible")
-            print("💡 Pour démarrer SVD avec ComfyUI :")
-            print("   1. Installez ComfyUI : git clone https://github.com/comfyanonymous/ComfyUI")
-            print("   2. Téléchargez SVD : huggingface-cli download stabilityai/stable-video-diffusion-img2vid")
-            print("   3. Démarrez : python main.py --port 7862")
+            print(f"⚠️  SVD non accessible ({health.last_error})")
+            if previous is None:
+                print("💡 Pour démarrer SVD avec ComfyUI :")
+                print("   1. Installez ComfyUI : git clone https://github.com/comfyanonymous/ComfyUI")
+                print("   2. Téléchargez SVD : huggingface-cli download stabilityai/stable-video-diffusion-img2vid")
+                print("   3. Démarrez : python main.py --port 7862")
     
     def _test_connection(self) -> bool:
-        """Teste la connexion à ComfyUI/SVD"""
-        try:
-            response = requests.get(f"{self.api_url}/system_stats", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+        """Teste la connexion à ComfyUI/SVD maintenant (met à jour l'état en cache)"""
+        return self.monitor.check(self.health_name)
     
     def generate_video_from_image(self, image_path: str, 
                                  duration_seconds: int = 3,
@@ -257,6 +275,8 @@ class StableVideoDiffusionGenerator:
                 return None
                 
         except Exception as e:
+            if isinstance(e, requests.ConnectionError):
+                self.monitor.report_failure(self.health_name, e)
             print(f"❌ Erreur soumission: {e}")
             return None
     
@@ -353,8 +373,11 @@ class StableVideoDiffusionGenerator:
             # (Utiliser votre générateur d'images existant)
             from services.stable_diffusion_generator import StableDiffusionGenerator
             
-            sd_generator = StableDiffusionGenerator()
-            if not sd_generator.is_available:
+            from config import Config
+            
+            # Même URL que le générateur de l'application: santé partagée (déjà sondée)
+            sd_generator = StableDiffusionGenerator(Config.STABLE_DIFFUSION_URL)
+            if not (sd_generator.is_available or sd_generator._test_connection()):
                 return VideoGenerationResult.error_result(
                     "Stable Diffusion requis pour générer l'image source", prompt
                 )
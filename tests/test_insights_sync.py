@@ -0,0 +1,59 @@
+# tests/test_insights_sync.py - Médias non joignables lors de la synchronisation des métriques
+"""
+Un média que le lot ne peut pas interroger ne doit pas rester en tête des
+posts dus: sans marquage, il bloquerait la file à chaque synchronisation.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager
+from models import Post, PostStatus
+from services.insights_sync import InsightsSync
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+
+class BatchPublisher:
+    """batch_request: None pour les médias injoignables, compteurs simples sinon"""
+
+    def __init__(self, unreachable):
+        self.unreachable = set(unreachable)
+
+    def batch_request(self, requests):
+        responses = []
+        for request in requests:
+            media_id = request['relative_url'].split('?')[0]
+            if media_id in self.unreachable:
+                responses.append(None)
+            else:
+                responses.append({'code': 200, 'body': {'id': media_id, 'like_count': 3,
+                                                        'comments_count': 1}})
+        return responses
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'posts.db'))
+    for i in range(4):
+        post_id = db_manager.create_post(Post(
+            title=f"Post {i}", description="Description", hashtags="#test",
+            image_prompt="test", topic="test", image_path="generated/post.png"
+        ))
+        db_manager.update_post_status(post_id, PostStatus.PUBLISHED, instagram_post_id=f"media{i}")
+        with db_manager.get_connection() as conn:
+            conn.execute('UPDATE posts SET published_at = ? WHERE id = ?',
+                         (NOW - timedelta(days=1), post_id))
+            conn.commit()
+    return db_manager
+
+
+def test_unreachable_media_do_not_starve_the_queue(db_manager):
+    sync = InsightsSync(db_manager, BatchPublisher(unreachable={'media0', 'media1'}), batch_size=2)
+
+    first = sync.sync(limit=2, now=NOW)
+    assert first['unreachable'] == 2 and first['updated'] == 0
+
+    second = sync.sync(limit=2, now=NOW + timedelta(minutes=1))
+    assert second['updated'] == 2
+    assert not db_manager.get_posts_due_for_insights(sync.refresh_tiers, NOW + timedelta(minutes=2))
@@ -0,0 +1,105 @@
+# tests/test_manual_publish_recovery.py - Publication manuelle et reprise du scheduler
+"""
+Un scheduler qui redémarre pendant une publication manuelle (route web)
+ne doit ni republier le post, ni le reprendre s'il n'est pas orphelin.
+
+Le faux publisher du simulateur appelle clock.sleep() à chaque étape
+(upload, container_create, container_wait, publish): l'horloge ci-dessous
+y déclenche le redémarrage du scheduler au moment voulu.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager
+from models import Post, PostStatus
+from utils.scheduler import PostScheduler, publish_post_now
+from utils.scheduler_simulator import FakeInstagramPublisher
+
+STAGES = ('upload', 'container_create', 'container_wait', 'publish')
+NOW = datetime.now()
+
+
+class StageClock:
+    """Horloge du faux publisher: exécute `hook` au début de l'étape `at_stage`"""
+
+    def __init__(self, at_stage: str, hook=None):
+        self.at_stage = at_stage
+        self.hook = hook
+        self.calls = 0
+
+    def sleep(self, seconds: float):
+        stage = STAGES[self.calls] if self.calls < len(STAGES) else None
+        self.calls += 1
+        if stage == self.at_stage and self.hook:
+            hook, self.hook = self.hook, None
+            hook()
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    return DatabaseManager(str(tmp_path / 'posts.db'))
+
+
+def create_due_post(db_manager: DatabaseManager) -> int:
+    return db_manager.create_post(Post(
+        title="Post manuel", description="Description", hashtags="#test",
+        image_prompt="test", topic="test", image_path="generated/manual.png",
+        scheduled_time=NOW - timedelta(minutes=1), status=PostStatus.SCHEDULED.value
+    ))
+
+
+def restart_scheduler(db_manager: DatabaseManager, publisher) -> PostScheduler:
+    """Nouvelle instance du scheduler: reprise au démarrage puis une vérification"""
+    scheduler = PostScheduler(db_manager, publisher, clock=datetime.now, sleep=lambda seconds: None)
+    scheduler.recover_in_flight_posts()
+    scheduler._check_and_publish_scheduled_posts()
+    return scheduler
+
+
+@pytest.mark.parametrize('restart_at', ['upload', 'container_wait'])
+def test_restart_during_manual_publish_does_not_publish_twice(db_manager, restart_at):
+    post_id = create_due_post(db_manager)
+    clock = StageClock(restart_at)
+    publisher = FakeInstagramPublisher(clock, latencies={stage: 0 for stage in STAGES})
+    clock.hook = lambda: restart_scheduler(db_manager, publisher)
+
+    result = publish_post_now(db_manager, publisher, db_manager.get_post_by_id(post_id))
+
+    assert result.success
+    assert publisher.duplicate_publishes() == 0
+    assert sum(publisher.publications.values()) == 1
+    assert db_manager.get_post_by_id(post_id).status == PostStatus.PUBLISHED.value
+
+
+def test_manual_publish_records_owner_and_container(db_manager):
+    post_id = create_due_post(db_manager)
+    seen = {}
+
+    def inspect():
+        with db_manager.get_connection() as conn:
+            seen.update(conn.execute(
+                'SELECT status, processing_owner, processing_started_at, instagram_container_id '
+                'FROM posts WHERE id = ?', (post_id,)
+            ).fetchone())
+
+    clock = StageClock('container_wait', inspect)
+    publisher = FakeInstagramPublisher(clock, latencies={stage: 0 for stage in STAGES})
+    publish_post_now(db_manager, publisher, db_manager.get_post_by_id(post_id), owner='web:test')
+
+    assert seen['status'] == PostStatus.PROCESSING.value
+    assert seen['processing_owner'] == 'web:test'
+    assert seen['processing_started_at'] is not None
+    assert seen['instagram_container_id']
+
+
+def test_manual_publish_refused_while_scheduler_publishes(db_manager):
+    post_id = create_due_post(db_manager)
+    assert db_manager.claim_post_for_publishing(post_id, 'scheduler')
+
+    publisher = FakeInstagramPublisher(StageClock('upload'), latencies={stage: 0 for stage in STAGES})
+    post = db_manager.get_post_by_id(post_id)
+
+    assert not post.can_be_published()
+    assert publish_post_now(db_manager, publisher, post) is None
+    assert publisher.calls == 0
@@ -0,0 +1,47 @@
+# tests/test_media_paths.py - Chemins d'images acceptés pour les posts
+"""
+media_paths vient du client (API): seules les images de generated/ et
+uploads/ peuvent être publiées, et la suppression d'un post ne touche
+que celles-là (toutes les slides d'un carrousel).
+"""
+import os
+
+import pytest
+
+from config import Config
+from services.image_pipeline import remove_post_media
+
+
+@pytest.fixture
+def media_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for folder in (Config.GENERATED_FOLDER, Config.UPLOAD_FOLDER):
+        os.makedirs(folder, exist_ok=True)
+    return tmp_path
+
+
+def write(path: str) -> str:
+    with open(path, 'w') as f:
+        f.write('x')
+    return path
+
+
+def test_only_images_of_the_app_folders_are_media(media_dirs):
+    outside = write(str(media_dirs / 'secret.png'))
+    os.symlink(outside, os.path.join(Config.GENERATED_FOLDER, 'link.png'))
+
+    assert Config.is_media_path(write(os.path.join(Config.GENERATED_FOLDER, 'a.png')))
+    assert Config.is_media_path(write(os.path.join(Config.UPLOAD_FOLDER, 'b.jpg')))
+    assert not Config.is_media_path(write(os.path.join(Config.GENERATED_FOLDER, 'notes.txt')))
+    assert not Config.is_media_path(os.path.join(Config.GENERATED_FOLDER, 'link.png'))
+    assert not Config.is_media_path(os.path.join(Config.GENERATED_FOLDER, '..', 'secret.png'))
+    assert not Config.is_media_path('/etc/passwd')
+
+
+def test_remove_post_media_deletes_every_slide_and_nothing_else(media_dirs):
+    slides = [write(os.path.join(Config.GENERATED_FOLDER, f'slide{i}.png')) for i in range(3)]
+    outside = write(str(media_dirs / 'config.png'))
+
+    assert remove_post_media(slides + [outside]) == 3
+    assert not any(os.path.exists(path) for path in slides)
+    assert os.path.exists(outside)
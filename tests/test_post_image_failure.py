@@ -0,0 +1,47 @@
+# tests/test_post_image_failure.py - Image d'un post non générée en arrière-plan
+"""
+Un post programmé sans image n'est jamais retenu par le scheduler: l'échec
+de sa génération doit apparaître sur le post, sans écraser un post qui a
+déjà son image ou qui est en cours de publication.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager
+from models import Post, PostStatus
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    return DatabaseManager(str(tmp_path / 'posts.db'))
+
+
+def create_post(db_manager: DatabaseManager, status: PostStatus, image_path: str = None) -> int:
+    return db_manager.create_post(Post(
+        title="Post", description="Description", hashtags="#test", image_prompt="test",
+        topic="test", image_path=image_path, status=status.value,
+        scheduled_time=datetime.now() - timedelta(minutes=1)
+    ))
+
+
+def test_failed_image_is_recorded_on_scheduled_post(db_manager):
+    post_id = create_post(db_manager, PostStatus.SCHEDULED)
+
+    assert db_manager.mark_post_image_failed(post_id, 'Stable Diffusion non disponible')
+
+    post = db_manager.get_post_by_id(post_id)
+    assert post.status == PostStatus.FAILED.value
+    assert 'Stable Diffusion non disponible' in post.error_message
+
+
+@pytest.mark.parametrize('status, image_path', [
+    (PostStatus.SCHEDULED, 'generated/ok.png'),
+    (PostStatus.PROCESSING, None),
+    (PostStatus.PUBLISHED, None),
+])
+def test_failed_image_leaves_other_posts_untouched(db_manager, status, image_path):
+    post_id = create_post(db_manager, status, image_path)
+
+    assert not db_manager.mark_post_image_failed(post_id, 'erreur')
+    assert db_manager.get_post_by_id(post_id).status == status.value
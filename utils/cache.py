@@ -0,0 +1,293 @@
+# utils/cache.py - Cache TTL + LRU borné, avec stale-while-revalidate et persistance SQLite optionnelle
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+# Sentinelle distinguant une valeur absente d'une valeur None en cache
+_MISSING = object()
+
+
+@dataclass
+class _CacheEntry:
+    """Valeur en cache et ses échéances (timestamps Unix)"""
+    value: Any
+    fresh_until: float
+    stale_until: float
+
+
+class TTLCache:
+    """
+    Cache clé/valeur borné (éviction LRU) à durée de vie par entrée
+
+    Une entrée passe par trois états:
+    - fraîche: retournée directement
+    - périmée (entre fresh_until et stale_until): retournée immédiatement,
+      et rechargée en arrière-plan (stale-while-revalidate)
+    - expirée: rechargée de façon synchrone
+
+    Un seul chargement a lieu à la fois par clé: les appels concurrents sur
+    une clé absente attendent le résultat du premier. Si `persist_path` est
+    fourni, les entrées sont aussi écrites dans une table SQLite et relues
+    après un redémarrage; les valeurs doivent alors être sérialisables en JSON.
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 300,
+                 default_stale_ttl: float = 0, persist_path: str = None,
+                 namespace: str = 'default', clock: Callable[[], float] = time.time):
+        """
+        Args:
+            max_entries: Nombre maximum d'entrées gardées en mémoire
+            default_ttl: Durée de fraîcheur par défaut (secondes)
+            default_stale_ttl: Durée supplémentaire pendant laquelle une valeur
+                               périmée peut être servie pendant son rechargement
+            persist_path: Fichier SQLite de persistance (None: mémoire seule)
+            namespace: Préfixe isolant les entrées de ce cache dans le fichier partagé
+            clock: Horloge murale (injectable; persistée, donc pas monotone)
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.default_stale_ttl = default_stale_ttl
+        self.persist_path = persist_path
+        self.namespace = namespace
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self._entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Event] = {}
+        self._refreshing = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        if self.persist_path:
+            self._init_persistence()
+
+    # --- Lecture / écriture ---
+
+    def get(self, key: str, default: Any = None, allow_stale: bool = True) -> Any:
+        """Retourne la valeur en cache (fraîche, ou périmée si allow_stale) sans la recharger"""
+        entry = self._get_entry(key)
+        if entry is None:
+            return default
+
+        now = self.clock()
+        if now < entry.fresh_until or (allow_stale and now < entry.stale_until):
+            return entry.value
+        return default
+
+    def set(self, key: str, value: Any, ttl: float = None, stale_ttl: float = None):
+        """Enregistre une valeur"""
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_ttl = self.default_stale_ttl if stale_ttl is None else stale_ttl
+        now = self.clock()
+        entry = _CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+
+        with self._lock:
+            self._store(key, entry)
+
+        if self.persist_path:
+            self._persist(key, entry)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float = None,
+                    stale_ttl: float = None, cacheable: Callable[[Any], bool] = None,
+                    force_refresh: bool = False) -> Any:
+        """
+        Retourne la valeur en cache ou la charge avec `loader`
+
+        Args:
+            key: Clé du cache
+            loader: Fonction sans argument produisant la valeur
+            ttl, stale_ttl: Durées de vie (valeurs par défaut du cache sinon)
+            cacheable: Prédicat: les résultats refusés (erreurs...) sont
+                       retournés sans être mis en cache
+            force_refresh: Ignorer le cache et recharger
+        """
+        if not force_refresh:
+            entry = self._get_entry(key)
+            if entry is not None:
+                now = self.clock()
+                if now < entry.fresh_until:
+                    self.hits += 1
+                    return entry.value
+                if now < entry.stale_until:
+                    self.stale_hits += 1
+                    self._refresh_in_background(key, loader, ttl, stale_ttl, cacheable)
+                    return entry.value
+
+        self.misses += 1
+        return self._load(key, loader, ttl, stale_ttl, cacheable, force_refresh)
+
+    def invalidate(self, key: str):
+        """Supprime une entrée"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self.persist_path:
+            self._execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                          (self.namespace, key))
+
+    def invalidate_prefix(self, prefix: str):
+        """Supprime toutes les entrées dont la clé commence par `prefix`"""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+        if self.persist_path:
+            escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            self._execute("DELETE FROM cache_entries WHERE namespace = ? AND key LIKE ? ESCAPE '\\'",
+                          (self.namespace, escaped + '%'))
+
+    def clear(self):
+        """Vide le cache (mémoire et persistance)"""
+        with self._lock:
+            self._entries.clear()
+
+        if self.persist_path:
+            self._execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'persistent': bool(self.persist_path)
+        }
+
+    # --- Chargement ---
+
+    def _load(self, key: str, loader, ttl, stale_ttl, cacheable, force_refresh: bool = False) -> Any:
+        """Charge une valeur; les appels concurrents sur la même clé attendent le premier"""
+        with self._lock:
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            pending.wait()
+            value = self.get(key, _MISSING)
+            if value is not _MISSING and not force_refresh:
+                return value
+            # Le chargement concurrent n'a rien mis en cache: charger nous-mêmes
+            return self._call_loader(key, loader, ttl, stale_ttl, cacheable)
+
+        try:
+            return self._call_loader(key, loader, ttl, stale_ttl, cacheable)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    def _call_loader(self, key: str, loader, ttl, stale_ttl, cacheable) -> Any:
+        value = loader()
+        if cacheable is None or cacheable(value):
+            self.set(key, value, ttl, stale_ttl)
+        return value
+
+    def _refresh_in_background(self, key: str, loader, ttl, stale_ttl, cacheable):
+        """Recharge une entrée périmée dans un thread (un seul rechargement par clé)"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._call_loader(key, loader, ttl, stale_ttl, cacheable)
+            except Exception as e:
+                self.logger.warning(f"Rechargement du cache échoué ({key}): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
+
+    # --- Stockage mémoire ---
+
+    def _get_entry(self, key: str) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if not self.persist_path:
+            return None
+
+        entry = self._load_persisted(key)
+        if entry is not None:
+            with self._lock:
+                self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: _CacheEntry):
+        """Ajoute une entrée et évince les moins récemment utilisées (verrou tenu)"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Persistance SQLite ---
+
+    def _init_persistence(self):
+        self._execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        # Les entrées expirées ne seront plus jamais servies
+        self._execute('DELETE FROM cache_entries WHERE stale_until < ?', (self.clock(),))
+
+    def _execute(self, sql: str, params: tuple = ()):
+        try:
+            conn = sqlite3.connect(self.persist_path, timeout=5)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Le cache persistant est une optimisation: ne jamais faire échouer l'appelant
+            self.logger.warning(f"Erreur cache SQLite: {e}")
+            return []
+
+    def _persist(self, key: str, entry: _CacheEntry):
+        try:
+            value = json.dumps(entry.value)
+        except (TypeError, ValueError):
+            return
+        self._execute('''
+            INSERT OR REPLACE INTO cache_entries (namespace, key, value, fresh_until, stale_until)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (self.namespace, key, value, entry.fresh_until, entry.stale_until))
+
+    def _load_persisted(self, key: str) -> Optional[_CacheEntry]:
+        rows = self._execute('''
+            SELECT value, fresh_until, stale_until FROM cache_entries
+            WHERE namespace = ? AND key = ? AND stale_until > ?
+        ''', (self.namespace, key, self.clock()))
+        if not rows:
+            return None
+        value, fresh_until, stale_until = rows[0]
+        return _CacheEntry(json.loads(value), fresh_until, stale_until)
+
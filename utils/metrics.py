@@ -0,0 +1,220 @@
+# utils/metrics.py - Métriques de publication (latence, débit, étapes)
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable
+
+
+class RollingHistogram:
+    """Histogramme glissant sur une fenêtre de temps (et un nombre max d'échantillons)"""
+    
+    DEFAULT_PERCENTILES = (50, 90, 95, 99)
+    
+    def __init__(self, window_seconds: int = 3600, max_samples: int = 10000, clock=time.time):
+        """
+        Args:
+            window_seconds: Durée de la fenêtre glissante
+            max_samples: Nombre maximum d'échantillons conservés
+            clock: Horloge (injectable pour les simulations)
+        """
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """Ajoute un échantillon"""
+        with self._lock:
+            self._samples.append((self.clock(), float(value)))
+    
+    def _prune(self):
+        """Retire les échantillons sortis de la fenêtre (verrou déjà acquis)"""
+        cutoff = self.clock() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+    
+    def values(self) -> List[float]:
+        """Retourne les valeurs encore dans la fenêtre"""
+        with self._lock:
+            self._prune()
+            return [value for _, value in self._samples]
+    
+    def count(self) -> int:
+        """Nombre d'échantillons dans la fenêtre"""
+        with self._lock:
+            self._prune()
+            return len(self._samples)
+    
+    @staticmethod
+    def _percentile(sorted_values: List[float], percentile: float) -> float:
+        """Percentile par interpolation linéaire sur des valeurs triées"""
+        if len(sorted_values) == 1:
+            return sorted_values[0]
+        
+        rank = (percentile / 100) * (len(sorted_values) - 1)
+        lower = int(rank)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        fraction = rank - lower
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+    
+    def snapshot(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Retourne count/min/max/moyenne et percentiles de la fenêtre"""
+        values = sorted(self.values())
+        
+        if not values:
+            snapshot = {'count': 0, 'min': None, 'max': None, 'mean': None}
+            snapshot.update({f'p{p}': None for p in percentiles})
+            return snapshot
+        
+        snapshot = {
+            'count': len(values),
+            'min': round(values[0], 3),
+            'max': round(values[-1], 3),
+            'mean': round(sum(values) / len(values), 3)
+        }
+        for p in percentiles:
+            snapshot[f'p{p}'] = round(self._percentile(values, p), 3)
+        
+        return snapshot
+
+
+class PublicationMetrics:
+    """Collecte les métriques de chaque publication du scheduler"""
+    
+    STAGES = ('upload', 'container_create', 'container_wait', 'publish')
+    OUTCOMES = ('published', 'failed', 'error')
+    
+    def __init__(self, window_seconds: int = 3600, max_samples: int = 10000,
+                 recent_size: int = 20, clock=time.time):
+        """
+        Args:
+            window_seconds: Fenêtre glissante des histogrammes et du débit
+            max_samples: Nombre maximum d'échantillons par histogramme
+            recent_size: Nombre de publications récentes conservées en détail
+            clock: Horloge (injectable pour les simulations)
+        """
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.started_at = clock()
+        
+        self.lag = RollingHistogram(window_seconds, max_samples, clock)
+        self.duration = RollingHistogram(window_seconds, max_samples, clock)
+        self.stages = {
+            stage: RollingHistogram(window_seconds, max_samples, clock)
+            for stage in self.STAGES
+        }
+        self._outcomes_window = {
+            outcome: RollingHistogram(window_seconds, max_samples, clock)
+            for outcome in self.OUTCOMES
+        }
+        
+        self.totals = {outcome: 0 for outcome in self.OUTCOMES}
+        self.recent = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+    
+    def record_publication(self, post_id: int, scheduled_time: Optional[datetime],
+                           published_at: datetime, duration: float, outcome: str,
+                           stage_timings: Dict[str, float] = None,
+                           error_message: str = None):
+        """
+        Enregistre une publication
+        
+        Args:
+            post_id: ID du post
+            scheduled_time: Heure programmée (None si publication manuelle)
+            published_at: Heure effective de fin de publication
+            duration: Durée totale de la publication en secondes
+            outcome: 'published', 'failed' (refus API) ou 'error' (exception)
+            stage_timings: Durée de chaque étape du publisher Instagram
+            error_message: Message d'erreur éventuel
+        """
+        if outcome not in self.OUTCOMES:
+            outcome = 'error'
+        
+        lag_seconds = None
+        if scheduled_time:
+            lag_seconds = (published_at - scheduled_time).total_seconds()
+            self.lag.observe(lag_seconds)
+        
+        self.duration.observe(duration)
+        self._outcomes_window[outcome].observe(1)
+        
+        for stage, seconds in (stage_timings or {}).items():
+            if stage in self.stages:
+                self.stages[stage].observe(seconds)
+        
+        with self._lock:
+            self.totals[outcome] += 1
+            self.recent.append({
+                'post_id': post_id,
+                'scheduled_time': scheduled_time.isoformat() if scheduled_time else None,
+                'published_at': published_at.isoformat(),
+                'lag_seconds': round(lag_seconds, 3) if lag_seconds is not None else None,
+                'duration_seconds': round(duration, 3),
+                'stage_timings': {k: round(v, 3) for k, v in (stage_timings or {}).items()},
+                'outcome': outcome,
+                'error_message': error_message
+            })
+    
+    def throughput_per_minute(self) -> float:
+        """Publications terminées par minute sur la fenêtre glissante"""
+        # Ne pas diviser par la fenêtre entière tant qu'elle n'est pas remplie
+        elapsed = min(self.window_seconds, max(self.clock() - self.started_at, 1))
+        completed = sum(hist.count() for hist in self._outcomes_window.values())
+        return round(completed / (elapsed / 60), 3)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Retourne un instantané sérialisable en JSON"""
+        with self._lock:
+            totals = dict(self.totals)
+            recent = list(self.recent)
+        
+        return {
+            'window_seconds': self.window_seconds,
+            'totals': totals,
+            'window_outcomes': {
+                outcome: hist.count() for outcome, hist in self._outcomes_window.items()
+            },
+            'throughput_per_minute': self.throughput_per_minute(),
+            'lag_seconds': self.lag.snapshot(),
+            'duration_seconds': self.duration.snapshot(),
+            'stages_seconds': {stage: hist.snapshot() for stage, hist in self.stages.items()},
+            'recent': recent
+        }
+    
+    def to_prometheus(self, prefix: str = 'autopost_scheduler') -> str:
+        """Exporte les métriques au format texte Prometheus"""
+        snapshot = self.snapshot()
+        lines = []
+        
+        def summary(name: str, help_text: str, series: List[tuple]):
+            """Écrit une métrique de type summary (une série par jeu de labels)"""
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} summary')
+            for labels, data in series:
+                sep = ',' if labels else ''
+                for p in RollingHistogram.DEFAULT_PERCENTILES:
+                    value = data.get(f'p{p}')
+                    if value is not None:
+                        lines.append(f'{prefix}_{name}{{{labels}{sep}quantile="{p / 100}"}} {value}')
+                count_labels = f'{{{labels}}}' if labels else ''
+                lines.append(f'{prefix}_{name}_count{count_labels} {data["count"]}')
+        
+        lines.append(f'# HELP {prefix}_publications_total Publications par résultat')
+        lines.append(f'# TYPE {prefix}_publications_total counter')
+        for outcome, count in snapshot['totals'].items():
+            lines.append(f'{prefix}_publications_total{{outcome="{outcome}"}} {count}')
+        
+        lines.append(f'# HELP {prefix}_throughput_per_minute Publications par minute (fenêtre glissante)')
+        lines.append(f'# TYPE {prefix}_throughput_per_minute gauge')
+        lines.append(f'{prefix}_throughput_per_minute {snapshot["throughput_per_minute"]}')
+        
+        summary('publish_lag_seconds', 'Retard entre heure programmée et publication',
+                [('', snapshot['lag_seconds'])])
+        summary('publish_duration_seconds', 'Durée totale de publication',
+                [('', snapshot['duration_seconds'])])
+        summary('stage_seconds', 'Durée par étape du publisher Instagram',
+                [(f'stage="{stage}"', data) for stage, data in snapshot['stages_seconds'].items()])
+        
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,623 @@
+# utils/mock_graph_server.py - Faux serveur API Graph pour benchmarks et tests de charge
+"""
+Serveur HTTP local imitant les endpoints Graph API utilisés par
+InstagramPublisher: création de container (image, élément et parent de
+carrousel), statut (status_code), publication, liste des médias, insights,
+ig_hashtag_search, lookups groupés (?ids=) et requêtes batch.
+
+Le coût d'établissement d'une connexion (handshake TCP+TLS vers
+graph.facebook.com) est simulé par `connection_delay`, appliqué une fois
+par connexion: c'est ce coût que la réutilisation des connexions élimine.
+
+Pour les tests de charge (voir loadtest_instagram_api.py):
+    - latences par type d'endpoint tirées d'une distribution (LatencyModel)
+    - injection d'erreurs 500 et de containers en ERROR
+    - quotas: appels par fenêtre (429, en-têtes X-App-Usage et
+      X-Business-Use-Case-Usage) et
+      publications par fenêtre (erreur Graph code 9, comme la limite de 24h)
+
+Usage:
+    python -m utils.mock_graph_server --port 8999 --connection-delay 0.05
+    python -m utils.mock_graph_server --latency container_create=lognormal:0.4,0.5 \
+        --app-call-limit 200 --publish-limit 50
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List
+from urllib.parse import urlparse, parse_qs
+
+
+# Types d'endpoints, pour les latences et erreurs par endpoint
+ENDPOINT_KINDS = (
+    'container_create', 'container_status', 'publish', 'media_list',
+    'insights', 'hashtag', 'batch', 'publishing_limit', 'account'
+)
+
+
+# Code interne: quota d'appels épuisé (répondu en 429 avec Retry-After)
+QUOTA_EXCEEDED = -429
+
+
+class LatencyModel:
+    """
+    Distribution de latence (secondes) décrite par une chaîne:
+
+        fixed:0.05            toujours 50ms
+        uniform:0.02,0.2      uniforme entre 20 et 200ms
+        lognormal:0.05,0.6    médiane 50ms, sigma 0.6 (queue longue réaliste)
+        exponential:0.05      moyenne 50ms
+    """
+
+    def __init__(self, spec: str = 'fixed:0'):
+        self.spec = spec
+        name, _, args = spec.partition(':')
+        self.kind = name.strip().lower()
+        self.args = [float(a) for a in args.split(',') if a.strip()]
+
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'exponential': 1}
+        if self.kind not in expected or len(self.args) != expected[self.kind]:
+            raise ValueError(f"Distribution de latence invalide: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            return self.args[0]
+        if self.kind == 'uniform':
+            return rng.uniform(*self.args)
+        if self.kind == 'lognormal':
+            median, sigma = self.args
+            return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return rng.expovariate(1 / self.args[0]) if self.args[0] > 0 else 0.0
+
+    def __repr__(self):
+        return f"LatencyModel({self.spec!r})"
+
+
+class MockGraphState:
+    """État partagé du faux serveur (containers, médias, quotas, compteurs)"""
+
+    def __init__(self, connection_delay: float = 0.0, request_delay: float = 0.0,
+                 ready_after_polls: int = 0, rate_limit_every: int = 0,
+                 error_rate: float = 0.0, seed: int = 42,
+                 latency: Dict[str, str] = None, error_rates: Dict[str, float] = None,
+                 container_error_rate: float = 0.0, app_call_limit: int = 0,
+                 publish_limit: int = 0, quota_window: float = 3600,
+                 publish_window: float = 86400):
+        """
+        Args:
+            connection_delay: Délai appliqué à chaque nouvelle connexion (handshake simulé)
+            request_delay: Délai de traitement de chaque requête (latence fixe par défaut)
+            ready_after_polls: Nombre de statuts IN_PROGRESS avant FINISHED
+            rate_limit_every: Répond 429 toutes les N requêtes (0 = jamais)
+            error_rate: Probabilité de réponse 500 (tous endpoints)
+            seed: Graine du générateur aléatoire
+            latency: Distribution par type d'endpoint ({'publish': 'lognormal:0.3,0.5'},
+                     clé 'default' pour les autres); voir LatencyModel
+            error_rates: Probabilité de réponse 500 par type d'endpoint
+            container_error_rate: Probabilité qu'un container termine en ERROR
+            app_call_limit: Appels autorisés par quota_window (0 = illimité)
+            publish_limit: Publications autorisées par publish_window (0 = illimité)
+            quota_window: Fenêtre glissante du quota d'appels (secondes)
+            publish_window: Fenêtre glissante du quota de publications (secondes)
+        """
+        self.connection_delay = connection_delay
+        self.request_delay = request_delay
+        self.ready_after_polls = ready_after_polls
+        self.rate_limit_every = rate_limit_every
+        self.error_rate = error_rate
+        self.error_rates = dict(error_rates or {})
+        self.container_error_rate = container_error_rate
+        self.app_call_limit = app_call_limit
+        self.publish_limit = publish_limit
+        self.quota_window = quota_window
+        self.publish_window = publish_window
+        self.business_id = '17841400000000000'
+
+        self.latency = {kind: LatencyModel(spec) for kind, spec in (latency or {}).items()}
+        self.default_latency = self.latency.pop('default', LatencyModel(f'fixed:{request_delay}'))
+
+        self._random = random.Random(seed)
+        self._ids = itertools.count(17840000000000000)
+        self._lock = threading.Lock()
+        self._call_times = deque()
+        self._publish_times = deque()
+
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.media: Dict[str, Dict[str, Any]] = {}
+        self.hashtags: Dict[str, Dict[str, Any]] = {}
+        self.connections = 0
+        self.requests = 0
+        self.requests_by_kind: Dict[str, int] = {}
+        self.injected_errors = 0
+        self.quota_rejections = 0
+        self.publish_rejections = 0
+
+    def next_id(self) -> str:
+        with self._lock:
+            return str(next(self._ids))
+
+    def latency_for(self, kind: str) -> float:
+        model = self.latency.get(kind, self.default_latency)
+        with self._lock:
+            return model.sample(self._random)
+
+    def count_request(self, kind: str = 'account') -> Optional[int]:
+        """Compte une requête et retourne un code d'erreur à injecter éventuellement"""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.requests_by_kind[kind] = self.requests_by_kind.get(kind, 0) + 1
+
+            if self.app_call_limit:
+                self._prune(self._call_times, now - self.quota_window)
+                if len(self._call_times) >= self.app_call_limit:
+                    self.quota_rejections += 1
+                    return QUOTA_EXCEEDED
+                self._call_times.append(now)
+
+            if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                return 429
+
+            rate = self.error_rates.get(kind, self.error_rate)
+            if rate and self._random.random() < rate:
+                self.injected_errors += 1
+                return 500
+        return None
+
+    def quota_reset_in(self) -> float:
+        """Secondes avant qu'un appel sorte de la fenêtre du quota"""
+        with self._lock:
+            if not self._call_times:
+                return 0.0
+            return max(0.0, self._call_times[0] + self.quota_window - time.monotonic())
+
+    def _reserve_publish(self) -> bool:
+        """Réserve une publication dans le quota glissant (verrou tenu); False si quota atteint"""
+        if not self.publish_limit:
+            return True
+        now = time.monotonic()
+        self._prune(self._publish_times, now - self.publish_window)
+        if len(self._publish_times) >= self.publish_limit:
+            self.publish_rejections += 1
+            return False
+        self._publish_times.append(now)
+        return True
+
+    def publish_quota_usage(self) -> int:
+        with self._lock:
+            self._prune(self._publish_times, time.monotonic() - self.publish_window)
+            return len(self._publish_times)
+
+    def app_usage(self) -> Dict[str, int]:
+        """Contenu de l'en-tête X-App-Usage (pourcentages du quota consommé)"""
+        if not self.app_call_limit:
+            return {'call_count': 0, 'total_cputime': 0, 'total_time': 0}
+        with self._lock:
+            self._prune(self._call_times, time.monotonic() - self.quota_window)
+            percent = min(100, int(len(self._call_times) * 100 / self.app_call_limit))
+        return {'call_count': percent, 'total_cputime': percent // 2, 'total_time': percent // 2}
+
+    def business_usage(self, usage: Dict[str, int]) -> Dict[str, List[Dict[str, Any]]]:
+        """Contenu de l'en-tête X-Business-Use-Case-Usage (quota d'appels du compte)"""
+        regain = math.ceil(self.quota_reset_in() / 60) if usage['call_count'] >= 100 else 0
+        return {self.business_id: [dict(usage, type='instagram',
+                                        estimated_time_to_regain_access=regain)]}
+
+    @staticmethod
+    def _prune(times: deque, before: float):
+        while times and times[0] < before:
+            times.popleft()
+
+    def add_media(self, caption: str = '', timestamp: str = None) -> str:
+        """Ajoute un média publié hors API (ex: depuis l'application Instagram)"""
+        media_id = self.next_id()
+        with self._lock:
+            self.media[media_id] = {
+                'id': media_id,
+                'caption': caption,
+                'media_type': 'IMAGE',
+                'timestamp': timestamp or time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())
+            }
+        return media_id
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'requests': self.requests,
+                'containers': len(self.containers),
+                'media': len(self.media),
+                'injected_errors': self.injected_errors,
+                'quota_rejections': self.quota_rejections,
+                'publish_rejections': self.publish_rejections,
+                'requests_by_kind': dict(self.requests_by_kind)
+            }
+
+
+class MockGraphHandler(BaseHTTPRequestHandler):
+    """Handler HTTP/1.1 keep-alive des endpoints Graph API simulés"""
+
+    protocol_version = 'HTTP/1.1'
+    state: MockGraphState = None
+
+    def setup(self):
+        super().setup()
+        # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, Nagle et
+        # l'ACK différé du client ajoutent ~40ms à chaque réponse keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.state._lock:
+            self.state.connections += 1
+        if self.state.connection_delay:
+            time.sleep(self.state.connection_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self) -> Dict[str, str]:
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode('utf-8')
+            params.update({k: v[0] for k, v in parse_qs(body).items()})
+
+        return params
+
+    def _send(self, status: int, payload: Any, headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        usage = self.state.app_usage()
+        self.send_header('X-App-Usage', json.dumps(usage))
+        if self.state.app_call_limit:
+            self.send_header('X-Business-Use-Case-Usage', json.dumps(self.state.business_usage(usage)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _endpoint_kind(method: str, parts: List[str], params: Dict[str, str]) -> str:
+        """Type d'endpoint de la requête (voir ENDPOINT_KINDS)"""
+        if method == 'POST' and not parts:
+            return 'batch'
+        if len(parts) == 2 and parts[1] == 'media':
+            return 'container_create' if method == 'POST' else 'media_list'
+        if len(parts) == 2 and parts[1] == 'media_publish':
+            return 'publish'
+        if len(parts) == 2 and parts[1] == 'insights':
+            return 'insights'
+        if len(parts) == 2 and parts[1] == 'content_publishing_limit':
+            return 'publishing_limit'
+        if parts == ['ig_hashtag_search']:
+            return 'hashtag'
+        if params.get('fields') == 'status_code':
+            return 'container_status'
+        return 'account'
+
+    def _handle(self, method: str):
+        params = self._params()
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        # Ignorer le préfixe de version (/v18.0/...)
+        if parts and parts[0].startswith('v') and '.' in parts[0]:
+            parts = parts[1:]
+
+        kind = self._endpoint_kind(method, parts, params)
+        delay = self.state.latency_for(kind)
+        if delay:
+            time.sleep(delay)
+
+        injected = self.state.count_request(kind)
+        if injected == QUOTA_EXCEEDED:
+            retry_after = math.ceil(self.state.quota_reset_in())
+            return self._send(429, {'error': {'message': 'Application request limit reached',
+                                              'code': 4}}, {'Retry-After': str(retry_after)})
+        if injected == 429:
+            return self._send(429, {'error': {'message': 'Application request limit reached',
+                                              'code': 4}}, {'Retry-After': '0'})
+        if injected == 500:
+            return self._send(500, {'error': {'message': 'Erreur interne simulée', 'code': 2}})
+
+        if kind == 'batch' and params.get('batch'):
+            # Requête batch: POST / batch=[{method, relative_url}, ...]
+            return self._send(200, [self._batch_item(item) for item in json.loads(params['batch'])])
+
+        if kind == 'container_create':
+            return self._create_container(params)
+
+        if kind == 'publish':
+            return self._publish(params)
+
+        if kind == 'media_list':
+            return self._send(200, self._media_page(params))
+
+        if kind == 'insights':
+            return self._insights(parts[0], params)
+
+        if kind == 'publishing_limit':
+            return self._send(200, {'data': [{
+                'quota_usage': self.state.publish_quota_usage(),
+                'config': {'quota_total': self.state.publish_limit,
+                           'quota_duration': int(self.state.publish_window)}
+            }]})
+
+        if method == 'GET' and not parts and params.get('ids'):
+            # Lookup groupé: GET /?ids=a,b,c
+            ids = params['ids'].split(',')
+            objects = {object_id: self._lookup(object_id) for object_id in ids}
+            if any(obj is None for obj in objects.values()):
+                return self._send(400, {'error': {'message': 'ID inconnu', 'code': 100}})
+            return self._send(200, objects)
+
+        if kind == 'hashtag':
+            name = params.get('q', '').lower()
+            hashtag_id = str(17841500000000000 + sum(ord(c) for c in name))
+            with self.state._lock:
+                self.state.hashtags[hashtag_id] = {'id': hashtag_id, 'name': name,
+                                                   'media_count': 1000 * len(name)}
+            return self._send(200, {'data': [{'id': hashtag_id}]})
+
+        if method == 'GET' and len(parts) == 1:
+            obj = self._lookup(parts[0])
+            return self._send(200, obj or {'id': parts[0], 'username': 'mock_account'})
+
+        return self._send(404, {'error': {'message': 'Endpoint inconnu', 'code': 803}})
+
+    def _create_container(self, params: Dict[str, str]):
+        children = [c for c in params.get('children', '').split(',') if c]
+        if params.get('media_type') == 'CAROUSEL':
+            # Le parent exige des enfants existants et prêts
+            with self.state._lock:
+                ready = [self.state.containers.get(c, {}).get('status_code') == 'FINISHED'
+                         for c in children]
+            if len(children) < 2 or not all(ready):
+                return self._send(400, {'error': {'message': 'Enfants du carrousel invalides',
+                                                  'code': 100}})
+
+        container_id = self.state.next_id()
+        with self.state._lock:
+            fails = bool(self.state.container_error_rate
+                         and self.state._random.random() < self.state.container_error_rate)
+            self.state.containers[container_id] = {
+                'polls': 0,
+                'status_code': 'IN_PROGRESS',
+                'final_status': 'ERROR' if fails else 'FINISHED',
+                'caption': params.get('caption', ''),
+                'media_type': 'CAROUSEL_ALBUM' if children else 'IMAGE',
+                'is_carousel_item': params.get('is_carousel_item') == 'true'
+            }
+        return self._send(200, {'id': container_id})
+
+    def _publish(self, params: Dict[str, str]):
+        container_id = params.get('creation_id')
+        error = None
+        with self.state._lock:
+            container = self.state.containers.get(container_id)
+            if not (container and container['status_code'] == 'FINISHED'
+                    and not container['is_carousel_item']):
+                error = {'message': 'Container invalide', 'code': 100}
+            elif not self.state._reserve_publish():
+                # Limite de publications de l'API (25 à 100 posts par 24h selon les comptes)
+                error = {'message': 'Application request limit reached',
+                         'code': 9, 'error_subcode': 2207042}
+            else:
+                container['status_code'] = 'PUBLISHED'
+                media_id = str(next(self.state._ids))
+                self.state.media[media_id] = {
+                    'id': media_id,
+                    'caption': container['caption'],
+                    'media_type': container['media_type'],
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime())
+                }
+
+        if error:
+            return self._send(400, {'error': error})
+        return self._send(200, {'id': media_id})
+
+    def _insights(self, media_id: str, params: Dict[str, str]):
+        """GET /{media-id}/insights?metric=reach,impressions,..."""
+        with self.state._lock:
+            media = self.state.media.get(media_id)
+        if not media:
+            return self._send(400, {'error': {'message': 'Objet inexistant', 'code': 100}})
+
+        values = self._metric_values(media_id)
+        metrics = [m for m in params.get('metric', 'reach,impressions').split(',') if m]
+        return self._send(200, {'data': [
+            {'name': metric, 'period': 'lifetime', 'values': [{'value': values.get(metric, 0)}]}
+            for metric in metrics
+        ]})
+
+    @staticmethod
+    def _metric_values(media_id: str) -> Dict[str, int]:
+        """Métriques déterministes dérivées de l'ID"""
+        seed = int(media_id[-6:]) if media_id[-6:].isdigit() else len(media_id)
+        return {
+            'reach': 1000 + seed % 5000,
+            'impressions': 1500 + seed % 8000,
+            'saved': seed % 60,
+            'likes': seed % 500,
+            'comments': seed % 40,
+            'shares': seed % 25
+        }
+
+    def _media_page(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Page de médias du plus récent au plus ancien, paginée par curseur (ID du dernier média)"""
+        limit = min(int(params.get('limit', 25)), 100)
+        with self.state._lock:
+            newest_first = list(self.state.media.values())[::-1]
+
+        start = 0
+        if params.get('after'):
+            ids = [media['id'] for media in newest_first]
+            start = ids.index(params['after']) + 1 if params['after'] in ids else len(ids)
+
+        page = newest_first[start:start + limit]
+        payload = {'data': [self._with_counters(media) for media in page]}
+        if page:
+            payload['paging'] = {'cursors': {'before': page[0]['id'], 'after': page[-1]['id']}}
+            if start + limit < len(newest_first):
+                payload['paging']['next'] = f"{self.path}&after={page[-1]['id']}"
+        return payload
+
+    @classmethod
+    def _with_counters(cls, media: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute les compteurs (likes, commentaires) du média"""
+        values = cls._metric_values(media['id'])
+        return dict(media, like_count=values['likes'], comments_count=values['comments'])
+
+    def _lookup(self, object_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne un container (en faisant progresser son statut) ou un média"""
+        with self.state._lock:
+            container = self.state.containers.get(object_id)
+            if container:
+                if container['status_code'] == 'IN_PROGRESS':
+                    container['polls'] += 1
+                    if container['polls'] > self.state.ready_after_polls:
+                        container['status_code'] = container['final_status']
+                return {'id': object_id, 'status_code': container['status_code']}
+            return self.state.media.get(object_id) or self.state.hashtags.get(object_id)
+
+    def _batch_item(self, item: Dict[str, str]) -> Dict[str, Any]:
+        """Réponse d'un élément de batch (lecture d'un média et de ses métriques)"""
+        url = urlparse(item.get('relative_url', ''))
+        object_id = url.path.strip('/').split('/')[0]
+        fields = parse_qs(url.query).get('fields', [''])[0]
+
+        with self.state._lock:
+            media = self.state.media.get(object_id)
+        if not media:
+            body = {'error': {'message': 'Objet inexistant', 'code': 100}}
+            return {'code': 400, 'body': json.dumps(body)}
+
+        body = self._with_counters(media)
+        if 'insights' in fields:
+            values = self._metric_values(object_id)
+            body['insights'] = {'data': [
+                {'name': name, 'values': [{'value': values[name]}]}
+                for name in ('reach', 'impressions', 'saved')
+            ]}
+        return {'code': 200, 'body': json.dumps(body)}
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._send(200, {'success': True})
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Beaucoup de connexions simultanées pendant les tests de charge
+    request_queue_size = 256
+
+
+class MockGraphServer:
+    """Faux serveur Graph API exécuté dans un thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, **state_options):
+        self.state = MockGraphState(**state_options)
+        handler = type('BoundMockGraphHandler', (MockGraphHandler,), {'state': self.state})
+        self.httpd = _MockHTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v18.0"
+
+    def start(self) -> 'MockGraphServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def parse_kind_options(values: List[str], convert=str) -> Dict[str, Any]:
+    """Convertit des options 'type=valeur' (--latency, --endpoint-error-rate) en dictionnaire"""
+    options = {}
+    for value in values or []:
+        kind, sep, spec = value.partition('=')
+        if not sep:
+            kind, spec = 'default', value
+        if kind != 'default' and kind not in ENDPOINT_KINDS:
+            raise argparse.ArgumentTypeError(f"Type d'endpoint inconnu: {kind} ({', '.join(ENDPOINT_KINDS)})")
+        options[kind] = convert(spec)
+    return options
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Options du faux serveur, partagées avec le script de test de charge"""
+    parser.add_argument('--connection-delay', type=float, default=0.05)
+    parser.add_argument('--request-delay', type=float, default=0.0)
+    parser.add_argument('--latency', action='append', metavar='[TYPE=]DISTRIBUTION',
+                        help="Ex: publish=lognormal:0.3,0.5 ou uniform:0.01,0.05 (voir LatencyModel)")
+    parser.add_argument('--ready-after-polls', type=int, default=0)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--endpoint-error-rate', action='append', metavar='TYPE=TAUX')
+    parser.add_argument('--container-error-rate', type=float, default=0.0)
+    parser.add_argument('--app-call-limit', type=int, default=0, help='Appels par --quota-window')
+    parser.add_argument('--quota-window', type=float, default=3600)
+    parser.add_argument('--publish-limit', type=int, default=0, help='Publications par --publish-window')
+    parser.add_argument('--publish-window', type=float, default=86400)
+
+
+def server_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Arguments de MockGraphState à partir des options de add_server_arguments"""
+    return {
+        'connection_delay': args.connection_delay,
+        'request_delay': args.request_delay,
+        'latency': parse_kind_options(args.latency),
+        'ready_after_polls': args.ready_after_polls,
+        'rate_limit_every': args.rate_limit_every,
+        'error_rate': args.error_rate,
+        'error_rates': parse_kind_options(args.endpoint_error_rate, float),
+        'container_error_rate': args.container_error_rate,
+        'app_call_limit': args.app_call_limit,
+        'quota_window': args.quota_window,
+        'publish_limit': args.publish_limit,
+        'publish_window': args.publish_window
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Faux serveur API Graph')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockGraphServer(args.host, args.port, **server_options(args))
+    print(f"🧪 Faux serveur Graph API sur {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
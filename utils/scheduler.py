@@ -1,33 +1,79 @@
+import concurrent.futures
+import functools
+import json
+import os
+import socket
 import time
 import threading
 from datetime import datetime, timedelta
-from typing import List, Callable, Optional
+from typing import List, Callable, Optional, Dict
 import logging
 
 from database import DatabaseManager
 from services.instagram_api import InstagramPublisher
 from models import Post, PostStatus, PublicationResult
+from utils.metrics import PublicationMetrics
 
 
 class PostScheduler:
     """Gestionnaire de programmation et publication automatique des posts"""
     
+    # Clé user_settings où l'état du scheduler est conservé entre deux démarrages
+    STATE_SETTING_KEY = 'scheduler_state'
+    
     def __init__(self, db_manager: DatabaseManager, 
-                 instagram_publisher: InstagramPublisher = None):
+                 instagram_publisher: InstagramPublisher = None,
+                 clock: Callable[[], datetime] = None,
+                 sleep: Callable[[float], None] = None):
         """
         Initialise le scheduler
         
         Args:
             db_manager: Gestionnaire de base de données
             instagram_publisher: Publisher Instagram (optionnel)
+            clock: Horloge retournant l'heure courante (datetime.now par défaut)
+            sleep: Fonction d'attente (time.sleep par défaut)
         """
         self.db_manager = db_manager
         self.instagram_publisher = instagram_publisher
         self.is_running = False
+        self._stop_requested = False
         self.thread = None
+        self.last_check_at: Optional[datetime] = None  # Dernière vérification (liveness)
         self.check_interval = 60  # Vérifier toutes les 60 secondes
+        self.publish_spacing = 2  # Pause entre deux publications (limites de taux)
+        self.drain_timeout = 120  # Délai accordé aux publications en cours à l'arrêt
+        self.stale_processing_after = 600  # Au-delà, un post "processing" est considéré orphelin
+        # Ralentissement imposé par les quotas Graph API au-delà duquel les
+        # publications sont reportées à une prochaine vérification
+        self.max_quota_wait = 60
+        self.quota_deferred_until: Optional[datetime] = None
         self.logger = logging.getLogger(__name__)
         
+        # Identifiant de cette instance (propriétaire des posts qu'elle publie)
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        
+        # Publications en cours: post_id -> heure de début
+        self._in_flight: Dict[int, datetime] = {}
+        self._in_flight_lock = threading.Lock()
+        
+        # Réveil anticipé de la boucle (arrêt, post programmé pour maintenant)
+        self._wake_event = threading.Event()
+        
+        # Publication concurrente optionnelle (voir enable_async_publishing)
+        self.async_publisher = None
+        self.max_concurrent_publications = 5
+        self._async_runner = None
+        self._batch_task = None  # Lot asynchrone en cours (annulé à l'arrêt)
+        self._batch_stop_event = None  # Interrompt les départs espacés du lot
+        
+        # Horloge injectable: permet de piloter le scheduler en temps virtuel
+        self._now = clock or datetime.now
+        self._sleep = sleep or self._wait
+        
+        # Métriques de publication (retard, durée par étape, débit)
+        self.metrics = PublicationMetrics(clock=lambda: self._now().timestamp())
+        
         # Callbacks pour les événements
         self.on_post_published = None
         self.on_post_failed = None
@@ -40,28 +86,109 @@ class PostScheduler:
             return
         
         self.is_running = True
+        self._stop_requested = False
+        self._wake_event.clear()
+        if self._async_runner:
+            self._async_runner.start()
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         self.logger.info("📅 Scheduler démarré")
     
-    def stop(self):
-        """Arrête le scheduler"""
+    def stop(self, drain_timeout: float = None):
+        """
+        Arrête le scheduler
+        
+        Aucune nouvelle publication n'est lancée; celles en cours disposent de
+        `drain_timeout` secondes pour se terminer. Les posts encore en cours à
+        l'échéance sont mémorisés et réconciliés au prochain démarrage.
+        """
         if not self.is_running:
+            self._close_async_publisher()
             return
         
+        if drain_timeout is None:
+            drain_timeout = self.drain_timeout
+        
         self.is_running = False
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=5)
+        self._stop_requested = True
+        self._wake_event.set()
+        self._interrupt_async_batch()
+        
+        in_flight = self.get_in_flight_posts()
+        if in_flight:
+            self.logger.info(
+                f"⏳ Attente de {len(in_flight)} publication(s) en cours (max {drain_timeout}s)"
+            )
+        
+        if (self.thread and self.thread.is_alive()
+                and self.thread is not threading.current_thread()):
+            self.thread.join(timeout=drain_timeout)
+        
+        interrupted = self.get_in_flight_posts()
+        if interrupted:
+            self.logger.warning(f"⚠️  Publications interrompues: {interrupted}")
+        
+        self._save_state(interrupted)
+        self._close_async_publisher()
         self.logger.info("📅 Scheduler arrêté")
     
+    def _close_async_publisher(self):
+        """Ferme la session aiohttp et la boucle (relancée par start(), session recréée au premier appel)"""
+        if not self._async_runner or not self._async_runner.loop or not self._async_runner.loop.is_running():
+            return
+        try:
+            # Les publications encore en cours sont annulées avant la fermeture de leur session
+            self._async_runner.run(self._cancel_async_batch(), timeout=5)
+            self._async_runner.run(self.async_publisher.close(), timeout=5)
+        except Exception as e:
+            self.logger.warning(f"Fermeture du publisher asynchrone: {e}")
+        self._async_runner.stop()
+    
+    def _interrupt_async_batch(self):
+        """Réveille les départs espacés du lot en cours (ils ne publieront pas)"""
+        event = self._batch_stop_event
+        if event and self._async_runner and self._async_runner.loop:
+            try:
+                self._async_runner.loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Boucle déjà fermée
+    
+    async def _cancel_async_batch(self):
+        """Annule le lot en cours et attend la fin de ses tâches"""
+        import asyncio
+        task = self._batch_task
+        if task and not task.done():
+            self.logger.warning("⚠️  Publications asynchrones en cours annulées")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    def wake(self):
+        """Réveille la boucle pour une vérification immédiate"""
+        self._wake_event.set()
+    
+    def _wait(self, seconds: float):
+        """Attente interrompue par wake() ou stop()"""
+        self._wake_event.wait(seconds)
+        if not self._stop_requested:
+            self._wake_event.clear()
+    
+    def get_in_flight_posts(self) -> List[int]:
+        """Retourne les IDs des posts en cours de publication par cette instance"""
+        with self._in_flight_lock:
+            return list(self._in_flight)
+    
     def _run_scheduler(self):
         """Boucle principale du scheduler"""
         self.logger.info("🔄 Boucle de scheduler démarrée")
         
+        # Réconcilier les publications laissées en suspens par un arrêt brutal
+        self.recover_in_flight_posts()
+        
         while self.is_running:
             try:
                 self._check_and_publish_scheduled_posts()
-                time.sleep(self.check_interval)
+                self.last_check_at = self._now()
+                self._sleep(self.check_interval)
                 
             except Exception as e:
                 self.logger.error(f"Erreur dans le scheduler: {e}")
@@ -69,89 +196,463 @@ class PostScheduler:
                     self.on_scheduler_error(e)
                 
                 # Attendre un peu plus longtemps en cas d'erreur
-                time.sleep(self.check_interval * 2)
+                self._sleep(self.check_interval * 2)
     
     def _check_and_publish_scheduled_posts(self):
         """Vérifie et publie les posts programmés prêts"""
         try:
             # Récupérer les posts prêts à être publiés
-            ready_posts = self.db_manager.get_scheduled_posts_ready()
+            ready_posts = self.db_manager.get_scheduled_posts_ready(self._now())
             
             if not ready_posts:
                 return
             
             self.logger.info(f"📋 {len(ready_posts)} post(s) prêt(s) pour publication")
             
+            if self.async_publisher and len(ready_posts) > 1:
+                self._publish_posts_concurrently(ready_posts)
+                return
+            
             for post in ready_posts:
+                # Ne pas entamer de nouvelle publication après un arrêt
+                if self._stop_requested:
+                    break
+                
+                # Ralentir avant d'atteindre les quotas plutôt que subir des 429
+                if not self._wait_for_quota():
+                    break
+
                 self._publish_single_post(post)
                 
                 # Petite pause entre les publications pour éviter les limites de taux
-                time.sleep(2)
+                self._sleep(self.publish_spacing)
                 
         except Exception as e:
             self.logger.error(f"Erreur lors de la vérification des posts: {e}")
     
+    def enable_async_publishing(self, async_publisher, max_concurrent: int = 5):
+        """
+        Publie les posts prêts en parallèle depuis une seule boucle asyncio
+        
+        Args:
+            async_publisher: AsyncInstagramPublisher
+            max_concurrent: Nombre maximum de publications simultanées
+        """
+        from services.instagram_async import AsyncLoopThread
+        
+        self.async_publisher = async_publisher
+        self.max_concurrent_publications = max_concurrent
+        
+        # Un seul état des quotas pour les deux publishers du même compte
+        quota = getattr(self.instagram_publisher, 'quota', None)
+        if quota and getattr(async_publisher, 'account_id', None) == self.instagram_publisher.account_id:
+            async_publisher.quota = quota
+        if not self._async_runner:
+            self._async_runner = AsyncLoopThread().start()
+    
+    def _quota_delay(self) -> float:
+        """Attente imposée par les quotas Graph API avant la prochaine publication"""
+        try:
+            if hasattr(self.instagram_publisher, 'publish_throttle_delay'):
+                return self.instagram_publisher.publish_throttle_delay()
+            
+            quota = getattr(self.async_publisher, 'quota', None)
+            if quota:
+                return quota.throttle_delay(self.async_publisher.account_id)
+        except Exception as e:
+            self.logger.warning(f"Quotas Graph API indisponibles: {e}")
+        return 0
+    
+    def _wait_for_quota(self) -> bool:
+        """
+        Applique le ralentissement demandé par les quotas
+        
+        Returns:
+            False si l'attente dépasse max_quota_wait: les posts restants
+            gardent leur statut et seront repris à une prochaine vérification
+        """
+        delay = self._quota_delay()
+        if delay <= 0:
+            self.quota_deferred_until = None
+            return True
+        
+        if delay > self.max_quota_wait:
+            self.quota_deferred_until = self._now() + timedelta(seconds=delay)
+            self.logger.warning(
+                f"⏸️  Quotas Graph API: publications reportées de {delay:.0f}s"
+            )
+            return False
+        
+        self.logger.info(f"⏳ Quotas Graph API: pause de {delay:.1f}s avant publication")
+        self._sleep(delay)
+        return not self._stop_requested
+    
+    def _remaining_publishes(self) -> Optional[int]:
+        """Publications restantes du compte (None si limite inconnue)"""
+        for publisher in (self.instagram_publisher, self.async_publisher):
+            quota = getattr(publisher, 'quota', None)
+            if quota:
+                return quota.remaining_publishes(publisher.account_id)
+        return None
+    
+    def _publish_posts_concurrently(self, posts: List[Post]):
+        """Publie un lot de posts en parallèle (départs espacés de publish_spacing)"""
+        import asyncio
+        
+        if not self._wait_for_quota():
+            return
+        
+        # Ne pas lancer plus de publications simultanées que le compte n'en a encore
+        remaining = self._remaining_publishes()
+        if remaining is not None and remaining < len(posts):
+            self.logger.warning(
+                f"⏸️  Limite de publication: {remaining}/{len(posts)} post(s) publiés maintenant"
+            )
+            posts = posts[:remaining]
+        
+        # Un lot de max_concurrent_publications posts par vérification: un
+        # arriéré important ne bloque ni la boucle ni stop(), la suite est
+        # reprise à la vérification suivante (anticipée)
+        if len(posts) > self.max_concurrent_publications:
+            self.logger.info(
+                f"📦 {len(posts) - self.max_concurrent_publications} post(s) reporté(s) au lot suivant"
+            )
+            posts = posts[:self.max_concurrent_publications]
+            self.wake()
+        
+        async def publish_all():
+            self._batch_task = asyncio.current_task()
+            self._batch_stop_event = stop_event = asyncio.Event()
+            if self._stop_requested:
+                stop_event.set()
+            
+            async def publish(index: int, post: Post):
+                # Les départs restent espacés (seules les attentes de container se
+                # chevauchent); stop() interrompt l'attente et annule le départ
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=index * self.publish_spacing)
+                except asyncio.TimeoutError:
+                    pass
+                if not self._stop_requested:
+                    await self._publish_single_post_async(post)
+            
+            await asyncio.gather(*(publish(i, post) for i, post in enumerate(posts)))
+        
+        # Au-delà, les posts du lot seraient de toute façon considérés orphelins
+        timeout = len(posts) * self.publish_spacing + self.stale_processing_after
+        batch = self._async_runner.submit(publish_all())
+        try:
+            batch.result(timeout)
+        except concurrent.futures.TimeoutError:
+            self.logger.warning(f"⚠️  Lot de publications non terminé après {timeout:.0f}s: annulé")
+            self._async_runner.run(self._cancel_async_batch(), timeout=5)
+        except concurrent.futures.CancelledError:
+            self.logger.info("Lot de publications annulé (arrêt du scheduler)")
+        finally:
+            self._batch_task = None
+            self._batch_stop_event = None
+    
     def _publish_single_post(self, post: Post):
         """Publie un seul post"""
+        start_time = self._claim_post(post)
+        if not start_time:
+            return
+        
+        result = None
         try:
-            self.logger.info(f"📸 Publication du post: {post.title}")
+            self._check_publishable(post, self.instagram_publisher)
             
-            # Marquer comme en cours de traitement
-            self.db_manager.update_post_status(
-                post.id, PostStatus.PROCESSING
+            container_status = None
+            if post.instagram_container_id:
+                container_status = self.instagram_publisher.get_container_status(
+                    post.instagram_container_id
+                )
+                if container_status == 'PUBLISHED':
+                    media = self.instagram_publisher.find_published_media(post.get_full_caption())
+                    self._mark_published_from_container(post, media)
+                    return
+            
+            # Publier sur Instagram (image seule ou carrousel)
+            publish = self.instagram_publisher.publish_post
+            media = post.image_path
+            if post.is_carousel():
+                publish = self.instagram_publisher.publish_carousel
+                media = post.get_media_paths()
+            
+            result = publish(
+                media, post.get_full_caption(),
+                container_id=self._reusable_container(post, container_status),
+                on_container_created=lambda cid: self.db_manager.set_post_container_id(post.id, cid)
             )
+            self._handle_publication_result(post, start_time, result)
             
-            if not self.instagram_publisher:
-                raise Exception("Publisher Instagram non configuré")
-            
-            if not post.image_path or not post.can_be_published():
-                raise Exception("Post non prêt pour publication (image ou contenu manquant)")
-            
-            # Publier sur Instagram
-            caption = post.get_full_caption()
-            result = self.instagram_publisher.publish_post(post.image_path, caption)
+        except Exception as e:
+            self._handle_publication_error(post, start_time, e, result)
+        
+        finally:
+            self._release_post(post)
+    
+    async def _in_thread(self, function: Callable, *args, **kwargs):
+        """Exécute un appel bloquant (SQLite, callbacks) hors de la boucle d'événements"""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(function, *args, **kwargs)
+        )
+    
+    async def _publish_single_post_async(self, post: Post):
+        """
+        Équivalent asynchrone de _publish_single_post (via async_publisher)
+        
+        Les accès à la base passent par le pool de threads de la boucle: des
+        centaines de publications simultanées ne la bloquent pas sur SQLite.
+        """
+        start_time = await self._in_thread(self._claim_post, post)
+        if not start_time:
+            return
+        
+        result = None
+        try:
+            self._check_publishable(post, self.async_publisher)
             
-            if result.success:
-                # Mise à jour du statut en succès
-                self.db_manager.update_post_status(
-                    post.id, 
-                    PostStatus.PUBLISHED,
-                    instagram_post_id=result.instagram_post_id
+            container_status = None
+            if post.instagram_container_id:
+                container_status = await self.async_publisher.get_container_status(
+                    post.instagram_container_id
                 )
-                
-                self.logger.info(f"✅ Post publié avec succès: {post.title}")
-                
-                # Callback de succès
-                if self.on_post_published:
-                    self.on_post_published(post, result)
-                    
-            else:
-                # Mise à jour du statut en échec
-                self.db_manager.update_post_status(
-                    post.id, 
-                    PostStatus.FAILED,
-                    error_message=result.error_message
+                if container_status == 'PUBLISHED':
+                    media = await self.async_publisher.find_published_media(post.get_full_caption())
+                    await self._in_thread(self._mark_published_from_container, post, media)
+                    return
+            
+            publish = self.async_publisher.publish_post
+            media = post.image_path
+            if post.is_carousel():
+                publish = self.async_publisher.publish_carousel
+                media = post.get_media_paths()
+            
+            container_id = await self._in_thread(self._reusable_container, post, container_status)
+            result = await publish(
+                media, post.get_full_caption(),
+                container_id=container_id,
+                on_container_created=lambda cid: self._in_thread(
+                    self.db_manager.set_post_container_id, post.id, cid
                 )
-                
-                self.logger.error(f"❌ Échec publication: {post.title} - {result.error_message}")
-                
-                # Callback d'échec
-                if self.on_post_failed:
-                    self.on_post_failed(post, result.error_message)
-                
+            )
+            await self._in_thread(self._handle_publication_result, post, start_time, result)
+            
         except Exception as e:
-            error_msg = f"Erreur publication post {post.id}: {str(e)}"
-            self.logger.error(error_msg)
+            await self._in_thread(self._handle_publication_error, post, start_time, e, result)
+        
+        finally:
+            self._release_post(post)
+    
+    def _claim_post(self, post: Post) -> Optional[datetime]:
+        """Prend le post en charge; retourne l'heure de début, None s'il est déjà pris"""
+        start_time = self._now()
+        
+        # Prise en charge atomique: un autre scheduler a pu prendre ce post entre-temps
+        if not self.db_manager.claim_post_for_publishing(post.id, self.instance_id, start_time):
+            self.logger.info(f"⏭️  Post {post.id} déjà pris en charge, ignoré")
+            return None
+        
+        with self._in_flight_lock:
+            self._in_flight[post.id] = start_time
+        
+        self.logger.info(f"📸 Publication du post: {post.title}")
+        return start_time
+    
+    def _release_post(self, post: Post):
+        with self._in_flight_lock:
+            self._in_flight.pop(post.id, None)
+    
+    def _check_publishable(self, post: Post, publisher):
+        if not publisher:
+            raise Exception("Publisher Instagram non configuré")
+        
+        if not post.image_path or not post.can_be_published():
+            raise Exception("Post non prêt pour publication (image ou contenu manquant)")
+    
+    def _reusable_container(self, post: Post, status: Optional[str]) -> Optional[str]:
+        """Container existant à reprendre plutôt que recréer (publication interrompue)"""
+        if not post.instagram_container_id:
+            return None
+        
+        if status in ('FINISHED', 'IN_PROGRESS'):
+            return post.instagram_container_id
+        
+        if status is None:
+            raise Exception(f"Statut du container {post.instagram_container_id} inconnu")
+        
+        self.db_manager.set_post_container_id(post.id, None)
+        return None
+    
+    def _handle_publication_result(self, post: Post, start_time: datetime,
+                                   result: PublicationResult):
+        """Enregistre le résultat d'une publication (statut, métriques, callbacks)"""
+        if result.success:
+            # Mise à jour du statut en succès
+            self.db_manager.update_post_status(
+                post.id, 
+                PostStatus.PUBLISHED,
+                instagram_post_id=result.instagram_post_id
+            )
             
-            # Marquer le post comme échoué
+            self.logger.info(f"✅ Post publié avec succès: {post.title}")
+            self._record_publication(post, start_time, 'published', result)
+            
+            # Callback de succès
+            if self.on_post_published:
+                self.on_post_published(post, result)
+                
+        else:
+            # Mise à jour du statut en échec
             self.db_manager.update_post_status(
                 post.id, 
                 PostStatus.FAILED,
-                error_message=error_msg
+                error_message=result.error_message
             )
             
+            self.logger.error(f"❌ Échec publication: {post.title} - {result.error_message}")
+            self._record_publication(post, start_time, 'failed', result, result.error_message)
+            
+            # Callback d'échec
             if self.on_post_failed:
-                self.on_post_failed(post, error_msg)
+                self.on_post_failed(post, result.error_message)
+    
+    def _handle_publication_error(self, post: Post, start_time: datetime, error: Exception,
+                                  result: Optional[PublicationResult] = None):
+        """Marque le post échoué après une exception pendant la publication"""
+        error_msg = f"Erreur publication post {post.id}: {str(error)}"
+        self.logger.error(error_msg)
+        
+        # Marquer le post comme échoué
+        self.db_manager.update_post_status(
+            post.id, 
+            PostStatus.FAILED,
+            error_message=error_msg
+        )
+        
+        self._record_publication(post, start_time, 'error', result, error_msg)
+        
+        if self.on_post_failed:
+            self.on_post_failed(post, error_msg)
+    
+    def _mark_published_from_container(self, post: Post, media: Optional[dict]):
+        """Marque publié un post dont le container a déjà été publié sur Instagram"""
+        self.db_manager.update_post_status(
+            post.id,
+            PostStatus.PUBLISHED,
+            instagram_post_id=media.get('id') if media else None
+        )
+        self.logger.info(f"✅ Post {post.id} déjà publié (container {post.instagram_container_id})")
+    
+    def recover_in_flight_posts(self) -> Dict[str, int]:
+        """
+        Réconcilie les posts restés en "processing" après un arrêt brutal
+        
+        Le container Instagram enregistré indique où la publication s'est arrêtée:
+        - aucun container: rien n'a été publié, le post est reprogrammé
+        - PUBLISHED: le post est marqué publié (pas de double publication)
+        - FINISHED / IN_PROGRESS: reprogrammé, le container sera repris
+        - ERROR / EXPIRED: reprogrammé avec un nouveau container
+        - statut injoignable: laissé en l'état jusqu'au prochain démarrage
+        """
+        summary = {'requeued': 0, 'resumed': 0, 'published': 0, 'unresolved': 0}
+        
+        try:
+            state = self._load_state()
+            interrupted = state.get('interrupted_post_ids') or []
+            cutoff = self._now() - timedelta(seconds=self.stale_processing_after)
+            
+            in_flight = set(self.get_in_flight_posts())
+            stale_posts = [
+                post for post in self.db_manager.get_processing_posts(cutoff, interrupted)
+                if post.id not in in_flight
+            ]
+            
+            for post in stale_posts:
+                summary[self._reconcile_post(post)] += 1
+            
+            if stale_posts:
+                self.logger.info(f"♻️  Reprise après arrêt: {summary}")
+            
+            if interrupted:
+                self._save_state([])
+                
+        except Exception as e:
+            self.logger.error(f"Erreur reprise des publications en cours: {e}")
+        
+        return summary
+    
+    def _reconcile_post(self, post: Post) -> str:
+        """Réconcilie un post orphelin avec l'état de son container Instagram"""
+        container_id = post.instagram_container_id
+        
+        if not container_id:
+            self.db_manager.update_post_status(post.id, PostStatus.SCHEDULED)
+            return 'requeued'
+        
+        if not self.instagram_publisher:
+            return 'unresolved'
+        
+        status = self.instagram_publisher.get_container_status(container_id)
+        
+        if status is None:
+            return 'unresolved'
+        
+        if status == 'PUBLISHED':
+            media = self.instagram_publisher.find_published_media(post.get_full_caption())
+            self._mark_published_from_container(post, media)
+            return 'published'
+        
+        if status not in ('FINISHED', 'IN_PROGRESS'):
+            self.db_manager.set_post_container_id(post.id, None)
+            self.db_manager.update_post_status(post.id, PostStatus.SCHEDULED)
+            return 'requeued'
+        
+        self.db_manager.update_post_status(post.id, PostStatus.SCHEDULED)
+        return 'resumed'
+    
+    def _load_state(self) -> dict:
+        """Charge l'état persisté lors du dernier arrêt"""
+        try:
+            raw = self.db_manager.get_user_setting(self.STATE_SETTING_KEY)
+            return json.loads(raw) if raw else {}
+        except Exception as e:
+            self.logger.warning(f"État du scheduler illisible: {e}")
+            return {}
+    
+    def _save_state(self, interrupted_post_ids: List[int]):
+        """Persiste l'état du scheduler (publications interrompues comprises)"""
+        state = {
+            'instance_id': self.instance_id,
+            'stopped_at': self._now().isoformat(),
+            'clean_shutdown': not interrupted_post_ids,
+            'interrupted_post_ids': interrupted_post_ids
+        }
+        
+        try:
+            self.db_manager.set_user_setting(self.STATE_SETTING_KEY, json.dumps(state))
+        except Exception as e:
+            self.logger.warning(f"Impossible de sauvegarder l'état du scheduler: {e}")
+    
+    def _record_publication(self, post: Post, start_time: datetime, outcome: str,
+                            result: Optional[PublicationResult] = None,
+                            error_message: str = None):
+        """Enregistre les métriques d'une publication (sans jamais lever d'exception)"""
+        try:
+            published_at = self._now()
+            self.metrics.record_publication(
+                post_id=post.id,
+                scheduled_time=post.scheduled_time,
+                published_at=published_at,
+                duration=(published_at - start_time).total_seconds(),
+                outcome=outcome,
+                stage_timings=result.stage_timings if result else None,
+                error_message=error_message
+            )
+        except Exception as e:
+            self.logger.warning(f"Erreur enregistrement métriques: {e}")
     
     def schedule_post(self, post: Post, publish_time: datetime) -> bool:
         """Programme un post pour publication"""
@@ -163,6 +664,10 @@ class PostScheduler:
             
             if success:
                 self.logger.info(f"📅 Post programmé: {post.title} pour {publish_time}")
+                
+                # Inutile d'attendre la prochaine vérification pour un post déjà dû
+                if self.is_running and publish_time <= self._now():
+                    self.wake()
             
             return success
             
@@ -208,43 +713,8 @@ class PostScheduler:
     def get_scheduled_posts_summary(self) -> dict:
         """Retourne un résumé des posts programmés"""
         try:
-            scheduled_posts = self.db_manager.get_posts_by_status(PostStatus.SCHEDULED)
-            ready_posts = self.db_manager.get_scheduled_posts_ready()
-            
-            # Grouper par période
-            now = datetime.now()
-            next_hour = now + timedelta(hours=1)
-            next_day = now + timedelta(days=1)
-            next_week = now + timedelta(weeks=1)
-            
-            summary = {
-                'total_scheduled': len(scheduled_posts),
-                'ready_now': len(ready_posts),
-                'next_hour': 0,
-                'next_day': 0,
-                'next_week': 0,
-                'later': 0,
-                'overdue': 0
-            }
-            
-            for post in scheduled_posts:
-                if not post.scheduled_time:
-                    continue
-                
-                if post.scheduled_time <= now:
-                    if post in ready_posts:
-                        continue  # Déjà compté dans ready_now
-                    summary['overdue'] += 1
-                elif post.scheduled_time <= next_hour:
-                    summary['next_hour'] += 1
-                elif post.scheduled_time <= next_day:
-                    summary['next_day'] += 1
-                elif post.scheduled_time <= next_week:
-                    summary['next_week'] += 1
-                else:
-                    summary['later'] += 1
-            
-            return summary
+            # Agrégation côté SQL: coût indépendant du nombre de posts chargés
+            return self.db_manager.get_scheduled_posts_summary(self._now())
             
         except Exception as e:
             self.logger.error(f"Erreur résumé programmation: {e}")
@@ -253,18 +723,7 @@ class PostScheduler:
     def get_next_publication_time(self) -> Optional[datetime]:
         """Retourne l'heure de la prochaine publication programmée"""
         try:
-            scheduled_posts = self.db_manager.get_posts_by_status(PostStatus.SCHEDULED)
-            
-            if not scheduled_posts:
-                return None
-            
-            # Trouver le post avec la date la plus proche
-            next_time = None
-            for post in scheduled_posts:
-                if post.scheduled_time and (not next_time or post.scheduled_time < next_time):
-                    next_time = post.scheduled_time
-            
-            return next_time
+            return self.db_manager.get_next_scheduled_time()
             
         except Exception as e:
             self.logger.error(f"Erreur recherche prochaine publication: {e}")
@@ -280,7 +739,7 @@ class PostScheduler:
                 # Vérifier si le post peut être republié
                 if post.can_be_published():
                     # Remettre en programmation immédiate
-                    post.scheduled_time = datetime.now()
+                    post.scheduled_time = self._now()
                     post.status = PostStatus.SCHEDULED.value
                     post.error_message = None
                     
@@ -318,12 +777,21 @@ class PostScheduler:
             scheduler_stats = {
                 'is_running': self.is_running,
                 'check_interval': self.check_interval,
+                'in_flight': self.get_in_flight_posts(),
+                'last_check_at': self.last_check_at.isoformat() if self.last_check_at else None,
                 'next_check_in': self.check_interval if self.is_running else None,
                 'posts_stats': stats,
                 'next_publication': self.get_next_publication_time(),
-                'scheduled_summary': self.get_scheduled_posts_summary()
+                'scheduled_summary': self.get_scheduled_posts_summary(),
+                'metrics': self.metrics.snapshot(),
+                'quota_deferred_until': (self.quota_deferred_until.isoformat()
+                                         if self.quota_deferred_until else None)
             }
             
+            quota = getattr(self.instagram_publisher, 'quota', None)
+            if quota:
+                scheduler_stats['graph_quota'] = quota.snapshot(self.instagram_publisher.account_id)
+            
             return scheduler_stats
             
         except Exception as e:
@@ -366,4 +834,56 @@ class PostScheduler:
                 'success': False,
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
-            }
\ No newline at end of file
+            }
+
+
+
+# Statuts depuis lesquels un post peut être publié manuellement (routes web)
+MANUAL_PUBLISH_STATUSES = (PostStatus.DRAFT.value, PostStatus.SCHEDULED.value, PostStatus.FAILED.value)
+
+
+def publish_post_now(db_manager: DatabaseManager, publisher, post: Post,
+                     owner: str = None) -> Optional[PublicationResult]:
+    """
+    Publication manuelle d'un post, protégée comme celle du scheduler
+    
+    Le post est pris atomiquement (propriétaire et heure de début notés) et
+    son container Instagram est enregistré dès sa création: un scheduler
+    redémarré pendant la publication ne le considère pas orphelin, et le
+    reprend depuis son container s'il l'est devenu.
+    
+    Returns:
+        Le résultat de la publication, None si le post est déjà en cours de
+        publication (scheduler ou autre requête)
+    """
+    owner = owner or f"web:{socket.gethostname()}:{os.getpid()}"
+    if not db_manager.claim_post_for_publishing(post.id, owner, from_statuses=MANUAL_PUBLISH_STATUSES):
+        return None
+    
+    try:
+        publish = publisher.publish_post
+        media = post.image_path
+        if post.is_carousel():
+            publish = publisher.publish_carousel
+            media = post.get_media_paths()
+        
+        result = publish(
+            media, post.get_full_caption(),
+            on_container_created=lambda cid: db_manager.set_post_container_id(post.id, cid)
+        )
+    except Exception as e:
+        db_manager.update_post_status(post.id, PostStatus.FAILED, error_message=str(e))
+        raise
+    
+    if result.success:
+        db_manager.update_post_status(post.id, PostStatus.PUBLISHED,
+                                      instagram_post_id=result.instagram_post_id)
+    else:
+        db_manager.update_post_status(post.id, PostStatus.FAILED, error_message=result.error_message)
+    return result
+
+
+if __name__ == '__main__':
+    # python -m utils.scheduler: démon de publication indépendant de Flask
+    from utils.scheduler_daemon import main
+    main()
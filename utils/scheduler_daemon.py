@@ -0,0 +1,276 @@
+# utils/scheduler_daemon.py - Démon de publication indépendant de l'application Flask
+"""
+Exécute le PostScheduler dans un processus dédié, sans Flask ni générateurs
+d'images: seules la base de données et l'API Instagram sont nécessaires.
+Le tiers web et le tiers publication peuvent ainsi être déployés, dimensionnés
+et redémarrés séparément (mettre SCHEDULER_EMBEDDED=False côté web).
+
+Usage:
+    python -m utils.scheduler
+    python -m utils.scheduler --db posts.db --port 8765 --check-interval 30
+
+Endpoints HTTP:
+    GET /health   -> état du démon (200 si la boucle tourne, 503 sinon)
+    GET /metrics  -> métriques Prometheus (?format=json pour le JSON)
+"""
+import argparse
+import json
+import logging
+import signal
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from config import Config
+from database import DatabaseManager
+from utils.scheduler import PostScheduler
+
+
+logger = logging.getLogger('scheduler_daemon')
+
+
+class SchedulerDaemon:
+    """Démon hébergeant un PostScheduler et son serveur HTTP de supervision"""
+
+    def __init__(self, db_path: str = None, host: str = None, port: int = None,
+                 check_interval: int = None, publish_spacing: float = None,
+                 drain_timeout: float = None):
+        """
+        Args:
+            db_path: Base SQLite partagée avec l'application web
+            host: Interface d'écoute du serveur de supervision
+            port: Port du serveur de supervision (0 pour le désactiver)
+            check_interval: Intervalle de vérification des posts programmés
+            publish_spacing: Pause entre deux publications
+            drain_timeout: Délai accordé aux publications en cours à l'arrêt
+        """
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.host = host or Config.SCHEDULER_DAEMON_HOST
+        self.port = Config.SCHEDULER_DAEMON_PORT if port is None else port
+        self.check_interval = check_interval or Config.SCHEDULER_CHECK_INTERVAL
+        self.publish_spacing = Config.SCHEDULER_PUBLISH_SPACING if publish_spacing is None else publish_spacing
+        self.drain_timeout = Config.SCHEDULER_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+
+        self.started_at = None
+        self.scheduler: Optional[PostScheduler] = None
+        self.http_server: Optional[ThreadingHTTPServer] = None
+        self.last_insights_sync: Optional[dict] = None
+        self.last_media_sync: Optional[dict] = None
+        self._shutdown = threading.Event()
+
+    def _create_publisher(self):
+        """Crée le publisher Instagram si la configuration le permet"""
+        if not (Config.INSTAGRAM_ACCESS_TOKEN and Config.INSTAGRAM_ACCOUNT_ID):
+            logger.warning("⚠️  Configuration Instagram manquante: les publications échoueront")
+            return None
+
+        try:
+            from services.instagram_api import InstagramPublisher
+            publisher = InstagramPublisher(Config.INSTAGRAM_ACCESS_TOKEN, Config.INSTAGRAM_ACCOUNT_ID)
+            if Config.INSTAGRAM_CONTAINER_TRACKER:
+                publisher.enable_container_tracker(min_interval=Config.INSTAGRAM_CONTAINER_POLL_INTERVAL)
+            return publisher
+        except Exception as e:
+            logger.error(f"❌ Erreur service Instagram: {e}")
+            return None
+
+    def _enable_async_publishing(self):
+        """Publication concurrente (SCHEDULER_ASYNC_PUBLISHING); reste synchrone sans aiohttp"""
+        try:
+            from services.instagram_async import AsyncInstagramPublisher
+            publisher = AsyncInstagramPublisher(Config.INSTAGRAM_ACCESS_TOKEN, Config.INSTAGRAM_ACCOUNT_ID)
+        except (ImportError, ValueError) as e:
+            logger.warning(f"⚠️  Publication asynchrone indisponible, publication séquentielle: {e}")
+            return
+
+        self.scheduler.enable_async_publishing(publisher, Config.SCHEDULER_MAX_CONCURRENT_PUBLICATIONS)
+        logger.info(f"⚡ Publication asynchrone: {Config.SCHEDULER_MAX_CONCURRENT_PUBLICATIONS} "
+                    f"publications simultanées au maximum")
+
+    def start(self):
+        """Démarre le scheduler puis le serveur de supervision"""
+        db_manager = DatabaseManager(self.db_path)
+
+        self.scheduler = PostScheduler(db_manager, self._create_publisher())
+        self.scheduler.check_interval = self.check_interval
+        self.scheduler.publish_spacing = self.publish_spacing
+        self.scheduler.drain_timeout = self.drain_timeout
+        self.scheduler.set_callbacks(
+            on_published=lambda post, result: logger.info(f"📸 Post publié: {post.title}"),
+            on_failed=lambda post, error: logger.error(f"❌ Échec publication: {post.title} - {error}"),
+            on_error=lambda error: logger.error(f"🚨 Erreur scheduler: {error}")
+        )
+
+        if self.scheduler.instagram_publisher and Config.SCHEDULER_ASYNC_PUBLISHING:
+            self._enable_async_publishing()
+
+        self.started_at = datetime.now()
+        self.scheduler.start()
+
+        if self.scheduler.instagram_publisher and Config.INSIGHTS_SYNC_INTERVAL > 0:
+            threading.Thread(target=self._run_insights_sync, name='insights-sync', daemon=True).start()
+
+        if self.scheduler.instagram_publisher and Config.MEDIA_SYNC_INTERVAL > 0:
+            threading.Thread(target=self._run_media_sync, name='media-sync', daemon=True).start()
+
+        if self.port:
+            self.http_server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self.http_server.daemon_threads = True
+            threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+            logger.info(f"🩺 Supervision sur http://{self.host}:{self.port}/health")
+
+    def _run_insights_sync(self):
+        """Rafraîchit périodiquement les métriques des posts publiés"""
+        from services.insights_sync import InsightsSync
+
+        sync = InsightsSync(self.scheduler.db_manager, self.scheduler.instagram_publisher)
+        while not self._shutdown.is_set():
+            try:
+                self.last_insights_sync = sync.sync()
+            except Exception as e:
+                logger.error(f"❌ Erreur synchronisation des métriques: {e}")
+            self._shutdown.wait(Config.INSIGHTS_SYNC_INTERVAL)
+
+    def _run_media_sync(self):
+        """Met à jour périodiquement la copie locale des médias Instagram"""
+        from services.media_sync import MediaSync
+
+        sync = MediaSync(self.scheduler.db_manager, self.scheduler.instagram_publisher)
+        while not self._shutdown.is_set():
+            try:
+                self.last_media_sync = sync.sync()
+            except Exception as e:
+                logger.error(f"❌ Erreur synchronisation des médias: {e}")
+            self._shutdown.wait(Config.MEDIA_SYNC_INTERVAL)
+
+    def run(self):
+        """Démarre le démon et bloque jusqu'à SIGTERM/SIGINT"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self._shutdown.set())
+
+        self.start()
+        logger.info(f"📅 Démon de publication démarré (base: {self.db_path})")
+
+        self._shutdown.wait()
+        self.stop()
+
+    def stop(self):
+        """Arrête le scheduler (avec drainage) puis le serveur HTTP"""
+        logger.info("🔄 Arrêt du démon de publication...")
+
+        if self.scheduler:
+            self.scheduler.stop()
+            # Après le drainage: les publications en cours attendaient leur container
+            if self.scheduler.instagram_publisher:
+                self.scheduler.instagram_publisher.close()
+
+        if self.http_server:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+
+        self._shutdown.set()
+        logger.info("✅ Démon arrêté")
+
+    def health(self) -> dict:
+        """État de santé: la boucle doit avoir vérifié les posts récemment"""
+        scheduler = self.scheduler
+        now = datetime.now()
+
+        last_check = scheduler.last_check_at if scheduler else None
+        # Une vérification peut durer le temps de publier plusieurs posts
+        max_silence = self.check_interval * 3 + self.drain_timeout
+        reference = last_check or self.started_at
+        stalled = bool(reference) and (now - reference).total_seconds() > max_silence
+
+        db_ok = True
+        try:
+            scheduler.db_manager.get_next_scheduled_time()
+        except Exception:
+            db_ok = False
+
+        healthy = bool(scheduler and scheduler.is_running) and not stalled and db_ok
+
+        return {
+            'status': 'healthy' if healthy else 'unhealthy',
+            'running': bool(scheduler and scheduler.is_running),
+            'stalled': stalled,
+            'database': db_ok,
+            'instagram_configured': bool(scheduler and scheduler.instagram_publisher),
+            'instance_id': scheduler.instance_id if scheduler else None,
+            'in_flight': scheduler.get_in_flight_posts() if scheduler else [],
+            'last_check_at': last_check.isoformat() if last_check else None,
+            'last_insights_sync': self.last_insights_sync,
+            'last_media_sync': self.last_media_sync,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'timestamp': now.isoformat()
+        }
+
+    def _make_handler(self):
+        """Construit le handler HTTP lié à ce démon"""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+
+                if url.path == '/health':
+                    health = daemon.health()
+                    self._send(200 if health['status'] == 'healthy' else 503,
+                               json.dumps(health), 'application/json')
+
+                elif url.path == '/metrics':
+                    if parse_qs(url.query).get('format') == ['json']:
+                        stats = daemon.scheduler.get_statistics()
+                        self._send(200, json.dumps(stats, default=str), 'application/json')
+                    else:
+                        self._send(200, daemon.scheduler.metrics.to_prometheus(),
+                                   'text/plain; version=0.0.4')
+
+                else:
+                    self._send(404, json.dumps({'error': 'Not found'}), 'application/json')
+
+            def _send(self, status: int, body: str, content_type: str):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Démon de publication Instagram')
+    parser.add_argument('--db', default=None, help='Chemin de la base SQLite')
+    parser.add_argument('--host', default=None, help='Interface du serveur de supervision')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Port du serveur de supervision (0 pour désactiver)')
+    parser.add_argument('--check-interval', type=int, default=None)
+    parser.add_argument('--publish-spacing', type=float, default=None)
+    parser.add_argument('--drain-timeout', type=float, default=None)
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format='%(asctime)s %(name)s %(levelname)s %(message)s'
+    )
+
+    SchedulerDaemon(
+        db_path=args.db,
+        host=args.host,
+        port=args.port,
+        check_interval=args.check_interval,
+        publish_spacing=args.publish_spacing,
+        drain_timeout=args.drain_timeout
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
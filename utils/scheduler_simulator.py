@@ -0,0 +1,544 @@
+# utils/scheduler_simulator.py - Simulateur du scheduler en temps virtuel
+"""
+Banc d'essai hors-ligne pour PostScheduler.
+
+Le scheduler est piloté par une horloge virtuelle et un faux publisher
+Instagram (latences et taux d'erreur configurables), sur une base SQLite
+pré-remplie. Plusieurs heures de programmation sont ainsi simulées en
+quelques secondes.
+
+Usage:
+    python -m utils.scheduler_simulator --posts 100000 --duration-hours 6
+    python -m utils.scheduler_simulator --schedulers 2 --error-rate 0.05
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from database import DatabaseManager
+from models import PublicationResult
+from utils.metrics import PublicationMetrics, RollingHistogram
+from utils.scheduler import PostScheduler
+
+
+class VirtualClock:
+    """
+    Horloge virtuelle partagée entre plusieurs threads participants.
+
+    Le temps n'avance que lorsque tous les participants sont bloqués dans
+    sleep(): il saute alors directement au prochain réveil. Le travail réel
+    (requêtes SQLite, etc.) ne consomme donc pas de temps virtuel.
+    """
+
+    def __init__(self, start: datetime, end: datetime = None):
+        self._now = start
+        self.end = end
+        self.stopped = False
+        self._participants = 0
+        self._sleepers = {}
+        self._cond = threading.Condition()
+        self._on_end = []
+
+    def now(self) -> datetime:
+        """Heure virtuelle courante"""
+        with self._cond:
+            return self._now
+
+    def on_end(self, callback):
+        """Enregistre un callback appelé quand l'horloge atteint sa fin"""
+        self._on_end.append(callback)
+
+    def add_participant(self):
+        """Déclare un thread qui utilisera sleep()"""
+        with self._cond:
+            self._participants += 1
+
+    def remove_participant(self):
+        """Retire un thread participant (fin de sa boucle)"""
+        with self._cond:
+            self._participants -= 1
+            self._advance_if_idle()
+
+    def sleep(self, seconds: float):
+        """Attend `seconds` secondes de temps virtuel"""
+        with self._cond:
+            if self.stopped:
+                return
+
+            token = object()
+            wake_at = self._now + timedelta(seconds=max(seconds, 0))
+            self._sleepers[token] = wake_at
+            self._advance_if_idle()
+
+            while self._now < wake_at and not self.stopped:
+                self._cond.wait()
+
+            del self._sleepers[token]
+
+    def _advance_if_idle(self):
+        """Avance le temps si tous les participants dorment (verrou acquis)"""
+        blocked = [wake for wake in self._sleepers.values() if wake > self._now]
+
+        if self._participants <= 0 or len(blocked) < self._participants:
+            return
+
+        next_wake = min(blocked)
+        if self.end and next_wake >= self.end:
+            self._now = self.end
+            self.stopped = True
+            for callback in self._on_end:
+                callback()
+        else:
+            self._now = next_wake
+
+        self._cond.notify_all()
+
+
+class InstrumentedLock:
+    """
+    Verrou mesurant le temps d'attente (contention de la base)
+
+    Remplace DatabaseManager._lock, pris par les écritures seulement: les
+    lectures passent par get_connection() sans ce verrou (voir
+    InstrumentedConnections).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait_times = RollingHistogram(window_seconds=10 ** 9, max_samples=10 ** 6)
+        self.contended = 0
+        self.owner: Optional[int] = None
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(blocking=False):
+            self.wait_times.observe(0.0)
+            self.owner = threading.get_ident()
+            return True
+
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self.wait_times.observe(time.perf_counter() - start)
+        self.contended += 1
+        if acquired:
+            self.owner = threading.get_ident()
+        return acquired
+
+    def release(self):
+        self.owner = None
+        self._lock.release()
+
+    def held_by_current_thread(self) -> bool:
+        return self.owner == threading.get_ident()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class InstrumentedConnections:
+    """
+    Mesure des connexions ouvertes par DatabaseManager.get_connection()
+
+    Les lectures (connexion ouverte sans le verrou d'écriture) ne sont pas
+    vues par InstrumentedLock; leur durée, de l'ouverture à la fermeture,
+    inclut l'attente du verrou de fichier SQLite (busy timeout) quand une
+    écriture est en cours.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, write_lock: InstrumentedLock):
+        self._get_connection = db_manager.get_connection
+        self.write_lock = write_lock
+        self.read_times = RollingHistogram(window_seconds=10 ** 9, max_samples=10 ** 6)
+        self.write_connections = 0
+        db_manager.get_connection = self.get_connection
+
+    @contextmanager
+    def get_connection(self):
+        if self.write_lock.held_by_current_thread():
+            self.write_connections += 1
+            with self._get_connection() as conn:
+                yield conn
+            return
+
+        start = time.perf_counter()
+        try:
+            with self._get_connection() as conn:
+                yield conn
+        finally:
+            self.read_times.observe(time.perf_counter() - start)
+
+
+class FakeInstagramPublisher:
+    """Faux InstagramPublisher: latences log-normales et erreurs injectées"""
+
+    # Latence médiane (secondes) de chaque étape du vrai publisher
+    DEFAULT_LATENCIES = {
+        'upload': 0.5,
+        'container_create': 1.0,
+        'container_wait': 6.0,
+        'publish': 1.5
+    }
+
+    def __init__(self, clock: VirtualClock, latencies: Dict[str, float] = None,
+                 jitter: float = 0.4, error_rate: float = 0.0, seed: int = 42):
+        """
+        Args:
+            clock: Horloge virtuelle utilisée pour simuler les latences
+            latencies: Latence médiane par étape
+            jitter: Écart-type (log) de la distribution log-normale
+            error_rate: Probabilité d'échec d'une publication
+            seed: Graine du générateur aléatoire
+        """
+        self.clock = clock
+        self.latencies = dict(self.DEFAULT_LATENCIES, **(latencies or {}))
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.publications = {}  # image_path -> nombre de publications
+        self.containers = {}  # container_id -> statut
+        self.calls = 0
+
+    def _latency(self, stage: str) -> float:
+        with self._lock:
+            median = self.latencies[stage]
+            if median <= 0:
+                return 0.0
+            return self._random.lognormvariate(math.log(median), self.jitter)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def publish_post(self, image_path: str, caption: str, location_id: str = None,
+                     container_id: str = None,
+                     on_container_created=None) -> PublicationResult:
+        """Simule publish_post() avec les mêmes étapes que le vrai publisher"""
+        stage_timings = {}
+        stages = ('container_wait', 'publish')
+
+        if not container_id:
+            stages = ('upload', 'container_create') + stages
+            with self._lock:
+                self.calls += 1
+                container_id = f"sim_container_{self._next_id}"
+                self._next_id += 1
+
+        for stage in stages:
+            latency = self._latency(stage)
+            self.clock.sleep(latency)
+            stage_timings[stage] = latency
+
+            if stage == 'container_create':
+                with self._lock:
+                    self.containers[container_id] = 'IN_PROGRESS'
+                if on_container_created:
+                    on_container_created(container_id)
+
+            if stage == 'container_wait':
+                failed = self._should_fail()
+                with self._lock:
+                    self.containers[container_id] = 'ERROR' if failed else 'FINISHED'
+                if failed:
+                    result = PublicationResult.error_result(
+                        "Erreur simulée: container en erreur", container_id=container_id
+                    )
+                    result.stage_timings = stage_timings
+                    return result
+
+        with self._lock:
+            self.containers[container_id] = 'PUBLISHED'
+            self.publications[image_path] = self.publications.get(image_path, 0) + 1
+
+        result = PublicationResult.success_result(
+            instagram_post_id=f"sim_media_{container_id}", container_id=container_id
+        )
+        result.stage_timings = stage_timings
+        return result
+
+    def publish_carousel(self, image_paths: List[str], caption: str, **kwargs) -> PublicationResult:
+        """Simule publish_carousel(): mêmes étapes qu'une image seule, couverture comptabilisée"""
+        return self.publish_post(image_paths[0], caption, **kwargs)
+
+    def get_container_status(self, container_id: str) -> Optional[str]:
+        with self._lock:
+            return self.containers.get(container_id, 'ERROR')
+
+    def find_published_media(self, caption: str, limit: int = 25) -> Optional[Dict[str, Any]]:
+        return None
+
+    def duplicate_publishes(self) -> int:
+        """Nombre de publications en trop (même post publié plusieurs fois)"""
+        with self._lock:
+            return sum(count - 1 for count in self.publications.values() if count > 1)
+
+
+class _ErrorCounter(logging.Handler):
+    """Compte les erreurs de verrouillage SQLite remontées par le scheduler"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.errors = 0
+        self.locked_errors = 0
+
+    def emit(self, record):
+        self.errors += 1
+        if 'locked' in record.getMessage():
+            self.locked_errors += 1
+
+
+def seed_database(db_manager: DatabaseManager, count: int, start: datetime,
+                  spread_hours: float, seed: int = 42) -> float:
+    """
+    Insère `count` posts programmés répartis uniformément sur `spread_hours`
+
+    Returns:
+        Durée de l'insertion en secondes
+    """
+    rng = random.Random(seed)
+    spread_seconds = spread_hours * 3600
+    started = time.perf_counter()
+
+    rows = []
+    for i in range(count):
+        scheduled_time = start + timedelta(seconds=rng.uniform(0, spread_seconds))
+        rows.append((
+            f"Post simulé {i}", f"Description simulée {i}", "#simulation",
+            "simulation", "simulation", "engageant", f"sim/post_{i}.png",
+            scheduled_time, 'scheduled', start, start
+        ))
+
+    with db_manager.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO posts (
+                title, description, hashtags, image_prompt, topic, tone,
+                image_path, scheduled_time, status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+    return time.perf_counter() - started
+
+
+def run_simulation(posts: int = 100000, duration_hours: float = 6.0,
+                   spread_hours: float = 24 * 30, schedulers: int = 1,
+                   check_interval: int = 60, publish_spacing: float = 2,
+                   latencies: Dict[str, float] = None, jitter: float = 0.4,
+                   error_rate: float = 0.0, seed: int = 42,
+                   db_path: str = None) -> Dict[str, Any]:
+    """
+    Exécute une simulation complète et retourne le rapport
+
+    Args:
+        posts: Nombre de posts programmés à insérer
+        duration_hours: Durée de temps virtuel simulée
+        spread_hours: Période sur laquelle les posts sont répartis
+        schedulers: Nombre d'instances de scheduler concurrentes
+        check_interval: Intervalle de vérification du scheduler (s)
+        publish_spacing: Pause entre deux publications (s)
+        latencies: Latences médianes par étape du faux publisher
+        jitter: Dispersion des latences
+        error_rate: Taux d'erreur du faux publisher
+        seed: Graine aléatoire
+        db_path: Base à utiliser (fichier temporaire par défaut)
+    """
+    logging.getLogger('utils.scheduler').setLevel(logging.CRITICAL + 1)
+    error_counter = _ErrorCounter()
+    logging.getLogger('utils.scheduler').addHandler(error_counter)
+
+    temp_dir = None
+    if not db_path:
+        temp_dir = tempfile.mkdtemp(prefix='scheduler_sim_')
+        db_path = os.path.join(temp_dir, 'simulation.db')
+
+    start = datetime(2030, 1, 1, 8, 0, 0)
+    end = start + timedelta(hours=duration_hours)
+
+    db_manager = DatabaseManager(db_path)
+    seed_seconds = seed_database(db_manager, posts, start, spread_hours, seed)
+    db_manager._lock = InstrumentedLock()
+    connections = InstrumentedConnections(db_manager, db_manager._lock)
+
+    clock = VirtualClock(start, end)
+    publisher = FakeInstagramPublisher(clock, latencies, jitter, error_rate, seed)
+
+    window = int((end - start).total_seconds()) + 3600
+    metrics = PublicationMetrics(window_seconds=window, max_samples=10 ** 6,
+                                 clock=lambda: clock.now().timestamp())
+
+    instances = []
+    for _ in range(schedulers):
+        scheduler = PostScheduler(db_manager, publisher, clock=clock.now, sleep=clock.sleep)
+        scheduler.check_interval = check_interval
+        scheduler.publish_spacing = publish_spacing
+        scheduler.metrics = metrics
+        instances.append(scheduler)
+
+    def stop_all():
+        for scheduler in instances:
+            scheduler.stop()
+
+    clock.on_end(stop_all)
+
+    def run(scheduler: PostScheduler):
+        try:
+            scheduler._run_scheduler()
+        finally:
+            clock.remove_participant()
+
+    threads = []
+    wall_start = time.perf_counter()
+    for scheduler in instances:
+        clock.add_participant()
+        scheduler.is_running = True
+        thread = threading.Thread(target=run, args=(scheduler,), daemon=True)
+        threads.append(thread)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - wall_start
+
+    # Posts dus pendant la fenêtre simulée
+    with db_manager.get_connection() as conn:
+        due = conn.execute(
+            "SELECT COUNT(*) FROM posts WHERE scheduled_time <= ?", (end,)
+        ).fetchone()[0]
+        still_scheduled_due = conn.execute(
+            "SELECT COUNT(*) FROM posts WHERE status = 'scheduled' AND scheduled_time <= ?", (end,)
+        ).fetchone()[0]
+
+    snapshot = metrics.snapshot()
+    completed = sum(snapshot['totals'].values())
+
+    report = {
+        'config': {
+            'posts': posts,
+            'duration_hours': duration_hours,
+            'spread_hours': spread_hours,
+            'schedulers': schedulers,
+            'check_interval': check_interval,
+            'publish_spacing': publish_spacing,
+            'latencies': publisher.latencies,
+            'jitter': jitter,
+            'error_rate': error_rate,
+            'seed': seed
+        },
+        'wall_seconds': round(wall_seconds, 3),
+        'seed_seconds': round(seed_seconds, 3),
+        'speedup': round(duration_hours * 3600 / wall_seconds, 1) if wall_seconds else None,
+        'posts_due': due,
+        'backlog_at_end': still_scheduled_due,
+        'publications': snapshot['totals'],
+        'throughput_per_hour': round(completed / duration_hours, 2) if duration_hours else None,
+        'lag_seconds': snapshot['lag_seconds'],
+        'duration_seconds': snapshot['duration_seconds'],
+        'stages_seconds': snapshot['stages_seconds'],
+        'duplicate_publishes': publisher.duplicate_publishes(),
+        'publisher_calls': publisher.calls,
+        'db_contention': {
+            'lock_acquisitions': db_manager._lock.wait_times.count(),
+            'contended_acquisitions': db_manager._lock.contended,
+            'lock_wait_seconds': db_manager._lock.wait_times.snapshot(),
+            'write_connections': connections.write_connections,
+            'read_connections': connections.read_times.count(),
+            'read_connection_seconds': connections.read_times.snapshot(),
+            'scheduler_errors': error_counter.errors,
+            'sqlite_locked_errors': error_counter.locked_errors
+        }
+    }
+
+    logging.getLogger('utils.scheduler').removeHandler(error_counter)
+    if temp_dir:
+        try:
+            os.remove(db_path)
+            os.rmdir(temp_dir)
+        except OSError:
+            pass
+
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """Affiche un rapport de simulation lisible"""
+    config = report['config']
+    lag = report['lag_seconds']
+    contention = report['db_contention']
+
+    print("=" * 60)
+    print("📊 SIMULATION DU SCHEDULER")
+    print("=" * 60)
+    print(f"   🗄️  Posts programmés: {config['posts']} (insérés en {report['seed_seconds']}s)")
+    print(f"   ⏱️  Temps simulé: {config['duration_hours']}h en {report['wall_seconds']}s "
+          f"(x{report['speedup']})")
+    print(f"   🔁 Schedulers: {config['schedulers']} - intervalle {config['check_interval']}s")
+    print(f"   📋 Posts dus: {report['posts_due']} - restant en file: {report['backlog_at_end']}")
+    print(f"   ✅ Publications: {report['publications']}")
+    print(f"   🚀 Débit: {report['throughput_per_hour']} publications/heure")
+    print(f"   ⏳ Retard (s): p50={lag['p50']} p95={lag['p95']} p99={lag['p99']} max={lag['max']}")
+    print(f"   ♻️  Publications en double: {report['duplicate_publishes']}")
+    print(f"   🔒 Contention DB: {contention['contended_acquisitions']}/"
+          f"{contention['lock_acquisitions']} acquisitions en attente, "
+          f"attente p99={contention['lock_wait_seconds']['p99']}s, "
+          f"erreurs 'locked'={contention['sqlite_locked_errors']}")
+    print(f"   📖 Lectures (hors verrou d'écriture): {contention['read_connections']} connexions, "
+          f"durée p99={contention['read_connection_seconds']['p99']}s")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Simulateur du scheduler en temps virtuel')
+    parser.add_argument('--posts', type=int, default=100000, help='Posts programmés à insérer')
+    parser.add_argument('--duration-hours', type=float, default=6.0, help='Temps virtuel simulé')
+    parser.add_argument('--spread-hours', type=float, default=24 * 30,
+                        help='Période de répartition des posts')
+    parser.add_argument('--schedulers', type=int, default=1, help='Instances concurrentes')
+    parser.add_argument('--check-interval', type=int, default=60)
+    parser.add_argument('--publish-spacing', type=float, default=2)
+    parser.add_argument('--container-wait', type=float, default=None,
+                        help='Latence médiane de préparation du container (s)')
+    parser.add_argument('--jitter', type=float, default=0.4)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', default=None, help='Base SQLite à utiliser')
+    parser.add_argument('--json', action='store_true', help='Rapport au format JSON')
+    args = parser.parse_args(argv)
+
+    latencies = {}
+    if args.container_wait is not None:
+        latencies['container_wait'] = args.container_wait
+
+    report = run_simulation(
+        posts=args.posts,
+        duration_hours=args.duration_hours,
+        spread_hours=args.spread_hours,
+        schedulers=args.schedulers,
+        check_interval=args.check_interval,
+        publish_spacing=args.publish_spacing,
+        latencies=latencies,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        db_path=args.db
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()